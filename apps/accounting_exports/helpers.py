@@ -1,4 +1,4 @@
-from apps.accounting_exports.models import AccountingExport
+from apps.accounting_exports.models import AccountingExport, ArchivedAccountingExport
 from apps.fyle.models import Expense
 import django_filters
 
@@ -55,6 +55,24 @@ class AccountingExportSearchFilter(AdvanceSearchFilter):
         or_fields = ['expenses__expense_number', 'expenses__employee_name', 'expenses__employee_email', 'expenses__claim_number']
 
 
+class ArchivedAccountingExportSearchFilter(AdvanceSearchFilter):
+    id__in = django_filters.CharFilter(lookup_expr='in', field_name='id')
+    exported_at__gte = django_filters.DateTimeFilter(lookup_expr='gte', field_name='exported_at')
+    exported_at__lte = django_filters.DateTimeFilter(lookup_expr='lte', field_name='exported_at')
+    status__in = django_filters.CharFilter(lookup_expr='in', field_name='status')
+    type__in = django_filters.CharFilter(lookup_expr='in', field_name='type')
+    # Same parameters as AccountingExportSearchFilter, searched in the archived expense details
+    expenses__expense_number = django_filters.CharFilter(field_name='expense_search_text', lookup_expr='icontains')
+    expenses__employee_name = django_filters.CharFilter(field_name='expense_search_text', lookup_expr='icontains')
+    expenses__employee_email = django_filters.CharFilter(field_name='expense_search_text', lookup_expr='icontains')
+    expenses__claim_number = django_filters.CharFilter(field_name='expense_search_text', lookup_expr='icontains')
+
+    class Meta:
+        model = ArchivedAccountingExport
+        fields = ['exported_at__gte', 'exported_at__lte', 'status__in', 'type__in', 'id__in']
+        or_fields = ['expenses__expense_number', 'expenses__employee_name', 'expenses__employee_email', 'expenses__claim_number']
+
+
 class ExpenseSearchFilter(AdvanceSearchFilter):
     org_id = django_filters.CharFilter()
     is_skipped = django_filters.BooleanFilter()
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.26 on 2026-10-19 10:12
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting_exports', '0009_error_mapping_error_accounting_export_ids'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='error',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['mapping_error_accounting_export_ids'], name='errors_mapping_error_ids_gin'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.26 on 2026-10-19 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting_exports', '0010_error_mapping_error_ids_gin_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='accountingexport',
+            index=models.Index(fields=['workspace', 'status', 'updated_at'], name='accounting_exports_status_idx'),
+        ),
+    ]
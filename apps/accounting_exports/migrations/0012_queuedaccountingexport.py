@@ -0,0 +1,28 @@
+# Generated by Django 4.2.26 on 2026-10-19 14:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workspaces', '0013_workspace_org_settings'),
+        ('accounting_exports', '0011_accountingexport_status_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueuedAccountingExport',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='Created at datetime')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='Updated at datetime')),
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('accounting_export', models.OneToOneField(help_text='Queued accounting export', on_delete=django.db.models.deletion.CASCADE, to='accounting_exports.accountingexport')),
+                ('workspace', models.ForeignKey(help_text='Reference to Workspace model', on_delete=django.db.models.deletion.PROTECT, to='workspaces.workspace')),
+            ],
+            options={
+                'db_table': 'queued_accounting_exports',
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.26 on 2026-10-19 16:40
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+import django.db.models.deletion
+import sage_desktop_api.models.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workspaces', '0013_workspace_org_settings'),
+        ('accounting_exports', '0012_queuedaccountingexport'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedAccountingExport',
+            fields=[
+                ('id', models.IntegerField(help_text='Accounting export ID', primary_key=True, serialize=False)),
+                ('type', sage_desktop_api.models.fields.StringOptionsField(choices=[('PURCHASE_INVOICE', 'PURCHASE_INVOICE'), ('DIRECT_COST', 'DIRECT_COST'), ('FETCHING_REIMBURSABLE_EXPENSES', 'FETCHING_REIMBURSABLE_EXPENSES'), ('FETCHING_CREDIT_CARD_EXPENSES', 'FETCHING_CREDIT_CARD_EXPENSES')], default='', help_text='Task type', max_length=255, null=True)),
+                ('fund_source', sage_desktop_api.models.fields.StringNotNullField(help_text='Expense fund source', max_length=255)),
+                ('status', sage_desktop_api.models.fields.StringNotNullField(help_text='Task Status', max_length=255)),
+                ('export_id', sage_desktop_api.models.fields.StringNullField(help_text='id of the exported expense', max_length=255, null=True)),
+                ('exported_at', sage_desktop_api.models.fields.CustomDateTimeField(help_text='time of export', null=True)),
+                ('expense_ids', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=255), default=list, help_text='Fyle expense IDs of the accounting export', size=None)),
+                ('expense_search_text', models.TextField(default='', help_text='Expense numbers, employee names and emails and claim numbers, for search')),
+                ('data', sage_desktop_api.models.fields.CustomJsonField(default=list, help_text='Accounting export as listed, with its expenses', null=True)),
+                ('export_records', sage_desktop_api.models.fields.CustomJsonField(default=list, help_text='Purchase invoice, line items and direct costs of the accounting export', null=True)),
+                ('errors', sage_desktop_api.models.fields.CustomJsonField(default=list, help_text='Resolved errors of the accounting export', null=True)),
+                ('created_at', models.DateTimeField(help_text='Created at datetime')),
+                ('updated_at', models.DateTimeField(help_text='Updated at datetime')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, help_text='Archived at datetime')),
+                ('workspace', models.ForeignKey(help_text='Reference to Workspace model', on_delete=django.db.models.deletion.PROTECT, to='workspaces.workspace')),
+            ],
+            options={
+                'db_table': 'archived_accounting_exports',
+                'indexes': [models.Index(fields=['workspace', 'updated_at'], name='archived_exports_updated_idx'), django.contrib.postgres.indexes.GinIndex(fields=['expense_ids'], name='archived_exports_expense_gin')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.26 on 2026-10-19 17:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting_exports', '0013_archivedaccountingexport'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='accountingexport',
+            index=models.Index(condition=models.Q(('status', 'EXPORT_QUEUED')), fields=['workspace', 'id'], name='accounting_exports_queued_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.26 on 2026-10-19 19:05
+
+from django.db import migrations
+import sage_desktop_api.models.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting_exports', '0014_accountingexport_queued_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='accountingexport',
+            name='next_poll_at',
+            field=sage_desktop_api.models.fields.CustomDateTimeField(help_text='Next Sage 300 operation status poll of an EXPORT_QUEUED export', null=True),
+        ),
+    ]
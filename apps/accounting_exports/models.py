@@ -1,10 +1,13 @@
-from datetime import datetime
-from typing import List
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Iterable, List, Tuple
 
 from django.contrib.postgres.aggregates import ArrayAgg
 from django.contrib.postgres.fields import ArrayField
-from django.db import models
-from django.db.models import Count
+from django.contrib.postgres.indexes import GinIndex
+from django.db import models, transaction
+from django.db.models import Count, F
+from django.db.models.functions import Coalesce
 from fyle_accounting_library.fyle_platform.constants import IMPORTED_FROM_CHOICES
 from fyle_accounting_mappings.models import ExpenseAttribute
 
@@ -36,6 +39,28 @@ EXPORT_MODE_CHOICES = (
 )
 
 
+# Accounting exports of these types are not part of the summary counts
+SUMMARY_EXCLUDED_TYPES = ['FETCHING_REIMBURSABLE_EXPENSES', 'FETCHING_CREDIT_CARD_EXPENSES']
+SUMMARY_FAILED_STATUSES = ['FAILED', 'FATAL']
+
+
+def get_summary_counter_deltas(export_type: str, old_status: str, new_status: str) -> Tuple[int, int]:
+    """
+    Change of the failed and successful summary counts for a status transition of an accounting export
+    Successful exports are counted from last_exported_at, exports leaving COMPLETE are left to the reconciliation
+    :param export_type: Accounting export type
+    :param old_status: Stored status, None for new accounting exports
+    :param new_status: Status being saved, None for deleted accounting exports
+    :return: (failed delta, successful delta)
+    """
+    if export_type in SUMMARY_EXCLUDED_TYPES or old_status == new_status:
+        return 0, 0
+
+    failed_delta = int(new_status in SUMMARY_FAILED_STATUSES) - int(old_status in SUMMARY_FAILED_STATUSES)
+    successful_delta = int(new_status == 'COMPLETE')
+    return failed_delta, successful_delta
+
+
 def get_error_type_mapping(attribute_type: str) -> str:
     """
     Get error type mapping for attribute type
@@ -116,9 +141,49 @@ class AccountingExport(BaseForeignWorkspaceModel):
     exported_at = CustomDateTimeField(help_text='time of export')
     triggered_by = StringOptionsField(max_length=255, help_text="Triggered by", choices=IMPORTED_FROM_CHOICES)
     re_attempt_export = models.BooleanField(default=False, help_text='Is re-attempt export')
+    next_poll_at = CustomDateTimeField(help_text='Next Sage 300 operation status poll of an EXPORT_QUEUED export')
 
     class Meta:
         db_table = 'accounting_exports'
+        indexes = [
+            # Completed exports of a workspace since a date, for the summary
+            models.Index(fields=['workspace', 'status', 'updated_at'], name='accounting_exports_status_idx'),
+            # Exports waiting for their Sage 300 operation across workspaces, for the operation status poller
+            models.Index(fields=['workspace', 'id'], condition=models.Q(status='EXPORT_QUEUED'), name='accounting_exports_queued_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Status as stored, the summary counters are updated from it when a new status is saved
+        instance._stored_status = instance.__dict__.get('status')
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        if fields is None or 'status' in fields:
+            self._stored_status = self.__dict__.get('status')
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        is_status_saved = 'status' in self.__dict__ and (update_fields is None or 'status' in update_fields)
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if is_status_saved:
+                AccountingExportSummary.update_counters([(self.workspace_id, self.type, getattr(self, '_stored_status', None), self.status)])
+
+        if is_status_saved:
+            self._stored_status = self.status
+
+    def delete(self, *args, **kwargs):
+        stored_status = getattr(self, '_stored_status', None)
+
+        with transaction.atomic():
+            deleted = super().delete(*args, **kwargs)
+            AccountingExportSummary.update_counters([(self.workspace_id, self.type, stored_status, None)])
+
+        return deleted
 
     @staticmethod
     def create_accounting_export(expense_objects: List[Expense], fund_source: str, workspace_id):
@@ -236,6 +301,10 @@ class Error(BaseForeignWorkspaceModel):
 
     class Meta:
         db_table = 'errors'
+        indexes = [
+            # Membership lookups of accounting exports in mapping errors while enqueueing exports
+            GinIndex(fields=['mapping_error_accounting_export_ids'], name='errors_mapping_error_ids_gin'),
+        ]
 
 
 class AccountingExportSummary(BaseModel):
@@ -252,3 +321,114 @@ class AccountingExportSummary(BaseModel):
 
     class Meta:
         db_table = 'accounting_export_summary'
+
+    @staticmethod
+    def update_counters(transitions: Iterable[Tuple[int, str, str, str]]) -> None:
+        """
+        Update the counts of the workspace summaries for accounting export status transitions,
+        one UPDATE per workspace with changed counts
+        :param transitions: (workspace_id, type, old status, new status) of every accounting export
+        """
+        deltas = defaultdict(lambda: [0, 0])
+        for workspace_id, export_type, old_status, new_status in transitions:
+            failed_delta, successful_delta = get_summary_counter_deltas(export_type, old_status, new_status)
+            deltas[workspace_id][0] += failed_delta
+            deltas[workspace_id][1] += successful_delta
+
+        for workspace_id, (failed_delta, successful_delta) in deltas.items():
+            if not failed_delta and not successful_delta:
+                continue
+
+            AccountingExportSummary.objects.filter(workspace_id=workspace_id).update(
+                failed_accounting_export_count=Coalesce(F('failed_accounting_export_count'), 0) + failed_delta,
+                successful_accounting_export_count=Coalesce(F('successful_accounting_export_count'), 0) + successful_delta,
+                total_accounting_export_count=Coalesce(F('total_accounting_export_count'), 0) + failed_delta + successful_delta,
+                updated_at=datetime.now(timezone.utc)
+            )
+
+
+class QueuedAccountingExport(BaseForeignWorkspaceModel):
+    """
+    Accounting exports with an export task waiting in the Django-Q queue, written when the export
+    chain is enqueued and cleared when the export task starts. Looked up by the unique
+    accounting export index, entries of lost tasks are deleted after QUEUED_ACCOUNTING_EXPORT_TTL_HOURS
+    """
+    id = models.AutoField(primary_key=True)
+    accounting_export = models.OneToOneField(AccountingExport, on_delete=models.CASCADE, help_text='Queued accounting export')
+
+    class Meta:
+        db_table = 'queued_accounting_exports'
+
+    @staticmethod
+    def register(workspace_id: int, accounting_export_ids: List[int]) -> None:
+        """
+        Record accounting exports whose export task is enqueued
+        :param workspace_id: Workspace ID
+        :param accounting_export_ids: Accounting export IDs
+        """
+        QueuedAccountingExport.objects.bulk_create(
+            [
+                QueuedAccountingExport(workspace_id=workspace_id, accounting_export_id=accounting_export_id)
+                for accounting_export_id in accounting_export_ids
+            ],
+            update_conflicts=True,
+            unique_fields=['accounting_export'],
+            update_fields=['updated_at']
+        )
+
+    @staticmethod
+    def clear(accounting_export_id: int) -> None:
+        """
+        Remove an accounting export once its export task runs
+        :param accounting_export_id: Accounting export ID
+        """
+        QueuedAccountingExport.objects.filter(accounting_export_id=accounting_export_id).delete()
+
+
+class ArchivedAccountingExport(BaseForeignWorkspaceModel):
+    """
+    COMPLETE accounting exports moved out of the live tables by archive_accounting_exports, kept
+    as the listing API returned them with their expenses. Read with ?archived=true on the listing APIs
+    """
+    id = models.IntegerField(primary_key=True, help_text='Accounting export ID')
+    type = StringOptionsField(choices=TYPE_CHOICES, help_text='Task type')
+    fund_source = StringNotNullField(help_text='Expense fund source')
+    status = StringNotNullField(help_text='Task Status')
+    export_id = StringNullField(help_text='id of the exported expense')
+    exported_at = CustomDateTimeField(help_text='time of export')
+    expense_ids = ArrayField(base_field=models.CharField(max_length=255), default=list, help_text='Fyle expense IDs of the accounting export')
+    expense_search_text = models.TextField(default='', help_text='Expense numbers, employee names and emails and claim numbers, for search')
+    data = CustomJsonField(help_text='Accounting export as listed, with its expenses')
+    export_records = CustomJsonField(help_text='Purchase invoice, line items and direct costs of the accounting export')
+    errors = CustomJsonField(help_text='Resolved errors of the accounting export')
+    # Created / updated times of the accounting export, kept as they were
+    created_at = models.DateTimeField(help_text='Created at datetime')
+    updated_at = models.DateTimeField(help_text='Updated at datetime')
+    archived_at = models.DateTimeField(auto_now_add=True, help_text='Archived at datetime')
+
+    class Meta:
+        db_table = 'archived_accounting_exports'
+        indexes = [
+            models.Index(fields=['workspace', 'updated_at'], name='archived_exports_updated_idx'),
+            # Archived expenses are not imported again
+            GinIndex(fields=['expense_ids'], name='archived_exports_expense_gin'),
+        ]
+
+    @staticmethod
+    def get_archived_expense_ids(workspace_id: int, expense_ids: List[str]) -> set:
+        """
+        Fyle expense IDs among expense_ids belonging to archived accounting exports
+        :param workspace_id: Workspace ID
+        :param expense_ids: Fyle expense IDs
+        :return: archived Fyle expense IDs
+        """
+        if not expense_ids:
+            return set()
+
+        archived_expense_ids = ArchivedAccountingExport.objects.filter(
+            workspace_id=workspace_id, expense_ids__overlap=expense_ids
+        ).values_list('expense_ids', flat=True)
+
+        return set(expense_ids).intersection(
+            expense_id for archived_ids in archived_expense_ids for expense_id in archived_ids
+        )
@@ -1,7 +1,13 @@
 from fyle_accounting_mappings.serializers import ExpenseAttributeSerializer
 from rest_framework import serializers
 
-from apps.accounting_exports.models import AccountingExport, AccountingExportSummary, Error, Expense
+from apps.accounting_exports.models import (
+    AccountingExport,
+    AccountingExportSummary,
+    ArchivedAccountingExport,
+    Error,
+    Expense,
+)
 
 
 class ExpenseSerializer(serializers.ModelSerializer):
@@ -27,6 +33,19 @@ class AccountingExportSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class ArchivedAccountingExportSerializer(serializers.ModelSerializer):
+    """
+    Archived Accounting Export serializer, the accounting export as it was listed before archiving
+    """
+
+    class Meta:
+        model = ArchivedAccountingExport
+        fields = ['data']
+
+    def to_representation(self, instance):
+        return instance.data
+
+
 class AccountingExportSummarySerializer(serializers.ModelSerializer):
     """
     Accounting Export Summary serializer
@@ -49,13 +68,20 @@ class AccountingExportSummarySerializer(serializers.ModelSerializer):
         if not start_date:
             return None
 
-        return AccountingExport.objects.filter(
+        successful_count = AccountingExport.objects.filter(
             workspace_id=obj.workspace_id,
             status='COMPLETE',
             updated_at__gte=start_date,
             type__in=['PURCHASE_INVOICE', 'DIRECT_COST']
         ).count()
 
+        # Only COMPLETE accounting exports are archived
+        return successful_count + ArchivedAccountingExport.objects.filter(
+            workspace_id=obj.workspace_id,
+            updated_at__gte=start_date,
+            type__in=['PURCHASE_INVOICE', 'DIRECT_COST']
+        ).count()
+
     def get_repurposed_failed_count(self, obj):
         """
         Get repurposed failed count based on start_date query parameter
@@ -66,11 +92,8 @@ class AccountingExportSummarySerializer(serializers.ModelSerializer):
         if not start_date:
             return None
 
-        return AccountingExport.objects.filter(
-            workspace_id=obj.workspace_id,
-            status__in=['FAILED', 'FATAL'],
-            type__in=['PURCHASE_INVOICE', 'DIRECT_COST']
-        ).count()
+        # Failed exports are not bound to start_date, the summary keeps their count up to date
+        return obj.failed_accounting_export_count or 0
 
     def get_repurposed_last_exported_at(self, obj):
         """
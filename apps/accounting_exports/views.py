@@ -4,13 +4,14 @@ from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import generics
 from rest_framework.response import Response
 
-from apps.accounting_exports.models import AccountingExport, AccountingExportSummary, Error
+from apps.accounting_exports.models import AccountingExport, AccountingExportSummary, ArchivedAccountingExport, Error
 from apps.accounting_exports.serializers import (
     AccountingExportSerializer,
     AccountingExportSummarySerializer,
+    ArchivedAccountingExportSerializer,
     ErrorSerializer,
 )
-from apps.accounting_exports.helpers import AccountingExportSearchFilter
+from apps.accounting_exports.helpers import AccountingExportSearchFilter, ArchivedAccountingExportSearchFilter
 
 from sage_desktop_api.utils import LookupFieldMixin
 
@@ -18,6 +19,13 @@ logger = logging.getLogger(__name__)
 logger.level = logging.INFO
 
 
+def is_archived_request(request) -> bool:
+    """
+    Archived accounting exports are listed with ?archived=true
+    """
+    return request.query_params.get('archived') == 'true'
+
+
 class AccountingExportView(LookupFieldMixin, generics.ListAPIView):
     """
     Retrieve or Create Accounting Export
@@ -25,7 +33,22 @@ class AccountingExportView(LookupFieldMixin, generics.ListAPIView):
     serializer_class = AccountingExportSerializer
     queryset = AccountingExport.objects.all().order_by("-updated_at")
     filter_backends = (DjangoFilterBackend,)
-    filterset_class = AccountingExportSearchFilter
+
+    @property
+    def filterset_class(self):
+        if is_archived_request(self.request):
+            return ArchivedAccountingExportSearchFilter
+        return AccountingExportSearchFilter
+
+    def get_queryset(self):
+        if is_archived_request(self.request):
+            return ArchivedAccountingExport.objects.all().order_by("-updated_at")
+        return super().get_queryset()
+
+    def get_serializer_class(self):
+        if is_archived_request(self.request):
+            return ArchivedAccountingExportSerializer
+        return super().get_serializer_class()
 
 
 class AccountingExportCountView(generics.RetrieveAPIView):
@@ -39,7 +62,8 @@ class AccountingExportCountView(generics.RetrieveAPIView):
         if request.query_params.get("status__in"):
             params["status__in"] = request.query_params.get("status__in").split(",")
 
-        return Response({"count": AccountingExport.objects.filter(**params).count()})
+        model = ArchivedAccountingExport if is_archived_request(request) else AccountingExport
+        return Response({"count": model.objects.filter(**params).count()})
 
 
 class AccountingExportSummaryView(generics.RetrieveAPIView):
@@ -1,19 +1,26 @@
+import hashlib
 import json
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timezone
-from typing import List
+from typing import Any, Callable, Dict, Hashable, List
 
 import requests
 from django.conf import settings
 from django.core.cache import cache
 from django.db.models import Q
 from fyle_accounting_library.fyle_platform.enums import CacheKeyEnum
-from fyle_integrations_platform_connector import PlatformConnector
+from gevent import monkey
 from rest_framework.exceptions import ValidationError
 
 from apps.accounting_exports.models import AccountingExport
 from apps.fyle.constants import DEFAULT_FYLE_CONDITIONS
 from apps.fyle.models import Expense, ExpenseFilter
 from apps.workspaces.models import ExportSetting, FyleCredential, Workspace
+from sage_desktop_api.boot import LazyImport
+
+PlatformConnector = LazyImport('fyle_integrations_platform_connector.PlatformConnector')
 
 
 def construct_expense_filter(expense_filter):
@@ -115,18 +122,14 @@ def post_request(url, body, refresh_token=None):
     """
     Create a HTTP post request.
     """
-    access_token = None
     api_headers = {
         'Content-Type': 'application/json',
     }
-    if refresh_token:
-        access_token = get_access_token(refresh_token)
-        api_headers['Authorization'] = 'Bearer {0}'.format(access_token)
-
-    response = requests.post(
-        url,
-        headers=api_headers,
-        data=json.dumps(body)
+
+    response = __send_request(
+        lambda headers: requests.post(url, headers=headers, data=json.dumps(body)),
+        api_headers,
+        refresh_token
     )
 
     if response.status_code in (200, 201):
@@ -139,10 +142,8 @@ def get_request(url, params, refresh_token):
     """
     Create a HTTP get request.
     """
-    access_token = get_access_token(refresh_token)
     api_headers = {
         'content-type': 'application/json',
-        'Authorization': 'Bearer {0}'.format(access_token)
     }
     api_params = {}
 
@@ -157,10 +158,10 @@ def get_request(url, params, refresh_token):
 
             api_params[k] = p
 
-    response = requests.get(
-        url,
-        headers=api_headers,
-        params=api_params
+    response = __send_request(
+        lambda headers: requests.get(url, headers=headers, params=api_params),
+        api_headers,
+        refresh_token
     )
 
     if response.status_code == 200:
@@ -173,19 +174,14 @@ def patch_request(url, body, refresh_token=None):
     """
     Create a HTTP patch request.
     """
-    access_token = None
     api_headers = {
         'Content-Type': 'application/json',
     }
-    if refresh_token:
-        access_token = get_access_token(refresh_token)
 
-        api_headers['Authorization'] = 'Bearer {0}'.format(access_token)
-
-    response = requests.patch(
-        url,
-        headers=api_headers,
-        data=json.dumps(body)
+    response = __send_request(
+        lambda headers: requests.patch(url, headers=headers, data=json.dumps(body)),
+        api_headers,
+        refresh_token
     )
 
     if response.status_code in [200, 201]:
@@ -194,9 +190,89 @@ def patch_request(url, body, refresh_token=None):
         raise Exception(response.text)
 
 
-def get_access_token(refresh_token: str) -> str:
+def __send_request(send: Callable[[Dict], requests.Response], api_headers: Dict, refresh_token: str = None) -> requests.Response:
+    """
+    Send a request with the cached access token of the refresh token, a 401 invalidates
+    the cached token and the request is retried once with a new one
+    :param send: sends the request with the given headers
+    :param api_headers: headers without authorization
+    :param refresh_token: refresh token, requests without it are sent as is
+    :return: response
+    """
+    if not refresh_token:
+        return send(api_headers)
+
+    api_headers['Authorization'] = 'Bearer {0}'.format(get_access_token(refresh_token))
+    response = send(api_headers)
+
+    if response.status_code == 401:
+        invalidate_access_token(refresh_token)
+        api_headers['Authorization'] = 'Bearer {0}'.format(get_access_token(refresh_token))
+        response = send(api_headers)
+
+    return response
+
+
+class ExpiringLRUCache:
+    """
+    Thread safe in process cache of values with an expiry, holding at most max_size entries.
+    Expired entries are dropped when read and when the cache is full, then the least recently used ones
     """
-    Get access token from fyle
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key: Hashable, value: Any, expires_at: float) -> None:
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            if len(self._entries) <= self.max_size:
+                return
+
+            now = time.time()
+            for expired_key in [entry_key for entry_key, (_, entry_expires_at) in self._entries.items() if entry_expires_at <= now]:
+                del self._entries[expired_key]
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def pop_matching(self, predicate: Callable[[Hashable], bool]) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+# Access tokens by cache key, kept in process memory only so bearer tokens are never written to the shared cache table
+_access_tokens = ExpiringLRUCache(getattr(settings, 'FYLE_CONNECTION_CACHE_SIZE', 1000))
+# Refreshes of a token are single-flighted on the lock of its stripe
+_access_token_locks = [threading.Lock() for _ in range(64)]
+
+
+def get_access_token_cache_key(refresh_token: str) -> str:
+    """
+    Cache key of the access token of a refresh token, the refresh token itself is never stored
+    """
+    return 'FYLE_ACCESS_TOKEN_{}'.format(hashlib.sha256(refresh_token.encode()).hexdigest())
+
+
+def __refresh_access_token(refresh_token: str, cache_key: str) -> str:
+    """
+    Get a new access token from fyle and cache it until shortly before it expires
     """
     api_data = {
         'grant_type': 'refresh_token',
@@ -205,7 +281,41 @@ def get_access_token(refresh_token: str) -> str:
         'client_secret': settings.FYLE_CLIENT_SECRET
     }
 
-    return post_request(settings.FYLE_TOKEN_URI, body=api_data)['access_token']
+    response = post_request(settings.FYLE_TOKEN_URI, body=api_data)
+
+    expires_in = int(response.get('expires_in') or getattr(settings, 'FYLE_ACCESS_TOKEN_LIFETIME', 3600))
+    cached_for = max(expires_in - getattr(settings, 'FYLE_ACCESS_TOKEN_EXPIRY_MARGIN', 300), 1)
+    _access_tokens.set(cache_key, response['access_token'], time.time() + cached_for)
+
+    return response['access_token']
+
+
+def get_access_token(refresh_token: str) -> str:
+    """
+    Get access token from fyle, cached per refresh token in the process.
+    Concurrent refreshes of the same token within the process are single-flighted
+    """
+    cache_key = get_access_token_cache_key(refresh_token)
+
+    access_token = _access_tokens.get(cache_key)
+    if access_token:
+        return access_token
+
+    with _access_token_locks[hash(cache_key) % len(_access_token_locks)]:
+        access_token = _access_tokens.get(cache_key)
+        if access_token:
+            return access_token
+
+        return __refresh_access_token(refresh_token, cache_key)
+
+
+def invalidate_access_token(refresh_token: str) -> None:
+    """
+    Drop the cached access token of a refresh token, used when fyle rejects it
+    """
+    cache_key = get_access_token_cache_key(refresh_token)
+    _access_tokens.pop_matching(lambda key: key == cache_key)
+    invalidate_platform_connectors(refresh_token)
 
 
 def get_cluster_domain(refresh_token: str) -> str:
@@ -227,7 +337,7 @@ def get_expense_fields(workspace_id: int):
     """
 
     fyle_credentails = FyleCredential.objects.get(workspace_id=workspace_id)
-    platform = PlatformConnector(fyle_credentails)
+    platform = get_platform_connector(fyle_credentails)
     custom_fields = platform.expense_custom_fields.list_all()
 
     response = []
@@ -243,8 +353,53 @@ def get_expense_fields(workspace_id: int):
     return response
 
 
+# Platform connectors by (native thread, workspace id, cluster domain, refresh token hash). The threads of a
+# worker pool keep their own connectors, the greenlets of a gevent web worker all run on one native thread
+# and share one connector per workspace, a greenlet id would be new on every request
+_platform_connectors = ExpiringLRUCache(getattr(settings, 'FYLE_CONNECTION_CACHE_SIZE', 1000))
+_get_native_thread_id = monkey.get_original('_thread', 'get_ident')
+
+
+def get_platform_connector(fyle_credentials: FyleCredential) -> PlatformConnector:
+    """
+    Platform connector of the credentials, reused by the calling native thread while its access token is valid
+    instead of authenticating again on every construction
+    :param fyle_credentials: FyleCredential
+    :return: PlatformConnector
+    """
+    refresh_token_hash = get_access_token_cache_key(fyle_credentials.refresh_token)
+    key = (_get_native_thread_id(), fyle_credentials.workspace_id, fyle_credentials.cluster_domain, refresh_token_hash)
+
+    platform = _platform_connectors.get(key)
+    if platform:
+        return platform
+
+    platform = PlatformConnector(fyle_credentials=fyle_credentials)
+
+    lifetime = getattr(settings, 'FYLE_ACCESS_TOKEN_LIFETIME', 3600) - getattr(settings, 'FYLE_ACCESS_TOKEN_EXPIRY_MARGIN', 300)
+    _platform_connectors.set(key, platform, time.time() + lifetime)
+
+    return platform
+
+
+def invalidate_platform_connectors(refresh_token: str) -> None:
+    """
+    Drop the cached platform connectors of a refresh token, in every thread
+    """
+    refresh_token_hash = get_access_token_cache_key(refresh_token)
+    _platform_connectors.pop_matching(lambda key: key[3] == refresh_token_hash)
+
+
+def clear_fyle_connection_caches() -> None:
+    """
+    Clear the access tokens and platform connectors cached in this process
+    """
+    _access_tokens.clear()
+    _platform_connectors.clear()
+
+
 def sync_dimensions(fyle_credentials: FyleCredential) -> None:
-    platform = PlatformConnector(fyle_credentials)
+    platform = get_platform_connector(fyle_credentials)
 
     platform.import_fyle_dimensions()
 
@@ -252,7 +407,7 @@ def sync_dimensions(fyle_credentials: FyleCredential) -> None:
 def connect_to_platform(workspace_id: int) -> PlatformConnector:
     fyle_credentials: FyleCredential = FyleCredential.objects.get(workspace_id=workspace_id)
 
-    return PlatformConnector(fyle_credentials=fyle_credentials)
+    return get_platform_connector(fyle_credentials)
 
 
 def get_exportable_accounting_exports_ids(workspace_id: int):
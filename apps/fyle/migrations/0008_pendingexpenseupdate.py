@@ -0,0 +1,29 @@
+from django.db import migrations, models
+import django.db.models.deletion
+import sage_desktop_api.models.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workspaces', '0013_workspace_org_settings'),
+        ('fyle', '0007_alter_expense_imported_from'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingExpenseUpdate',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='Created at datetime')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='Updated at datetime')),
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('expense_id', sage_desktop_api.models.fields.StringNotNullField(help_text='Fyle Expense ID', max_length=255)),
+                ('payload', models.JSONField(help_text='Latest expense payload')),
+                ('workspace', models.ForeignKey(help_text='Reference to Workspace model', on_delete=django.db.models.deletion.PROTECT, to='workspaces.workspace')),
+            ],
+            options={
+                'db_table': 'pending_expense_updates',
+                'unique_together': {('workspace', 'expense_id')},
+            },
+        ),
+    ]
@@ -1,3 +1,4 @@
+from datetime import datetime, timezone
 from typing import List, Dict
 
 from django.db import models
@@ -135,56 +136,7 @@ class Expense(BaseForeignWorkspaceModel):
         # Create an empty list to store expense objects
         expense_objects = []
         for expense in expenses:
-            # Iterate through custom property fields and handle empty values
-            for custom_property_field in expense['custom_properties']:
-                if expense['custom_properties'][custom_property_field] == '':
-                    expense['custom_properties'][custom_property_field] = None
-
-            expense_data_to_append = {}
-            if not skip_update:
-                expense_data_to_append = {
-                    'claim_number': expense['claim_number'],
-                    'report_title': expense['report_title'],
-                    'approved_at': expense['approved_at'],
-                    'payment_number': expense['payment_number'],
-                    'expense_created_at': expense['expense_created_at'],
-                    'expense_updated_at': expense['expense_updated_at']
-                }
-
-            defaults = {
-                'employee_email': expense['employee_email'],
-                'employee_name': expense['employee_name'],
-                'category': expense['category'],
-                'sub_category': expense['sub_category'],
-                'project': expense['project'],
-                'expense_number': expense['expense_number'],
-                'org_id': expense['org_id'],
-                'amount': round(expense['amount'], 2),
-                'currency': expense['currency'],
-                'foreign_amount': expense['foreign_amount'],
-                'foreign_currency': expense['foreign_currency'],
-                'tax_amount': expense['tax_amount'],
-                'tax_group_id': expense['tax_group_id'],
-                'reimbursable': expense['reimbursable'],
-                'billable': expense['billable'] if expense['billable'] else False,
-                'state': expense['state'],
-                'vendor': expense['vendor'][:250] if expense['vendor'] else None,
-                'cost_center': expense['cost_center'],
-                'purpose': expense['purpose'],
-                'report_id': expense['report_id'],
-                'spent_at': expense['spent_at'],
-                'posted_at': expense['posted_at'],
-                'is_posted_at_null': expense['is_posted_at_null'],
-                'fund_source': SOURCE_ACCOUNT_MAP[expense['source_account_type']],
-                'verified_at': expense['verified_at'],
-                'custom_properties': expense['custom_properties'],
-                'file_ids': expense['file_ids'],
-                'corporate_card_id': expense['corporate_card_id'],
-                'workspace_id': workspace_id
-            }
-
-            if expense_data_to_append:
-                defaults.update(expense_data_to_append)
+            defaults = Expense.construct_expense_defaults(expense, workspace_id, skip_update)
 
             # Create or update an Expense object based on expense_id
             expense_object, created = Expense.objects.update_or_create(
@@ -204,6 +156,90 @@ class Expense(BaseForeignWorkspaceModel):
 
         return expense_objects
 
+    @staticmethod
+    def construct_expense_defaults(expense: Dict, workspace_id: int, skip_update: bool = False) -> Dict:
+        """
+        Expense field values of a constructed platform expense
+        """
+        # Iterate through custom property fields and handle empty values
+        for custom_property_field in expense['custom_properties']:
+            if expense['custom_properties'][custom_property_field] == '':
+                expense['custom_properties'][custom_property_field] = None
+
+        expense_data_to_append = {}
+        if not skip_update:
+            expense_data_to_append = {
+                'claim_number': expense['claim_number'],
+                'report_title': expense['report_title'],
+                'approved_at': expense['approved_at'],
+                'payment_number': expense['payment_number'],
+                'expense_created_at': expense['expense_created_at'],
+                'expense_updated_at': expense['expense_updated_at']
+            }
+
+        defaults = {
+            'employee_email': expense['employee_email'],
+            'employee_name': expense['employee_name'],
+            'category': expense['category'],
+            'sub_category': expense['sub_category'],
+            'project': expense['project'],
+            'expense_number': expense['expense_number'],
+            'org_id': expense['org_id'],
+            'amount': round(expense['amount'], 2),
+            'currency': expense['currency'],
+            'foreign_amount': expense['foreign_amount'],
+            'foreign_currency': expense['foreign_currency'],
+            'tax_amount': expense['tax_amount'],
+            'tax_group_id': expense['tax_group_id'],
+            'reimbursable': expense['reimbursable'],
+            'billable': expense['billable'] if expense['billable'] else False,
+            'state': expense['state'],
+            'vendor': expense['vendor'][:250] if expense['vendor'] else None,
+            'cost_center': expense['cost_center'],
+            'purpose': expense['purpose'],
+            'report_id': expense['report_id'],
+            'spent_at': expense['spent_at'],
+            'posted_at': expense['posted_at'],
+            'is_posted_at_null': expense['is_posted_at_null'],
+            'fund_source': SOURCE_ACCOUNT_MAP[expense['source_account_type']],
+            'verified_at': expense['verified_at'],
+            'custom_properties': expense['custom_properties'],
+            'file_ids': expense['file_ids'],
+            'corporate_card_id': expense['corporate_card_id'],
+            'workspace_id': workspace_id
+        }
+
+        if expense_data_to_append:
+            defaults.update(expense_data_to_append)
+
+        return defaults
+
+    @staticmethod
+    def update_expense_objects(expenses: List[Dict], workspace_id: int) -> List['Expense']:
+        """
+        Update existing expenses from constructed platform expenses in bulk, the report level
+        fields are kept as they are, same as create_expense_objects with skip_update
+        """
+        expense_defaults = {
+            expense['id']: Expense.construct_expense_defaults(expense, workspace_id, skip_update=True)
+            for expense in expenses
+        }
+        expense_objects = list(Expense.objects.filter(workspace_id=workspace_id, expense_id__in=expense_defaults.keys()))
+
+        if not expense_objects:
+            return []
+
+        updated_at = datetime.now(timezone.utc)
+        update_fields = [field for field in next(iter(expense_defaults.values())) if field != 'workspace_id']
+        for expense_object in expense_objects:
+            for field, value in expense_defaults[expense_object.expense_id].items():
+                setattr(expense_object, field, value)
+            expense_object.updated_at = updated_at
+
+        Expense.objects.bulk_update(expense_objects, update_fields + ['updated_at'], batch_size=50)
+
+        return expense_objects
+
 
 class DependentFieldSetting(BaseModel):
     """
@@ -226,6 +262,35 @@ class DependentFieldSetting(BaseModel):
         db_table = 'dependent_field_settings'
 
 
+class PendingExpenseUpdate(BaseForeignWorkspaceModel):
+    """
+    Latest expense update webhook payload of an expense waiting to be applied, updates
+    of a workspace are coalesced and applied together by apply_pending_expense_updates
+    DB Table: pending_expense_updates:
+    """
+    id = models.AutoField(primary_key=True)
+    expense_id = StringNotNullField(help_text='Fyle Expense ID')
+    payload = models.JSONField(help_text='Latest expense payload')
+
+    class Meta:
+        db_table = 'pending_expense_updates'
+        unique_together = ('workspace', 'expense_id')
+
+    @staticmethod
+    def add(workspace_id: int, expense: Dict) -> None:
+        """
+        Store the payload of an expense update, replacing the pending payload of the expense
+        :param workspace_id: Workspace ID
+        :param expense: Expense payload
+        """
+        PendingExpenseUpdate.objects.bulk_create(
+            [PendingExpenseUpdate(workspace_id=workspace_id, expense_id=expense['id'], payload=expense)],
+            update_conflicts=True,
+            unique_fields=['workspace', 'expense_id'],
+            update_fields=['payload', 'updated_at']
+        )
+
+
 class Reimbursement:
     """
     Creating a dummy class to be able to user
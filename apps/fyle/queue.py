@@ -9,6 +9,7 @@ from fyle_accounting_library.fyle_platform.enums import ExpenseImportSourceEnum,
 
 from apps.accounting_exports.models import AccountingExport
 from apps.fyle.helpers import assert_valid_request
+from apps.fyle.models import PendingExpenseUpdate
 from apps.fyle.tasks import import_credit_card_expenses, import_reimbursable_expenses
 from apps.workspaces.models import FeatureConfig
 from fyle_integrations_imports.modules.webhook_attributes import WebhookAttributeProcessor
@@ -115,11 +116,13 @@ def async_handle_webhook_callback(body: dict, workspace_id: int) -> None:
         pass
 
     elif body.get('action') == 'UPDATED_AFTER_APPROVAL' and body.get('data') and resource == 'EXPENSE':
+        # Updates are coalesced per expense, one deduplicated message applies all pending updates of the workspace
+        PendingExpenseUpdate.add(workspace_id, body['data'])
         payload = {
             'workspace_id': workspace_id,
             'action': WorkerActionEnum.EXPENSE_UPDATED_AFTER_APPROVAL.value,
             'data': {
-                'data': body['data']
+                'workspace_id': workspace_id
             }
         }
         publish_to_rabbitmq(payload=payload, routing_key=RoutingKeyEnum.UTILITY.value)
@@ -8,10 +8,8 @@ from django.dispatch import receiver
 
 from rest_framework.exceptions import ValidationError
 
-
-from fyle_integrations_platform_connector import PlatformConnector
-
 from apps.workspaces.models import FyleCredential
+from apps.fyle.helpers import get_platform_connector
 from apps.fyle.models import DependentFieldSetting, ExpenseFilter
 from apps.sage300.dependent_fields import create_dependent_custom_field_in_fyle
 from apps.fyle.tasks import re_run_skip_export_rule
@@ -31,7 +29,7 @@ def run_pre_save_dependent_field_settings_triggers(sender, instance: DependentFi
         return
 
     fyle_credentials: FyleCredential = FyleCredential.objects.get(workspace_id=instance.workspace_id)
-    platform = PlatformConnector(fyle_credentials=fyle_credentials)
+    platform = get_platform_connector(fyle_credentials)
 
     instance.project_field_id = platform.dependent_fields.get_project_field_id()
 
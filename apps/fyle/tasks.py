@@ -6,11 +6,13 @@ All Tasks from which involve Fyle APIs
 """
 import hashlib
 import logging
+import time
 from datetime import datetime, timedelta, timezone
-from typing import Dict, List
+from typing import Dict, Iterable, Iterator, List, Tuple
 
+from django.conf import settings
 from django.db import transaction
-from django.db.models import Count, Q
+from django.db.models import Count, Max, Q
 from django.utils.module_loading import import_string
 from django_q.models import Schedule
 from django_q.tasks import schedule
@@ -21,16 +23,19 @@ from fyle_accounting_library.fyle_platform.helpers import (
     get_source_account_types_based_on_export_modules,
 )
 from fyle_accounting_mappings.models import CategoryMapping, ExpenseAttribute
-from fyle_integrations_platform_connector import PlatformConnector
-from fyle_integrations_platform_connector.apis.expenses import Expenses as FyleExpenses
 
-from apps.accounting_exports.models import AccountingExport, AccountingExportSummary, Error
+from apps.accounting_exports.models import AccountingExport, ArchivedAccountingExport, Error
 from apps.fyle.exceptions import handle_exceptions
-from apps.fyle.helpers import __bulk_update_expenses, construct_expense_filter_query
-from apps.fyle.models import SOURCE_ACCOUNT_MAP, Expense, ExpenseFilter
+from apps.fyle.helpers import __bulk_update_expenses, construct_expense_filter_query, get_platform_connector
+from apps.fyle.models import SOURCE_ACCOUNT_MAP, Expense, ExpenseFilter, PendingExpenseUpdate
 from apps.workspaces.helpers import construct_filter_for_affected_accounting_exports
 from apps.workspaces.models import AdvancedSetting, ExportSetting, FyleCredential, Workspace
 from sage_desktop_api.logging_middleware import get_logger
+from sage_desktop_api.streaming import stream_queryset_batches
+from sage_desktop_api.boot import LazyImport
+
+PlatformConnector = LazyImport('fyle_integrations_platform_connector.PlatformConnector')
+FyleExpenses = LazyImport('fyle_integrations_platform_connector.apis.expenses.Expenses')
 
 logger = logging.getLogger(__name__)
 logger.level = logging.INFO
@@ -118,7 +123,7 @@ def import_expenses(workspace_id, accounting_export: AccountingExport = None, so
         source_account_type_query_param = [source_account_type]
 
     fyle_credentials = FyleCredential.objects.get(workspace_id=workspace_id)
-    platform = PlatformConnector(fyle_credentials)
+    platform = get_platform_connector(fyle_credentials)
 
     expenses = platform.expenses.get(
         source_account_type=source_account_type_query_param,
@@ -134,12 +139,19 @@ def import_expenses(workspace_id, accounting_export: AccountingExport = None, so
     if is_state_change_event:
         expenses = filter_expenses_based_on_state(expenses, export_settings, 'sage_desktop')
 
+    # Expenses of archived accounting exports are exported already, they are not imported again
+    archived_expense_ids = ArchivedAccountingExport.get_archived_expense_ids(workspace_id, [expense['id'] for expense in expenses])
+    if archived_expense_ids:
+        logger.info('Skipping %s expenses of archived accounting exports for workspace_id: %s', len(archived_expense_ids), workspace_id)
+        expenses = [expense for expense in expenses if expense['id'] not in archived_expense_ids]
+
     if expenses:
         with transaction.atomic():
             if not is_state_change_event:
                 setattr(workspace, f"{fund_source_map.get(fund_source_key)}_last_synced_at", datetime.now())
                 if imported_from != ExpenseImportSourceEnum.CONFIGURATION_UPDATE:
-                    workspace.save()
+                    # Only the synced fund source is saved, reimbursable and ccc imports can run concurrently
+                    workspace.save(update_fields=[f"{fund_source_map.get(fund_source_key)}_last_synced_at", 'updated_at'])
 
             # Handle fund source changes for state change events (report state changes)
             if is_state_change_event and report_id:
@@ -216,129 +228,191 @@ def update_non_exported_expenses(data: Dict) -> None:
     """
     To update expenses not in COMPLETE, IN_PROGRESS state
     """
-    org_id = data['org_id']
-    expense_id = data['id']
-    workspace = Workspace.objects.get(org_id=org_id)
-    expense = Expense.objects.filter(workspace_id=workspace.id, expense_id=expense_id).first()
+    workspace = Workspace.objects.get(org_id=data['org_id'])
+    apply_expense_updates(workspace.id, [data])
 
-    if expense:
-        accounting_export = AccountingExport.objects.filter(
-            workspace_id=workspace.id,
-            expenses=expense,
-            status__in=['EXPORT_READY', 'FAILED', 'FATAL']
-        ).first()
 
-        if accounting_export:
-            expense_obj = []
-            expense_obj.append(data)
-            expense_objects = FyleExpenses().construct_expense_object(expense_obj, expense.workspace_id)
+def apply_pending_expense_updates(workspace_id: int = None, data: Dict = None) -> None:
+    """
+    Apply the coalesced expense update webhooks of a workspace, waits for the burst of
+    updates to settle for EXPENSE_UPDATE_COALESCE_SECONDS before reading them
+    :param workspace_id: Workspace ID
+    :param data: Expense payload of messages published before updates were coalesced
+    """
+    if data:
+        update_non_exported_expenses(data)
+        return
 
-            old_fund_source = expense.fund_source
-            new_fund_source = SOURCE_ACCOUNT_MAP[expense_objects[0]['source_account_type']]
+    coalesce_seconds = getattr(settings, 'EXPENSE_UPDATE_COALESCE_SECONDS', 2)
+    last_updated_at = PendingExpenseUpdate.objects.filter(workspace_id=workspace_id).aggregate(Max('updated_at'))['updated_at__max']
 
-            old_category = expense.category if (expense.category == expense.sub_category or expense.sub_category is None) else '{0} / {1}'.format(expense.category, expense.sub_category)
-            new_category = expense_objects[0]['category'] if (expense_objects[0]['category'] == expense_objects[0]['sub_category'] or expense_objects[0]['sub_category'] is None) else '{0} / {1}'.format(expense_objects[0]['category'], expense_objects[0]['sub_category'])
+    if not last_updated_at:
+        return
 
-            Expense.create_expense_objects(
-                expense_objects, expense.workspace_id, skip_update=True
-            )
+    wait_seconds = coalesce_seconds - (datetime.now(timezone.utc) - last_updated_at).total_seconds()
+    if wait_seconds > 0:
+        time.sleep(min(wait_seconds, coalesce_seconds))
 
-            if old_fund_source != new_fund_source:
-                logger.info("Fund source changed for expense %s from %s to %s in workspace %s", expense.id, old_fund_source, new_fund_source, expense.workspace_id)
-                handle_fund_source_changes_for_expense_ids(
-                    workspace_id=expense.workspace_id,
-                    changed_expense_ids=[expense.id],
-                    report_id=expense.report_id,
-                    affected_fund_source_expense_ids={old_fund_source: [expense.id]}
-                )
+    pending_updates = list(PendingExpenseUpdate.objects.filter(workspace_id=workspace_id).order_by('id'))
+
+    if not pending_updates:
+        return
+
+    logger.info('Applying %s coalesced expense updates for workspace %s', len(pending_updates), workspace_id)
+    apply_expense_updates(workspace_id, [pending_update.payload for pending_update in pending_updates])
 
-            if old_category != new_category:
-                logger.info("Category changed for expense %s from %s to %s in workspace %s", expense.id, old_category, new_category, expense.workspace_id)
-                handle_category_changes_for_expense(expense=expense, old_category=old_category, new_category=new_category)
+    # An expense updated again while applying keeps its row and is applied by the next run
+    applied_updates = Q()
+    for pending_update in pending_updates:
+        applied_updates |= Q(id=pending_update.id, updated_at=pending_update.updated_at)
 
+    PendingExpenseUpdate.objects.filter(applied_updates, workspace_id=workspace_id).delete()
 
-def remove_accounting_export_from_category_error(workspace_id: int, accounting_export_id: int, old_category: str, expense_id: str) -> None:
+
+def apply_expense_updates(workspace_id: int, expenses: List[Dict]) -> None:
     """
-    Remove accounting export from old category's mapping error
+    Update the expenses of accounting exports that are not exported yet from expense payloads,
+    the last payload of an expense wins. Category and fund source changes are handled together
+    for all the expenses
     :param workspace_id: Workspace ID
-    :param accounting_export_id: Accounting export ID
-    :param old_category: Old category value
-    :param expense_id: Expense ID for logging
+    :param expenses: Expense payloads
     """
-    old_category_expense_attribute = ExpenseAttribute.objects.filter(
-        workspace_id=workspace_id,
-        attribute_type='CATEGORY',
-        value=old_category
-    ).first()
+    latest_expenses = {expense['id']: expense for expense in expenses}
 
-    if not old_category_expense_attribute:
-        return
+    export_expenses = AccountingExport.expenses.through.objects.filter(
+        accountingexport__workspace_id=workspace_id,
+        accountingexport__status__in=['EXPORT_READY', 'FAILED', 'FATAL'],
+        expense__workspace_id=workspace_id,
+        expense__expense_id__in=latest_expenses.keys()
+    ).select_related('accountingexport', 'expense').order_by('accountingexport_id')
 
-    error = Error.objects.filter(
-        workspace_id=workspace_id,
-        is_resolved=False,
-        type='CATEGORY_MAPPING',
-        expense_attribute=old_category_expense_attribute,
-        mapping_error_accounting_export_ids__contains=[accounting_export_id]
-    ).first()
+    accounting_export_by_expense = {}
+    for export_expense in export_expenses:
+        accounting_export_by_expense.setdefault(export_expense.expense, export_expense.accountingexport)
 
-    if not error:
+    if not accounting_export_by_expense:
         return
 
-    logger.info('Removing accounting export: %s from errors for workspace_id: %s as a result of category update for expense %s', accounting_export_id, workspace_id, expense_id)
-    error.mapping_error_accounting_export_ids.remove(accounting_export_id)
+    existing_expenses = list(accounting_export_by_expense.keys())
+    expense_objects = FyleExpenses().construct_expense_object(
+        [latest_expenses[expense.expense_id] for expense in existing_expenses], workspace_id
+    )
+
+    category_changes = []
+    fund_source_changes = {}
 
-    if error.mapping_error_accounting_export_ids:
-        error.updated_at = datetime.now(timezone.utc)
-        error.save(update_fields=['mapping_error_accounting_export_ids', 'updated_at'])
-    else:
-        error.delete()
+    for expense, expense_object in zip(existing_expenses, expense_objects):
+        old_fund_source = expense.fund_source
+        new_fund_source = SOURCE_ACCOUNT_MAP[expense_object['source_account_type']]
+
+        old_category = expense.category if (expense.category == expense.sub_category or expense.sub_category is None) else '{0} / {1}'.format(expense.category, expense.sub_category)
+        new_category = expense_object['category'] if (expense_object['category'] == expense_object['sub_category'] or expense_object['sub_category'] is None) else '{0} / {1}'.format(expense_object['category'], expense_object['sub_category'])
+
+        if old_fund_source != new_fund_source:
+            logger.info("Fund source changed for expense %s from %s to %s in workspace %s", expense.id, old_fund_source, new_fund_source, workspace_id)
+            report_changes = fund_source_changes.setdefault(expense.report_id, {'changed_expense_ids': [], 'affected_fund_source_expense_ids': {}})
+            report_changes['changed_expense_ids'].append(expense.id)
+            report_changes['affected_fund_source_expense_ids'].setdefault(old_fund_source, []).append(expense.id)
+
+        accounting_export = accounting_export_by_expense[expense]
+        if old_category != new_category and not accounting_export.exported_at:
+            logger.info("Category changed for expense %s from %s to %s in workspace %s", expense.id, old_category, new_category, workspace_id)
+            category_changes.append((accounting_export.id, old_category, new_category))
+
+    Expense.update_expense_objects(expense_objects, workspace_id)
+
+    for report_id, report_changes in fund_source_changes.items():
+        handle_fund_source_changes_for_expense_ids(
+            workspace_id=workspace_id,
+            changed_expense_ids=report_changes['changed_expense_ids'],
+            report_id=report_id,
+            affected_fund_source_expense_ids=report_changes['affected_fund_source_expense_ids']
+        )
+
+    if category_changes:
+        handle_category_changes_for_accounting_exports(workspace_id=workspace_id, category_changes=category_changes)
 
 
-def add_accounting_export_to_category_error(workspace_id: int, accounting_export_id: int, new_category: str) -> None:
+def handle_category_changes_for_accounting_exports(workspace_id: int, category_changes: List[Tuple[int, str, str]]) -> None:
     """
-    Add accounting export to new category's mapping error or create one if mapping is missing
+    Move accounting exports from the mapping errors of their old categories to the ones of the new categories,
+    a mapping error is created for a new category that is not mapped
     :param workspace_id: Workspace ID
-    :param accounting_export_id: Accounting export ID
-    :param new_category: New category value
+    :param category_changes: (accounting export id, old category, new category) of every change
     """
-    new_category_expense_attribute = ExpenseAttribute.objects.filter(
-        workspace_id=workspace_id,
-        attribute_type='CATEGORY',
-        value=new_category
-    ).first()
+    categories = {old_category for _, old_category, _ in category_changes} | {new_category for _, _, new_category in category_changes}
 
-    if not new_category_expense_attribute:
-        return
+    category_attributes = {}
+    for attribute in ExpenseAttribute.objects.filter(workspace_id=workspace_id, attribute_type='CATEGORY', value__in=categories).order_by('id'):
+        category_attributes.setdefault(attribute.value, attribute)
 
-    existing_error = Error.objects.filter(
-        workspace_id=workspace_id,
-        is_resolved=False,
-        type='CATEGORY_MAPPING',
-        expense_attribute=new_category_expense_attribute
-    ).first()
-
-    if existing_error:
-        if accounting_export_id not in existing_error.mapping_error_accounting_export_ids:
-            existing_error.mapping_error_accounting_export_ids.append(accounting_export_id)
-            existing_error.updated_at = datetime.now(timezone.utc)
-            existing_error.save(update_fields=['mapping_error_accounting_export_ids', 'updated_at'])
+    if not category_attributes:
         return
 
-    category_mapping = CategoryMapping.objects.filter(
-        source_category__value=new_category,
-        workspace_id=workspace_id
-    ).first()
-
-    if not category_mapping:
-        Error.objects.create(
+    with transaction.atomic():
+        errors = {}
+        for error in Error.objects.filter(
             workspace_id=workspace_id,
+            is_resolved=False,
             type='CATEGORY_MAPPING',
-            expense_attribute=new_category_expense_attribute,
-            mapping_error_accounting_export_ids=[accounting_export_id],
-            error_detail=f"{new_category_expense_attribute.display_name} mapping is missing",
-            error_title=new_category_expense_attribute.value
-        )
+            expense_attribute__in=category_attributes.values()
+        ).order_by('id'):
+            errors.setdefault(error.expense_attribute_id, error)
+
+        unmapped_categories = set(category_attributes.keys())
+        if any(category_attributes[new_category].id not in errors for _, _, new_category in category_changes if new_category in category_attributes):
+            unmapped_categories -= set(CategoryMapping.objects.filter(
+                workspace_id=workspace_id,
+                source_category__value__in=category_attributes.keys()
+            ).values_list('source_category__value', flat=True))
+
+        changed_errors = {}
+        for accounting_export_id, old_category, new_category in category_changes:
+            old_attribute = category_attributes.get(old_category)
+            old_error = errors.get(old_attribute.id) if old_attribute else None
+
+            if old_error and accounting_export_id in old_error.mapping_error_accounting_export_ids:
+                logger.info('Removing accounting export: %s from errors for workspace_id: %s as a result of category update', accounting_export_id, workspace_id)
+                old_error.mapping_error_accounting_export_ids.remove(accounting_export_id)
+                changed_errors[old_attribute.id] = old_error
+
+            new_attribute = category_attributes.get(new_category)
+            if not new_attribute:
+                continue
+
+            new_error = errors.get(new_attribute.id)
+            if not new_error and new_category in unmapped_categories:
+                new_error = errors[new_attribute.id] = Error(
+                    workspace_id=workspace_id,
+                    type='CATEGORY_MAPPING',
+                    expense_attribute=new_attribute,
+                    mapping_error_accounting_export_ids=[],
+                    error_detail=f"{new_attribute.display_name} mapping is missing",
+                    error_title=new_attribute.value
+                )
+
+            if new_error and accounting_export_id not in new_error.mapping_error_accounting_export_ids:
+                new_error.mapping_error_accounting_export_ids.append(accounting_export_id)
+                changed_errors[new_attribute.id] = new_error
+
+        updated_at = datetime.now(timezone.utc)
+        errors_to_create, errors_to_update, error_ids_to_delete = [], [], []
+        for error in changed_errors.values():
+            if not error.pk:
+                if error.mapping_error_accounting_export_ids:
+                    errors_to_create.append(error)
+            elif error.mapping_error_accounting_export_ids:
+                error.updated_at = updated_at
+                errors_to_update.append(error)
+            else:
+                error_ids_to_delete.append(error.pk)
+
+        if error_ids_to_delete:
+            Error.objects.filter(id__in=error_ids_to_delete).delete()
+        if errors_to_update:
+            Error.objects.bulk_update(errors_to_update, ['mapping_error_accounting_export_ids', 'updated_at'], batch_size=50)
+        if errors_to_create:
+            Error.objects.bulk_create(errors_to_create, batch_size=50)
 
 
 def handle_category_changes_for_expense(expense: Expense, old_category: str, new_category: str) -> None:
@@ -348,49 +422,40 @@ def handle_category_changes_for_expense(expense: Expense, old_category: str, new
     :param old_category: Old category
     :param new_category: New category
     """
-    with transaction.atomic():
-        accounting_export = AccountingExport.objects.filter(
-            expenses__id=expense.id,
-            workspace_id=expense.workspace_id,
-            exported_at__isnull=True
-        ).first()
+    accounting_export = AccountingExport.objects.filter(
+        expenses__id=expense.id,
+        workspace_id=expense.workspace_id,
+        exported_at__isnull=True
+    ).first()
 
-        if not accounting_export:
-            return
+    if not accounting_export:
+        return
 
-        remove_accounting_export_from_category_error(expense.workspace_id, accounting_export.id, old_category, expense.id)
-        add_accounting_export_to_category_error(expense.workspace_id, accounting_export.id, new_category)
+    handle_category_changes_for_accounting_exports(
+        workspace_id=expense.workspace_id,
+        category_changes=[(accounting_export.id, old_category, new_category)]
+    )
 
 
-def mark_expenses_as_skipped(final_query: Q, expenses_object_ids: List, workspace: Workspace) -> List[Expense]:
+def mark_expenses_as_skipped(final_query: Q, expenses_object_ids: Iterable[int], workspace: Workspace) -> Iterator[List[int]]:
     """
-    Mark expenses as skipped in bulk
+    Mark expenses as skipped in bulk, one streamed batch of ids at a time
+    Memory ceiling: one batch of STREAM_QUERYSET_CHUNK_SIZE expense ids
     :param final_query: final query
-    :param expenses_object_ids: expenses object ids
+    :param expenses_object_ids: expenses object ids, a values_list queryset is used as a subquery
     :param workspace: workspace object
-    :return: List of skipped expense objects
+    :return: ids of each batch of skipped expenses, once the batch is marked
     """
     expenses_to_be_skipped = Expense.objects.filter(
         final_query,
         id__in=expenses_object_ids,
         org_id=workspace.org_id,
         is_skipped=False
-    )
-    skipped_expenses_list = list(expenses_to_be_skipped)
-    expense_to_be_updated = []
-    for expense in expenses_to_be_skipped:
-        expense_to_be_updated.append(
-            Expense(
-                id=expense.id,
-                is_skipped=True,
-            )
-        )
-
-    if expense_to_be_updated:
-        __bulk_update_expenses(expense_to_be_updated)
+    ).values_list('id', flat=True)
 
-    # Return the updated expense objects
-    return skipped_expenses_list
+    for skipped_expense_ids in stream_queryset_batches(expenses_to_be_skipped):
+        __bulk_update_expenses([Expense(id=expense_id, is_skipped=True) for expense_id in skipped_expense_ids])
+        yield skipped_expense_ids
 
 
 def re_run_skip_export_rule(workspace: Workspace) -> None:
@@ -406,20 +471,14 @@ def re_run_skip_export_rule(workspace: Workspace) -> None:
         expenses = Expense.objects.filter(
             filtered_expense_query, workspace_id=workspace.id, is_skipped=False, accountingexport__exported_at__isnull=True
         )
-        expense_ids = list(expenses.values_list('id', flat=True))
-        skipped_expenses = mark_expenses_as_skipped(
+        skipped_expense_batches = mark_expenses_as_skipped(
             filtered_expense_query,
-            expense_ids,
+            expenses.values_list('id', flat=True),
             workspace
         )
-        if skipped_expenses:
-            accounting_exports = AccountingExport.objects.filter(exported_at__isnull=True, workspace_id=workspace.id, expenses__in=skipped_expenses)
-            deleted_failed_accounting_export_count = 0
-            deleted_total_accounting_export_count = 0
+        for skipped_expense_ids in skipped_expense_batches:
+            accounting_exports = AccountingExport.objects.filter(exported_at__isnull=True, workspace_id=workspace.id, expenses__in=skipped_expense_ids)
             for accounting_export in accounting_exports:
-                if accounting_export.status != 'COMPLETE':
-                    deleted_failed_accounting_export_count += 1
-
                 error = Error.objects.filter(
                     workspace_id=workspace.id,
                     accounting_export_id=accounting_export.id
@@ -428,23 +487,11 @@ def re_run_skip_export_rule(workspace: Workspace) -> None:
                     logger.info('Deleting Sage300 error for accounting export %s before export', accounting_export.id)
                     error.delete()
 
-                accounting_export.expenses.remove(*skipped_expenses)
+                accounting_export.expenses.remove(*skipped_expense_ids)
                 if not accounting_export.expenses.exists():
                     logger.info('Deleting empty accounting export %s before export', accounting_export.id)
+                    # Summary counts of the deleted accounting export are updated by AccountingExport.delete()
                     accounting_export.delete()
-                    deleted_total_accounting_export_count += 1
-
-            last_export_detail = AccountingExportSummary.objects.filter(workspace_id=workspace.id).first()
-            if last_export_detail:
-                last_export_detail.failed_accounting_export_count = max(
-                    0,
-                    (last_export_detail.failed_accounting_export_count or 0) - deleted_failed_accounting_export_count
-                )
-                last_export_detail.total_accounting_export_count = max(
-                    0,
-                    (last_export_detail.total_accounting_export_count or 0) - deleted_total_accounting_export_count
-                )
-                last_export_detail.save()
 
 
 def handle_expense_fund_source_change(workspace_id: int, report_id: str, platform: PlatformConnector) -> None:
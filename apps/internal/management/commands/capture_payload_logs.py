@@ -0,0 +1,42 @@
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from sage_desktop_api.log_handlers import FULL_PAYLOAD_WORKSPACES_CACHE_KEY
+
+
+class Command(BaseCommand):
+
+    help = 'Log full, unsampled and untruncated payloads of a workspace for a while, eg: when debugging an export'
+
+    def add_arguments(self, parser):
+        parser.add_argument('workspace_ids', nargs='*', type=int, help='Workspaces to capture full payloads of')
+        parser.add_argument('--minutes', type=int, default=30, help='How long full payloads are captured')
+        parser.add_argument('--stop', action='store_true', help='Stop capturing full payloads of the workspaces')
+
+    def handle(self, *args, **options):
+        now = time.time()
+        full_payload_workspaces = {
+            workspace_id: expires_at
+            for workspace_id, expires_at in (cache.get(FULL_PAYLOAD_WORKSPACES_CACHE_KEY) or {}).items()
+            if expires_at > now
+        }
+
+        for workspace_id in options['workspace_ids']:
+            if options['stop']:
+                full_payload_workspaces.pop(str(workspace_id), None)
+            else:
+                full_payload_workspaces[str(workspace_id)] = now + options['minutes'] * 60
+
+        if full_payload_workspaces:
+            timeout = max(full_payload_workspaces.values()) - now
+            cache.set(FULL_PAYLOAD_WORKSPACES_CACHE_KEY, full_payload_workspaces, timeout)
+        else:
+            cache.delete(FULL_PAYLOAD_WORKSPACES_CACHE_KEY)
+
+        for workspace_id, expires_at in sorted(full_payload_workspaces.items()):
+            self.stdout.write('Capturing full payloads of workspace {} for {} more minutes'.format(
+                workspace_id, int((expires_at - now) / 60)
+            ))
+        self.stdout.write('Workers pick up the change within 30 seconds')
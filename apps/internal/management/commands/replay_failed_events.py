@@ -0,0 +1,60 @@
+import json
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from fyle_accounting_library.rabbitmq.models import FailedEvent
+
+from workers.helpers import publish_to_rabbitmq
+
+
+class Command(BaseCommand):
+
+    help = 'Replay FailedEvent rows to RabbitMQ, filtered by routing key, action or workspace'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--routing-key', help='Only replay events consumed from this routing key, eg: EXPORT.P1.*')
+        parser.add_argument('--action', help='Only replay events of this action, eg: EXPORT.P1.RUN_SYNC_SCHEDULE')
+        parser.add_argument('--workspace-id', type=int, action='append', dest='workspace_ids', help='Workspace to replay, can be repeated')
+        parser.add_argument('--since-hours', type=int, default=24, help='Only replay events that failed in the last n hours')
+        parser.add_argument('--limit', type=int, default=1000, help='Maximum number of messages to publish')
+        parser.add_argument('--rate', type=float, default=10, help='Maximum messages published per second')
+        parser.add_argument('--dry-run', action='store_true', help='Only print the messages that would be replayed')
+
+    def handle(self, *args, **options):
+        failed_events = FailedEvent.objects.filter(
+            created_at__gte=timezone.now() - timedelta(hours=options['since_hours'])
+        ).order_by('-id')
+
+        if options['routing_key']:
+            failed_events = failed_events.filter(routing_key=options['routing_key'])
+        if options['action']:
+            failed_events = failed_events.filter(payload__action=options['action'])
+        if options['workspace_ids']:
+            failed_events = failed_events.filter(workspace_id__in=options['workspace_ids'])
+
+        interval = 1 / options['rate'] if options['rate'] > 0 else 0
+        replayed_fingerprints = set()
+
+        for failed_event in failed_events.iterator():
+            if len(replayed_fingerprints) >= options['limit']:
+                break
+
+            payload = dict(failed_event.payload)
+            payload.pop('retry_count', None)
+
+            # Every retry of a message leaves a row, replay each message once
+            fingerprint = json.dumps([failed_event.routing_key, payload], sort_keys=True, default=str)
+            if fingerprint in replayed_fingerprints:
+                continue
+            replayed_fingerprints.add(fingerprint)
+
+            self.stdout.write(f'Replaying event {failed_event.id}: {payload.get("action")} for workspace {payload.get("workspace_id")}')
+            if options['dry_run']:
+                continue
+
+            publish_to_rabbitmq(payload=payload, routing_key=failed_event.routing_key)
+            time.sleep(interval)
+
+        self.stdout.write(self.style.SUCCESS(f'{len(replayed_fingerprints)} events replayed'))
@@ -0,0 +1,18 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from workers.scheduler import Scheduler
+
+
+class Command(BaseCommand):
+
+    help = 'Dispatch due Django-Q schedules through RabbitMQ from a single timer process, replaces the qcluster scheduler'
+
+    def handle(self, *args, **options):
+        scheduler = Scheduler()
+
+        signal.signal(signal.SIGTERM, scheduler.stop)
+        signal.signal(signal.SIGINT, scheduler.stop)
+
+        scheduler.run()
@@ -0,0 +1,38 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django_q.models import Schedule
+
+from workers.sharding import get_schedule_offset_minutes
+
+
+class Command(BaseCommand):
+
+    help = 'Spread existing run_import_export schedules over SCHEDULE_SPREAD_WINDOW_MINUTES'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only print the schedules that would be moved',
+        )
+
+    def handle(self, *args, **options):
+        schedules = Schedule.objects.filter(func='apps.workspaces.tasks.run_import_export', next_run__isnull=False)
+        updated_schedules = []
+
+        for schedule in schedules:
+            workspace_id = int(schedule.args)
+            # Align to the top of the hour first so re-running the command is idempotent
+            base_next_run = schedule.next_run.replace(minute=0, second=0, microsecond=0)
+            next_run = base_next_run + timedelta(minutes=get_schedule_offset_minutes(workspace_id))
+
+            if next_run != schedule.next_run:
+                schedule.next_run = next_run
+                updated_schedules.append(schedule)
+                self.stdout.write(f'Workspace {workspace_id}: next run moved to {next_run}')
+
+        if not options['dry_run'] and updated_schedules:
+            Schedule.objects.bulk_update(updated_schedules, ['next_run'], batch_size=500)
+
+        self.stdout.write(self.style.SUCCESS(f'{len(updated_schedules)} schedules spread'))
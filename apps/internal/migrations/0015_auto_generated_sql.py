@@ -0,0 +1,26 @@
+# Generated by Django
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [('internal', '0014_auto_generated_sql')]
+
+    operations = [
+        migrations.RunSQL(
+            sql="""
+                INSERT INTO django_q_schedule (func, args, schedule_type, minutes, next_run, repeats)
+                SELECT 'apps.internal.tasks.archive_accounting_exports', NULL, 'D', NULL, NOW() + interval '2 hours', -1
+                WHERE NOT EXISTS (
+                    SELECT 1
+                    FROM django_q_schedule
+                    WHERE func = 'apps.internal.tasks.archive_accounting_exports'
+                    AND args IS NULL
+                );
+            """,
+            reverse_sql="""
+                DELETE FROM django_q_schedule
+                WHERE func = 'apps.internal.tasks.archive_accounting_exports'
+                AND args IS NULL;
+            """
+        )
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [('internal', '0015_auto_generated_sql')]
+
+    operations = [
+        migrations.RunSQL(
+            sql="""
+                DELETE FROM django_q_schedule
+                WHERE func IN (
+                    'apps.sage300.exports.purchase_invoice.queues.poll_operation_status',
+                    'apps.sage300.exports.direct_cost.queues.poll_operation_status'
+                );
+
+                INSERT INTO django_q_schedule (func, args, schedule_type, minutes, next_run, repeats)
+                SELECT 'apps.sage300.exports.polling.publish_poll_queued_accounting_exports', NULL, 'I', 1, NOW() + interval '1 minute', -1
+                WHERE NOT EXISTS (
+                    SELECT 1
+                    FROM django_q_schedule
+                    WHERE func = 'apps.sage300.exports.polling.publish_poll_queued_accounting_exports'
+                    AND args IS NULL
+                );
+            """,
+            reverse_sql="""
+                DELETE FROM django_q_schedule
+                WHERE func = 'apps.sage300.exports.polling.publish_poll_queued_accounting_exports'
+                AND args IS NULL;
+            """
+        )
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [('internal', '0016_auto_generated_sql')]
+
+    operations = [
+        migrations.RunSQL(
+            sql="""
+                CREATE INDEX IF NOT EXISTS django_q_schedule_next_run_idx
+                ON django_q_schedule (next_run)
+                WHERE repeats <> 0;
+            """,
+            reverse_sql="""
+                DROP INDEX IF EXISTS django_q_schedule_next_run_idx;
+            """
+        )
+    ]
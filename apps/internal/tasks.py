@@ -1,84 +1,229 @@
+import json
 import logging
+from collections import defaultdict
 from datetime import datetime, timedelta
+from typing import Dict, List
 
-from django.db.models import Q
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F, Q
 from django.utils import timezone
-from django_q.models import OrmQ, Schedule
-
-from apps.accounting_exports.models import AccountingExport
+from django_q.models import Schedule
+
+from apps.accounting_exports.models import (
+    AccountingExport,
+    AccountingExportSummary,
+    ArchivedAccountingExport,
+    Error,
+    QueuedAccountingExport,
+)
+from apps.accounting_exports.serializers import AccountingExportSerializer
+from apps.fyle.models import Expense
+from apps.sage300.actions import update_accounting_export_summary
+from apps.sage300.exports.direct_cost.models import DirectCost
+from apps.sage300.exports.purchase_invoice.models import PurchaseInvoice, PurchaseInvoiceLineitems
 from apps.workspaces.models import Workspace
-from workers.helpers import publish_to_rabbitmq, RoutingKeyEnum, WorkerActionEnum
+from sage_desktop_api.streaming import iterate_queryset_by_pk
+from workers.helpers import publish_to_rabbitmq, publisher, RoutingKeyEnum, WorkerActionEnum
 
 logger = logging.getLogger(__name__)
 logger.level = logging.INFO
 
 
-target_func = ['apps.sage300.exports.direct_cost.tasks.create_direct_cost', 'apps.sage300.exports.purchase_invoice.tasks.create_purchase_invoice']
-
-
 def re_export_stuck_exports():
     """
     Re-exports stuck accounting exports that have been in ENQUEUED or IN_PROGRESS state
     for more than 60 minutes. Skips exports that are already in the queue.
     """
+    # Registry entries older than the TTL belong to lost tasks, their exports are re-exported like any other
+    queued_export_cutoff = timezone.now() - timedelta(hours=getattr(settings, 'QUEUED_ACCOUNTING_EXPORT_TTL_HOURS', 2))
+    QueuedAccountingExport.objects.filter(updated_at__lt=queued_export_cutoff).delete()
+
     # Get production workspaces
     prod_workspace_ids = Workspace.objects.filter(
         ~Q(name__icontains='fyle for') & ~Q(name__icontains='test')
     ).values_list('id', flat=True)
 
     # Find stuck exports
-    accounting_exports = AccountingExport.objects.filter(
+    stuck_export_workspace_ids = dict(AccountingExport.objects.filter(
         status__in=['ENQUEUED', 'IN_PROGRESS'],
         updated_at__lt=timezone.now() - timedelta(minutes=60),
         updated_at__gt=timezone.now() - timedelta(days=7),
         workspace_id__in=prod_workspace_ids
-    ).select_related('workspace')
+    ).values_list('id', 'workspace_id'))
 
-    export_count = accounting_exports.count()
-    if export_count == 0:
+    if not stuck_export_workspace_ids:
         return
 
-    logger.info('Found %s stuck accounting exports', export_count)
-
-    # Get unique workspace IDs and export IDs
-    workspace_ids = set(accounting_exports.values_list('workspace_id', flat=True))
-    accounting_export_ids = set(accounting_exports.values_list('id', flat=True))
+    logger.info('Found %s stuck accounting exports', len(stuck_export_workspace_ids))
+    workspace_ids = set(stuck_export_workspace_ids.values())
 
     # Check existing tasks in queue
-    for orm in OrmQ.objects.all():
-        task_data = orm.task()
-        if not ('chain' in task_data and task_data['chain']):
-            continue
+    queued_exports = QueuedAccountingExport.objects.filter(
+        accounting_export_id__in=stuck_export_workspace_ids.keys()
+    ).values_list('accounting_export_id', flat=True)
+
+    for accounting_export_id in queued_exports:
+        logger.info('Skipping Re Export For Expense Log %s', accounting_export_id)
+        stuck_export_workspace_ids.pop(accounting_export_id)
 
-        for chain in task_data['chain']:
-            if (len(chain) > 1 and chain[0] in target_func and isinstance(chain[1][0], int)):
-                logger.info('Skipping Re Export For Expense Log %s', chain[1][0])
-                accounting_export_ids.remove(chain[1][0])
+    accounting_export_ids = set(stuck_export_workspace_ids.keys())
 
     logger.info('Re-exporting Accouting Export IDs: %s', accounting_export_ids)
     # Update status of exports to be re-exported
-    AccountingExport.objects.filter(id__in=accounting_export_ids).update(
+    stuck_exports = AccountingExport.objects.filter(id__in=accounting_export_ids)
+    transitions = [
+        (workspace_id, export_type, status, 'FAILED')
+        for workspace_id, export_type, status in stuck_exports.values_list('workspace_id', 'type', 'status')
+    ]
+    stuck_exports.update(
         status='FAILED',
         updated_at=datetime.now(timezone.utc),
         re_attempt_export=True
     )
+    AccountingExportSummary.update_counters(transitions)
 
     # Schedule re-exports for affected workspaces
-    workspaces = Workspace.objects.filter(id__in=workspace_ids)
-    schedules = Schedule.objects.filter(
-        args__in=[str(workspace.id) for workspace in workspaces],
+    next_runs = dict(Schedule.objects.filter(
+        args__in=[str(workspace_id) for workspace_id in workspace_ids],
         func='apps.workspaces.tasks.run_import_export'
-    )
-
-    for workspace in workspaces:
-        schedule = schedules.filter(args=str(workspace.id)).first()
-        if not schedule or schedule.next_run >= timezone.now() + timedelta(minutes=60):
-            logger.info('Scheduling re-export for workspace %s', workspace.id)
-            payload = {
-                'workspace_id': workspace.id,
-                'action': WorkerActionEnum.BACKGROUND_SCHEDULE_EXPORT.value,
-                'data': {
-                    'workspace_id': workspace.id
+    ).order_by('-id').values_list('args', 'next_run'))
+
+    with publisher.batch():
+        for workspace_id in sorted(workspace_ids):
+            next_run = next_runs.get(str(workspace_id))
+            if not next_run or next_run >= timezone.now() + timedelta(minutes=60):
+                logger.info('Scheduling re-export for workspace %s', workspace_id)
+                payload = {
+                    'workspace_id': workspace_id,
+                    'action': WorkerActionEnum.BACKGROUND_SCHEDULE_EXPORT.value,
+                    'data': {
+                        'workspace_id': workspace_id
+                    }
                 }
-            }
-            publish_to_rabbitmq(payload=payload, routing_key=RoutingKeyEnum.EXPORT_P1.value)
+                publish_to_rabbitmq(payload=payload, routing_key=RoutingKeyEnum.EXPORT_P1.value)
+
+
+def reconcile_accounting_export_summaries(hours: int = 24):
+    """
+    Recount the summaries of workspaces with accounting exports updated in the last hours,
+    corrects drift of the incrementally updated counts
+    :param hours: window of accounting export updates
+    """
+    workspace_ids = AccountingExport.objects.filter(
+        updated_at__gte=timezone.now() - timedelta(hours=hours)
+    ).values_list('workspace_id', flat=True).distinct()
+
+    # Paged by id instead of streamed, every recount locks its summary row and commits on its own.
+    # Memory ceiling: one page of STREAM_QUERYSET_CHUNK_SIZE summaries
+    summaries = AccountingExportSummary.objects.filter(workspace_id__in=workspace_ids)
+    for summary in iterate_queryset_by_pk(summaries):
+        counts = (summary.failed_accounting_export_count, summary.successful_accounting_export_count)
+        reconciled_summary = update_accounting_export_summary(summary.workspace_id)
+        reconciled_counts = (reconciled_summary.failed_accounting_export_count, reconciled_summary.successful_accounting_export_count)
+
+        if counts != reconciled_counts:
+            logger.info('Reconciled accounting export summary of workspace %s from %s to %s', summary.workspace_id, counts, reconciled_counts)
+
+
+def _group_rows(rows: List[Dict], key: str) -> Dict[int, List[Dict]]:
+    """
+    Rows as JSON safe dicts grouped by an accounting export id
+    """
+    grouped_rows = defaultdict(list)
+    for row in rows:
+        grouped_rows[row[key]].append(json.loads(json.dumps(row, cls=DjangoJSONEncoder)))
+    return grouped_rows
+
+
+def _archive_accounting_exports_batch(accounting_exports: List[AccountingExport]) -> None:
+    """
+    Copy accounting exports to archived_accounting_exports and delete them with their expenses,
+    export records and resolved errors. Queryset deletes leave the summary counts as they are
+    :param accounting_exports: locked accounting exports with prefetched expenses
+    """
+    accounting_export_ids = [accounting_export.id for accounting_export in accounting_exports]
+    expense_ids = {expense.id for accounting_export in accounting_exports for expense in accounting_export.expenses.all()}
+
+    purchase_invoices = _group_rows(
+        PurchaseInvoice.objects.filter(accounting_export_id__in=accounting_export_ids).values(), 'accounting_export_id'
+    )
+    purchase_invoice_lineitems = _group_rows(
+        PurchaseInvoiceLineitems.objects.filter(
+            purchase_invoice__accounting_export_id__in=accounting_export_ids
+        ).annotate(accounting_export_id=F('purchase_invoice__accounting_export_id')).values(),
+        'accounting_export_id'
+    )
+    direct_costs = _group_rows(DirectCost.objects.filter(accounting_export_id__in=accounting_export_ids).values(), 'accounting_export_id')
+    errors = _group_rows(Error.objects.filter(accounting_export_id__in=accounting_export_ids).values(), 'accounting_export_id')
+
+    archived_accounting_exports = []
+    for accounting_export, data in zip(accounting_exports, AccountingExportSerializer(accounting_exports, many=True).data):
+        expenses = accounting_export.expenses.all()
+        archived_accounting_exports.append(ArchivedAccountingExport(
+            id=accounting_export.id,
+            workspace_id=accounting_export.workspace_id,
+            type=accounting_export.type,
+            fund_source=accounting_export.fund_source,
+            status=accounting_export.status,
+            export_id=accounting_export.export_id,
+            exported_at=accounting_export.exported_at,
+            expense_ids=[expense.expense_id for expense in expenses],
+            expense_search_text=' '.join(
+                value for expense in expenses
+                for value in (expense.expense_number, expense.employee_name, expense.employee_email, expense.claim_number) if value
+            ),
+            data=json.loads(json.dumps(data, cls=DjangoJSONEncoder)),
+            export_records={
+                'purchase_invoices': purchase_invoices.get(accounting_export.id, []),
+                'purchase_invoice_lineitems': purchase_invoice_lineitems.get(accounting_export.id, []),
+                'direct_costs': direct_costs.get(accounting_export.id, [])
+            },
+            errors=errors.get(accounting_export.id, []),
+            created_at=accounting_export.created_at,
+            updated_at=accounting_export.updated_at
+        ))
+    ArchivedAccountingExport.objects.bulk_create(archived_accounting_exports)
+
+    # Expenses also part of an accounting export that is not archived stay
+    shared_expense_ids = set(AccountingExport.expenses.through.objects.filter(
+        expense_id__in=expense_ids
+    ).exclude(accountingexport_id__in=accounting_export_ids).values_list('expense_id', flat=True))
+
+    PurchaseInvoiceLineitems.objects.filter(purchase_invoice__accounting_export_id__in=accounting_export_ids).delete()
+    PurchaseInvoice.objects.filter(accounting_export_id__in=accounting_export_ids).delete()
+    DirectCost.objects.filter(accounting_export_id__in=accounting_export_ids).delete()
+    Error.objects.filter(accounting_export_id__in=accounting_export_ids).delete()
+    AccountingExport.objects.filter(id__in=accounting_export_ids).delete()
+    Expense.objects.filter(id__in=expense_ids - shared_expense_ids).delete()
+
+
+def archive_accounting_exports(days: int = None, batch_size: int = 500):
+    """
+    Move COMPLETE accounting exports last updated more than ACCOUNTING_EXPORT_ARCHIVE_AFTER_DAYS ago to
+    archived_accounting_exports, so the live tables hold the exports still being worked on.
+    Exports with unresolved errors stay, each batch is archived in its own transaction
+    :param days: age of the accounting exports, defaults to ACCOUNTING_EXPORT_ARCHIVE_AFTER_DAYS
+    :param batch_size: accounting exports archived per transaction
+    """
+    days = days or getattr(settings, 'ACCOUNTING_EXPORT_ARCHIVE_AFTER_DAYS', 180)
+    archivable_exports = AccountingExport.objects.filter(
+        status='COMPLETE',
+        type__in=['PURCHASE_INVOICE', 'DIRECT_COST'],
+        updated_at__lt=timezone.now() - timedelta(days=days)
+    ).exclude(error__is_resolved=False)
+
+    archived_count = 0
+    while True:
+        with transaction.atomic():
+            accounting_exports = list(
+                archivable_exports.select_for_update(skip_locked=True).order_by('id')[:batch_size].prefetch_related('expenses')
+            )
+            if not accounting_exports:
+                break
+
+            _archive_accounting_exports_batch(accounting_exports)
+            archived_count += len(accounting_exports)
+
+    logger.info('Archived %s accounting exports older than %s days', archived_count, days)
@@ -6,7 +6,6 @@ from django.dispatch import receiver
 
 from django.utils.module_loading import import_string
 from rest_framework.exceptions import ValidationError
-from fyle_integrations_platform_connector import PlatformConnector
 from fyle.platform.exceptions import WrongParamsError
 from fyle_accounting_mappings.models import MappingSetting, CategoryMapping, EmployeeMapping
 from sage_desktop_sdk.exceptions import InvalidUserCredentials
@@ -19,6 +18,9 @@ from apps.sage300.utils import SageDesktopConnector
 from apps.mappings.schedules import schedule_or_delete_fyle_import_tasks
 from apps.accounting_exports.models import Error
 from apps.workspaces.models import ImportSetting, Sage300Credential, FyleCredential
+from sage_desktop_api.boot import LazyImport
+
+PlatformConnector = LazyImport('fyle_integrations_platform_connector.PlatformConnector')
 
 logger = logging.getLogger(__name__)
 logger.level = logging.INFO
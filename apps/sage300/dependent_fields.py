@@ -5,10 +5,10 @@ from time import sleep
 
 from django.contrib.postgres.aggregates import JSONBAgg
 from django.contrib.postgres.fields import JSONField
-from django.db.models import F, Func, Value
+from django.db.models import Case, CharField, Exists, F, Func, OuterRef, Q, Value, When
+from django.db.models.functions import Concat
 
 from fyle_accounting_mappings.models import ExpenseAttribute
-from fyle_integrations_platform_connector import PlatformConnector
 from fyle.platform.exceptions import InvalidTokenError as FyleInvalidTokenError
 
 from apps.fyle.models import DependentFieldSetting
@@ -18,6 +18,9 @@ from fyle_integrations_imports.models import ImportLog
 from apps.mappings.exceptions import handle_import_exceptions_v2
 from apps.workspaces.models import ImportSetting
 from apps.mappings.helpers import prepend_code_to_name
+from sage_desktop_api.boot import LazyImport
+
+PlatformConnector = LazyImport('fyle_integrations_platform_connector.PlatformConnector')
 
 logger = logging.getLogger(__name__)
 logger.level = logging.INFO
@@ -75,6 +78,20 @@ def create_dependent_custom_field_in_fyle(workspace_id: int, fyle_attribute_type
     return platform.expense_custom_fields.post(expense_custom_field_payload)
 
 
+def get_project_name_expression(use_job_code_in_naming: bool):
+    """
+    Project name of a cost category as posted to Fyle, the SQL counterpart of prepend_code_to_name
+    """
+    if not use_job_code_in_naming:
+        return F('job_name')
+
+    return Case(
+        When(Q(job_code__isnull=True) | Q(job_code=''), then=F('job_name')),
+        default=Concat(F('job_code'), Value(': '), F('job_name')),
+        output_field=CharField()
+    )
+
+
 @handle_import_exceptions_v2
 def post_dependent_cost_code(import_log: ImportLog, dependent_field_setting: DependentFieldSetting, platform: PlatformConnector, filters: Dict, is_enabled: bool = True) -> tuple[List[str], bool]:
     import_settings = ImportSetting.objects.filter(workspace_id=import_log.workspace.id).first()
@@ -86,8 +103,21 @@ def post_dependent_cost_code(import_log: ImportLog, dependent_field_setting: Dep
     if 'COST_CODE' in import_settings.import_code_fields:
         use_cost_code_in_naming = True
 
+    # Only projects that exist in Fyle, checked in SQL against the project name as posted to Fyle
+    projects_in_fyle = ExpenseAttribute.objects.filter(
+        workspace_id=dependent_field_setting.workspace_id,
+        attribute_type='PROJECT',
+        value=OuterRef('project_name'),
+        active=True
+    )
+
+    # Read at once rather than streamed, every project is posted to Fyle with a pause in between and a
+    # named cursor would hold a transaction, and its pooled connection, open for the whole import.
+    # Memory ceiling: one row per project existing in Fyle with its distinct cost code names and codes
     projects = (
         CostCategory.objects.filter(**filters)
+        .annotate(project_name=get_project_name_expression(use_job_code_in_naming))
+        .filter(Exists(projects_in_fyle))
         .values('job_name', 'job_code')
         .annotate(
             cost_codes=JSONBAgg(
@@ -102,23 +132,12 @@ def post_dependent_cost_code(import_log: ImportLog, dependent_field_setting: Dep
         )
     )
 
-    projects_from_categories = []
     posted_cost_codes = []
     processed_batches = 0
     is_errored = False
 
-    for project in projects:
-        project_name = prepend_code_to_name(prepend_code_in_name=use_job_code_in_naming, value=project['job_name'], code=project['job_code'])
-        projects_from_categories.append(project_name)
-
-    existing_projects_in_fyle = ExpenseAttribute.objects.filter(
-        workspace_id=dependent_field_setting.workspace_id,
-        attribute_type='PROJECT',
-        value__in=projects_from_categories,
-        active=True
-    ).values_list('value', flat=True)
-
-    import_log.total_batches_count = len(existing_projects_in_fyle)
+    projects = list(projects)
+    import_log.total_batches_count = len(projects)
     import_log.save()
 
     for project in projects:
@@ -126,17 +145,16 @@ def post_dependent_cost_code(import_log: ImportLog, dependent_field_setting: Dep
         cost_code_names = []
         project_name = prepend_code_to_name(prepend_code_in_name=use_job_code_in_naming, value=project['job_name'], code=project['job_code'])
 
-        if project_name in existing_projects_in_fyle:
-            for cost_code in project['cost_codes']:
-                cost_code_name = prepend_code_to_name(prepend_code_in_name=use_cost_code_in_naming, value=cost_code['cost_code_name'], code=cost_code['cost_code_code'])
-                payload.append({
-                    'parent_expense_field_id': dependent_field_setting.project_field_id,
-                    'parent_expense_field_value': project_name,
-                    'expense_field_id': dependent_field_setting.cost_code_field_id,
-                    'expense_field_value': cost_code_name,
-                    'is_enabled': is_enabled
-                })
-                cost_code_names.append(cost_code['cost_code_name'])
+        for cost_code in project['cost_codes']:
+            cost_code_name = prepend_code_to_name(prepend_code_in_name=use_cost_code_in_naming, value=cost_code['cost_code_name'], code=cost_code['cost_code_code'])
+            payload.append({
+                'parent_expense_field_id': dependent_field_setting.project_field_id,
+                'parent_expense_field_value': project_name,
+                'expense_field_id': dependent_field_setting.cost_code_field_id,
+                'expense_field_value': cost_code_name,
+                'is_enabled': is_enabled
+            })
+            cost_code_names.append(cost_code['cost_code_name'])
 
         if payload:
             sleep(0.2)
@@ -2,13 +2,10 @@
 import logging
 import traceback
 
-from django_q.models import Schedule
-
 from apps.accounting_exports.models import AccountingExport, Error
-from apps.sage300.actions import update_accounting_export_summary
 from apps.workspaces.models import FyleCredential, Sage300Credential
 from sage_desktop_api.exceptions import BulkError
-from sage_desktop_sdk.exceptions.hh2_exceptions import WrongParamsError
+from sage_desktop_sdk.exceptions.hh2_exceptions import CircuitOpenError, WrongParamsError
 
 logger = logging.getLogger(__name__)
 logger.level = logging.INFO
@@ -35,7 +32,6 @@ def handle_sage300_exceptions():
     def decorator(func):
         def wrapper(*args):
             accounting_export = AccountingExport.objects.get(id=args[0])
-            is_last_export = args[1]
             try:
                 return func(*args)
             except (FyleCredential.DoesNotExist):
@@ -54,6 +50,14 @@ def handle_sage300_exceptions():
 
                 accounting_export.save()
 
+            except CircuitOpenError as exception:
+                # The server is struggling, keep the export for the next run instead of failing it
+                logger.info('Deferring accounting export %s for workspace_id %s, %s', accounting_export.id, accounting_export.workspace_id, exception.message)
+                accounting_export.status = 'EXPORT_READY'
+                accounting_export.re_attempt_export = True
+                accounting_export.detail = {'message': 'Sage 300 server is not responding, export will be retried in the next run'}
+                accounting_export.save()
+
             except WrongParamsError as exception:
                 handle_sage300_error(exception, accounting_export, 'Purchase Invoice')
 
@@ -74,10 +78,6 @@ def handle_sage300_exceptions():
                 accounting_export.save()
                 logger.error('Something unexpected happened workspace_id: %s %s', accounting_export.workspace_id, accounting_export.detail)
 
-            schedule = Schedule.objects.filter(args=accounting_export.workspace_id, func='apps.sage300.exports.purchase_invoice.queues.poll_operation_status').first()
-            if not schedule and is_last_export:
-                update_accounting_export_summary(accounting_export.workspace_id)
-
         return wrapper
 
     return decorator
@@ -4,6 +4,7 @@ from django.db import transaction
 from apps.accounting_exports.models import AccountingExport
 from apps.workspaces.models import AdvancedSetting
 from apps.sage300.exports.helpers import validate_accounting_export
+from sage_desktop_api.instrumentation import instrument
 
 logger = logging.getLogger(__name__)
 logger.level = logging.INFO
@@ -47,20 +48,26 @@ class AccountingDataExporter:
             # If the status is already 'IN_PROGRESS' or 'COMPLETE', return without further processing
             return
 
-        validate_accounting_export(accounting_export)
+        export_name = self.__class__.__name__
+
+        with instrument('export', workspace_id=accounting_export.workspace_id, action='{}.validate'.format(export_name)):
+            validate_accounting_export(accounting_export)
+
         with transaction.atomic():
-            # Create or update the main body of the accounting object
-            body_model_object = self.body_model.create_or_update_object(accounting_export, advance_settings)
-
-            # Create or update line items for the accounting object
-            lineitems_model_objects = None
-            if self.lineitem_model:
-                lineitems_model_objects = self.lineitem_model.create_or_update_object(
-                    accounting_export, advance_settings
-                )
-
-            # Post the data to the external accounting system
-            created_object = self.post(accounting_export, body_model_object, lineitems_model_objects)
+            with instrument('export', workspace_id=accounting_export.workspace_id, action='{}.build'.format(export_name)):
+                # Create or update the main body of the accounting object
+                body_model_object = self.body_model.create_or_update_object(accounting_export, advance_settings)
+
+                # Create or update line items for the accounting object
+                lineitems_model_objects = None
+                if self.lineitem_model:
+                    lineitems_model_objects = self.lineitem_model.create_or_update_object(
+                        accounting_export, advance_settings
+                    )
+
+            with instrument('export', workspace_id=accounting_export.workspace_id, action='{}.post'.format(export_name)):
+                # Post the data to the external accounting system
+                created_object = self.post(accounting_export, body_model_object, lineitems_model_objects)
 
             # Update the accounting export details
             detail = {
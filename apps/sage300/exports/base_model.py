@@ -24,13 +24,14 @@ class BaseExportModel(models.Model):
         abstract = True
 
     def get_expense_purpose(workspace_id, lineitem: Expense, category: str, advance_setting: AdvancedSetting) -> str:
-        workspace = Workspace.objects.get(id=workspace_id)
+        fyle_credentials = FyleCredential.objects.select_related('workspace').get(workspace_id=workspace_id)
+        workspace = fyle_credentials.workspace
         org_id = workspace.org_id
 
-        fyle_credentials = FyleCredential.objects.get(workspace_id=workspace_id)
         cluster_domain = fyle_credentials.cluster_domain
-        workspace.cluster_domain = cluster_domain
-        workspace.save()
+        if workspace.cluster_domain != cluster_domain:
+            workspace.cluster_domain = cluster_domain
+            workspace.save()
 
         expense_link = '{0}/app/admin/company_expenses?txnId={1}&org_id={2}'.format(
             cluster_domain, lineitem.expense_id, org_id
@@ -184,7 +185,7 @@ class BaseExportModel(models.Model):
                 destination_type='JOB',
                 source__value=source_value,
                 workspace_id=accounting_export.workspace_id
-            ).first()
+            ).select_related('destination').first()
 
             # If a mapping is found, retrieve the destination job ID
             if mapping:
@@ -283,7 +284,7 @@ class BaseExportModel(models.Model):
                 destination_type='STANDARD_CATEGORY',
                 source__value=source_value,
                 workspace_id=accounting_export.workspace_id
-            ).first()
+            ).select_related('destination').first()
 
             # If a mapping is found, retrieve the destination standard category ID
             if mapping:
@@ -323,7 +324,7 @@ class BaseExportModel(models.Model):
                 destination_type='STANDARD_COST_CODE',
                 source__value=source_value,
                 workspace_id=accounting_export.workspace_id
-            ).first()
+            ).select_related('destination').first()
 
             # If a mapping is found, retrieve the destination standard cost code ID
             if mapping:
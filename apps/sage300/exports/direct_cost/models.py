@@ -55,7 +55,7 @@ class DirectCost(BaseExportModel):
         account = CategoryMapping.objects.filter(
             source_category__value=expense.category,
             workspace_id=accounting_export.workspace_id
-        ).first()
+        ).select_related('destination_account').first()
 
         job_id = self.get_job_id(accounting_export, expense)
         # TO DO: Add get_commitment_id method
@@ -2,7 +2,7 @@ from typing import Dict
 
 from fyle_accounting_library.fyle_platform.enums import ExpenseImportSourceEnum
 
-from apps.accounting_exports.models import AccountingExport
+from apps.accounting_exports.models import AccountingExport, QueuedAccountingExport
 from apps.sage300.exceptions import handle_sage300_exceptions
 from apps.sage300.exports.accounting_export import AccountingDataExporter
 from apps.sage300.exports.direct_cost.models import DirectCost
@@ -79,6 +79,7 @@ def create_direct_cost(accounting_export_id: int, _: bool):
     """
     Helper function to create and export a direct cost.
     """
+    QueuedAccountingExport.clear(accounting_export_id)
     accounting_export: AccountingExport = AccountingExport.objects.get(id=accounting_export_id)
     export_direct_cost_instance = ExportDirectCost()
 
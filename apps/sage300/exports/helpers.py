@@ -1,16 +1,26 @@
 import itertools
 import logging
 from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Set
 
+from fyle.platform.exceptions import InvalidTokenError
 from fyle_accounting_library.fyle_platform.actions import get_employee_expense_attribute, sync_inactive_employee
 from fyle_accounting_mappings.models import CategoryMapping, EmployeeMapping, ExpenseAttribute, Mapping
 
-from apps.accounting_exports.models import AccountingExport, Error
+from apps.accounting_exports.models import AccountingExport, AccountingExportSummary, Error, get_error_type_mapping
+from apps.fyle.models import Expense
+from apps.workspaces.models import FyleCredential
 from sage_desktop_api.exceptions import BulkError
+from sage_desktop_api.boot import LazyImport
+
+PlatformConnector = LazyImport('fyle_integrations_platform_connector.PlatformConnector')
 
 logger = logging.getLogger(__name__)
 logger.level = logging.INFO
 
+# Emails per Fyle call while syncing inactive employees, keeps the query string short
+INACTIVE_EMPLOYEE_BATCH_SIZE = 50
+
 
 def get_filtered_mapping(
     source_field: str, destination_type: str, workspace_id: int, source_value: str, source_id: str) -> Mapping:
@@ -28,6 +38,16 @@ def get_filtered_mapping(
     return Mapping.objects.filter(**filters).first()
 
 
+def get_category_value(expense: Expense) -> str:
+    """
+    Category attribute value of an expense, including the sub category when it differs
+    """
+    if expense.category == expense.sub_category or expense.sub_category == None:
+        return expense.category
+
+    return '{0} / {1}'.format(expense.category, expense.sub_category)
+
+
 def __validate_category_mapping(accounting_export: AccountingExport):
 
     row = 0
@@ -35,8 +55,7 @@ def __validate_category_mapping(accounting_export: AccountingExport):
     expenses = accounting_export.expenses.all()
 
     for lineitem in expenses:
-        category = lineitem.category if (lineitem.category == lineitem.sub_category or lineitem.sub_category == None) else '{0} / {1}'.format(
-            lineitem.category, lineitem.sub_category)
+        category = get_category_value(lineitem)
 
         category_attribute = ExpenseAttribute.objects.filter(
             value=category,
@@ -119,6 +138,236 @@ def validate_accounting_export(accounting_export: AccountingExport):
         raise BulkError('Mappings are missing', bulk_errors)
 
 
+def get_employee_email(accounting_export: AccountingExport) -> str:
+    """
+    Employee email from the accounting export description, None when it is not set
+    """
+    if isinstance(accounting_export.description, dict):
+        return accounting_export.description.get('employee_email')
+
+
+def sync_inactive_employees(employee_emails: List[str], workspace_id: int) -> None:
+    """
+    Sync employees missing from expense attributes (disabled in Fyle), one Fyle call per batch of emails
+    :param employee_emails: Employee emails
+    :param workspace_id: Workspace id
+    """
+    try:
+        fyle_credentials = FyleCredential.objects.get(workspace_id=workspace_id)
+        platform = PlatformConnector(fyle_credentials=fyle_credentials)
+
+        attributes = []
+        for index in range(0, len(employee_emails), INACTIVE_EMPLOYEE_BATCH_SIZE):
+            emails = employee_emails[index:index + INACTIVE_EMPLOYEE_BATCH_SIZE]
+            query_params = {
+                'user->email': 'in.({})'.format(','.join(emails)),
+                'offset': 0,
+                'order': 'updated_at.desc'
+            }
+
+            for page in platform.employees.connection.list_all(query_params):
+                for employee in page['data']:
+                    attributes.append({
+                        'attribute_type': 'EMPLOYEE',
+                        'display_name': 'Employee',
+                        'value': employee['user']['email'],
+                        'source_id': employee['id'],
+                        'active': True if employee['is_enabled'] and employee['has_accepted_invite'] else False,
+                        'detail': {
+                            'user_id': employee['user_id'],
+                            'employee_code': employee['code'],
+                            'full_name': employee['user']['full_name'],
+                            'location': employee['location'],
+                            'department': employee['department']['name'] if employee['department'] else None,
+                            'department_id': employee['department_id'],
+                            'department_code': employee['department']['code'] if employee['department'] else None
+                        }
+                    })
+
+        if attributes:
+            ExpenseAttribute.bulk_create_or_update_expense_attributes(attributes, 'EMPLOYEE', workspace_id, True)
+
+    except InvalidTokenError:
+        logger.info('Invalid Fyle refresh token while syncing inactive employees for workspace_id %s', workspace_id)
+
+    except Exception as exception:
+        logger.info('Error while syncing inactive employees for workspace_id %s - %s', workspace_id, exception)
+
+
+def __get_employee_attributes(workspace_id: int, employee_emails: Set[str]) -> Dict[str, ExpenseAttribute]:
+    """
+    Employee attributes by email, syncing the employees that are not present yet
+    """
+    employee_attributes = {}
+    for attribute in ExpenseAttribute.objects.filter(workspace_id=workspace_id, attribute_type='EMPLOYEE', value__in=employee_emails).order_by('-id'):
+        employee_attributes[attribute.value] = attribute
+
+    missing_emails = sorted(employee_emails - set(employee_attributes))
+    if missing_emails:
+        sync_inactive_employees(missing_emails, workspace_id)
+        for attribute in ExpenseAttribute.objects.filter(workspace_id=workspace_id, attribute_type='EMPLOYEE', value__in=missing_emails).order_by('-id'):
+            employee_attributes[attribute.value] = attribute
+
+    return employee_attributes
+
+
+def __upsert_mapping_errors(workspace_id: int, accounting_export_ids_by_attribute: Dict[int, Set[int]], expense_attributes: Dict[int, ExpenseAttribute]) -> None:
+    """
+    Create or reopen the mapping errors of the attributes and add the failing accounting exports to them
+    """
+    if not accounting_export_ids_by_attribute:
+        return
+
+    existing_errors = Error.objects.filter(workspace_id=workspace_id, expense_attribute_id__in=accounting_export_ids_by_attribute.keys())
+    existing_errors = {error.expense_attribute_id: error for error in existing_errors}
+
+    errors_to_create = []
+    errors_to_update = []
+    now = datetime.now(timezone.utc)
+
+    for attribute_id, accounting_export_ids in accounting_export_ids_by_attribute.items():
+        error = existing_errors.get(attribute_id)
+
+        if error:
+            error.mapping_error_accounting_export_ids = sorted(set(error.mapping_error_accounting_export_ids) | accounting_export_ids)
+            error.is_resolved = False
+            error.repetition_count += 1
+            error.updated_at = now
+            errors_to_update.append(error)
+        else:
+            expense_attribute = expense_attributes[attribute_id]
+            errors_to_create.append(Error(
+                workspace_id=workspace_id,
+                expense_attribute=expense_attribute,
+                type=get_error_type_mapping(expense_attribute.attribute_type),
+                error_detail='{} mapping is missing'.format(expense_attribute.display_name),
+                error_title=expense_attribute.value,
+                is_resolved=False,
+                mapping_error_accounting_export_ids=sorted(accounting_export_ids)
+            ))
+
+    Error.objects.bulk_create(errors_to_create, batch_size=50, ignore_conflicts=True)
+    Error.objects.bulk_update(errors_to_update, ['mapping_error_accounting_export_ids', 'is_resolved', 'repetition_count', 'updated_at'], batch_size=50)
+
+
+def validate_accounting_exports_in_bulk(workspace_id: int, accounting_exports: Iterable[AccountingExport]) -> Dict[int, List[dict]]:
+    """
+    Validate category and employee mappings of a batch of accounting exports with set based queries,
+    mapping errors of the failing exports are upserted in bulk
+    :param workspace_id: Workspace id
+    :param accounting_exports: Accounting exports
+    :return: Bulk errors by accounting export id, only for the exports that would fail
+    """
+    accounting_exports = list(accounting_exports)
+    if not accounting_exports:
+        return {}
+
+    expenses_by_export: Dict[int, List[Expense]] = {accounting_export.id: [] for accounting_export in accounting_exports}
+    export_expenses = AccountingExport.expenses.through.objects.filter(
+        accountingexport_id__in=expenses_by_export.keys()
+    ).select_related('expense').order_by('id')
+
+    for export_expense in export_expenses:
+        expenses_by_export[export_expense.accountingexport_id].append(export_expense.expense)
+
+    categories = {get_category_value(expense) for expenses in expenses_by_export.values() for expense in expenses}
+    category_attributes = {}
+    for attribute in ExpenseAttribute.objects.filter(workspace_id=workspace_id, attribute_type='CATEGORY', value__in=categories).order_by('-id'):
+        category_attributes[attribute.value] = attribute
+
+    mapped_attribute_ids = set(CategoryMapping.objects.filter(
+        workspace_id=workspace_id,
+        source_category_id__in=[attribute.id for attribute in category_attributes.values()]
+    ).values_list('source_category_id', flat=True))
+
+    employee_emails = {
+        get_employee_email(accounting_export) for accounting_export in accounting_exports
+        if accounting_export.fund_source == 'PERSONAL'
+    }
+    employee_emails.discard(None)
+    employee_attributes = __get_employee_attributes(workspace_id, employee_emails) if employee_emails else {}
+
+    mapped_attribute_ids.update(EmployeeMapping.objects.filter(
+        workspace_id=workspace_id,
+        source_employee_id__in=[attribute.id for attribute in employee_attributes.values()]
+    ).values_list('source_employee_id', flat=True))
+
+    bulk_errors_by_export = {}
+    accounting_export_ids_by_attribute: Dict[int, Set[int]] = {}
+    expense_attributes: Dict[int, ExpenseAttribute] = {}
+
+    def add_error(accounting_export: AccountingExport, row: int, value: str, attribute: ExpenseAttribute, error_type: str):
+        bulk_errors_by_export.setdefault(accounting_export.id, []).append({
+            'row': row,
+            'accounting_export_id': accounting_export.id,
+            'value': value,
+            'type': '{} Mapping'.format(error_type),
+            'message': '{} Mapping not found'.format(error_type)
+        })
+
+        if attribute:
+            accounting_export_ids_by_attribute.setdefault(attribute.id, set()).add(accounting_export.id)
+            expense_attributes[attribute.id] = attribute
+
+    for accounting_export in accounting_exports:
+        for row, expense in enumerate(expenses_by_export[accounting_export.id]):
+            category = get_category_value(expense)
+            category_attribute = category_attributes.get(category)
+            if not category_attribute or category_attribute.id not in mapped_attribute_ids:
+                add_error(accounting_export, row, category, category_attribute, 'Category')
+
+        # Exports without an employee email are left to the validation inside the export task
+        employee_email = get_employee_email(accounting_export)
+        if accounting_export.fund_source == 'PERSONAL' and employee_email:
+            employee_attribute = employee_attributes.get(employee_email)
+            if not employee_attribute or employee_attribute.id not in mapped_attribute_ids:
+                add_error(accounting_export, 0, employee_email, employee_attribute, 'Employee')
+
+    __upsert_mapping_errors(workspace_id, accounting_export_ids_by_attribute, expense_attributes)
+
+    return bulk_errors_by_export
+
+
+def skip_accounting_exports_with_mapping_errors(workspace_id: int, accounting_exports: Iterable[AccountingExport]) -> List[AccountingExport]:
+    """
+    Validate the accounting exports of a run up front, the ones with missing mappings are marked
+    failed here instead of failing inside their own export task
+    :param workspace_id: Workspace id
+    :param accounting_exports: Accounting exports
+    :return: Accounting exports that can be enqueued
+    """
+    accounting_exports = list(accounting_exports)
+    bulk_errors_by_export = validate_accounting_exports_in_bulk(workspace_id, accounting_exports)
+
+    failing_exports = []
+    exportable_exports = []
+    transitions = []
+    now = datetime.now(timezone.utc)
+
+    for accounting_export in accounting_exports:
+        bulk_errors = bulk_errors_by_export.get(accounting_export.id)
+        if not bulk_errors:
+            exportable_exports.append(accounting_export)
+            continue
+
+        transitions.append((workspace_id, accounting_export.type, accounting_export.status, 'FAILED'))
+        accounting_export.status = 'FAILED'
+        accounting_export.re_attempt_export = False
+        accounting_export.detail = bulk_errors
+        accounting_export.updated_at = now
+        failing_exports.append(accounting_export)
+
+    if failing_exports:
+        logger.info(
+            'Skipping accounting exports %s as they have mapping errors for workspace_id %s',
+            [accounting_export.id for accounting_export in failing_exports], workspace_id
+        )
+        AccountingExport.objects.bulk_update(failing_exports, ['status', 're_attempt_export', 'detail', 'updated_at'], batch_size=50)
+        AccountingExportSummary.update_counters(transitions)
+
+    return exportable_exports
+
+
 def resolve_errors_for_exported_accounting_export(accounting_export: AccountingExport):
     """
     Resolve errors for exported accounting export
@@ -127,13 +376,33 @@ def resolve_errors_for_exported_accounting_export(accounting_export: AccountingE
     Error.objects.filter(workspace_id=accounting_export.workspace_id, accounting_export=accounting_export, is_resolved=False).update(is_resolved=True, updated_at=datetime.now(timezone.utc))
 
 
-def validate_failing_export(is_auto_export: bool, interval_hours: int, error: Error, accounting_export: AccountingExport = None) -> tuple:
+def get_mapping_error_accounting_export_ids(workspace_id: int, accounting_export_ids: List[int]) -> Set[int]:
+    """
+    Accounting exports of the list that are part of an unresolved mapping error, in one query
+    :param workspace_id: Workspace id
+    :param accounting_export_ids: Accounting export ids
+    :return: Accounting export ids with mapping errors
+    """
+    mapping_error_ids = Error.objects.filter(
+        workspace_id=workspace_id,
+        mapping_error_accounting_export_ids__overlap=accounting_export_ids,
+        is_resolved=False
+    ).values_list('mapping_error_accounting_export_ids', flat=True)
+
+    return set(itertools.chain.from_iterable(mapping_error_ids)) & set(accounting_export_ids)
+
+
+def validate_failing_export(
+    is_auto_export: bool, interval_hours: int, error: Error,
+    accounting_export: AccountingExport = None, mapping_error_accounting_export_ids: Set[int] = None
+) -> tuple:
     """
     Validate failing export
     :param is_auto_export: Is auto export
     :param interval_hours: Interval hours
     :param error: Error
     :param accounting_export: AccountingExport object
+    :param mapping_error_accounting_export_ids: Prefetched get_mapping_error_accounting_export_ids(), queried per export when not passed
     :return: Tuple of (should_skip, is_mapping_error)
     """
     should_skip_repetition = (
@@ -147,6 +416,9 @@ def validate_failing_export(is_auto_export: bool, interval_hours: int, error: Er
     if should_skip_repetition:
         return True, False
 
+    if accounting_export and mapping_error_accounting_export_ids is not None:
+        return (True, True) if accounting_export.id in mapping_error_accounting_export_ids else (False, False)
+
     if accounting_export:
         mapping_error = Error.objects.filter(
             workspace_id=accounting_export.workspace_id,
@@ -0,0 +1,173 @@
+"""
+Fleet wide operation status polling
+
+One schedule publishes a poll every POLL_TICK, the poll finds the EXPORT_QUEUED accounting exports
+of every workspace whose next_poll_at has passed in one query, moves their next_poll_at on by the
+poll interval of their age and checks them grouped by Sage 300 identifier, one group per worker
+thread so an hh2 server is never polled concurrently. A late or skipped tick only delays a poll.
+"""
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Tuple
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+from apps.accounting_exports.models import AccountingExport
+from apps.sage300.utils import SageDesktopConnector
+from apps.workspaces.models import Sage300Credential
+from sage_desktop_sdk.exceptions import InvalidUserCredentials
+from workers.helpers import publish_to_rabbitmq, RoutingKeyEnum, WorkerActionEnum
+
+logger = logging.getLogger(__name__)
+logger.level = logging.INFO
+
+# Interval of the apps.sage300.exports.polling.publish_poll_queued_accounting_exports schedule
+POLL_TICK = timedelta(minutes=1)
+
+# (export age, poll interval), exports older than the last age are polled every MAX_POLL_INTERVAL
+POLL_INTERVALS = [
+    (timedelta(minutes=15), timedelta(minutes=1)),
+    (timedelta(hours=2), timedelta(minutes=5)),
+    (timedelta(hours=24), timedelta(minutes=15)),
+]
+MAX_POLL_INTERVAL = timedelta(hours=1)
+
+UPDATE_OPERATION_STATUS = {
+    'PURCHASE_INVOICE': 'apps.sage300.exports.purchase_invoice.queues.update_operation_status',
+    'DIRECT_COST': 'apps.sage300.exports.direct_cost.queues.update_operation_status',
+}
+
+
+def get_poll_interval(age: timedelta) -> timedelta:
+    """
+    Poll interval of an accounting export queued for age, fresh exports usually complete within minutes
+    :param age: time since the accounting export was queued in Sage 300
+    :return: poll interval
+    """
+    for max_age, interval in POLL_INTERVALS:
+        if age < max_age:
+            return interval
+    return MAX_POLL_INTERVAL
+
+
+def get_next_poll_at(accounting_export: AccountingExport, now: datetime) -> datetime:
+    """
+    Next poll of an accounting export polled at now
+    :param accounting_export: EXPORT_QUEUED accounting export, updated_at is when it was queued
+    :param now: time of the poll
+    :return: next poll time
+    """
+    age = max(now - accounting_export.updated_at, timedelta(0))
+    return now + get_poll_interval(age)
+
+
+def publish_poll_queued_accounting_exports():
+    """
+    Publish the fleet wide poll to RabbitMQ for processing in the utility worker
+    :return: None
+    """
+    payload = {
+        'workspace_id': None,
+        'action': WorkerActionEnum.POLL_QUEUED_ACCOUNTING_EXPORTS.value,
+        'data': {}
+    }
+    publish_to_rabbitmq(payload=payload, routing_key=RoutingKeyEnum.UTILITY.value)
+
+
+def poll_workspace(credentials: Sage300Credential, accounting_exports: List[AccountingExport]) -> None:
+    """
+    Update the operation status of the due accounting exports of a workspace over one connection
+    :param credentials: active Sage 300 credentials of the workspace
+    :param accounting_exports: due EXPORT_QUEUED accounting exports of the workspace
+    :return: None
+    """
+    workspace_id = credentials.workspace_id
+    try:
+        sage300_connection = SageDesktopConnector(credentials, workspace_id)
+    except InvalidUserCredentials:
+        invalidate_sage300_credentials = import_string('sage_desktop_api.utils.invalidate_sage300_credentials')
+        invalidate_sage300_credentials(workspace_id, credentials)
+        return
+
+    for accounting_export in accounting_exports:
+        try:
+            import_string(UPDATE_OPERATION_STATUS[accounting_export.type])(sage300_connection, accounting_export)
+        except Exception as exception:
+            logger.exception('Polling operation status of accounting export %s failed for workspace_id %s | ERROR: %s', accounting_export.id, workspace_id, exception)
+
+
+def poll_identifier(workspaces: List[Tuple[Sage300Credential, List[AccountingExport]]]) -> None:
+    """
+    Poll the workspaces sharing a Sage 300 identifier one after another
+    :param workspaces: credentials and due accounting exports of each workspace
+    :return: None
+    """
+    for credentials, accounting_exports in workspaces:
+        try:
+            poll_workspace(credentials, accounting_exports)
+        except Exception as exception:
+            logger.exception('Polling operation statuses failed for workspace_id %s | ERROR: %s', credentials.workspace_id, exception)
+
+
+def _run_in_thread(workspaces: List[Tuple[Sage300Credential, List[AccountingExport]]]) -> None:
+    """
+    Poll an identifier in a worker thread, the thread owns its own DB connection
+    which has to be closed once the poll returns
+    """
+    try:
+        poll_identifier(workspaces)
+    finally:
+        connection.close()
+
+
+def poll_queued_accounting_exports():
+    """
+    Poll the operation status of the due EXPORT_QUEUED accounting exports of every workspace,
+    at most OPERATION_STATUS_POLL_CONCURRENCY identifiers at a time
+    :return: None
+    """
+    now = datetime.now(timezone.utc)
+    accounting_exports = AccountingExport.objects.filter(
+        Q(next_poll_at__isnull=True) | Q(next_poll_at__lte=now),
+        status='EXPORT_QUEUED', type__in=UPDATE_OPERATION_STATUS.keys()
+    ).order_by('workspace_id', 'id')
+
+    due_exports = defaultdict(list)
+    next_polls = defaultdict(list)
+    for accounting_export in accounting_exports:
+        due_exports[accounting_export.workspace_id].append(accounting_export)
+        next_polls[get_next_poll_at(accounting_export, now)].append(accounting_export.id)
+
+    if not due_exports:
+        return
+
+    # Moved on before polling so a poll that fails or overruns the tick is not repeated every tick,
+    # update() leaves updated_at, the queued time, as it is
+    for next_poll_at, accounting_export_ids in next_polls.items():
+        AccountingExport.objects.filter(id__in=accounting_export_ids).update(next_poll_at=next_poll_at)
+
+    identifiers: Dict[str, List[Tuple[Sage300Credential, List[AccountingExport]]]] = defaultdict(list)
+    credentials = Sage300Credential.objects.filter(workspace_id__in=due_exports.keys(), is_expired=False).order_by('workspace_id')
+    for workspace_credentials in credentials:
+        identifiers[workspace_credentials.identifier].append((workspace_credentials, due_exports[workspace_credentials.workspace_id]))
+
+    logger.info(
+        'Polling %s accounting exports of %s workspaces on %s identifiers',
+        sum(len(exports) for exports in due_exports.values()), len(due_exports), len(identifiers)
+    )
+
+    max_workers = min(getattr(settings, 'OPERATION_STATUS_POLL_CONCURRENCY', 4), len(identifiers))
+    if max_workers < 2:
+        for workspaces in identifiers.values():
+            poll_identifier(workspaces)
+        return
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='poll') as executor:
+        futures = [executor.submit(_run_in_thread, workspaces) for workspaces in identifiers.values()]
+        for future in futures:
+            future.result()
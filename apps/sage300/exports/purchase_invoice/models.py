@@ -95,7 +95,13 @@ class PurchaseInvoiceLineitems(BaseExportModel):
         expenses = accounting_export.expenses.all()
         purchase_invoice = PurchaseInvoice.objects.get(accounting_export=accounting_export)
         dependent_field_setting = DependentFieldSetting.objects.filter(workspace_id=accounting_export.workspace_id).first()
-        export_setting = ExportSetting.objects.filter(workspace_id=purchase_invoice.workspace.id).first()
+        export_setting = ExportSetting.objects.filter(workspace_id=purchase_invoice.workspace_id).first()
+
+        import_code_fields = []
+        if dependent_field_setting:
+            import_code_fields = ImportSetting.objects.get(workspace_id=accounting_export.workspace_id).import_code_fields
+        prepend_code_in_cost_code = True if 'COST_CODE' in import_code_fields else False
+        prepend_code_in_cost_category = True if 'COST_CATEGORY' in import_code_fields else False
 
         cost_category_id = None
         cost_code_id = None
@@ -111,7 +117,7 @@ class PurchaseInvoiceLineitems(BaseExportModel):
             account = CategoryMapping.objects.filter(
                 source_category__value=category,
                 workspace_id=accounting_export.workspace_id
-            ).first()
+            ).select_related('destination_account').first()
 
             accounts_payable_id = self.get_account_payable_id(
                 export_setting = export_setting,
@@ -125,10 +131,6 @@ class PurchaseInvoiceLineitems(BaseExportModel):
             description = self.get_expense_purpose(accounting_export.workspace_id, lineitem, lineitem.category, advance_setting)
 
             if dependent_field_setting:
-                import_code_fields = ImportSetting.objects.get(workspace_id=accounting_export.workspace_id).import_code_fields
-                prepend_code_in_cost_code = True if 'COST_CODE' in import_code_fields else False
-                prepend_code_in_cost_category = True if 'COST_CATEGORY' in import_code_fields else False
-
                 cost_code_id = self.get_cost_code_id(accounting_export, lineitem, dependent_field_setting, job_id, prepend_code_in_cost_code)
                 cost_category_id = self.get_cost_category_id(accounting_export, lineitem, dependent_field_setting, job_id, cost_code_id, prepend_code_in_cost_category)
 
@@ -1,26 +1,30 @@
 import logging
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import List
 
 from django.db import transaction
 from django.db.models import Q
 from django.utils.module_loading import import_string
-from django_q.models import Schedule
 from django_q.tasks import Chain
 from fyle_accounting_library.fyle_platform.enums import ExpenseImportSourceEnum
 from fyle_accounting_library.rabbitmq.data_class import Task
 from fyle_accounting_library.rabbitmq.helpers import TaskChainRunner
-from fyle_integrations_platform_connector import PlatformConnector
 
-from apps.accounting_exports.models import AccountingExport, Error
+from apps.accounting_exports.models import AccountingExport, AccountingExportSummary, Error, QueuedAccountingExport
 from apps.fyle.helpers import check_interval_and_sync_dimension
-from apps.sage300.actions import update_accounting_export_summary
-from apps.sage300.exports.helpers import resolve_errors_for_exported_accounting_export, validate_failing_export
+from apps.sage300.exports.helpers import (
+    get_mapping_error_accounting_export_ids,
+    resolve_errors_for_exported_accounting_export,
+    skip_accounting_exports_with_mapping_errors,
+    validate_failing_export
+)
 from apps.sage300.exports.purchase_invoice.models import PurchaseInvoice, PurchaseInvoiceLineitems
 from apps.sage300.utils import SageDesktopConnector
 from apps.workspaces.models import FeatureConfig, FyleCredential, Sage300Credential
 from sage_desktop_sdk.exceptions import InvalidUserCredentials
-from workers.helpers import publish_to_rabbitmq, RoutingKeyEnum, WorkerActionEnum
+from sage_desktop_api.boot import LazyImport
+
+PlatformConnector = LazyImport('fyle_integrations_platform_connector.PlatformConnector')
 
 logger = logging.getLogger(__name__)
 logger.level = logging.INFO
@@ -48,40 +52,47 @@ def check_accounting_export_and_start_import(workspace_id: int, accounting_expor
             exported_at__isnull=True
         ).values_list('id', flat=True))
 
-        accounting_exports = AccountingExport.objects.select_for_update().filter(id__in=ids_to_lock).all()
-
-        errors = Error.objects.filter(workspace_id=workspace_id, is_resolved=False, accounting_export_id__in=accounting_export_ids).all()
+        accounting_exports = AccountingExport.objects.select_for_update().filter(id__in=ids_to_lock).order_by('id')
 
-        chain_tasks = []
+        errors = Error.objects.filter(workspace_id=workspace_id, is_resolved=False, accounting_export_id__in=ids_to_lock).order_by('id')
+        errors_by_export = {error.accounting_export_id: error for error in errors}
+        mapping_error_accounting_export_ids = get_mapping_error_accounting_export_ids(workspace_id, ids_to_lock)
 
-        for index, accounting_export_group in enumerate(accounting_exports):
-            error = errors.filter(workspace_id=workspace_id, accounting_export=accounting_export_group, is_resolved=False).first()
-            skip_export, is_mapping_error = validate_failing_export(is_auto_export, interval_hours, error, accounting_export_group)
+        exports_to_validate = []
+        for accounting_export in accounting_exports:
+            error = errors_by_export.get(accounting_export.id)
+            skip_export, is_mapping_error = validate_failing_export(is_auto_export, interval_hours, error, accounting_export, mapping_error_accounting_export_ids)
             if skip_export:
                 if is_mapping_error:
-                    logger.info('Skipping accounting export %s as it has mapping errors for workspace_id %s', accounting_export_group.id, workspace_id)
+                    logger.info('Skipping accounting export %s as it has mapping errors for workspace_id %s', accounting_export.id, workspace_id)
                 else:
-                    logger.info('Skipping expense group %s as it has %s errors for workspace_id %s', accounting_export_group.id, error.repetition_count, workspace_id)
+                    logger.info('Skipping expense group %s as it has %s errors for workspace_id %s', accounting_export.id, error.repetition_count, workspace_id)
                 continue
 
-            accounting_export, _ = AccountingExport.objects.get_or_create(
-                workspace_id=accounting_export_group.workspace_id,
-                id=accounting_export_group.id,
-                defaults={
-                    'status': 'ENQUEUED',
-                    'type': 'PURCHASE_INVOICE',
-                    'triggered_by': triggered_by
-                }
-            )
+            exports_to_validate.append(accounting_export)
+
+        # Exports with missing mappings are failed here in bulk instead of inside their own task
+        exports_to_enqueue = skip_accounting_exports_with_mapping_errors(workspace_id, exports_to_validate)
 
-            if accounting_export.status not in ['IN_PROGRESS', 'ENQUEUED']:
-                accounting_export.status = 'ENQUEUED'
-                if accounting_export.triggered_by != triggered_by:
-                    accounting_export.triggered_by = triggered_by
-                accounting_export.save()
+        # Locked exports are never ENQUEUED / IN_PROGRESS, all of them move to ENQUEUED in one update
+        if exports_to_enqueue:
+            AccountingExport.objects.filter(id__in=[accounting_export.id for accounting_export in exports_to_enqueue]).update(
+                status='ENQUEUED',
+                triggered_by=triggered_by,
+                updated_at=datetime.now(timezone.utc)
+            )
+            AccountingExportSummary.update_counters(
+                (workspace_id, accounting_export.type, accounting_export.status, 'ENQUEUED') for accounting_export in exports_to_enqueue
+            )
+            # Lets the stuck export sweep skip exports whose Django-Q task is still waiting in the queue,
+            # the RabbitMQ worker runs the chain right away
+            if not run_in_rabbitmq_worker:
+                QueuedAccountingExport.register(workspace_id, [accounting_export.id for accounting_export in exports_to_enqueue])
 
+        chain_tasks = []
+        for index, accounting_export in enumerate(exports_to_enqueue):
             is_last_export = False
-            if accounting_exports.count() == index + 1:
+            if len(exports_to_enqueue) == index + 1:
                 is_last_export = True
 
             chain_tasks.append(Task(
@@ -89,13 +100,8 @@ def check_accounting_export_and_start_import(workspace_id: int, accounting_expor
                 args=[accounting_export.id, is_last_export]
             ))
 
-            if is_last_export:
-                chain_tasks.append(Task(
-                    target='apps.sage300.exports.purchase_invoice.queues.create_schedule_for_polling',
-                    args=[workspace_id]
-                ))
-
     # Run TaskChainRunner OUTSIDE transaction.atomic() to prevent rollback issues
+
     if len(chain_tasks) > 0:
         fyle_webhook_sync_enabled = FeatureConfig.get_feature_config(workspace_id=workspace_id, key='fyle_webhook_sync_enabled')
 
@@ -116,37 +122,10 @@ def check_accounting_export_and_start_import(workspace_id: int, accounting_expor
 
 def create_schedule_for_polling(workspace_id: int):
     """
-    Create Schedule for running operation status polling
-
-    Returns:
-        None
+    Operation statuses of every workspace are polled by apps.sage300.exports.polling.poll_queued_accounting_exports,
+    kept for export chains enqueued before it
     """
-
-    Schedule.objects.update_or_create(
-        func='apps.sage300.exports.purchase_invoice.queues.poll_operation_status',
-        args='{}'.format(workspace_id),
-        defaults={
-            'schedule_type': Schedule.MINUTES,
-            'minutes': 5,
-            'next_run': datetime.now()
-        }
-    )
-
-
-def poll_operation_status(workspace_id: int):
-    """
-    Publish poll operation status to RabbitMQ for processing in P1 export worker.
-    :param workspace_id: workspace id
-    :return: None
-    """
-    payload = {
-        'workspace_id': workspace_id,
-        'action': WorkerActionEnum.POLL_PURCHASE_INVOICE_STATUS.value,
-        'data': {
-            'workspace_id': workspace_id
-        }
-    }
-    publish_to_rabbitmq(payload=payload, routing_key=RoutingKeyEnum.EXPORT_P1.value)
+    return
 
 
 def trigger_poll_operation_status(workspace_id: int):
@@ -164,11 +143,6 @@ def trigger_poll_operation_status(workspace_id: int):
     accounting_exports = AccountingExport.objects.filter(status='EXPORT_QUEUED', workspace_id=workspace_id, type='PURCHASE_INVOICE').all()
 
     if not accounting_exports:
-        schedule = Schedule.objects.filter(args=workspace_id, func='apps.sage300.exports.purchase_invoice.queues.poll_operation_status').first()
-        if schedule:
-            update_accounting_export_summary(workspace_id=workspace_id)
-            schedule.delete()
-
         return
 
     try:
@@ -186,54 +160,65 @@ def trigger_poll_operation_status(workspace_id: int):
 
     # Iterate through each queued accounting export
     for accounting_export in accounting_exports:
-        export_id = accounting_export.detail.get('export_id')
-
-        # Get the operation status for the current export_id from Sage 300
-        operation_status = sage300_connection.connection.operation_status.get(export_id=export_id)
-        logger.info('operation status for export id %s: %s for workspace_id %s', export_id, operation_status, workspace_id)
-
-        # Check if the operation is disabled
-        if operation_status['CompletedOn']:
-            # Retrieve Sage 300 errors for the current export
-            document = sage300_connection.connection.documents.get(accounting_export.export_id)
-            logger.info('expense for export id %s: %s for workspace_id %s', export_id, document, workspace_id)
-
-            if str(document['CurrentState']) != '9':
-                sage300_errors = sage300_connection.connection.event_failures.get(accounting_export.export_id)
-                logger.info('export failed with errors: %s for workspace_id %s', sage300_errors, workspace_id)
-                # Update the accounting export object with Sage 300 errors and status
-                accounting_export.sage300_errors = sage300_errors
-                accounting_export.status = 'FAILED'
-                accounting_export.re_attempt_export = False
-
-                # Save the updated accounting export
-                accounting_export.save()
-                error, _ = Error.objects.update_or_create(
-                    workspace_id=accounting_export.workspace_id,
-                    accounting_export=accounting_export,
-                    defaults={
-                        'error_title': 'Failed to create purchase invoice',
-                        'type': 'SAGE300_ERROR',
-                        'error_detail': sage300_errors,
-                        'is_resolved': False
-                    }
-                )
-
-                error.increase_repetition_count_by_one()
-
-                # delete purchase invoice from db
-                purchase_invoice_instance = PurchaseInvoice.objects.filter(workspace_id=workspace_id, accounting_export_id=accounting_export.id)
-                purchase_invoice_lineitems_instance = PurchaseInvoiceLineitems.objects.filter(workspace_id=workspace_id, purchase_invoice_id__in=purchase_invoice_instance.values_list('id', flat=True))
-
-                purchase_invoice_lineitems_instance.delete()
-                purchase_invoice_instance.delete()
-
-            else:
-                accounting_export.status = 'COMPLETE'
-                accounting_export.sage300_errors = None
-                detail = accounting_export.detail
-                detail['operation_status'] = operation_status
-                accounting_export.detail = detail
-                accounting_export.exported_at = datetime.now()
-                accounting_export.save()
-                resolve_errors_for_exported_accounting_export(accounting_export)
+        update_operation_status(sage300_connection, accounting_export)
+
+
+def update_operation_status(sage300_connection: SageDesktopConnector, accounting_export: AccountingExport):
+    """
+    Check the Sage 300 operation of a queued purchase invoice and mark the accounting export COMPLETE or FAILED once it completed
+    :param sage300_connection: Sage 300 connection of the workspace
+    :param accounting_export: EXPORT_QUEUED accounting export
+    :return: None
+    """
+    workspace_id = accounting_export.workspace_id
+    export_id = accounting_export.detail.get('export_id')
+
+    # Get the operation status for the current export_id from Sage 300
+    operation_status = sage300_connection.connection.operation_status.get(export_id=export_id)
+    logger.info('operation status for export id %s: %s for workspace_id %s', export_id, operation_status, workspace_id)
+
+    # Check if the operation is disabled
+    if operation_status['CompletedOn']:
+        # Retrieve Sage 300 errors for the current export
+        document = sage300_connection.connection.documents.get(accounting_export.export_id)
+        logger.info('expense for export id %s: %s for workspace_id %s', export_id, document, workspace_id)
+
+        if str(document['CurrentState']) != '9':
+            sage300_errors = sage300_connection.connection.event_failures.get(accounting_export.export_id)
+            logger.info('export failed with errors: %s for workspace_id %s', sage300_errors, workspace_id)
+            # Update the accounting export object with Sage 300 errors and status
+            accounting_export.sage300_errors = sage300_errors
+            accounting_export.status = 'FAILED'
+            accounting_export.re_attempt_export = False
+
+            # Save the updated accounting export
+            accounting_export.save()
+            error, _ = Error.objects.update_or_create(
+                workspace_id=accounting_export.workspace_id,
+                accounting_export=accounting_export,
+                defaults={
+                    'error_title': 'Failed to create purchase invoice',
+                    'type': 'SAGE300_ERROR',
+                    'error_detail': sage300_errors,
+                    'is_resolved': False
+                }
+            )
+
+            error.increase_repetition_count_by_one()
+
+            # delete purchase invoice from db
+            purchase_invoice_instance = PurchaseInvoice.objects.filter(workspace_id=workspace_id, accounting_export_id=accounting_export.id)
+            purchase_invoice_lineitems_instance = PurchaseInvoiceLineitems.objects.filter(workspace_id=workspace_id, purchase_invoice_id__in=purchase_invoice_instance.values_list('id', flat=True))
+
+            purchase_invoice_lineitems_instance.delete()
+            purchase_invoice_instance.delete()
+
+        else:
+            accounting_export.status = 'COMPLETE'
+            accounting_export.sage300_errors = None
+            detail = accounting_export.detail
+            detail['operation_status'] = operation_status
+            accounting_export.detail = detail
+            accounting_export.exported_at = datetime.now()
+            accounting_export.save()
+            resolve_errors_for_exported_accounting_export(accounting_export)
@@ -3,7 +3,7 @@ from typing import Dict, List
 
 from fyle_accounting_library.fyle_platform.enums import ExpenseImportSourceEnum
 
-from apps.accounting_exports.models import AccountingExport
+from apps.accounting_exports.models import AccountingExport, QueuedAccountingExport
 from apps.sage300.exceptions import handle_sage300_exceptions
 from apps.sage300.exports.accounting_export import AccountingDataExporter
 from apps.sage300.exports.purchase_invoice.models import PurchaseInvoice, PurchaseInvoiceLineitems
@@ -107,6 +107,7 @@ def create_purchase_invoice(accounting_export_id: int, _: bool):
     """
     Helper function to create and export a purchase invoice.
     """
+    QueuedAccountingExport.clear(accounting_export_id)
     accounting_export: AccountingExport = AccountingExport.objects.get(id=accounting_export_id)
     export_purchase_invoice_instance = ExportPurchaseInvoice()
 
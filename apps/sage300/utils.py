@@ -1,15 +1,21 @@
+import itertools
 import logging
 
+from django.conf import settings
 from django.core.cache import cache
 from django.db import transaction
-from django.utils.module_loading import import_string
+from django.db.models import QuerySet
 from fyle_accounting_mappings.models import DestinationAttribute, MappingSetting
 
 from apps.mappings.exceptions import handle_import_exceptions_v2
 from apps.mappings.models import Version
 from apps.sage300.models import CostCategory
 from apps.workspaces.models import ImportSetting, Sage300Credential
-from sage_desktop_sdk.sage_desktop_sdk import SageDesktopSDK
+from sage_desktop_api.instrumentation import instrumented, mark_skipped
+from sage_desktop_sdk.core.schema.decoders import build_destination_attribute_extractor, get_field_getters, get_schema_class
+from sage_desktop_api.boot import LazyImport
+
+SageDesktopSDK = LazyImport('sage_desktop_sdk.sage_desktop_sdk.SageDesktopSDK')
 
 logger = logging.getLogger(__name__)
 logger.level = logging.INFO
@@ -52,7 +58,8 @@ class SageDesktopConnector:
             api_secret=credentials_object.api_secret,
             user_name=credentials_object.username,
             password=credentials_object.password,
-            identifier=credentials_object.identifier
+            identifier=credentials_object.identifier,
+            stream_batch_size=getattr(settings, 'HH2_STREAM_BATCH_SIZE', None)
         )
 
         self.workspace_id = workspace_id
@@ -120,25 +127,30 @@ class SageDesktopConnector:
                 item.code if hasattr(item, 'code') else None
             )
 
-    def _get_attribute_class(self, attribute_type: str):
+    def _peek_changes(self, data_gen):
         """
-        Get the attribute class for the attribute type
-        :param attribute_type: Type of the attribute
-        :return: Attribute class
-        """
-        ATTRIBUTE_CLASS_MAP = {
-            'ACCOUNT': 'Account',
-            'VENDOR': 'Vendor',
-            'JOB': 'Job',
-            'STANDARD_COST_CODE': 'StandardCostCode',
-            'STANDARD_CATEGORY': 'StandardCategory',
-            'COMMITMENT': 'Commitment',
-            'COMMITMENT_ITEM': 'CommitmentItem',
-            'COST_CODE': 'CostCode',
-            'VENDOR_TYPE': 'VendorType'
-        }
+        Pull the first page of a sync, hh2 only returns objects newer than the requested version
+        so an empty first page means nothing changed since the last sync
+        :param data_gen: Generator returned by the SDK
+        :return: Generator with the first page put back, None when nothing changed
+        """
+        data_gen = iter(data_gen)
+        for data in data_gen:
+            data = iter(data)
+            for items in data:
+                if items:
+                    return itertools.chain([itertools.chain([items], data)], data_gen)
 
-        return ATTRIBUTE_CLASS_MAP[attribute_type]
+        return None
+
+    def _skip_unchanged_sync(self, attribute_type: str):
+        """
+        Record a sync skipped because nothing changed since the stored version
+        :param attribute_type: Type of the attribute
+        """
+        logger.info(f'No {attribute_type} changes since the last sync in workspace_id {self.workspace_id}, skipping')
+        mark_skipped()
+        return []
 
     def _remove_credit_card_vendors(self):
         credit_card_vendor = DestinationAttribute.objects.filter(
@@ -150,7 +162,7 @@ class SageDesktopConnector:
         logger.info(f'Deleting {vendor_count} credit card vendors from workspace_id {self.workspace_id}')
         credit_card_vendor.delete()
 
-    def _sync_data(self, data_gen, attribute_type, display_name, workspace_id, field_names, is_generator: bool = True, vendor_type_mapping = None, is_import_to_fyle_enabled: bool = False, distinct_job_ids: list = None):
+    def _sync_data(self, data_gen, attribute_type, display_name, workspace_id, field_names, is_generator: bool = True, vendor_type_mapping = None, is_import_to_fyle_enabled: bool = False, active_job_ids: QuerySet = None):
         """
         Synchronize data from Sage Desktop SDK to your application
         :param data: Data to synchronize
@@ -168,18 +180,26 @@ class SageDesktopConnector:
             attribute_processed_count = 0
 
             if is_generator:
+                extract_destination_attribute = build_destination_attribute_extractor(attribute_type, display_name, field_names, vendor_type_mapping)
+                getters = get_field_getters(get_schema_class(attribute_type))
+                skip_inactive = attribute_type in ['COST_CODE', 'JOB']
+                job_ids = None
+
                 for data in data_gen:
                     for items in data:
+                        if attribute_type == 'COST_CODE':
+                            # Only the jobs of this page are looked up, memory ceiling: one page of job ids
+                            items = list(items)
+                            job_ids = set(active_job_ids.filter(destination_id__in={getters['job_id'](_item) for _item in items}))
+
                         destination_attributes = []
                         for _item in items:
-                            attribute_class = self._get_attribute_class(attribute_type)
-                            item = import_string(f'sage_desktop_sdk.core.schema.read_only.{attribute_class}').from_dict(_item)
                             if (
-                                (attribute_type == 'COST_CODE' and item.job_id not in distinct_job_ids)
-                                or (attribute_type in ['COST_CODE', 'JOB'] and not item.is_active)
+                                (job_ids is not None and getters['job_id'](_item) not in job_ids)
+                                or (skip_inactive and not getters['is_active'](_item))
                             ):
                                 continue
-                            destination_attr = self._add_to_destination_attributes(item, attribute_type, display_name, field_names, vendor_type_mapping)
+                            destination_attr = extract_destination_attribute(_item)
                             if destination_attr:
                                 attribute_processed_count += 1
                                 destination_attributes.append(destination_attr)
@@ -226,6 +246,7 @@ class SageDesktopConnector:
             if attribute_type == 'VENDOR':
                 self._remove_credit_card_vendors()
 
+    @instrumented('sage300_sync')
     def sync_accounts(self):
         """
         Synchronize accounts from Sage Desktop SDK to your application
@@ -235,13 +256,16 @@ class SageDesktopConnector:
 
         version = Version.objects.get(workspace_id=self.workspace_id).account
 
-        accounts = self.connection.accounts.get_all(version=version)
+        accounts = self._peek_changes(self.connection.accounts.get_all(version=version))
+        if accounts is None:
+            return self._skip_unchanged_sync('ACCOUNT')
 
         is_import_to_fyle_enabled = self.is_imported_enabled('ACCOUNT', self.workspace_id)
 
         self._sync_data(accounts, 'ACCOUNT', 'Account', self.workspace_id, ['code', 'version'], is_import_to_fyle_enabled=is_import_to_fyle_enabled)
         return []
 
+    @instrumented('sage300_sync')
     def sync_vendors(self):
         """
         Synchronize vendors from Sage Desktop SDK to your application
@@ -250,7 +274,10 @@ class SageDesktopConnector:
             return []
 
         version = Version.objects.get(workspace_id=self.workspace_id).vendor
-        vendors = self.connection.vendors.get_all(version=version)
+        vendors = self._peek_changes(self.connection.vendors.get_all(version=version))
+        if vendors is None:
+            return self._skip_unchanged_sync('VENDOR')
+
         field_names = [
             'code', 'version', 'default_expense_account', 'default_standard_category',
             'default_standard_costcode', 'type_id', 'created_on_utc'
@@ -270,6 +297,7 @@ class SageDesktopConnector:
         self._sync_data(vendors, 'VENDOR', 'Vendor', self.workspace_id, field_names, vendor_type_mapping=vendor_type_mapping, is_import_to_fyle_enabled=is_import_to_fyle_enabled)
         return []
 
+    @instrumented('sage300_sync')
     def sync_jobs(self):
         """
         Synchronize jobs from Sage Desktop SDK to your application
@@ -278,7 +306,10 @@ class SageDesktopConnector:
             return []
 
         version = Version.objects.get(workspace_id=self.workspace_id).job
-        jobs = self.connection.jobs.get_all_jobs(version=version)
+        jobs = self._peek_changes(self.connection.jobs.get_all_jobs(version=version))
+        if jobs is None:
+            return self._skip_unchanged_sync('JOB')
+
         field_names = [
             'code', 'status', 'version', 'account_prefix_id', 'created_on_utc'
         ]
@@ -288,6 +319,7 @@ class SageDesktopConnector:
         self._sync_data(jobs, 'JOB', 'Job', self.workspace_id, field_names, is_import_to_fyle_enabled=is_import_to_fyle_enabled)
         return []
 
+    @instrumented('sage300_sync')
     def sync_standard_cost_codes(self):
         """
         Synchronize standard cost codes from Sage Desktop SDK to your application
@@ -296,21 +328,32 @@ class SageDesktopConnector:
             return []
 
         version = Version.objects.get(workspace_id=self.workspace_id).standard_cost_code
-        cost_codes = self.connection.jobs.get_standard_costcodes(version=version)
+        cost_codes = self._peek_changes(self.connection.jobs.get_standard_costcodes(version=version))
+        if cost_codes is None:
+            return self._skip_unchanged_sync('STANDARD_COST_CODE')
+
         field_names = ['code', 'version', 'is_standard', 'description']
         self._sync_data(cost_codes, 'STANDARD_COST_CODE', 'standard_cost_code', self.workspace_id, field_names)
         return []
 
+    @instrumented('sage300_sync')
     def sync_standard_categories(self):
         """
         Synchronize standard categories from Sage Desktop SDK to your application
         """
+        if self.is_upper_sync_limit_reached_in_cache('STANDARD_CATEGORY', self.workspace_id):
+            return []
+
         version = Version.objects.get(workspace_id=self.workspace_id).standard_category
-        categories = self.connection.jobs.get_standard_categories(version=version)
+        categories = self._peek_changes(self.connection.jobs.get_standard_categories(version=version))
+        if categories is None:
+            return self._skip_unchanged_sync('STANDARD_CATEGORY')
+
         field_names = ['code', 'version', 'description', 'accumulation_name']
         self._sync_data(categories, 'STANDARD_CATEGORY', 'standard_category', self.workspace_id, field_names)
         return []
 
+    @instrumented('sage300_sync')
     def sync_commitments(self):
         """
         Synchronize commitments from Sage Desktop SDK to your application
@@ -319,7 +362,10 @@ class SageDesktopConnector:
             return []
 
         version = Version.objects.get(workspace_id=self.workspace_id).commitment
-        commitments = self.connection.commitments.get_all(version=version)
+        commitments = self._peek_changes(self.connection.commitments.get_all(version=version))
+        if commitments is None:
+            return self._skip_unchanged_sync('COMMITMENT')
+
         field_names = [
             'code', 'is_closed', 'version', 'description', 'is_commited',
             'created_on_utc', 'date', 'vendor_id', 'job_id'
@@ -327,6 +373,7 @@ class SageDesktopConnector:
         self._sync_data(commitments, 'COMMITMENT', 'commitment', self.workspace_id, field_names)
         return []
 
+    @instrumented('sage300_sync')
     def sync_commitment_items(self):
         """
         Sync commitment items from Sage Desktop SDK to your application
@@ -334,19 +381,30 @@ class SageDesktopConnector:
         if self.is_upper_sync_limit_reached_in_cache('COMMITMENT_ITEM', self.workspace_id):
             return []
 
-        commitments = DestinationAttribute.objects.filter(
+        version = Version.objects.filter(workspace_id=self.workspace_id).values_list('commitment_item', flat=True).first()
+        commitment_ids = DestinationAttribute.objects.filter(
             workspace_id=self.workspace_id,
             attribute_type='COMMITMENT'
-        )
+        ).values_list('destination_id', flat=True)
 
-        for commitment in commitments:
-            commitment_items = self.connection.commitments.get_commitment_items(commitment.destination_id)
-            field_names = [
-                'code', 'version', 'description', 'cost_code_id',
-                'category_id', 'created_on_utc', 'job_id', 'commitment_id'
-            ]
+        field_names = [
+            'code', 'version', 'description', 'cost_code_id',
+            'category_id', 'created_on_utc', 'job_id', 'commitment_id'
+        ]
+        is_changed = False
+
+        for commitment_id in commitment_ids:
+            commitment_items = list(self.connection.commitments.get_commitment_items(commitment_id, version=version))
+            if not commitment_items:
+                continue
+
+            is_changed = True
             self._sync_data(commitment_items, 'COMMITMENT_ITEM', 'commitment_item', self.workspace_id, field_names, False)
 
+        if not is_changed:
+            self._skip_unchanged_sync('COMMITMENT_ITEM')
+
+    @instrumented('sage300_sync')
     @handle_import_exceptions_v2
     def sync_cost_codes(self, _import_log = None):
         """
@@ -356,17 +414,22 @@ class SageDesktopConnector:
             return []
 
         version = Version.objects.get(workspace_id=self.workspace_id).cost_code
-        cost_codes = self.connection.cost_codes.get_all_costcodes(version=version)
-        distinct_job_ids = DestinationAttribute.objects.filter(
+        cost_codes = self._peek_changes(self.connection.cost_codes.get_all_costcodes(version=version))
+        if cost_codes is None:
+            return self._skip_unchanged_sync('COST_CODE')
+
+        # A workspace can have tens of thousands of jobs, _sync_data checks the jobs of each page in SQL
+        active_job_ids = DestinationAttribute.objects.filter(
             workspace_id=self.workspace_id,
             attribute_type='JOB',
             active=True
-        ).values_list('destination_id', flat=True).distinct()
+        ).values_list('destination_id', flat=True)
 
         field_names = ['code', 'version', 'job_id']
-        self._sync_data(cost_codes, 'COST_CODE', 'cost_code', self.workspace_id, field_names, distinct_job_ids=distinct_job_ids)
+        self._sync_data(cost_codes, 'COST_CODE', 'cost_code', self.workspace_id, field_names, active_job_ids=active_job_ids)
         return []
 
+    @instrumented('sage300_sync')
     @handle_import_exceptions_v2
     def sync_cost_categories(self, import_log = None):
         """
@@ -376,7 +439,9 @@ class SageDesktopConnector:
             return []
 
         version = Version.objects.get(workspace_id=self.workspace_id)
-        cost_categories_generator = self.connection.categories.get_all_categories(version=version.cost_category)
+        cost_categories_generator = self._peek_changes(self.connection.categories.get_all_categories(version=version.cost_category))
+        if cost_categories_generator is None:
+            return self._skip_unchanged_sync('COST_CATEGORY')
 
         upper_sync_limit = UPPER_SYNC_LIMITS.get('COST_CATEGORY')
         attribute_processed_count = 0
@@ -1,10 +1,12 @@
 from typing import Tuple
 
-from fyle_integrations_platform_connector import PlatformConnector
 from fyle_rest_auth.models import AuthToken
 
 from apps.fyle.helpers import get_cluster_domain
 from apps.workspaces.models import FyleCredential
+from sage_desktop_api.boot import LazyImport
+
+PlatformConnector = LazyImport('fyle_integrations_platform_connector.PlatformConnector')
 
 
 def get_cluster_domain_and_refresh_token(user) -> Tuple[str, str]:
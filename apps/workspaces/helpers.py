@@ -1,8 +1,11 @@
-from typing import List
+from typing import List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
 from django.db import transaction
 from django.db.models import Q
 
-from apps.accounting_exports.models import AccountingExport, Error
+from apps.accounting_exports.models import AccountingExport, AccountingExportSummary, Error
 from apps.workspaces.models import ExportSetting
 from apps.fyle.models import EXPENSE_SOURCE_ACCOUNT_MAP
 import logging
@@ -116,9 +119,14 @@ def clear_workspace_errors_on_export_type_change(
                         total_deleted_errors += deleted_mapping_errors_count
                         logger.info("Cleared %s mapping errors (all EMPLOYEE_MAPPING and CATEGORY_MAPPING errors)", deleted_mapping_errors_count)
 
+                    transitions = [
+                        (workspace_id, export_type, status, 'EXPORT_READY')
+                        for export_type, status in affected_accounting_exports.values_list('type', 'status')
+                    ]
                     updated_exports = affected_accounting_exports.filter(
                         status__in=['FAILED', 'FATAL', 'EXPORT_QUEUED']
                     ).update(status='EXPORT_READY', sage300_errors=None, detail=None, mapping_errors=None)
+                    AccountingExportSummary.update_counters(transitions)
 
                     if updated_exports > 0:
                         logger.info("Reset %s accounting exports to EXPORT_READY status", updated_exports)
@@ -233,3 +241,31 @@ def construct_filter_for_affected_accounting_exports(
                 filter_for_affected_accounting_exports |= Q(expenses__id__in=expense_ids)
 
     return filter_for_affected_accounting_exports
+
+
+def acquire_workspace_run_slot(workspace_id: int) -> Optional[str]:
+    """
+    Acquire one of the per workspace run_import_export slots, so a single workspace
+    cannot occupy more than RUN_IMPORT_EXPORT_CONCURRENCY_PER_WORKSPACE P1 workers
+    :param workspace_id: Workspace ID
+    :return: slot key if acquired, None if all slots are busy
+    """
+    concurrency = getattr(settings, 'RUN_IMPORT_EXPORT_CONCURRENCY_PER_WORKSPACE', 1)
+    timeout = getattr(settings, 'RUN_IMPORT_EXPORT_SLOT_TIMEOUT', 3 * 60 * 60)
+
+    for slot in range(concurrency):
+        slot_key = 'RUN_IMPORT_EXPORT_SLOT_{}_{}'.format(workspace_id, slot)
+        # cache.add is a no-op if the key already exists, the timeout frees slots of crashed workers
+        if cache.add(slot_key, True, timeout=timeout):
+            return slot_key
+
+    return None
+
+
+def release_workspace_run_slot(slot_key: str) -> None:
+    """
+    Release a slot acquired through acquire_workspace_run_slot
+    :param slot_key: slot key
+    :return: None
+    """
+    cache.delete(slot_key)
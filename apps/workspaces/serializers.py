@@ -29,7 +29,9 @@ from apps.workspaces.tasks import sync_org_settings
 from fyle_integrations_imports.models import ImportLog
 from workers.helpers import publish_to_rabbitmq, RoutingKeyEnum, WorkerActionEnum
 from sage_desktop_api.utils import assert_valid
-from sage_desktop_sdk.sage_desktop_sdk import SageDesktopSDK
+from sage_desktop_api.boot import LazyImport
+
+SageDesktopSDK = LazyImport('sage_desktop_sdk.sage_desktop_sdk.SageDesktopSDK')
 
 logger = logging.getLogger(__name__)
 logger.level = logging.INFO
@@ -1,20 +1,28 @@
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import List
 
 from django.conf import settings
-from django.db.models import Q
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.db.models.functions import Coalesce
 from django_q.models import Schedule
 from fyle_accounting_library.fyle_platform.enums import ExpenseImportSourceEnum
-from fyle_integrations_platform_connector import PlatformConnector
 
 from apps.accounting_exports.models import AccountingExport, AccountingExportSummary
 from apps.fyle.helpers import patch_request
 from apps.fyle.queue import queue_import_credit_card_expenses, queue_import_reimbursable_expenses
 from apps.sage300.exports.direct_cost.tasks import ExportDirectCost
 from apps.sage300.exports.purchase_invoice.tasks import ExportPurchaseInvoice
+from apps.workspaces.helpers import acquire_workspace_run_slot, release_workspace_run_slot
 from apps.workspaces.models import AdvancedSetting, ExportSetting, FyleCredential, Workspace
-from workers.helpers import publish_to_rabbitmq, RoutingKeyEnum, WorkerActionEnum
+from workers.helpers import publish_to_rabbitmq, WorkerActionEnum
+from workers.retry import schedule_retry
+from workers.sharding import get_export_routing_key, get_schedule_offset_minutes
+from sage_desktop_api.boot import LazyImport
+
+PlatformConnector = LazyImport('fyle_integrations_platform_connector.PlatformConnector')
 
 logger = logging.getLogger(__name__)
 
@@ -59,12 +67,116 @@ def run_import_export(workspace_id: int) -> None:
             'workspace_id': workspace_id
         }
     }
-    publish_to_rabbitmq(payload=payload, routing_key=RoutingKeyEnum.EXPORT_P1.value)
+    publish_to_rabbitmq(payload=payload, routing_key=get_export_routing_key(workspace_id))
+
+
+def _run_in_thread(func, **kwargs) -> None:
+    """
+    Run a function in a worker thread, the thread owns its own DB connection
+    which has to be closed once the function returns
+    """
+    try:
+        func(**kwargs)
+    finally:
+        connection.close()
+
+
+def start_accounting_summary_export_window(accounting_summary: AccountingExportSummary) -> None:
+    """
+    Save the summary of a new export run, successful exports are counted again from last_exported_at
+    while the failed count is kept. last_exported_at is the start of the run, so exports the poller
+    completed while the run was exporting stay counted. The summary row is locked while counting like
+    update_accounting_export_summary, a concurrent status transition applies its F() increment on top
+    """
+    with transaction.atomic():
+        AccountingExportSummary.objects.select_for_update().filter(id=accounting_summary.id).first()
+
+        successful_count = AccountingExport.objects.filter(
+            ~Q(type__in=['FETCHING_REIMBURSABLE_EXPENSES', 'FETCHING_CREDIT_CARD_EXPENSES']),
+            workspace_id=accounting_summary.workspace_id,
+            status='COMPLETE',
+            updated_at__gte=accounting_summary.last_exported_at
+        ).count()
+
+        accounting_summary.successful_accounting_export_count = successful_count
+        accounting_summary.total_accounting_export_count = Coalesce(F('failed_accounting_export_count'), 0) + successful_count
+        accounting_summary.save(update_fields=[
+            'last_exported_at', 'export_mode', 'next_export_at', 'successful_accounting_export_count', 'total_accounting_export_count', 'updated_at'
+        ])
 
+    accounting_summary.refresh_from_db()
 
-def trigger_run_import_export(workspace_id: int, export_mode = None):
+
+def import_expenses_for_export(workspace_id: int, export_settings: ExportSetting) -> None:
+    """
+    Import reimbursable and credit card expenses before a scheduled export.
+    Both fund sources touch disjoint expenses, so the imports are overlapped
+    when OVERLAP_EXPENSE_IMPORTS is enabled.
+    :param workspace_id: Workspace id
+    :param export_settings: Export settings of the workspace
+    :return: None
+    """
+    imports = []
+    if export_settings.reimbursable_expenses_export_type:
+        imports.append(queue_import_reimbursable_expenses)
+    if export_settings.credit_card_expense_export_type:
+        imports.append(queue_import_credit_card_expenses)
+
+    import_kwargs = {
+        'workspace_id': workspace_id,
+        'synchronous': True,
+        'imported_from': ExpenseImportSourceEnum.BACKGROUND_SCHEDULE
+    }
+
+    if len(imports) < 2 or not getattr(settings, 'OVERLAP_EXPENSE_IMPORTS', False):
+        for queue_import in imports:
+            queue_import(**import_kwargs)
+        return
+
+    with ThreadPoolExecutor(max_workers=len(imports)) as executor:
+        futures = [executor.submit(_run_in_thread, queue_import, **import_kwargs) for queue_import in imports]
+        for future in futures:
+            future.result()
+
+
+def trigger_run_import_export(workspace_id: int, export_mode = None, retry_count: int = 0):
     """
     Run process to export to sage300
+    The run holds a workspace slot until it returns, imports and the export chain both run inline
+    in the worker, when every slot is busy the run is published again with the retry backoff,
+    up to WORKER_MAX_RETRIES times, after that the running ones are left to cover the workspace
+
+    :param workspace_id: Workspace id
+    :param retry_count: times the run was already delayed
+    """
+    slot_key = acquire_workspace_run_slot(workspace_id)
+    if not slot_key:
+        retry_count += 1
+        if retry_count > getattr(settings, 'WORKER_MAX_RETRIES', 4):
+            logger.info('Dropping run_import_export for workspace %s, concurrency limit reached %s times', workspace_id, retry_count)
+            return
+
+        logger.info('Delaying run_import_export for workspace %s, concurrency limit reached', workspace_id)
+        data = {'workspace_id': workspace_id, 'retry_count': retry_count}
+        if export_mode:
+            data['export_mode'] = export_mode
+        schedule_retry(get_export_routing_key(workspace_id), {
+            'workspace_id': workspace_id,
+            'action': WorkerActionEnum.RUN_SYNC_SCHEDULE.value,
+            'data': data,
+            'retry_count': retry_count
+        })
+        return
+
+    try:
+        _trigger_run_import_export(workspace_id=workspace_id, export_mode=export_mode)
+    finally:
+        release_workspace_run_slot(slot_key)
+
+
+def _trigger_run_import_export(workspace_id: int, export_mode = None):
+    """
+    Import expenses and export them to sage300
 
     :param workspace_id: Workspace id
     """
@@ -84,9 +196,10 @@ def trigger_run_import_export(workspace_id: int, export_mode = None):
         'DIRECT_COST': ExportDirectCost()
     }
 
+    import_expenses_for_export(workspace_id=workspace_id, export_settings=export_settings)
+
     # For Reimbursable Expenses
     if export_settings.reimbursable_expenses_export_type:
-        queue_import_reimbursable_expenses(workspace_id=workspace_id,  synchronous=True, imported_from=ExpenseImportSourceEnum.BACKGROUND_SCHEDULE)
         accounting_export = AccountingExport.objects.get(
             workspace_id=workspace_id,
             type='FETCHING_REIMBURSABLE_EXPENSES'
@@ -110,7 +223,6 @@ def trigger_run_import_export(workspace_id: int, export_mode = None):
 
     # For Credit Card Expenses
     if export_settings.credit_card_expense_export_type:
-        queue_import_credit_card_expenses(workspace_id=workspace_id, synchronous=True, imported_from=ExpenseImportSourceEnum.BACKGROUND_SCHEDULE)
         accounting_export = AccountingExport.objects.get(
             workspace_id=workspace_id,
             type='FETCHING_CREDIT_CARD_EXPENSES'
@@ -142,7 +254,7 @@ def trigger_run_import_export(workspace_id: int, export_mode = None):
         if advance_settings and advance_settings.schedule_is_enabled:
             accounting_summary.next_export_at = last_exported_at + timedelta(hours=advance_settings.interval_hours)
 
-        accounting_summary.save()
+        start_accounting_summary_export_window(accounting_summary)
 
 
 def schedule_sync(workspace_id: int, schedule_enabled: bool, hours: int, email_added: List, emails_selected: List):
@@ -188,7 +300,8 @@ def _create_or_update_schedule(advance_settings, hours: int):
     """
     Create or update the sync schedule
     """
-    next_run = datetime.now() + timedelta(hours=hours)
+    # Workspaces are spread over SCHEDULE_SPREAD_WINDOW_MINUTES so they don't all fire at once
+    next_run = datetime.now() + timedelta(hours=hours, minutes=get_schedule_offset_minutes(advance_settings.workspace_id))
 
     schedule, _ = Schedule.objects.update_or_create(
         func='apps.workspaces.tasks.run_import_export',
@@ -276,7 +389,7 @@ def export_to_sage300(workspace_id: int, triggered_by: ExpenseImportSourceEnum,
 
         accounting_summary.last_exported_at = last_exported_at
         accounting_summary.export_mode = 'MANUAL'
-        accounting_summary.save()
+        start_accounting_summary_export_window(accounting_summary)
 
 
 def async_create_admin_subscriptions(workspace_id: int) -> None:
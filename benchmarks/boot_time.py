@@ -0,0 +1,139 @@
+"""
+Boot time of a web worker
+
+Imports the WSGI application in fresh interpreters with -X importtime, which is what a
+recycled worker pays without preload_app, and forks a process with the application
+already loaded, which is what it pays with it. Prints the modules and packages that
+cost the most and whether the lazily imported SDKs were loaded while booting.
+
+Usage: python -m benchmarks.boot_time --runs 5 --top 20
+"""
+import argparse
+import importlib
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+BOOT_STATEMENT = 'import sage_desktop_api.wsgi'
+
+# Imported on first use through sage_desktop_api.boot.LazyImport
+LAZY_MODULES = [
+    'sage_desktop_sdk.sage_desktop_sdk',
+    'fyle_integrations_platform_connector',
+]
+
+
+@dataclass
+class ImportTime:
+    module: str
+    self_us: int
+    cumulative_us: int
+
+
+def parse_import_times(stderr: str) -> List[ImportTime]:
+    """
+    Rows of `import time: self [us] | cumulative | imported package`
+    """
+    import_times = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, module = line[len('import time:'):].split('|')
+        import_times.append(ImportTime(module.strip(), int(self_us), int(cumulative_us)))
+
+    return import_times
+
+
+def measure_fresh_boot() -> Tuple[float, List[ImportTime], Dict[str, bool]]:
+    """
+    Wall time of importing the application in a new interpreter
+    """
+    check_lazy_modules = 'import sys; print(",".join(str(name in sys.modules) for name in {!r}))'.format(LAZY_MODULES)
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', '{}; {}'.format(BOOT_STATEMENT, check_lazy_modules)],
+        capture_output=True, text=True, check=True
+    )
+    elapsed = time.perf_counter() - start
+
+    loaded = dict(zip(LAZY_MODULES, (value == 'True' for value in result.stdout.strip().splitlines()[-1].split(','))))
+    return elapsed, parse_import_times(result.stderr), loaded
+
+
+def measure_fork(runs: int) -> List[float]:
+    """
+    Wall time of forking a process with the application loaded until the child exits
+    """
+    importlib.import_module('sage_desktop_api.wsgi')
+    from sage_desktop_api.boot import prepare_for_fork, reset_after_fork
+
+    timings = []
+    for _ in range(runs):
+        prepare_for_fork()
+        start = time.perf_counter()
+        pid = os.fork()
+        if pid == 0:
+            reset_after_fork()
+            os._exit(0)
+        os.waitpid(pid, 0)
+        timings.append(time.perf_counter() - start)
+
+    return timings
+
+
+def get_top_packages(import_times: List[ImportTime]) -> List[Tuple[str, int]]:
+    """
+    Self time summed per top level package
+    """
+    packages = defaultdict(int)
+    for import_time in import_times:
+        packages[import_time.module.split('.')[0]] += import_time.self_us
+
+    return sorted(packages.items(), key=lambda item: item[1], reverse=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark web worker boot time')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--skip-fork', action='store_true', help='only measure fresh interpreters')
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sage_desktop_api.settings')
+
+    boots = [measure_fresh_boot() for _ in range(args.runs)]
+    boot_timings = [elapsed for elapsed, _, _ in boots]
+    _, import_times, loaded = boots[-1]
+
+    print('fresh boot (no preload): median {:.3f}s, min {:.3f}s over {} runs'.format(
+        statistics.median(boot_timings), min(boot_timings), args.runs
+    ))
+
+    if not args.skip_fork:
+        fork_timings = measure_fork(args.runs)
+        print('fork of preloaded app:   median {:.3f}s, min {:.3f}s over {} runs'.format(
+            statistics.median(fork_timings), min(fork_timings), args.runs
+        ))
+
+    print('\nslowest modules by self time:')
+    for import_time in sorted(import_times, key=lambda import_time: import_time.self_us, reverse=True)[:args.top]:
+        print('  {:>8.1f}ms self {:>8.1f}ms cumulative  {}'.format(
+            import_time.self_us / 1000, import_time.cumulative_us / 1000, import_time.module
+        ))
+
+    print('\nslowest packages by self time:')
+    for package, self_us in get_top_packages(import_times)[:args.top]:
+        print('  {:>8.1f}ms  {}'.format(self_us / 1000, package))
+
+    print('\nlazily imported modules loaded while booting:')
+    for module, is_loaded in loaded.items():
+        print('  {:<45} {}'.format(module, 'loaded' if is_loaded else 'not loaded'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,473 @@
+"""
+Local hh2 simulator for benchmarking syncs and exports without a customer's server
+
+Serves the hh2 routes used by sage_desktop_sdk with generated datasets of any size,
+hh2 style pagination and ?version= filtering, cookie sessions, per route latency
+and error injection. Point the SDK at it with the printed identifier:
+
+    python -m benchmarks.hh2_simulator --port 8765 --size jobs=30000 --size categories=500000 \
+        --latency jobs=0.2:0.5 --error-rate categories=0.01
+
+    SageDesktopSDK(api_key='key', api_secret='secret', user_name='user', password='password',
+                   identifier='http://127.0.0.1:8765')
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field, fields
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from sage_desktop_sdk.core.schema import read_only
+from sage_desktop_sdk.core.schema.decoders import get_raw_key
+
+AUTHENTICATE_PATH = '/api/security/v3/session.svc/authenticate'
+
+# Route name -> (path, schema, is_paginated), paths are matched case insensitively like IIS
+DIMENSION_ROUTES = {
+    'accounts': ('/generalledger/api/v1/account.svc/accounts', read_only.Account, False),
+    'vendors': ('/accountspayable/api/v1/vendor.svc/vendors', read_only.Vendor, False),
+    'vendor_types': ('/accountspayable/api/v1/vendor.svc/vendors/types', read_only.VendorType, False),
+    'jobs': ('/jobcosting/api/v1/jobcost.svc/jobs', read_only.Job, True),
+    'standard_cost_codes': ('/jobcosting/api/v1/jobcost.svc/costcodes', read_only.StandardCostCode, True),
+    'standard_categories': ('/jobcosting/api/v1/jobcost.svc/categories', read_only.StandardCategory, True),
+    'cost_codes': ('/jobcosting/api/v1/jobcost.svc/jobs/costcodes', read_only.CostCode, True),
+    'categories': ('/jobcosting/api/v1/jobcost.svc/jobs/categories', read_only.Category, True),
+    'commitments': ('/jobcosting/api/v1/commitment.svc/commitments', read_only.Commitment, False),
+}
+
+OTHER_ROUTES = {
+    'commitment_items': '/jobcosting/api/v1/commitment.svc/commitments/items',
+    'documents': '/documentmanagement/api/v1/document.svc/document',
+    'document_export': '/documentmanagement/api/v1/document.svc/document/actions/export',
+    'direct_costs': '/jobcosting/api/v1/jobtransaction.svc/transactions/direct-costs',
+    'direct_cost_export': '/jobcosting/api/v1/jobtransaction.svc/job/transaction/synchronize',
+    'event_failures': '/synchronization/eventservice.svc/events/failures',
+}
+
+OPERATION_STATUS_PREFIX = '/synchronization/requestservice.svc/status/'
+
+DEFAULT_SIZES = {
+    'accounts': 1000,
+    'vendors': 5000,
+    'vendor_types': 5,
+    'jobs': 1000,
+    'standard_cost_codes': 500,
+    'standard_categories': 50,
+    'cost_codes': 5000,
+    'categories': 20000,
+    'commitments': 200,
+    'commitment_items': 5,
+}
+
+
+@dataclass
+class Latency:
+    """
+    Log normal latency, most requests close to median, a long tail up to roughly p99
+    """
+    median: float = 0.0
+    p99: float = 0.0
+
+    def sample(self) -> float:
+        if self.median <= 0:
+            return 0.0
+        sigma = math.log(max(self.p99, self.median) / self.median) / 2.326
+        return random.lognormvariate(math.log(self.median), sigma)
+
+
+@dataclass
+class SimulatorConfig:
+    """
+    Dataset sizes, page size, latencies and injected errors per route name
+    """
+    sizes: Dict[str, int] = field(default_factory=lambda: dict(DEFAULT_SIZES))
+    page_size: int = 500
+    latencies: Dict[str, Latency] = field(default_factory=dict)
+    error_rates: Dict[str, float] = field(default_factory=dict)
+    error_status: int = 500
+    # Fraction of exported documents that fail in Sage 300 with event failures
+    export_failure_rate: float = 0.0
+    # Time for an export operation to complete
+    operation_seconds: float = 0.0
+    session_timeout: float = 20 * 60
+    api_key: str = 'key'
+    api_secret: str = 'secret'
+    username: str = 'user'
+    password: str = 'password'
+    seed: int = 1
+
+
+class Dataset:
+    """
+    Items generated from their index on demand so 500k row dimensions don't sit in memory.
+    Versions start at index + 1, touch() moves items to newer versions like edits in Sage 300.
+    """
+    def __init__(self, name: str, schema_class: type, size: int, sizes: Dict[str, int]):
+        self.name = name
+        self.size = size
+        self.sizes = sizes
+        self.raw_keys = [get_raw_key(schema_field.name) for schema_field in fields(schema_class)]
+        self.touched_versions: Dict[int, int] = {}
+        self._selection_cache: Dict[int, List[int]] = {}
+        self._lock = threading.Lock()
+
+    def touch(self, indexes: List[int], next_version: Callable[[], int]) -> None:
+        with self._lock:
+            for index in indexes:
+                self.touched_versions[index] = next_version()
+            self._selection_cache.clear()
+
+    def select(self, version: int) -> List[int]:
+        """
+        Indexes of items newer than version, ordered by version
+        """
+        with self._lock:
+            if version not in self._selection_cache:
+                untouched = [index for index in range(max(version, 0), self.size) if index not in self.touched_versions]
+                touched = sorted(
+                    (item_version, index) for index, item_version in self.touched_versions.items() if item_version > version
+                )
+                self._selection_cache[version] = untouched + [index for _, index in touched]
+            return self._selection_cache[version]
+
+    def item(self, index: int) -> Dict:
+        raw_item = dict.fromkeys(self.raw_keys)
+        raw_item.update({
+            'Id': '{}-{}'.format(self.name, index),
+            'Code': str(index),
+            'Name': '{} {}'.format(self.name.replace('_', ' ').title(), index),
+            'Version': self.touched_versions.get(index, index + 1),
+            'IsActive': True,
+            'IsArchived': False,
+            'CreatedOnUtc': '2024-01-01T00:00:00Z',
+        })
+
+        jobs = max(self.sizes.get('jobs', 1), 1)
+        if self.name == 'cost_codes':
+            raw_item['JobId'] = 'jobs-{}'.format(index % jobs)
+        elif self.name == 'categories':
+            cost_codes = max(self.sizes.get('cost_codes', 1), 1)
+            raw_item['CostCodeId'] = 'cost_codes-{}'.format(index % cost_codes)
+            raw_item['JobId'] = 'jobs-{}'.format(index % cost_codes % jobs)
+            raw_item['StandardCategoryId'] = 'standard_categories-{}'.format(index % max(self.sizes.get('standard_categories', 1), 1))
+        elif self.name == 'vendors':
+            raw_item['TypeId'] = 'vendor_types-{}'.format(index % max(self.sizes.get('vendor_types', 1), 1))
+        elif self.name == 'commitments':
+            raw_item['JobId'] = 'jobs-{}'.format(index % jobs)
+            raw_item['VendorId'] = 'vendors-{}'.format(index % max(self.sizes.get('vendors', 1), 1))
+
+        return raw_item
+
+
+class Hh2Simulator:
+    """
+    State shared by the request handlers: datasets, sessions and export operations
+    """
+    def __init__(self, config: SimulatorConfig = None):
+        self.config = config or SimulatorConfig()
+        self.random = random.Random(self.config.seed)
+        self.sessions: Dict[str, float] = {}
+        self.operations: Dict[str, Tuple[float, str]] = {}
+        self.documents: Dict[str, bool] = {}
+        self.request_counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._version = max(list(self.config.sizes.values()) + [0])
+
+        self.datasets = {
+            name: Dataset(name, schema_class, self.config.sizes.get(name, 0), self.config.sizes)
+            for name, (_, schema_class, _) in DIMENSION_ROUTES.items()
+        }
+        self.commitment_item_keys = [get_raw_key(schema_field.name) for schema_field in fields(read_only.CommitmentItem)]
+
+    def next_version(self) -> int:
+        with self._lock:
+            self._version += 1
+            return self._version
+
+    def touch(self, name: str, count: int) -> None:
+        """
+        Give count random items of a dimension a newer version
+        """
+        dataset = self.datasets[name]
+        self.datasets[name].touch(self.random.sample(range(dataset.size), min(count, dataset.size)), self.next_version)
+
+    def count_request(self, route: str) -> None:
+        with self._lock:
+            self.request_counts[route] = self.request_counts.get(route, 0) + 1
+
+    def create_session(self) -> str:
+        token = uuid.uuid4().hex
+        with self._lock:
+            self.sessions[token] = time.monotonic() + self.config.session_timeout
+        return token
+
+    def is_valid_session(self, token: Optional[str]) -> bool:
+        with self._lock:
+            expires_at = self.sessions.get(token)
+        return expires_at is not None and expires_at > time.monotonic()
+
+    def commitment_items(self, commitment_id: str, version: int) -> List[Dict]:
+        items = []
+        for index in range(self.config.sizes.get('commitment_items', 0)):
+            item = dict.fromkeys(self.commitment_item_keys)
+            item.update({
+                'Id': '{}-item-{}'.format(commitment_id, index),
+                'Code': str(index),
+                'Name': 'Item {}'.format(index),
+                'Version': index + 1,
+                'IsActive': True,
+                'CommitmentId': commitment_id,
+            })
+            if item['Version'] > version:
+                items.append(item)
+        return items
+
+    def create_operation(self, document_id: str) -> str:
+        operation_id = uuid.uuid4().hex
+        with self._lock:
+            self.operations[operation_id] = (time.monotonic(), document_id)
+            is_exported = self.documents.setdefault(document_id, self.random.random() >= self.config.export_failure_rate)
+            # Event failures are looked up by the export id as well
+            self.documents[operation_id] = is_exported
+        return operation_id
+
+    def operation_status(self, operation_id: str) -> Dict:
+        now = datetime.now(timezone.utc).isoformat()
+        created_at, _ = self.operations.get(operation_id, (time.monotonic(), None))
+        is_completed = time.monotonic() - created_at >= self.config.operation_seconds
+        return {
+            'Id': operation_id,
+            'CreatedOn': now,
+            'TransmittedOn': now,
+            'ReceivedOn': now,
+            'DisabledOn': None,
+            'CompletedOn': now if is_completed else None
+        }
+
+
+class Hh2RequestHandler(BaseHTTPRequestHandler):
+    """
+    HTTP/1.0 handler, unpaginated responses are written as they are generated
+    """
+    simulator: Hh2Simulator = None
+
+    def log_message(self, format, *args):
+        return
+
+    def _send_json(self, data, status: int = 200, headers: Dict[str, str] = None) -> None:
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream_json_array(self, items) -> None:
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+
+        buffer = ['[']
+        for index, item in enumerate(items):
+            if index:
+                buffer.append(',')
+            buffer.append(json.dumps(item))
+            if len(buffer) >= 1000:
+                self.wfile.write(''.join(buffer).encode('utf-8'))
+                buffer = []
+        buffer.append(']')
+        self.wfile.write(''.join(buffer).encode('utf-8'))
+
+    def _get_session_token(self) -> Optional[str]:
+        for cookie in (self.headers.get('Cookie') or '').split(';'):
+            name, _, value = cookie.strip().partition('=')
+            if name == '.ASPXAUTH':
+                return value
+        return None
+
+    def _route(self) -> Tuple[str, str, Dict[str, str]]:
+        url = urlparse(self.path)
+        path = url.path.lower().rstrip('/')
+        query = {key.lower(): values[0] for key, values in parse_qs(url.query).items()}
+
+        if path == AUTHENTICATE_PATH:
+            return 'authenticate', path, query
+        if path.startswith(OPERATION_STATUS_PREFIX):
+            return 'operation_status', path, query
+        for name, (route_path, _, _) in DIMENSION_ROUTES.items():
+            if path == route_path:
+                return name, path, query
+        for name, route_path in OTHER_ROUTES.items():
+            if path == route_path:
+                return name, path, query
+        return None, path, query
+
+    def _inject(self, route: str) -> bool:
+        """
+        Apply latency and injected errors of the route, True when the request was answered with an error
+        """
+        simulator = self.simulator
+        simulator.count_request(route)
+
+        latency = simulator.config.latencies.get(route) or simulator.config.latencies.get('*')
+        if latency:
+            time.sleep(latency.sample())
+
+        error_rate = simulator.config.error_rates.get(route, simulator.config.error_rates.get('*', 0))
+        if error_rate and simulator.random.random() < error_rate:
+            self._send_json({'Message': 'Injected error'}, status=simulator.config.error_status)
+            return True
+
+        return False
+
+    def _handle(self, method: str) -> None:
+        route, path, query = self._route()
+        if route is None:
+            return self._send_json({'Message': 'Not found'}, status=404)
+
+        if self._inject(route):
+            return
+
+        if route == 'authenticate':
+            return self._authenticate()
+
+        if not self.simulator.is_valid_session(self._get_session_token()):
+            return self._send_json({'Message': 'Session expired'}, status=401)
+
+        if method == 'GET' and route in DIMENSION_ROUTES:
+            return self._get_dimension(route, query)
+
+        if method == 'GET' and route == 'commitment_items':
+            return self._send_json(self.simulator.commitment_items(query.get('commitment'), int(query.get('version') or 0)))
+
+        if method == 'POST' and route in ('documents', 'direct_costs'):
+            length = int(self.headers.get('Content-Length') or 0)
+            json.loads(self.rfile.read(length) or b'{}')
+            return self._send_json(uuid.uuid4().hex)
+
+        if method == 'POST' and route in ('document_export', 'direct_cost_export'):
+            return self._send_json(self.simulator.create_operation(query.get('document') or query.get('id')))
+
+        if method == 'POST' and route == 'operation_status':
+            return self._send_json(self.simulator.operation_status(path[len(OPERATION_STATUS_PREFIX):]))
+
+        if method == 'GET' and route == 'documents':
+            is_exported = self.simulator.documents.get(query.get('id'), True)
+            return self._send_json({'Id': query.get('id'), 'CurrentState': 9 if is_exported else 4})
+
+        if method == 'GET' and route == 'event_failures':
+            if self.simulator.documents.get(query.get('entity'), True):
+                return self._send_json([])
+            return self._send_json([{'EntityId': query.get('entity'), 'Message': 'Injected export failure'}])
+
+        return self._send_json({'Message': 'Method not allowed'}, status=405)
+
+    def _authenticate(self) -> None:
+        config = self.simulator.config
+        length = int(self.headers.get('Content-Length') or 0)
+        credentials = json.loads(self.rfile.read(length) or b'{}')
+
+        if credentials.get('ApiKey') != config.api_key or credentials.get('ApiSecret') != config.api_secret:
+            return self._send_json({'Result': 2})
+        if credentials.get('Username') != config.username or credentials.get('Password') != config.password:
+            return self._send_json({'Result': 1})
+
+        token = self.simulator.create_session()
+        cookie = '.ASPXAUTH={}; path=/; HttpOnly, ApplicationGatewayAffinity=simulator; Path=/'.format(token)
+        return self._send_json({'Result': 5}, headers={'Set-Cookie': cookie})
+
+    def _get_dimension(self, route: str, query: Dict[str, str]) -> None:
+        dataset = self.simulator.datasets[route]
+        indexes = dataset.select(int(query.get('version') or 0))
+
+        if DIMENSION_ROUTES[route][2]:
+            page_size = self.simulator.config.page_size
+            page = int(query.get('page') or 0)
+            indexes = indexes[page * page_size:(page + 1) * page_size]
+            return self._send_json([dataset.item(index) for index in indexes])
+
+        return self._stream_json_array(dataset.item(index) for index in indexes)
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+
+def start_simulator(config: SimulatorConfig = None, port: int = 0) -> Tuple[ThreadingHTTPServer, Hh2Simulator, str]:
+    """
+    Start the simulator in a daemon thread
+    :param config: SimulatorConfig
+    :param port: port, 0 picks a free port
+    :return: server, simulator and the identifier to give to SageDesktopSDK
+    """
+    simulator = Hh2Simulator(config)
+    handler = type('BoundHh2RequestHandler', (Hh2RequestHandler,), {'simulator': simulator})
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='hh2-simulator', daemon=True).start()
+
+    return server, simulator, 'http://127.0.0.1:{}'.format(server.server_address[1])
+
+
+def _parse_pairs(values: List[str]) -> Dict[str, str]:
+    pairs = {}
+    for value in values or []:
+        name, _, setting = value.partition('=')
+        pairs[name] = setting
+    return pairs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Run a local hh2 simulator')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--page-size', type=int, default=500)
+    parser.add_argument('--size', action='append', help='route=count, eg: categories=500000')
+    parser.add_argument('--latency', action='append', help='route=median:p99 in seconds, route * applies to all routes')
+    parser.add_argument('--error-rate', action='append', help='route=rate, eg: jobs=0.01')
+    parser.add_argument('--error-status', type=int, default=500)
+    parser.add_argument('--export-failure-rate', type=float, default=0.0)
+    parser.add_argument('--operation-seconds', type=float, default=0.0)
+    parser.add_argument('--session-timeout', type=float, default=20 * 60)
+    args = parser.parse_args()
+
+    sizes = dict(DEFAULT_SIZES)
+    sizes.update({name: int(count) for name, count in _parse_pairs(args.size).items()})
+
+    latencies = {}
+    for name, setting in _parse_pairs(args.latency).items():
+        median, _, p99 = setting.partition(':')
+        latencies[name] = Latency(float(median), float(p99 or median))
+
+    config = SimulatorConfig(
+        sizes=sizes,
+        page_size=args.page_size,
+        latencies=latencies,
+        error_rates={name: float(rate) for name, rate in _parse_pairs(args.error_rate).items()},
+        error_status=args.error_status,
+        export_failure_rate=args.export_failure_rate,
+        operation_seconds=args.operation_seconds,
+        session_timeout=args.session_timeout,
+    )
+
+    server, _, identifier = start_simulator(config, args.port)
+    print('hh2 simulator listening, identifier: {}'.format(identifier))
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
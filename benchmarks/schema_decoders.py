@@ -0,0 +1,98 @@
+"""
+Micro-benchmark of the per item work done by SageDesktopConnector._sync_data
+
+Usage: python -m benchmarks.schema_decoders --items 500000 --attribute-type JOB
+"""
+import argparse
+import importlib
+import time
+from dataclasses import fields
+
+from sage_desktop_sdk.core.schema.decoders import ATTRIBUTE_SCHEMA_MAP, build_destination_attribute_extractor, get_raw_key
+
+
+def generate_raw_items(attribute_type: str, count: int) -> list:
+    """
+    Raw hh2 items with every field of the schema set
+    """
+    schema_class = ATTRIBUTE_SCHEMA_MAP[attribute_type]
+    template = {get_raw_key(field.name): None for field in fields(schema_class)}
+
+    raw_items = []
+    for index in range(count):
+        raw_item = dict(template)
+        raw_item.update({
+            'Id': 'id-{}'.format(index),
+            'Name': 'Item  {}'.format(index),
+            'Code': str(index),
+            'Version': index,
+            'IsActive': True
+        })
+        raw_items.append(raw_item)
+
+    return raw_items
+
+
+def decode_with_from_dict(raw_items: list, attribute_type: str, field_names: list) -> list:
+    """
+    Previous path: schema class import and from_dict per item, then getattr over field_names
+    """
+    destination_attributes = []
+    for raw_item in raw_items:
+        schema_class = getattr(importlib.import_module('sage_desktop_sdk.core.schema.read_only'), ATTRIBUTE_SCHEMA_MAP[attribute_type].__name__)
+        item = schema_class.from_dict(raw_item)
+        detail = {field: getattr(item, field) for field in field_names}
+        if item.name:
+            destination_attributes.append({
+                'attribute_type': attribute_type,
+                'display_name': attribute_type.lower(),
+                'value': ' '.join(item.name.split()),
+                'destination_id': item.id,
+                'active': item.is_active,
+                'detail': detail,
+                'code': item.code if hasattr(item, 'code') else None
+            })
+
+    return destination_attributes
+
+
+def decode_with_extractor(raw_items: list, attribute_type: str, field_names: list) -> list:
+    """
+    Precompiled extractor path
+    """
+    extract = build_destination_attribute_extractor(attribute_type, attribute_type.lower(), field_names)
+    destination_attributes = []
+    for raw_item in raw_items:
+        destination_attribute = extract(raw_item)
+        if destination_attribute:
+            destination_attributes.append(destination_attribute)
+
+    return destination_attributes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark hh2 item decoding')
+    parser.add_argument('--items', type=int, default=100000)
+    parser.add_argument('--attribute-type', default='JOB', choices=sorted(ATTRIBUTE_SCHEMA_MAP.keys()))
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    schema_field_names = {field.name for field in fields(ATTRIBUTE_SCHEMA_MAP[args.attribute_type])}
+    field_names = [field_name for field_name in ('code', 'version') if field_name in schema_field_names]
+    raw_items = generate_raw_items(args.attribute_type, args.items)
+
+    assert decode_with_from_dict(raw_items[:100], args.attribute_type, field_names) == decode_with_extractor(raw_items[:100], args.attribute_type, field_names)
+
+    for name, decode in (('from_dict', decode_with_from_dict), ('extractor', decode_with_extractor)):
+        best = min(_time(decode, raw_items, args.attribute_type, field_names) for _ in range(args.repeat))
+        print('{:<10} {:>8.3f}s  {:>8.2f}us/item'.format(name, best, best * 1e6 / args.items))
+
+
+def _time(decode, *args) -> float:
+    start_time = time.perf_counter()
+    decode(*args)
+    return time.perf_counter() - start_time
+
+
+if __name__ == '__main__':
+    main()
@@ -28,6 +28,21 @@ loglevel = os.environ.get('GUNICORN_LOG _LEVEL', 'debug')
 # The type of workers to use.
 worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gevent')
 
+# Load the application once in the master so forked workers, recycled every max_requests, skip the imports.
+preload_app = os.environ.get('GUNICORN_PRELOAD_APP', 'True') == 'True'
+
+# Patch before the application is preloaded so the master imports it against gevent, as the workers will run it.
+if worker_class == 'gevent' and preload_app:
+    from gevent import monkey
+    monkey.patch_all()
+
+# Greenlets of a gevent worker share a pool of database connections, see DATABASES in settings.
+if worker_class == 'gevent':
+    os.environ.setdefault('DATABASE_CONNECTION_POOL', 'geventpool')
+
+# Workers serve Prometheus metrics (database pool included) on the first free port from this one.
+metrics_port = os.environ.get('WEB_METRICS_PORT')
+
 # The number of worker threads for handling requests.
 threads = int(os.environ.get('GUNICORN_NUMBER_WORKER_THREADS', 1))
 
@@ -40,8 +55,8 @@ max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 20))
 # Timeout for graceful workers restart.
 graceful_timeout = int(os.environ.get('GUNICORN_WORKER_GRACEFUL_TIMEOUT', 5))
 
-# Restart workers when code changes.
-reload = True
+# Restart workers when code changes, a preloaded application is not reloaded so this is for development only.
+reload = os.environ.get('GUNICORN_RELOAD', 'False') == 'True'
 
 # The maximum size of HTTP request line in bytes.
 limit_request_line = 0
@@ -65,11 +80,32 @@ access_log_format = '%({X-Real-IP}i)s - - - %(t)s "%(r)s" "%(f)s" "%(a)s" %({X-R
 
 def post_fork(server, worker):
     patch_psycopg()
+    if server.cfg.preload_app:
+        from sage_desktop_api.boot import reset_after_fork
+
+        reset_after_fork()
     server.log.info("Worker spawned (pid: %s)", worker.pid)
 
 
+def post_worker_init(worker):
+    # Started after the worker is patched by gevent so the metrics server runs as a greenlet
+    if metrics_port:
+        from sage_desktop_api.instrumentation import start_metrics_server
+
+        for port in range(int(metrics_port), int(metrics_port) + workers):
+            try:
+                start_metrics_server(port)
+                break
+            except OSError:
+                continue
+
+
 def pre_fork(server, worker):  # noqa
-    pass
+    # Connections opened while preloading must not be shared with the worker
+    if server.cfg.preload_app:
+        from sage_desktop_api.boot import prepare_for_fork
+
+        prepare_for_fork()
 
 
 def pre_exec(server):
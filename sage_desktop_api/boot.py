@@ -0,0 +1,93 @@
+"""
+Worker boot helpers
+
+Heavy SDK and connector classes are imported on first use through LazyImport, and
+gunicorn's fork hooks use prepare_for_fork / reset_after_fork so an application
+preloaded in the master never shares a database or cache connection with a worker.
+"""
+import gc
+import sys
+import threading
+from typing import Any
+
+from django.core.cache import caches
+from django.db import connections
+from django.utils.module_loading import import_string
+
+from sage_desktop_api.instrumentation import GEVENTPOOL_BACKEND_MODULE
+
+
+class LazyImport:
+    """
+    Stands in for a class or function that is imported the first time it is called or
+    an attribute is read, so importing a module does not pull in the whole SDK.
+    Module level proxies can still be patched in tests like the real object, attributes
+    set or deleted on a proxy are set or deleted on the loaded object.
+    """
+    __slots__ = ('dotted_path', '_target', '_lock')
+
+    def __init__(self, dotted_path: str):
+        self.dotted_path = dotted_path
+        self._target = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> Any:
+        if self._target is None:
+            with self._lock:
+                if self._target is None:
+                    self._target = import_string(self.dotted_path)
+        return self._target
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._target is not None
+
+    def __call__(self, *args, **kwargs):
+        return self._load()(*args, **kwargs)
+
+    def __getattr__(self, name: str):
+        # Only called for attributes missing on the proxy itself
+        if name.startswith('__') and name.endswith('__'):
+            raise AttributeError(name)
+        return getattr(self._load(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name in LazyImport.__slots__:
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._load(), name, value)
+
+    def __delattr__(self, name: str) -> None:
+        delattr(self._load(), name)
+
+    def __repr__(self) -> str:
+        return '<LazyImport {}{}>'.format(self.dotted_path, '' if self.is_loaded else ' (not loaded)')
+
+
+def _get_geventpool_connection_pools() -> dict:
+    geventpool_backend = sys.modules.get(GEVENTPOOL_BACKEND_MODULE)
+    return geventpool_backend.connection_pools if geventpool_backend else {}
+
+
+def prepare_for_fork() -> None:
+    """
+    Run in the master before a worker is forked, closes every connection opened while
+    preloading and freezes the objects created so far so the garbage collector of a
+    worker does not touch, and copy, the pages it shares with the master
+    """
+    connections.close_all()
+
+    for pool in list(_get_geventpool_connection_pools().values()):
+        pool.closeall()
+
+    caches.close_all()
+    gc.freeze()
+
+
+def reset_after_fork() -> None:
+    """
+    Run in a worker right after the fork, drops connection pools created in the master,
+    the worker opens its own on first use
+    """
+    # The sockets belong to the master, they are dropped without closing them
+    _get_geventpool_connection_pools().clear()
@@ -0,0 +1,324 @@
+"""
+Per task instrumentation
+
+Wraps worker actions, Sage 300 syncs and export steps and records wall time,
+DB query count / time, outbound HTTP count / latency per host and peak RSS.
+Every finished task is logged as one structured line and aggregated in-process
+for the Prometheus text exposition served by start_metrics_server().
+"""
+import contextvars
+import json
+import logging
+import resource
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+from django.db import connection
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger('instrumentation')
+
+# Stack of tasks running in the current thread / context, outer tasks include the cost of inner ones
+_active_tasks: contextvars.ContextVar[Tuple['TaskMetrics', ...]] = contextvars.ContextVar('active_tasks', default=())
+
+_http_instrumentation_lock = threading.Lock()
+_http_instrumented = False
+
+
+class TaskMetrics:
+    """
+    Metrics of a single task run
+    """
+    def __init__(self, name: str, workspace_id: int = None, action: str = None):
+        self.name = name
+        self.workspace_id = workspace_id
+        self.action = action
+        self.status = 'success'
+        self.wall_time = 0.0
+        self.db_query_count = 0
+        self.db_time = 0.0
+        self.http_count: Dict[str, int] = defaultdict(int)
+        self.http_time: Dict[str, float] = defaultdict(float)
+        self.peak_rss_kb = 0
+        self.skipped = False
+
+    def record_query(self, execute: Callable, sql: str, params, many: bool, context: Dict):
+        """
+        connection.execute_wrapper hook
+        """
+        start_time = time.monotonic()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_query_count += 1
+            self.db_time += time.monotonic() - start_time
+
+    def record_http(self, host: str, elapsed: float) -> None:
+        self.http_count[host] += 1
+        self.http_time[host] += elapsed
+
+    def to_dict(self) -> Dict:
+        return {
+            'task': self.name,
+            'workspace_id': self.workspace_id,
+            'action': self.action,
+            'status': self.status,
+            'skipped': self.skipped,
+            'wall_time': round(self.wall_time, 4),
+            'db_query_count': self.db_query_count,
+            'db_time': round(self.db_time, 4),
+            'http_count': dict(self.http_count),
+            'http_time': {host: round(elapsed, 4) for host, elapsed in self.http_time.items()},
+            'peak_rss_kb': self.peak_rss_kb,
+        }
+
+
+class MetricsRegistry:
+    """
+    In-process aggregation of finished tasks, labelled by task and action
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._collectors: List[Callable[[], Dict[str, float]]] = []
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.task_count = defaultdict(int)
+            self.task_failures = defaultdict(int)
+            self.task_skipped = defaultdict(int)
+            self.task_time = defaultdict(float)
+            self.db_query_count = defaultdict(int)
+            self.db_time = defaultdict(float)
+            self.http_count = defaultdict(int)
+            self.http_time = defaultdict(float)
+            self.peak_rss_kb = 0
+
+    def register_collector(self, collector: Callable[[], Dict[str, float]]) -> None:
+        """
+        Register a function returning extra gauges, eg: RabbitMQ publisher metrics
+        """
+        self._collectors.append(collector)
+
+    def record(self, metrics: TaskMetrics) -> None:
+        labels = (metrics.name, metrics.action or '')
+        with self._lock:
+            self.task_count[labels] += 1
+            self.task_time[labels] += metrics.wall_time
+            self.db_query_count[labels] += metrics.db_query_count
+            self.db_time[labels] += metrics.db_time
+            if metrics.status != 'success':
+                self.task_failures[labels] += 1
+            if metrics.skipped:
+                self.task_skipped[labels] += 1
+            for host, count in metrics.http_count.items():
+                self.http_count[labels + (host,)] += count
+                self.http_time[labels + (host,)] += metrics.http_time[host]
+            self.peak_rss_kb = max(self.peak_rss_kb, metrics.peak_rss_kb)
+
+    def render(self) -> str:
+        """
+        Prometheus text exposition format
+        """
+        lines = []
+
+        def add(metric: str, metric_type: str, samples: Dict, label_names: Tuple[str, ...]):
+            lines.append('# TYPE {} {}'.format(metric, metric_type))
+            for labels, value in sorted(samples.items()):
+                label_string = ','.join('{}="{}"'.format(name, label) for name, label in zip(label_names, labels))
+                lines.append('{}{{{}}} {}'.format(metric, label_string, value))
+
+        task_labels = ('task', 'action')
+        with self._lock:
+            add('sage_desktop_task_total', 'counter', self.task_count, task_labels)
+            add('sage_desktop_task_failures_total', 'counter', self.task_failures, task_labels)
+            add('sage_desktop_task_skipped_total', 'counter', self.task_skipped, task_labels)
+            add('sage_desktop_task_seconds_total', 'counter', self.task_time, task_labels)
+            add('sage_desktop_task_db_queries_total', 'counter', self.db_query_count, task_labels)
+            add('sage_desktop_task_db_seconds_total', 'counter', self.db_time, task_labels)
+            add('sage_desktop_task_http_requests_total', 'counter', self.http_count, task_labels + ('host',))
+            add('sage_desktop_task_http_seconds_total', 'counter', self.http_time, task_labels + ('host',))
+            lines.append('# TYPE sage_desktop_peak_rss_kilobytes gauge')
+            lines.append('sage_desktop_peak_rss_kilobytes {}'.format(self.peak_rss_kb))
+
+        for collector in self._collectors:
+            for metric, value in sorted(collector().items()):
+                lines.append('# TYPE sage_desktop_{} gauge'.format(metric))
+                lines.append('sage_desktop_{} {}'.format(metric, value))
+
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+# New database connections of this process by alias, with pooled or persistent connections this stays flat
+_opened_connections: Dict[str, int] = defaultdict(int)
+_opened_connections_lock = threading.Lock()
+
+GEVENTPOOL_BACKEND_MODULE = 'django_db_geventpool.backends.postgresql_psycopg2.base'
+
+
+def _count_opened_connection(sender, connection, **kwargs) -> None:
+    with _opened_connections_lock:
+        _opened_connections[connection.alias] += 1
+
+
+connection_created.connect(_count_opened_connection, dispatch_uid='instrumentation_count_opened_connection')
+
+
+def get_database_connection_metrics() -> Dict[str, float]:
+    """
+    Opened connections per database and, on web workers using the gevent pool, the size of every pool
+    """
+    with _opened_connections_lock:
+        metrics = {'db_connections_opened_{}'.format(alias): count for alias, count in _opened_connections.items()}
+
+    # Only loaded when DATABASE_CONNECTION_POOL selects the pooled backend
+    geventpool_backend = sys.modules.get(GEVENTPOOL_BACKEND_MODULE)
+    if geventpool_backend:
+        for alias, pool in list(geventpool_backend.connection_pools.items()):
+            metrics['db_pool_{}_connections'.format(alias)] = pool.size
+            metrics['db_pool_{}_idle_connections'.format(alias)] = pool.pool.qsize()
+            metrics['db_pool_{}_max_connections'.format(alias)] = pool.maxsize
+
+    return metrics
+
+
+registry.register_collector(get_database_connection_metrics)
+
+
+def _instrument_http() -> None:
+    """
+    Patch requests.Session.send once per process so hh2 and Fyle calls are timed per host
+    """
+    global _http_instrumented
+
+    with _http_instrumentation_lock:
+        if _http_instrumented:
+            return
+
+        original_send = requests.Session.send
+
+        @wraps(original_send)
+        def send(session, request, **kwargs):
+            active_tasks = _active_tasks.get()
+            if not active_tasks:
+                return original_send(session, request, **kwargs)
+
+            start_time = time.monotonic()
+            try:
+                return original_send(session, request, **kwargs)
+            finally:
+                host = urlparse(request.url).hostname or 'unknown'
+                elapsed = time.monotonic() - start_time
+                for task in active_tasks:
+                    task.record_http(host, elapsed)
+
+        requests.Session.send = send
+        _http_instrumented = True
+
+
+@contextmanager
+def instrument(name: str, workspace_id: int = None, action: str = None):
+    """
+    Record metrics of the wrapped block
+    :param name: task name, eg: worker_action, sage300_sync, export
+    :param workspace_id: workspace id
+    :param action: action / step within the task
+    """
+    _instrument_http()
+
+    metrics = TaskMetrics(name=name, workspace_id=workspace_id, action=action)
+    token = _active_tasks.set(_active_tasks.get() + (metrics,))
+    start_time = time.monotonic()
+
+    try:
+        with connection.execute_wrapper(metrics.record_query):
+            yield metrics
+    except Exception:
+        metrics.status = 'failed'
+        raise
+    finally:
+        _active_tasks.reset(token)
+        metrics.wall_time = time.monotonic() - start_time
+        metrics.peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        registry.record(metrics)
+        logger.info('task_metrics %s', json.dumps(metrics.to_dict()))
+
+
+def instrumented(name: str, action: str = None):
+    """
+    Decorator for methods of classes with a workspace_id attribute, eg: SageDesktopConnector
+    :param name: task name
+    :param action: action name, defaults to the function name
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(self, *args, **kwargs):
+            with instrument(name, workspace_id=getattr(self, 'workspace_id', None), action=action or func.__name__):
+                return func(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def mark_skipped() -> None:
+    """
+    Mark the innermost running task as skipped, eg: a sync with no changes
+    """
+    active_tasks = _active_tasks.get()
+    if active_tasks:
+        active_tasks[-1].skipped = True
+
+
+def get_current_workspace_id() -> Optional[int]:
+    """
+    Workspace of the innermost running task that has one
+    """
+    for metrics in reversed(_active_tasks.get()):
+        if metrics.workspace_id is not None:
+            return metrics.workspace_id
+    return None
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    """
+    Serves the registry at /metrics
+    """
+    def do_GET(self):
+        if self.path != '/metrics':
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        body = registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        return
+
+
+def start_metrics_server(port: Optional[int]) -> Optional[ThreadingHTTPServer]:
+    """
+    Start the Prometheus endpoint of this process in a daemon thread
+    :param port: port, nothing is started when it is not set, 0 picks a free port
+    :return: server
+    """
+    if port is None or port == '':
+        return None
+
+    server = ThreadingHTTPServer(('0.0.0.0', int(port)), MetricsRequestHandler)
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    logger.info('Serving metrics on port %s', port)
+    return server
@@ -0,0 +1,241 @@
+"""
+Logging pipeline
+
+AsyncStreamHandler formats records in the caller and hands the line to a writer thread,
+so a slow or full stdout never blocks a gevent worker. PayloadLogFilter truncates long
+messages per logger and samples payload sized INFO / DEBUG lines of the payload loggers
+(hh2 responses, request bodies, export payloads) per workspace, unless full payloads are
+being captured for the workspace, see the capture_payload_logs command.
+The list of capturing workspaces is read from the cache by a background thread, never while a
+record is being logged.
+"""
+import logging
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+from gevent import monkey
+
+from sage_desktop_api.instrumentation import get_current_workspace_id
+
+FULL_PAYLOAD_WORKSPACES_CACHE_KEY = 'LOG_FULL_PAYLOAD_WORKSPACES'
+
+WORKSPACE_ID_PATTERN = re.compile(r'workspaces/(\d+)|workspace_id\W{0,3}(\d+)', re.IGNORECASE)
+
+# Only the start of a message is searched for the workspace id
+WORKSPACE_ID_SEARCH_LENGTH = 500
+
+
+class AsyncStreamHandler(logging.StreamHandler):
+    """
+    StreamHandler writing from a native thread, records beyond max_queue_size are dropped
+    and counted instead of blocking the caller
+    """
+    def __init__(self, stream=None, max_queue_size: int = 10000, flush_timeout: float = 2):
+        super().__init__(stream)
+        self.max_queue_size = max_queue_size
+        self.flush_timeout = flush_timeout
+        self._queue = None
+        self._pid = None
+        self._dropped = 0
+        # Native lock, the writer thread swaps the dropped count while callers increment it
+        self._dropped_lock = monkey.get_original('_thread', 'allocate_lock')()
+        # Incremented under the handler lock by emit and by the writer thread alone respectively
+        self._queued = 0
+        self._written = 0
+        self._start_lock = threading.Lock()
+
+    def _ensure_writer(self) -> None:
+        # A writer thread does not survive a fork, workers of a preloaded app start their own
+        if self._pid == os.getpid():
+            return
+
+        with self._start_lock:
+            if self._pid != os.getpid():
+                # The originals, patched ones would run the writer as a greenlet on the hub
+                self._queue = monkey.get_original('queue', 'SimpleQueue')()
+                self._dropped = 0
+                self._queued = self._written = 0
+                monkey.get_original('_thread', 'start_new_thread')(self._write_lines, (self._queue,))
+                self._pid = os.getpid()
+
+    def _write_lines(self, line_queue) -> None:
+        while True:
+            lines = [line_queue.get()]
+            while len(lines) < 100 and not line_queue.empty():
+                lines.append(line_queue.get())
+            line_count = len(lines)
+
+            with self._dropped_lock:
+                dropped, self._dropped = self._dropped, 0
+            if dropped:
+                lines.append('WARNING dropped {} log records, the log queue was full'.format(dropped))
+
+            try:
+                self.stream.write(self.terminator.join(lines) + self.terminator)
+                self.stream.flush()
+            except Exception:
+                pass
+            finally:
+                self._written += line_count
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self._ensure_writer()
+            if self._queue.qsize() >= self.max_queue_size:
+                with self._dropped_lock:
+                    self._dropped += 1
+                return
+            self._queue.put(self.format(record))
+            self._queued += 1
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+    def flush(self) -> None:
+        """
+        Wait, up to flush_timeout, for queued lines to be written, eg: at exit
+        """
+        if self._pid != os.getpid():
+            return
+
+        deadline = time.monotonic() + self.flush_timeout
+        while self._written < self._queued and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+
+class PayloadLogFilter(logging.Filter):
+    """
+    Truncates messages longer than the limit of their logger and keeps one in sample_every
+    INFO / DEBUG messages longer than sample_min_length of the sampled loggers per workspace,
+    messages of the other loggers are only truncated
+    :param max_lengths: message length limit per logger name prefix, eg: {'sage_desktop_sdk': 2000}
+    :param default_max_length: limit of the other loggers
+    :param sampled_loggers: logger name prefixes of payload logs, eg: ['sage_desktop_sdk', 'django.request']
+    :param sample_every: keep one payload sized message in this many, 1 keeps all of them
+    :param sample_min_length: messages longer than this are payload sized
+    :param refresh_seconds: how often the list of workspaces capturing full payloads is read from the cache,
+        0 disables the background refresh
+    :param max_sampled_workspaces: sampling counters are reset once this many workspaces are counted
+    """
+    def __init__(
+        self, max_lengths: Dict[str, int] = None, default_max_length: int = 5000, sampled_loggers: List[str] = None,
+        sample_every: int = 10, sample_min_length: int = 1000, refresh_seconds: int = 30, max_sampled_workspaces: int = 10000
+    ):
+        super().__init__()
+        # Longest prefix first so 'sage_desktop_sdk.core' wins over 'sage_desktop_sdk'
+        self.max_lengths = sorted((max_lengths or {}).items(), key=lambda item: len(item[0]), reverse=True)
+        self.default_max_length = default_max_length
+        self.sampled_loggers = list(sampled_loggers or [])
+        self.sample_every = max(sample_every, 1)
+        self.sample_min_length = sample_min_length
+        self.refresh_seconds = refresh_seconds
+        self.max_sampled_workspaces = max_sampled_workspaces
+        self._seen_payloads = defaultdict(int)
+        # Native lock, records are filtered from greenlets and from worker pool threads
+        self._seen_payloads_lock = monkey.get_original('_thread', 'allocate_lock')()
+        self._full_payload_workspaces = {}
+        self._refresher_pid = None
+        self._refresher_lock = threading.Lock()
+
+    @staticmethod
+    def _is_logger_of(logger_name: str, prefix: str) -> bool:
+        return logger_name == prefix or logger_name.startswith(prefix + '.')
+
+    def get_max_length(self, logger_name: str) -> int:
+        for prefix, max_length in self.max_lengths:
+            if self._is_logger_of(logger_name, prefix):
+                return max_length
+        return self.default_max_length
+
+    def is_sampled(self, logger_name: str) -> bool:
+        return any(self._is_logger_of(logger_name, prefix) for prefix in self.sampled_loggers)
+
+    def is_sampled_out(self, workspace_id: int) -> bool:
+        """
+        Count a payload sized message of the workspace, True when it is not one of the kept samples
+        """
+        with self._seen_payloads_lock:
+            if len(self._seen_payloads) >= self.max_sampled_workspaces and workspace_id not in self._seen_payloads:
+                self._seen_payloads.clear()
+            self._seen_payloads[workspace_id] += 1
+            return bool((self._seen_payloads[workspace_id] - 1) % self.sample_every)
+
+    def refresh_full_payload_workspaces(self) -> None:
+        """
+        Read the workspaces capturing full payloads, workspace id to capture expiry timestamp, from the cache
+        """
+        try:
+            from django.core.cache import cache
+            full_payload_workspaces = cache.get(FULL_PAYLOAD_WORKSPACES_CACHE_KEY) or {}
+        except Exception:
+            full_payload_workspaces = {}
+
+        self._full_payload_workspaces = full_payload_workspaces
+
+    def _refresh_loop(self) -> None:
+        while True:
+            self.refresh_full_payload_workspaces()
+            try:
+                # The database cache opened a connection for this thread, it would sit idle until the next refresh
+                from django.db import connections
+                connections.close_all()
+            except Exception:
+                pass
+            time.sleep(self.refresh_seconds)
+
+    def _ensure_refresher(self) -> None:
+        # A thread does not survive a fork, workers of a preloaded app start their own
+        if not self.refresh_seconds or self._refresher_pid == os.getpid():
+            return
+
+        with self._refresher_lock:
+            if self._refresher_pid != os.getpid():
+                self._refresher_pid = os.getpid()
+                threading.Thread(target=self._refresh_loop, name='payload-log-refresh', daemon=True).start()
+
+    def get_full_payload_workspaces(self) -> Dict[str, float]:
+        """
+        Workspace id to capture expiry timestamp of the unexpired captures, as last refreshed
+        """
+        self._ensure_refresher()
+        now = time.time()
+        return {
+            workspace_id: expires_at for workspace_id, expires_at in self._full_payload_workspaces.items() if expires_at > now
+        }
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        max_length = self.get_max_length(record.name)
+        full_payload_workspaces = self.get_full_payload_workspaces()
+
+        # Long arguments are cut before formatting so a multi-megabyte response is never copied,
+        # unless a workspace is capturing full payloads
+        if isinstance(record.args, tuple) and not full_payload_workspaces:
+            record.args = tuple(
+                arg[:max_length] if isinstance(arg, (str, bytes)) and len(arg) > max_length else arg for arg in record.args
+            )
+
+        message = record.getMessage()
+        record.msg, record.args = message, None
+        if len(message) <= self.sample_min_length:
+            return True
+
+        workspace_id = get_current_workspace_id()
+        if workspace_id is None:
+            match = WORKSPACE_ID_PATTERN.search(message, 0, WORKSPACE_ID_SEARCH_LENGTH)
+            workspace_id = int(match.group(1) or match.group(2)) if match else None
+
+        if full_payload_workspaces.get(str(workspace_id), 0) > time.time():
+            return True
+
+        if record.levelno < logging.WARNING and self.is_sampled(record.name) and self.is_sampled_out(workspace_id):
+            return False
+
+        if len(message) > max_length:
+            record.msg = '{}... [truncated {} characters]'.format(message[:max_length], len(message) - max_length)
+
+        return True
@@ -15,6 +15,7 @@ from logging.config import dictConfig
 
 import dj_database_url
 
+from sage_desktop_api.log_handlers import AsyncStreamHandler, PayloadLogFilter
 from sage_desktop_api.logging_middleware import WorkerIDFilter
 from sage_desktop_api.sentry import Sentry
 
@@ -129,6 +130,26 @@ REST_FRAMEWORK = {
 
 SERVICE_NAME = os.environ.get('SERVICE_NAME')
 
+# Logging
+# Lines are written by a background thread, records beyond this many queued lines are dropped
+LOG_QUEUE_MAX_SIZE = int(os.environ.get('LOG_QUEUE_MAX_SIZE', 10000))
+# Messages are truncated to this many characters, hh2 responses and request bodies to their own limits
+LOG_MAX_LENGTH = int(os.environ.get('LOG_MAX_LENGTH', 5000))
+LOG_HH2_RESPONSE_MAX_LENGTH = int(os.environ.get('LOG_HH2_RESPONSE_MAX_LENGTH', 2000))
+LOG_REQUEST_BODY_MAX_LENGTH = int(os.environ.get('LOG_REQUEST_BODY_MAX_LENGTH', 2000))
+# One in this many INFO / DEBUG messages longer than LOG_PAYLOAD_MIN_LENGTH of the payload loggers is kept
+# per workspace, messages of the other loggers are only truncated
+LOG_PAYLOAD_SAMPLED_LOGGERS = [
+    'sage_desktop_sdk',
+    'django.request',
+    'apps.sage300.exports.purchase_invoice.tasks',
+    'apps.sage300.exports.direct_cost.tasks',
+]
+LOG_PAYLOAD_SAMPLE_EVERY = int(os.environ.get('LOG_PAYLOAD_SAMPLE_EVERY', 10))
+LOG_PAYLOAD_MIN_LENGTH = int(os.environ.get('LOG_PAYLOAD_MIN_LENGTH', 1000))
+
+REQUEST_LOGGING_MAX_BODY_LENGTH = LOG_REQUEST_BODY_MAX_LENGTH
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -147,21 +168,36 @@ LOGGING = {
         'worker_id': {
             '()': WorkerIDFilter,
         },
+        'payload': {
+            '()': PayloadLogFilter,
+            'max_lengths': {
+                'sage_desktop_sdk': LOG_HH2_RESPONSE_MAX_LENGTH,
+                'django.request': LOG_REQUEST_BODY_MAX_LENGTH,
+            },
+            'default_max_length': LOG_MAX_LENGTH,
+            'sampled_loggers': LOG_PAYLOAD_SAMPLED_LOGGERS,
+            'sample_every': LOG_PAYLOAD_SAMPLE_EVERY,
+            'sample_min_length': LOG_PAYLOAD_MIN_LENGTH,
+        },
     },
     'handlers': {
         'console': {
-            'class': 'logging.StreamHandler',
+            '()': AsyncStreamHandler,
+            'max_queue_size': LOG_QUEUE_MAX_SIZE,
             'formatter': 'standard',
-            'filters': ['worker_id'],
+            'filters': ['worker_id', 'payload'],
         },
         'request_logs': {
-            'class': 'logging.StreamHandler',
+            '()': AsyncStreamHandler,
             'stream': sys.stdout,
-            'formatter': 'requests'
+            'max_queue_size': LOG_QUEUE_MAX_SIZE,
+            'formatter': 'requests',
+            'filters': ['payload'],
         },
         'debug_logs': {
-            'class': 'logging.StreamHandler',
+            '()': AsyncStreamHandler,
             'stream': sys.stdout,
+            'max_queue_size': LOG_QUEUE_MAX_SIZE,
             'formatter': 'verbose'
         }
     },
@@ -196,7 +232,10 @@ Q_CLUSTER = {
     'cached': False,
     'orm': 'default',
     'ack_failures': True,
-    'poll': 5,
+    # Seconds between polls of the ORM broker for async tasks and chains
+    'poll': int(os.environ.get('Q_CLUSTER_POLL_SECONDS', 5)),
+    # Schedules are dispatched by the run_scheduler timer process once Q_CLUSTER_SCHEDULER is False
+    'scheduler': os.environ.get('Q_CLUSTER_SCHEDULER', 'True') == 'True',
     'max_attempts': 1,
     'attempt_count': 1,
     # The number of tasks a worker will process before recycling.
@@ -221,6 +260,29 @@ DATABASES = {
 
 DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
 
+# Large reads go through sage_desktop_api.streaming.stream_queryset, a named cursor inside a transaction
+# that fetches this many rows at a time
+STREAM_QUERYSET_CHUNK_SIZE = int(os.environ.get('STREAM_QUERYSET_CHUNK_SIZE', 2000))
+
+# Gevent web workers share a pool of connections per process, gunicorn_config.py selects it.
+# Greenlets borrow a connection for a request and return it, MAX_CONNS caps the connections
+# of a process and idle ones beyond REUSE_CONNS are closed. Pooled connections are checked
+# with SELECT 1 before they are handed out.
+if os.environ.get('DATABASE_CONNECTION_POOL') == 'geventpool':
+    DATABASES['default']['ENGINE'] = 'django_db_geventpool.backends.postgresql_psycopg2'
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS'] = {
+        **DATABASES['default'].get('OPTIONS', {}),
+        'MAX_CONNS': int(os.environ.get('DB_POOL_MAX_CONNS', 20)),
+        'REUSE_CONNS': int(os.environ.get('DB_POOL_REUSE_CONNS', 10))
+    }
+# RabbitMQ workers and the Django-Q cluster keep one persistent connection per worker thread / process,
+# so their connection count is bounded by WORKER_CONCURRENCY and Q_CLUSTER workers. Connections are
+# health checked before reuse and recycled after CONN_MAX_AGE by close_old_connections between tasks.
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', 600))
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = os.environ.get('DB_CONN_HEALTH_CHECKS', 'True') == 'True'
+
 DATABASES['cache_db'] = {
     'ENGINE': 'django.db.backends.sqlite3',
     'NAME': 'cache.db'
@@ -260,6 +322,48 @@ INTEGRATIONS_SETTINGS_API = os.environ.get('INTEGRATIONS_SETTINGS_API')
 SD_API_KEY = os.environ.get('SD_API_KEY')
 SD_API_SECRET = os.environ.get('SD_API_SECRET')
 
+# Fleet scheduling
+# Number of sage_desktop_export.p1.shard_<n> queues, 1 keeps the single sage_desktop_export.p1 queue
+EXPORT_P1_SHARD_COUNT = int(os.environ.get('EXPORT_P1_SHARD_COUNT', 1))
+# Scheduled run_import_export runs are spread over this window instead of firing together
+SCHEDULE_SPREAD_WINDOW_MINUTES = int(os.environ.get('SCHEDULE_SPREAD_WINDOW_MINUTES', 30))
+RUN_IMPORT_EXPORT_CONCURRENCY_PER_WORKSPACE = int(os.environ.get('RUN_IMPORT_EXPORT_CONCURRENCY_PER_WORKSPACE', 1))
+RUN_IMPORT_EXPORT_SLOT_TIMEOUT = int(os.environ.get('RUN_IMPORT_EXPORT_SLOT_TIMEOUT', 3 * 60 * 60))
+OVERLAP_EXPENSE_IMPORTS = os.environ.get('OVERLAP_EXPENSE_IMPORTS', 'True') == 'True'
+
+# RabbitMQ publisher
+# Idempotent payloads (see workers.helpers.DEDUPLICATED_ACTIONS) published again within this window are dropped
+RABBITMQ_PUBLISH_DEDUPE_SECONDS = int(os.environ.get('RABBITMQ_PUBLISH_DEDUPE_SECONDS', 300))
+RABBITMQ_PUBLISH_BATCH_SIZE = int(os.environ.get('RABBITMQ_PUBLISH_BATCH_SIZE', 100))
+
+# Worker retries, failed messages are re-published after an exponential backoff
+WORKER_MAX_RETRIES = int(os.environ.get('WORKER_MAX_RETRIES', 4))
+WORKER_RETRY_BASE_DELAY_SECONDS = int(os.environ.get('WORKER_RETRY_BASE_DELAY_SECONDS', 60))
+WORKER_RETRY_MAX_DELAY_SECONDS = int(os.environ.get('WORKER_RETRY_MAX_DELAY_SECONDS', 60 * 60))
+
+# Queued export registry entries older than this belong to lost Django-Q tasks, the stuck export sweep
+# deletes them and re-exports their exports, kept close to the sweep's 60 minute stuck threshold
+QUEUED_ACCOUNTING_EXPORT_TTL_HOURS = int(os.environ.get('QUEUED_ACCOUNTING_EXPORT_TTL_HOURS', 2))
+
+# COMPLETE accounting exports, with their expenses, last updated this long ago are moved to the archive
+# tables by the daily archive_accounting_exports task, listing APIs read them with ?archived=true
+ACCOUNTING_EXPORT_ARCHIVE_AFTER_DAYS = int(os.environ.get('ACCOUNTING_EXPORT_ARCHIVE_AFTER_DAYS', 180))
+
+# Sage 300 identifiers whose queued exports are polled at the same time by the fleet wide operation status poller
+OPERATION_STATUS_POLL_CONCURRENCY = int(os.environ.get('OPERATION_STATUS_POLL_CONCURRENCY', 4))
+
+# run_scheduler timer process, sleeps until the next schedule is due but at most SCHEDULER_MAX_SLEEP_SECONDS
+# so new schedules are picked up, due schedules are locked and dispatched SCHEDULER_BATCH_SIZE at a time
+SCHEDULER_MAX_SLEEP_SECONDS = int(os.environ.get('SCHEDULER_MAX_SLEEP_SECONDS', 60))
+SCHEDULER_BATCH_SIZE = int(os.environ.get('SCHEDULER_BATCH_SIZE', 100))
+
+# Expense update webhooks of a workspace are applied together once no update arrived for this long
+EXPENSE_UPDATE_COALESCE_SECONDS = int(os.environ.get('EXPENSE_UPDATE_COALESCE_SECONDS', 2))
+
+# hh2
+# Unpaginated vendor and account responses are streamed and upserted in batches of this size
+HH2_STREAM_BATCH_SIZE = int(os.environ.get('HH2_STREAM_BATCH_SIZE', 1000))
+
 # Internationalization
 # https://docs.djangoproject.com/en/3.1/topics/i18n/
 
@@ -0,0 +1,88 @@
+"""
+Streaming reads of large querysets
+
+DISABLE_SERVER_SIDE_CURSORS is set because connections are shared by a pooler in transaction
+mode, so QuerySet.iterator() silently fetches the whole result set. stream_queryset opens a
+named (server side) cursor inside a transaction instead, the cursor never outlives the
+transaction so it stays on the same server connection, and fetches chunk_size rows at a time.
+
+A reader holds at most chunk_size rows from the cursor in memory, plus whatever it keeps, so
+readers consume the rows as they come or push membership checks into SQL instead of collecting
+them. stream_queryset_batches hands the rows over in lists of chunk_size for bulk writes.
+
+Readers that lock rows or call out per row can't keep one transaction open for the whole read,
+they page through the queryset by primary key with iterate_queryset_by_pk instead.
+
+Every reader documents its memory ceiling where it reads.
+"""
+from typing import Iterator, List, TypeVar
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import QuerySet
+
+T = TypeVar('T')
+
+
+def stream_queryset(queryset: QuerySet, chunk_size: int = None) -> Iterator[T]:
+    """
+    Rows of a queryset fetched chunk_size at a time through a named cursor
+    Writes made while iterating are part of the reading transaction, a reader that stops early
+    commits them, an error while reading rolls them back
+    :param queryset: queryset, values() and values_list() querysets are streamed too
+    :param chunk_size: rows per fetch, defaults to STREAM_QUERYSET_CHUNK_SIZE
+    :return: model instances or values of the queryset
+    """
+    chunk_size = chunk_size or getattr(settings, 'STREAM_QUERYSET_CHUNK_SIZE', 2000)
+
+    with transaction.atomic(using=queryset.db):
+        try:
+            # iterator() would fall back to a client side cursor because of DISABLE_SERVER_SIDE_CURSORS
+            yield from queryset._iterator(use_chunked_fetch=True, chunk_size=chunk_size)
+        except GeneratorExit:
+            return
+
+
+def stream_queryset_batches(queryset: QuerySet, batch_size: int = None) -> Iterator[List[T]]:
+    """
+    Rows of a queryset streamed through stream_queryset in lists of batch_size,
+    at most one batch is held in memory
+    :param queryset: queryset
+    :param batch_size: rows per batch, defaults to STREAM_QUERYSET_CHUNK_SIZE
+    :return: lists of model instances or values of the queryset
+    """
+    batch_size = batch_size or getattr(settings, 'STREAM_QUERYSET_CHUNK_SIZE', 2000)
+
+    batch = []
+    for row in stream_queryset(queryset, chunk_size=batch_size):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+def iterate_queryset_by_pk(queryset: QuerySet, batch_size: int = None) -> Iterator[T]:
+    """
+    Model instances of a queryset read in primary key ordered pages of batch_size, every page
+    is its own query so no transaction is held open between rows
+    :param queryset: queryset of model instances
+    :param batch_size: rows per page, defaults to STREAM_QUERYSET_CHUNK_SIZE
+    :return: model instances of the queryset
+    """
+    batch_size = batch_size or getattr(settings, 'STREAM_QUERYSET_CHUNK_SIZE', 2000)
+
+    last_pk = None
+    while True:
+        page = queryset.order_by('pk')
+        if last_pk is not None:
+            page = page.filter(pk__gt=last_pk)
+
+        rows = list(page[:batch_size])
+        yield from rows
+
+        if len(rows) < batch_size:
+            return
+        last_pk = rows[-1].pk
@@ -24,5 +24,5 @@ class Accounts(Client):
             endpoint += query_params
 
         # Query the API to get all accounts
-        accounts = self._query_get_all_generator(endpoint)
+        accounts = self._query_get_all_stream(endpoint)
         yield accounts
@@ -46,7 +46,7 @@ class Commitments(Client):
         """
         if version:
             # Append the version query parameter if provided
-            query_params = '?version={0}'.format(version)
+            query_params = '&version={0}'.format(version)
             endpoint = Commitments.GET_COMMITMENT_ITEMS.format(commitment_id) + query_params
         else:
             endpoint = Commitments.GET_COMMITMENT_ITEMS.format(commitment_id)
@@ -27,7 +27,7 @@ class Vendors(Client):
             endpoint += query_params
 
         # Query the API to get all vendors
-        vendors = self._query_get_all_generator(endpoint)
+        vendors = self._query_get_all_stream(endpoint)
         yield vendors
 
     def get_vendor_types(self, version: int = None):
@@ -47,5 +47,5 @@ class Vendors(Client):
             endpoint += query_params
 
         # Query the API to get all vendor types
-        vendor_types = self._query_get_all_generator(endpoint)
+        vendor_types = self._query_get_all_stream(endpoint)
         yield vendor_types
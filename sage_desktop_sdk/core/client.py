@@ -1,9 +1,11 @@
 import json
 import logging
-from typing import Dict, Generator, List
+from typing import Callable, Dict, Generator, List
 
 import requests
 
+from sage_desktop_sdk.core.flow_control import get_flow_controller
+from sage_desktop_sdk.core.helpers import iter_json_array
 from sage_desktop_sdk.exceptions import (
     InternalServerError,
     InvalidUserCredentials,
@@ -18,6 +20,8 @@ from sage_desktop_sdk.exceptions import (
 
 logger = logging.getLogger(__name__)
 
+STREAM_CHUNK_SIZE = 64 * 1024
+
 
 class Client:
     """
@@ -29,6 +33,16 @@ class Client:
         self.__user_id = None
         self.__user_password = None
         self.__cookie = None
+        self.__flow_controller = None
+        self.stream_batch_size = 1000
+
+    def set_stream_batch_size(self, stream_batch_size: int):
+        """
+        Set the number of items per batch yielded by streamed responses
+        :param stream_batch_size: batch size
+        :return: None
+        """
+        self.stream_batch_size = stream_batch_size
 
     def set_user_id_and_password(self, user_id: str, user_password: str):
         """
@@ -43,14 +57,26 @@ class Client:
     def set_api_url(self, identifier: str):
         """
         Set the api url and identifier for APIs
-        :param identifier: identifier
+        :param identifier: identifier, a url with a scheme is used as is, eg: http://127.0.0.1:8765
         :return: None
         """
-        self.__api_url = "https://{0}".format(identifier)
+        self.__api_url = identifier.rstrip('/') if '://' in identifier else "https://{0}".format(identifier)
+        self.__flow_controller = get_flow_controller(identifier)
 
     def set_cookie(self, cookie: str):
         self.__cookie = cookie
 
+    def _call(self, method: Callable, *args, **kwargs) -> requests.Response:
+        """
+        Make a request within the concurrency limit and circuit breaker of the identifier
+        :param method: eg: requests.get
+        :return: response
+        """
+        if self.__flow_controller is None:
+            return method(*args, **kwargs)
+
+        return self.__flow_controller.call(method, *args, **kwargs)
+
     def _reformat_cookie(self, cookie: str) -> str:
         """
         Reformat cookie string to proper order and format
@@ -117,7 +143,7 @@ class Client:
         })
 
         authentication_url = self.__api_url + '/Api/Security/V3/Session.svc/authenticate'
-        result = requests.request("POST", url=authentication_url, headers=request_header, data=api_data)
+        result = self._call(requests.request, "POST", url=authentication_url, headers=request_header, data=api_data)
         try:
             response = json.loads(result.text)
 
@@ -160,9 +186,9 @@ class Client:
         while True:
             try:
                 if is_paginated:
-                    response = requests.get(url=request_url.format(page_number), headers=api_headers)
+                    response = self._call(requests.get, url=request_url.format(page_number), headers=api_headers)
                 else:
-                    response = requests.get(url=request_url, headers=api_headers)
+                    response = self._call(requests.get, url=request_url, headers=api_headers)
 
                 data = json.loads(response.text)
 
@@ -194,6 +220,43 @@ class Client:
 
                 raise SageDesktopSDKError('Error: {0}'.format(err.response.status_code), response.text)
 
+    def _query_get_all_stream(self, url: str) -> Generator[List[Dict], None, None]:
+        """
+        Gets all the objects of an unpaginated GET call, the body is parsed while it is
+        downloaded and objects are yielded in batches of stream_batch_size
+        :param url: GET URL of object
+        :return: Generator of lists of objects
+        """
+        request_url = '{0}{1}'.format(self.__api_url, url)
+        api_headers = {
+            'Cookie': self.__cookie,
+            'Accept': 'application/json'
+        }
+
+        with self._call(requests.get, url=request_url, headers=api_headers, stream=True) as response:
+            if response.status_code != 200:
+                logger.info('Response for get request for url: %s, %s', url, response.text)
+                if response.status_code == 400:
+                    raise WrongParamsError('Some of the parameters are wrong', response.text)
+
+                if response.status_code == 406:
+                    raise NotAcceptableClientError('Forbidden, the user has insufficient privilege', response.text)
+
+                if response.status_code == 404:
+                    raise NotFoundItemError('Not found item with ID', response.text)
+
+                if response.status_code == 500:
+                    raise InternalServerError('Internal server error', response.text)
+
+                raise SageDesktopSDKError('Error: {0}'.format(response.status_code), response.text)
+
+            item_count = 0
+            for batch in iter_json_array(response.iter_content(chunk_size=STREAM_CHUNK_SIZE), self.stream_batch_size):
+                item_count += len(batch)
+                yield batch
+
+            logger.debug('Streamed %s objects for get request for url: %s', item_count, request_url)
+
     def _query_get_all(self, url: str) -> List[Dict]:
         """
         Gets all the objects of a particular type for query type GET calls
@@ -208,7 +271,7 @@ class Client:
             'Accept': 'application/json'
         }
 
-        response = requests.get(url=request_url, headers=api_headers)
+        response = self._call(requests.get, url=request_url, headers=api_headers)
 
         if response.status_code == 200:
             logger.debug('Response for get request for url: %s, %s', request_url, response.text)
@@ -244,7 +307,7 @@ class Client:
             'Accept': 'application/json'
         }
 
-        response = requests.get(url=request_url, headers=api_headers)
+        response = self._call(requests.get, url=request_url, headers=api_headers)
 
         if response.status_code == 200:
             logger.debug('Response for get request for url: %s, %s', request_url, response.text)
@@ -280,7 +343,7 @@ class Client:
             'Content-Type': 'application/json'
         }
 
-        response = requests.post(url=request_url, headers=api_headers, data=data)
+        response = self._call(requests.post, url=request_url, headers=api_headers, data=data)
         logger.debug('Payload for post request: %s', data)
 
         if response.status_code == 200:
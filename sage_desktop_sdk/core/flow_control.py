@@ -0,0 +1,165 @@
+"""
+Per identifier flow control for hh2 requests.
+
+Every Sage 300 server sits behind its own hh2 identifier and has its own capacity.
+The in-flight request limit of an identifier follows AIMD: it grows by one request
+per limit worth of fast successful requests, and halves on a 5xx, a timeout, a
+connection error or a slow response. Repeated failures open the circuit, requests
+then fail fast with CircuitOpenError until a trial request succeeds.
+State is per process.
+"""
+import logging
+import threading
+import time
+from typing import Callable, Dict
+
+import requests
+
+from sage_desktop_sdk.exceptions import CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+INITIAL_CONCURRENCY = 2
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = 8
+# Responses slower than this count as congestion
+LATENCY_TARGET_SECONDS = 15
+ACQUIRE_TIMEOUT_SECONDS = 5 * 60
+FAILURE_THRESHOLD = 5
+RESET_TIMEOUT_SECONDS = 60
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after failure_threshold consecutive failures.
+    Open -> half open after reset_timeout, a single trial request is let through.
+    Half open -> closed on success, open again on failure.
+    """
+    CLOSED = 'CLOSED'
+    OPEN = 'OPEN'
+    HALF_OPEN = 'HALF_OPEN'
+
+    def __init__(self, failure_threshold: int = FAILURE_THRESHOLD, reset_timeout: float = RESET_TIMEOUT_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failure_count = 0
+        self.opened_at = 0.0
+        self.is_trial_running = False
+
+    def allow_request(self) -> bool:
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self.is_trial_running = False
+
+        if self.state == self.CLOSED:
+            return True
+
+        if self.state == self.HALF_OPEN and not self.is_trial_running:
+            self.is_trial_running = True
+            return True
+
+        return False
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.failure_count = 0
+        self.is_trial_running = False
+
+    def record_failure(self) -> None:
+        self.failure_count += 1
+        self.is_trial_running = False
+        if self.state == self.HALF_OPEN or self.failure_count >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+
+class FlowController:
+    """
+    In-flight limit and circuit breaker of a single identifier
+    """
+    def __init__(self, identifier: str, initial_concurrency: int = INITIAL_CONCURRENCY, min_concurrency: int = MIN_CONCURRENCY,
+                 max_concurrency: int = MAX_CONCURRENCY, latency_target: float = LATENCY_TARGET_SECONDS,
+                 acquire_timeout: float = ACQUIRE_TIMEOUT_SECONDS, circuit_breaker: CircuitBreaker = None):
+        self.identifier = identifier
+        self.limit = float(initial_concurrency)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.latency_target = latency_target
+        self.acquire_timeout = acquire_timeout
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.in_flight = 0
+        self._condition = threading.Condition()
+
+    def _acquire(self) -> None:
+        deadline = time.monotonic() + self.acquire_timeout
+
+        with self._condition:
+            while True:
+                if not self.circuit_breaker.allow_request():
+                    raise CircuitOpenError('Circuit open for {0}, hh2 requests are failing'.format(self.identifier))
+
+                if self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise CircuitOpenError('Timed out waiting for a request slot for {0}'.format(self.identifier))
+                self._condition.wait(remaining)
+
+    def _release(self, is_success: bool, latency: float) -> None:
+        with self._condition:
+            self.in_flight -= 1
+
+            if is_success:
+                self.circuit_breaker.record_success()
+            else:
+                self.circuit_breaker.record_failure()
+
+            if is_success and latency <= self.latency_target:
+                self.limit = min(self.limit + 1 / self.limit, self.max_concurrency)
+            else:
+                self.limit = max(self.limit / 2, self.min_concurrency)
+                logger.info('Reduced hh2 concurrency of %s to %s, success: %s, latency: %.2fs', self.identifier, int(self.limit), is_success, latency)
+
+            self._condition.notify_all()
+
+    def call(self, method: Callable, *args, **kwargs) -> requests.Response:
+        """
+        Run a requests call within the limits of the identifier
+        :param method: eg: requests.get
+        :return: response
+        """
+        self._acquire()
+
+        start_time = time.monotonic()
+        is_success = False
+        try:
+            response = method(*args, **kwargs)
+            is_success = response.status_code < 500
+            return response
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            raise
+        except Exception:
+            # Not a sign of an overloaded server
+            is_success = True
+            raise
+        finally:
+            self._release(is_success, time.monotonic() - start_time)
+
+
+_controllers: Dict[str, FlowController] = {}
+_controllers_lock = threading.Lock()
+
+
+def get_flow_controller(identifier: str) -> FlowController:
+    """
+    Get the flow controller shared by all clients of an identifier in this process
+    :param identifier: hh2 identifier
+    :return: FlowController
+    """
+    with _controllers_lock:
+        if identifier not in _controllers:
+            _controllers[identifier] = FlowController(identifier)
+        return _controllers[identifier]
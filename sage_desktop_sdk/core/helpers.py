@@ -0,0 +1,109 @@
+import codecs
+import json
+from typing import Any, Generator, Iterable, List
+
+WHITESPACE = ' \t\n\r'
+
+# Consumed text is dropped from the buffer once it grows past this
+BUFFER_COMPACT_SIZE = 64 * 1024
+
+
+def iter_json_array(chunks: Iterable[bytes], batch_size: int = 1000) -> Generator[List[Any], None, None]:
+    """
+    Incrementally parse a JSON array from a stream of byte chunks,
+    only the current chunk and the current batch are held in memory
+    :param chunks: body chunks, eg: response.iter_content()
+    :param batch_size: number of items per yielded list
+    :return: Generator of lists of items
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    chunks = iter(chunks)
+
+    buffer = ''
+    position = 0
+    is_eof = False
+
+    def read_more() -> bool:
+        nonlocal buffer, position, is_eof
+        if is_eof:
+            return False
+
+        chunk = next(chunks, None)
+        if chunk is None:
+            is_eof = True
+            text = text_decoder.decode(b'', final=True)
+        else:
+            text = text_decoder.decode(chunk)
+
+        if position > BUFFER_COMPACT_SIZE:
+            buffer = buffer[position:]
+            position = 0
+        buffer += text
+        return True
+
+    def skip_whitespace() -> bool:
+        """
+        Move to the next non whitespace character, False at the end of the body
+        """
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in WHITESPACE:
+                position += 1
+            if position < len(buffer):
+                return True
+            if not read_more():
+                return False
+
+    if not skip_whitespace():
+        return
+
+    if buffer[position] != '[':
+        # Not an array, eg: an error object, decode it whole like before
+        while read_more():
+            pass
+        data = json.loads(buffer[position:])
+        if data:
+            yield data
+        return
+
+    position += 1
+    batch = []
+    expect_separator = False
+
+    while True:
+        if not skip_whitespace():
+            raise json.JSONDecodeError('Unterminated array', buffer, position)
+
+        character = buffer[position]
+        if character == ']':
+            break
+
+        if expect_separator:
+            if character != ',':
+                raise json.JSONDecodeError('Expecting , delimiter', buffer, position)
+            position += 1
+            expect_separator = False
+            if not skip_whitespace():
+                raise json.JSONDecodeError('Unterminated array', buffer, position)
+
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+            # A scalar ending exactly at the end of the buffer may continue in the next chunk
+            if end == len(buffer) and not isinstance(item, (dict, list)) and not is_eof:
+                raise json.JSONDecodeError('Incomplete item', buffer, position)
+        except json.JSONDecodeError:
+            if read_more():
+                continue
+            raise
+
+        position = end
+        expect_separator = True
+        batch.append(item)
+
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
@@ -0,0 +1,116 @@
+"""
+Decoders going straight from raw hh2 dicts to destination attribute dicts.
+Schema classes and field getters are resolved once per process instead of once per item.
+"""
+from dataclasses import fields
+from functools import lru_cache
+from operator import methodcaller
+from typing import Callable, Dict, List, Optional
+
+from sage_desktop_sdk.core.schema import read_only
+
+ATTRIBUTE_SCHEMA_MAP = {
+    'ACCOUNT': read_only.Account,
+    'VENDOR': read_only.Vendor,
+    'JOB': read_only.Job,
+    'STANDARD_COST_CODE': read_only.StandardCostCode,
+    'STANDARD_CATEGORY': read_only.StandardCategory,
+    'COMMITMENT': read_only.Commitment,
+    'COMMITMENT_ITEM': read_only.CommitmentItem,
+    'COST_CODE': read_only.CostCode,
+    'VENDOR_TYPE': read_only.VendorType
+}
+
+# hh2 keys that don't follow the CamelCase form of the field name
+RAW_KEY_OVERRIDES = {
+    'default_standard_costcode': 'DefaultStandardCostCode'
+}
+
+# Fields whose from_dict doesn't read a single key
+FIELD_GETTER_OVERRIDES = {
+    read_only.VendorType: {
+        'is_active': lambda raw: True
+    },
+    read_only.Category: {
+        'name': lambda raw: raw.get('Name', raw.get('StandardCategoryDescription'))
+    }
+}
+
+
+def get_raw_key(field_name: str) -> str:
+    """
+    Get the hh2 key of a schema field, eg: created_on_utc -> CreatedOnUtc
+    :param field_name: schema field name
+    :return: hh2 key
+    """
+    if field_name in RAW_KEY_OVERRIDES:
+        return RAW_KEY_OVERRIDES[field_name]
+
+    return ''.join(word[:1].upper() + word[1:] for word in field_name.split('_'))
+
+
+def get_schema_class(attribute_type: str) -> type:
+    """
+    Get the read only schema class of an attribute type
+    :param attribute_type: eg: JOB
+    :return: schema class
+    """
+    return ATTRIBUTE_SCHEMA_MAP[attribute_type]
+
+
+@lru_cache(maxsize=None)
+def get_field_getters(schema_class: type) -> Dict[str, Callable[[dict], object]]:
+    """
+    Getters reading each field of schema_class from a raw hh2 dict, same values as from_dict
+    :param schema_class: read only schema class
+    :return: field name -> getter
+    """
+    overrides = FIELD_GETTER_OVERRIDES.get(schema_class, {})
+
+    return {
+        field.name: overrides.get(field.name) or methodcaller('get', get_raw_key(field.name))
+        for field in fields(schema_class)
+    }
+
+
+def build_destination_attribute_extractor(
+        attribute_type: str, display_name: str, field_names: List[str], vendor_type_mapping: dict = None
+) -> Callable[[dict], Optional[dict]]:
+    """
+    Build the function turning a raw hh2 item into a destination attribute dict,
+    equivalent to from_dict followed by SageDesktopConnector._add_to_destination_attributes
+    :param attribute_type: eg: JOB
+    :param display_name: display name of the attribute
+    :param field_names: fields stored in detail
+    :param vendor_type_mapping: vendor type id -> name, only for vendors
+    :return: extractor returning None for items without a name
+    """
+    getters = get_field_getters(get_schema_class(attribute_type))
+
+    get_name = getters['name']
+    get_id = getters['id']
+    get_is_active = getters['is_active']
+    get_code = getters.get('code')
+    get_type_id = getters.get('type_id')
+    detail_getters = tuple((field_name, getters[field_name]) for field_name in field_names)
+
+    def extract(raw: dict) -> Optional[dict]:
+        name = get_name(raw)
+        if not name:
+            return None
+
+        detail = {field_name: getter(raw) for field_name, getter in detail_getters}
+        if vendor_type_mapping:
+            detail['type'] = vendor_type_mapping.get(get_type_id(raw))
+
+        return {
+            'attribute_type': attribute_type,
+            'display_name': display_name,
+            'value': ' '.join(name.split()),
+            'destination_id': get_id(raw),
+            'active': get_is_active(raw),
+            'detail': detail,
+            'code': get_code(raw) if get_code else None
+        }
+
+    return extract
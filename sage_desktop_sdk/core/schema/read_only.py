@@ -1,7 +1,7 @@
 from dataclasses import dataclass
 
 
-@dataclass
+@dataclass(slots=True)
 class Account:
     id: str
     code: str
@@ -22,7 +22,7 @@ class Account:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class Vendor:
     id: str
     version: int
@@ -57,7 +57,7 @@ class Vendor:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class VendorType:
     id: str
     version: int
@@ -74,7 +74,7 @@ class VendorType:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class Commitment:
     id: str
     version: str
@@ -145,7 +145,7 @@ class Commitment:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class Job:
     id: str
     version: int
@@ -224,7 +224,7 @@ class Job:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class StandardCostCode:
     id: str
     version: int
@@ -249,7 +249,7 @@ class StandardCostCode:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class StandardCategory:
     id: str
     version: int
@@ -274,7 +274,7 @@ class StandardCategory:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class OperationStatusResponse:
     Id: str
     CreatedOn: str
@@ -284,7 +284,7 @@ class OperationStatusResponse:
     CompletedOn: str
 
 
-@dataclass
+@dataclass(slots=True)
 class CostCode:
     code: str
     cost_code_status: int
@@ -347,7 +347,7 @@ class CostCode:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class Category:
     id: str
     version: int
@@ -420,7 +420,7 @@ class Category:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class CommitmentItem:
     id: str
     version: int
@@ -13,5 +13,6 @@ __all__ = [
     'InvalidUserCredentials',
     'InvalidWebApiClientCredentials',
     'UserAccountLocked',
-    'WebApiClientLocked'
+    'WebApiClientLocked',
+    'CircuitOpenError'
 ]
@@ -49,4 +49,8 @@ class UserAccountLocked(SageDesktopSDKError):
     
 
 class WebApiClientLocked(SageDesktopSDKError):
-    """WebApiClientLocked"""
\ No newline at end of file
+    """WebApiClientLocked"""
+
+
+class CircuitOpenError(SageDesktopSDKError):
+    """hh2 requests of the identifier are failing, requests are refused until the server recovers."""
@@ -10,7 +10,7 @@ class SageDesktopSDK:
     Sage Desktop SDK
     """
 
-    def __init__(self, api_key: str, api_secret: str,  user_name: str, password: str, identifier: str):
+    def __init__(self, api_key: str, api_secret: str,  user_name: str, password: str, identifier: str, stream_batch_size: int = None):
         """
         Initialize connection to Sage300
             :param api_key: Sage API Key
@@ -18,6 +18,7 @@ class SageDesktopSDK:
             :param user_name: Sage Desktop user name
             :param password: Sage Desktop user password
             :param identifier: Sage Desktop Identifier
+            :param stream_batch_size: Objects per batch of streamed vendor and account responses
         """
 
         self.__api_key = api_key
@@ -38,6 +39,10 @@ class SageDesktopSDK:
         self.direct_costs = DirectCosts()
         self.event_failures = EventFailures()
 
+        if stream_batch_size:
+            self.accounts.set_stream_batch_size(stream_batch_size)
+            self.vendors.set_stream_batch_size(stream_batch_size)
+
         self.update_api_url()
         self.update_user_id_and_password()
         self.update_cookie()
@@ -31,6 +31,12 @@ BEGIN
   GET DIAGNOSTICS rcount = ROW_COUNT;
   RAISE NOTICE 'Deleted % dependent_field_settings', rcount;
 
+  DELETE
+  FROM pending_expense_updates peu
+  WHERE peu.workspace_id = _workspace_id;
+  GET DIAGNOSTICS rcount = ROW_COUNT;
+  RAISE NOTICE 'Deleted % pending_expense_updates', rcount;
+
   DELETE
   FROM cost_category cc
   WHERE cc.workspace_id = _workspace_id;
@@ -81,6 +87,18 @@ BEGIN
   GET DIAGNOSTICS rcount = ROW_COUNT;
   RAISE NOTICE 'Deleted % accounting_exports_expenses', rcount;
 
+  DELETE
+  FROM queued_accounting_exports qae
+  WHERE qae.workspace_id = _workspace_id;
+  GET DIAGNOSTICS rcount = ROW_COUNT;
+  RAISE NOTICE 'Deleted % queued_accounting_exports', rcount;
+
+  DELETE
+  FROM archived_accounting_exports aae
+  WHERE aae.workspace_id = _workspace_id;
+  GET DIAGNOSTICS rcount = ROW_COUNT;
+  RAISE NOTICE 'Deleted % archived_accounting_exports', rcount;
+
   DELETE
   FROM accounting_exports ae
   WHERE ae.workspace_id = _workspace_id;
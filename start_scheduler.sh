@@ -0,0 +1,4 @@
+#!/bin/bash
+
+# Running the schedule timer, set Q_CLUSTER_SCHEDULER=False on the qcluster once this runs
+python manage.py run_scheduler
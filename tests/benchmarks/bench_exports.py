@@ -0,0 +1,50 @@
+from apps.accounting_exports.models import AccountingExport
+from apps.sage300.exports.direct_cost.models import DirectCost
+from apps.sage300.exports.purchase_invoice.models import PurchaseInvoice, PurchaseInvoiceLineitems
+from apps.workspaces.models import AdvancedSetting
+from tests.benchmarks.generator import create_expenses
+
+
+def test_create_accounting_export(synthetic_workspace, benchmark_size, benchmark):
+    expenses = create_expenses(synthetic_workspace, benchmark_size)
+
+    with benchmark.measure('create_accounting_export'):
+        AccountingExport.create_accounting_export(expenses, fund_source='PERSONAL', workspace_id=synthetic_workspace.id)
+
+    assert AccountingExport.objects.filter(workspace_id=synthetic_workspace.id).count() == benchmark_size.reports
+
+
+def test_purchase_invoice_lineitems(synthetic_workspace, benchmark_size, benchmark):
+    expenses = create_expenses(synthetic_workspace, benchmark_size)
+    AccountingExport.create_accounting_export(expenses, fund_source='PERSONAL', workspace_id=synthetic_workspace.id)
+
+    advance_setting = AdvancedSetting.objects.get(workspace_id=synthetic_workspace.id)
+    accounting_exports = list(AccountingExport.objects.filter(workspace_id=synthetic_workspace.id))
+    for accounting_export in accounting_exports:
+        PurchaseInvoice.create_or_update_object(accounting_export, advance_setting)
+
+    with benchmark.measure('purchase_invoice_lineitems_create_or_update_object'):
+        for accounting_export in accounting_exports:
+            PurchaseInvoiceLineitems.create_or_update_object(accounting_export, advance_setting)
+
+    lineitems = PurchaseInvoiceLineitems.objects.filter(workspace_id=synthetic_workspace.id)
+    assert lineitems.count() == benchmark_size.expenses
+    assert not lineitems.filter(job_id__isnull=True).exists()
+    assert not lineitems.filter(category_id__isnull=True).exists()
+
+
+def test_direct_cost(synthetic_workspace, benchmark_size, benchmark):
+    expenses = create_expenses(synthetic_workspace, benchmark_size, fund_source='CCC')
+    AccountingExport.create_accounting_export(expenses, fund_source='CCC', workspace_id=synthetic_workspace.id)
+    AccountingExport.objects.filter(workspace_id=synthetic_workspace.id).update(type='DIRECT_COST')
+
+    advance_setting = AdvancedSetting.objects.get(workspace_id=synthetic_workspace.id)
+    accounting_exports = list(AccountingExport.objects.filter(workspace_id=synthetic_workspace.id))
+
+    with benchmark.measure('direct_cost_create_or_update_object'):
+        for accounting_export in accounting_exports:
+            DirectCost.create_or_update_object(accounting_export, advance_setting)
+
+    direct_costs = DirectCost.objects.filter(workspace_id=synthetic_workspace.id)
+    assert direct_costs.count() == benchmark_size.expenses
+    assert not direct_costs.filter(cost_code_id__isnull=True).exists()
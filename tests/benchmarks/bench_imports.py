@@ -0,0 +1,87 @@
+from fyle_accounting_library.fyle_platform.enums import ExpenseImportSourceEnum
+from fyle_integrations_imports.models import ImportLog
+
+from apps.accounting_exports.models import AccountingExport
+from apps.fyle.models import DependentFieldSetting, Expense
+from apps.fyle.tasks import import_expenses, re_run_skip_export_rule
+from apps.sage300.dependent_fields import post_dependent_cost_code
+from apps.sage300.models import CostCategory
+from apps.sage300.utils import SageDesktopConnector
+from apps.workspaces.models import Sage300Credential
+from tests.benchmarks.generator import create_expense_filters, create_expenses, generate_expenses, generate_hh2_categories
+
+
+def get_skipped_expense_count(benchmark_size) -> int:
+    """
+    Expenses of the first employee, matched by create_expense_filters()
+    """
+    return len([
+        index for index in range(benchmark_size.expenses)
+        if (index % benchmark_size.reports) % benchmark_size.employees == 0
+    ])
+
+
+def test_import_expenses(mocker, synthetic_workspace, benchmark_size, benchmark):
+    create_expense_filters(synthetic_workspace)
+
+    platform = mocker.patch('apps.fyle.tasks.get_platform_connector')
+    platform.return_value.expenses.get.return_value = generate_expenses(synthetic_workspace, benchmark_size)
+
+    with benchmark.measure('import_expenses'):
+        import_expenses(
+            synthetic_workspace.id,
+            source_account_type='PERSONAL_CASH_ACCOUNT',
+            fund_source_key='PERSONAL',
+            imported_from=ExpenseImportSourceEnum.DASHBOARD_SYNC
+        )
+
+    assert Expense.objects.filter(workspace_id=synthetic_workspace.id).count() == benchmark_size.expenses
+    assert Expense.objects.filter(workspace_id=synthetic_workspace.id, is_skipped=True).count() == get_skipped_expense_count(benchmark_size)
+
+
+def test_re_run_skip_export_rule(synthetic_workspace, benchmark_size, benchmark):
+    expenses = create_expenses(synthetic_workspace, benchmark_size)
+    AccountingExport.create_accounting_export(expenses, fund_source='PERSONAL', workspace_id=synthetic_workspace.id)
+    create_expense_filters(synthetic_workspace)
+
+    with benchmark.measure('re_run_skip_export_rule'):
+        re_run_skip_export_rule(synthetic_workspace)
+
+    assert Expense.objects.filter(workspace_id=synthetic_workspace.id, is_skipped=True).count() == get_skipped_expense_count(benchmark_size)
+
+
+def test_sync_cost_categories(mocker, synthetic_workspace, benchmark_size, benchmark):
+    mocker.patch('apps.sage300.utils.SageDesktopSDK')
+    sage_connector = SageDesktopConnector(
+        credentials_object=Sage300Credential.objects.get(workspace_id=synthetic_workspace.id),
+        workspace_id=synthetic_workspace.id
+    )
+    sage_connector.connection.categories.get_all_categories.return_value = [generate_hh2_categories(benchmark_size)]
+
+    import_log = ImportLog.update_or_create_in_progress_import_log('COST_CATEGORY', synthetic_workspace.id)
+
+    with benchmark.measure('sync_cost_categories'):
+        sage_connector.sync_cost_categories(import_log)
+
+    new_cost_category_count = benchmark_size.jobs * benchmark_size.cost_codes_per_job
+    assert CostCategory.objects.filter(workspace_id=synthetic_workspace.id).count() == benchmark_size.cost_categories + new_cost_category_count
+
+
+def test_post_dependent_cost_code(mocker, synthetic_workspace, benchmark_size, benchmark):
+    mocker.patch('apps.sage300.dependent_fields.sleep')
+    platform = mocker.MagicMock()
+
+    import_log = ImportLog.update_or_create_in_progress_import_log('COST_CODE', synthetic_workspace.id)
+    dependent_field_setting = DependentFieldSetting.objects.get(workspace_id=synthetic_workspace.id)
+
+    with benchmark.measure('post_dependent_cost_code'):
+        posted_cost_codes, is_errored = post_dependent_cost_code(
+            import_log,
+            dependent_field_setting=dependent_field_setting,
+            platform=platform,
+            filters={'workspace_id': synthetic_workspace.id}
+        )
+
+    assert not is_errored
+    assert len(posted_cost_codes) == benchmark_size.jobs * benchmark_size.cost_codes_per_job
+    assert platform.dependent_fields.bulk_post_dependent_expense_field_values.call_count == benchmark_size.jobs
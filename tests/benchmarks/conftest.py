@@ -0,0 +1,168 @@
+"""
+Fixtures for the benchmark suite
+
+Benchmarks live in bench_*.py files so they are not part of the regular test run:
+
+    BENCHMARK_SIZE=medium pytest tests/benchmarks/bench_*.py --no-cov
+
+Every measured block records wall time, DB query count / time and HTTP calls.
+Results are written to BENCHMARK_REPORT (default: benchmark_report.json) and compared
+with the stored baseline of the same size, a benchmark fails when it makes more queries
+than BENCHMARK_QUERY_TOLERANCE or is slower than BENCHMARK_TIME_TOLERANCE allow.
+BENCHMARK_SAVE_BASELINE=1 stores the results as the new baseline instead.
+
+BENCHMARK_QUERIES_ONLY=1 fails only on query count regressions, slower wall times are
+still listed under time_regressions of the report. CI runs in this mode, single wall time
+samples on a shared runner are too noisy to fail a build on.
+"""
+import json
+import os
+import platform
+from contextlib import contextmanager
+from dataclasses import asdict
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+
+import pytest
+
+from sage_desktop_api.instrumentation import instrument
+from tests.benchmarks.generator import WORKSPACE_SIZES, WorkspaceSize, create_workspace
+
+BENCHMARK_WORKSPACE_ID = 100
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+# Timings below this are dominated by noise and are not compared
+MIN_COMPARED_WALL_TIME = 0.05
+
+results: Dict[str, Dict] = {}
+regressions: List[str] = []
+time_regressions: List[str] = []
+
+
+def get_size_name() -> str:
+    size_name = os.environ.get('BENCHMARK_SIZE', 'small')
+    if size_name not in WORKSPACE_SIZES:
+        raise pytest.UsageError('BENCHMARK_SIZE should be one of {}'.format(', '.join(WORKSPACE_SIZES)))
+    return size_name
+
+
+def load_baseline() -> Dict:
+    if not os.path.exists(BASELINE_PATH):
+        return {}
+
+    with open(BASELINE_PATH) as baseline_file:
+        return json.load(baseline_file)
+
+
+def compare_with_baseline(name: str, result: Dict, baseline: Dict) -> Tuple[List[str], List[str]]:
+    """
+    Query count and wall time regressions of a result against its baseline entry
+    """
+    if not baseline:
+        return [], []
+
+    query_tolerance = float(os.environ.get('BENCHMARK_QUERY_TOLERANCE', 0.1))
+    time_tolerance = float(os.environ.get('BENCHMARK_TIME_TOLERANCE', 0.5))
+    query_regressions = []
+    wall_time_regressions = []
+
+    allowed_query_count = int(baseline['db_query_count'] * (1 + query_tolerance))
+    if result['db_query_count'] > allowed_query_count:
+        query_regressions.append('{}: {} queries, baseline {}'.format(name, result['db_query_count'], baseline['db_query_count']))
+
+    allowed_wall_time = max(baseline['wall_time'], MIN_COMPARED_WALL_TIME) * (1 + time_tolerance)
+    if result['wall_time'] > allowed_wall_time:
+        wall_time_regressions.append('{}: {:.3f}s, baseline {:.3f}s'.format(name, result['wall_time'], baseline['wall_time']))
+
+    return query_regressions, wall_time_regressions
+
+
+class Benchmark:
+    """
+    Measures named blocks of a benchmark test
+    """
+    def __init__(self, workspace_id: int):
+        self.workspace_id = workspace_id
+        self.size_name = get_size_name()
+        self.baseline = load_baseline().get(self.size_name, {})
+
+    @contextmanager
+    def measure(self, name: str):
+        with instrument('benchmark', workspace_id=self.workspace_id, action=name) as metrics:
+            yield metrics
+
+        result = {
+            'wall_time': round(metrics.wall_time, 4),
+            'db_query_count': metrics.db_query_count,
+            'db_time': round(metrics.db_time, 4),
+            'http_count': sum(metrics.http_count.values()),
+        }
+        results[name] = result
+
+        if os.environ.get('BENCHMARK_SAVE_BASELINE'):
+            return
+
+        found_regressions, wall_time_regressions = compare_with_baseline(name, result, self.baseline.get(name))
+        if os.environ.get('BENCHMARK_QUERIES_ONLY'):
+            time_regressions.extend(wall_time_regressions)
+        else:
+            found_regressions.extend(wall_time_regressions)
+
+        if found_regressions:
+            regressions.extend(found_regressions)
+            pytest.fail('Benchmark regression | {}'.format(' | '.join(found_regressions)))
+
+
+@pytest.fixture
+def benchmark_size() -> WorkspaceSize:
+    return WORKSPACE_SIZES[get_size_name()]
+
+
+@pytest.fixture
+def synthetic_workspace(db, benchmark_size):
+    """
+    Workspace with settings, mappings and cost categories of BENCHMARK_SIZE
+    """
+    return create_workspace(BENCHMARK_WORKSPACE_ID, benchmark_size)
+
+
+@pytest.fixture
+def benchmark(synthetic_workspace) -> Benchmark:
+    return Benchmark(synthetic_workspace.id)
+
+
+def pytest_terminal_summary(terminalreporter):
+    if time_regressions:
+        terminalreporter.section('benchmark wall time regressions (not failing)')
+        for time_regression in time_regressions:
+            terminalreporter.write_line(time_regression)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    if not results:
+        return
+
+    size_name = get_size_name()
+    report = {
+        'size': size_name,
+        'workspace_size': asdict(WORKSPACE_SIZES[size_name]),
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'results': results,
+        'regressions': regressions,
+        'time_regressions': time_regressions,
+    }
+
+    with open(os.environ.get('BENCHMARK_REPORT', 'benchmark_report.json'), 'w') as report_file:
+        json.dump(report, report_file, indent=4, sort_keys=True)
+
+    if os.environ.get('BENCHMARK_SAVE_BASELINE'):
+        baseline = load_baseline()
+        baseline.setdefault(size_name, {}).update({
+            name: {'wall_time': result['wall_time'], 'db_query_count': result['db_query_count']}
+            for name, result in results.items()
+        })
+        with open(BASELINE_PATH, 'w') as baseline_file:
+            json.dump(baseline, baseline_file, indent=4, sort_keys=True)
+            baseline_file.write('\n')
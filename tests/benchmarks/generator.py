@@ -0,0 +1,395 @@
+"""
+Synthetic workspace generator for the benchmark suite
+
+Builds a fully configured workspace of a given size with bulk inserts, signals are
+not triggered so no schedules or imports are kicked off while generating data.
+All values are derived from indexes so every run works on identical data.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+from fyle_accounting_mappings.models import (
+    CategoryMapping,
+    DestinationAttribute,
+    EmployeeMapping,
+    ExpenseAttribute,
+    Mapping,
+    MappingSetting,
+)
+
+from apps.accounting_exports.models import AccountingExport, AccountingExportSummary
+from apps.fyle.models import SOURCE_ACCOUNT_MAP, DependentFieldSetting, Expense, ExpenseFilter
+from apps.mappings.models import Version
+from apps.sage300.models import CostCategory
+from apps.workspaces.models import (
+    AdvancedSetting,
+    ExportSetting,
+    FyleCredential,
+    ImportSetting,
+    Sage300Credential,
+    Workspace,
+)
+
+BATCH_SIZE = 2000
+
+SPENT_AT = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+@dataclass(frozen=True)
+class WorkspaceSize:
+    """
+    Size of a synthetic workspace
+    """
+    expenses: int
+    reports: int
+    employees: int
+    categories: int
+    jobs: int
+    cost_codes_per_job: int
+    cost_categories_per_cost_code: int
+
+    @property
+    def cost_categories(self) -> int:
+        return self.jobs * self.cost_codes_per_job * self.cost_categories_per_cost_code
+
+
+WORKSPACE_SIZES = {
+    'small': WorkspaceSize(expenses=200, reports=20, employees=10, categories=20, jobs=10, cost_codes_per_job=5, cost_categories_per_cost_code=5),
+    'medium': WorkspaceSize(expenses=2000, reports=200, employees=50, categories=100, jobs=100, cost_codes_per_job=10, cost_categories_per_cost_code=10),
+    'large': WorkspaceSize(expenses=20000, reports=1000, employees=200, categories=300, jobs=300, cost_codes_per_job=20, cost_categories_per_cost_code=20),
+}
+
+
+def get_job(job_index: int) -> Dict:
+    return {'id': 'job-{}'.format(job_index), 'name': 'Job {}'.format(job_index), 'code': str(job_index)}
+
+
+def get_cost_code(job_index: int, cost_code_index: int) -> Dict:
+    return {'id': 'cost-code-{}-{}'.format(job_index, cost_code_index), 'name': 'Cost Code {}'.format(cost_code_index), 'code': str(cost_code_index)}
+
+
+def get_cost_category(job_index: int, cost_code_index: int, cost_category_index: int) -> Dict:
+    return {
+        'id': 'cost-category-{}-{}-{}'.format(job_index, cost_code_index, cost_category_index),
+        'name': 'Cost Category {}'.format(cost_category_index),
+        'code': str(cost_category_index)
+    }
+
+
+def get_project_name(job_index: int) -> str:
+    job = get_job(job_index)
+    return '{}: {}'.format(job['code'], job['name'])
+
+
+def get_employee_email(employee_index: int) -> str:
+    return 'employee{}@fyle.in'.format(employee_index)
+
+
+def get_claim_number(report_index: int) -> str:
+    return 'C/2024/01/R/{}'.format(report_index)
+
+
+def create_workspace(workspace_id: int, size: WorkspaceSize) -> Workspace:
+    """
+    Create a workspace with settings, credentials, mappings, dimensions and cost categories
+    :param workspace_id: workspace id
+    :param size: WorkspaceSize
+    :return: workspace
+    """
+    workspace = Workspace.objects.create(
+        id=workspace_id,
+        name='Benchmark Workspace {}'.format(workspace_id),
+        org_id='orbenchmark{}'.format(workspace_id),
+        onboarding_state='COMPLETE'
+    )
+
+    FyleCredential.objects.create(workspace=workspace, refresh_token='dummy_refresh_token', cluster_domain='https://dummy_cluster_domain.com')
+    Sage300Credential.objects.create(
+        workspace=workspace,
+        identifier='identifier',
+        username='username',
+        password='password',
+        api_key='apikey',
+        api_secret='apisecret'
+    )
+
+    ExportSetting.objects.bulk_create([ExportSetting(
+        workspace=workspace,
+        reimbursable_expenses_export_type='PURCHASE_INVOICE',
+        reimbursable_expense_state='PAYMENT_PROCESSING',
+        reimbursable_expense_date='SPENT_AT',
+        reimbursable_expense_grouped_by='REPORT',
+        credit_card_expense_export_type='DIRECT_COST',
+        credit_card_expense_state='PAYMENT_PROCESSING',
+        credit_card_expense_date='SPENT_AT',
+        credit_card_expense_grouped_by='EXPENSE',
+        default_ccc_credit_card_account_name='Visa',
+        default_ccc_credit_card_account_id='12',
+        default_vendor_id='1'
+    )])
+    ImportSetting.objects.bulk_create([ImportSetting(
+        workspace=workspace,
+        import_categories=False,
+        import_vendors_as_merchants=False,
+        import_code_fields=['JOB', 'COST_CODE', 'COST_CATEGORY']
+    )])
+    AdvancedSetting.objects.bulk_create([AdvancedSetting(
+        workspace=workspace,
+        expense_memo_structure=['employee_email', 'category', 'spent_on', 'report_number', 'expense_link']
+    )])
+    DependentFieldSetting.objects.bulk_create([DependentFieldSetting(
+        workspace=workspace,
+        is_import_enabled=True,
+        project_field_id=1,
+        cost_code_field_name='Cost Code',
+        cost_code_field_id='1',
+        cost_category_field_name='Cost Category',
+        cost_category_field_id='2'
+    )])
+    MappingSetting.objects.bulk_create([MappingSetting(
+        workspace=workspace,
+        source_field='PROJECT',
+        destination_field='JOB',
+        import_to_fyle=True,
+        is_custom=False
+    )])
+    AccountingExportSummary.objects.create(workspace=workspace, total_accounting_export_count=0, successful_accounting_export_count=0, failed_accounting_export_count=0)
+    Version.objects.create(workspace=workspace, cost_category=size.cost_categories)
+
+    _create_employee_mappings(workspace, size)
+    _create_category_mappings(workspace, size)
+    _create_job_mappings(workspace, size)
+    _create_cost_categories(workspace, size)
+
+    return workspace
+
+
+def _create_employee_mappings(workspace: Workspace, size: WorkspaceSize) -> None:
+    employees = ExpenseAttribute.objects.bulk_create([
+        ExpenseAttribute(
+            workspace=workspace, attribute_type='EMPLOYEE', display_name='Employee',
+            value=get_employee_email(index), source_id='ou{}'.format(index), active=True
+        ) for index in range(size.employees)
+    ], batch_size=BATCH_SIZE)
+    vendors = DestinationAttribute.objects.bulk_create([
+        DestinationAttribute(
+            workspace=workspace, attribute_type='VENDOR', display_name='Vendor',
+            value='Vendor {}'.format(index), destination_id='vendor-{}'.format(index), active=True
+        ) for index in range(size.employees)
+    ], batch_size=BATCH_SIZE)
+    EmployeeMapping.objects.bulk_create([
+        EmployeeMapping(workspace=workspace, source_employee=employee, destination_vendor=vendor)
+        for employee, vendor in zip(employees, vendors)
+    ], batch_size=BATCH_SIZE)
+
+
+def _create_category_mappings(workspace: Workspace, size: WorkspaceSize) -> None:
+    categories = ExpenseAttribute.objects.bulk_create([
+        ExpenseAttribute(
+            workspace=workspace, attribute_type='CATEGORY', display_name='Category',
+            value='Category {}'.format(index), source_id='category-{}'.format(index), active=True
+        ) for index in range(size.categories)
+    ], batch_size=BATCH_SIZE)
+    accounts = DestinationAttribute.objects.bulk_create([
+        DestinationAttribute(
+            workspace=workspace, attribute_type='ACCOUNT', display_name='Account',
+            value='Account {}'.format(index), destination_id='account-{}'.format(index), active=True
+        ) for index in range(size.categories)
+    ], batch_size=BATCH_SIZE)
+    CategoryMapping.objects.bulk_create([
+        CategoryMapping(workspace=workspace, source_category=category, destination_account=account)
+        for category, account in zip(categories, accounts)
+    ], batch_size=BATCH_SIZE)
+
+
+def _create_job_mappings(workspace: Workspace, size: WorkspaceSize) -> None:
+    projects = ExpenseAttribute.objects.bulk_create([
+        ExpenseAttribute(
+            workspace=workspace, attribute_type='PROJECT', display_name='Project',
+            value=get_project_name(index), source_id='project-{}'.format(index), active=True
+        ) for index in range(size.jobs)
+    ], batch_size=BATCH_SIZE)
+    jobs = DestinationAttribute.objects.bulk_create([
+        DestinationAttribute(
+            workspace=workspace, attribute_type='JOB', display_name='Job', value=get_job(index)['name'],
+            destination_id=get_job(index)['id'], code=get_job(index)['code'], active=True
+        ) for index in range(size.jobs)
+    ], batch_size=BATCH_SIZE)
+    Mapping.objects.bulk_create([
+        Mapping(workspace=workspace, source_type='PROJECT', destination_type='JOB', source=project, destination=job)
+        for project, job in zip(projects, jobs)
+    ], batch_size=BATCH_SIZE)
+
+    DestinationAttribute.objects.bulk_create([
+        DestinationAttribute(
+            workspace=workspace, attribute_type='COST_CODE', display_name='Cost Code',
+            value=get_cost_code(job_index, cost_code_index)['name'], destination_id=get_cost_code(job_index, cost_code_index)['id'],
+            code=get_cost_code(job_index, cost_code_index)['code'], active=True, detail={'job_id': get_job(job_index)['id']}
+        ) for job_index in range(size.jobs) for cost_code_index in range(size.cost_codes_per_job)
+    ], batch_size=BATCH_SIZE)
+
+
+def _create_cost_categories(workspace: Workspace, size: WorkspaceSize) -> None:
+    cost_categories = []
+    for job_index in range(size.jobs):
+        job = get_job(job_index)
+        for cost_code_index in range(size.cost_codes_per_job):
+            cost_code = get_cost_code(job_index, cost_code_index)
+            for cost_category_index in range(size.cost_categories_per_cost_code):
+                cost_category = get_cost_category(job_index, cost_code_index, cost_category_index)
+                cost_categories.append(CostCategory(
+                    workspace=workspace,
+                    job_id=job['id'],
+                    job_name=job['name'],
+                    job_code=job['code'],
+                    cost_code_id=cost_code['id'],
+                    cost_code_name=cost_code['name'],
+                    cost_code_code=cost_code['code'],
+                    cost_category_id=cost_category['id'],
+                    name=cost_category['name'],
+                    cost_category_code=cost_category['code'],
+                    status=True,
+                    is_imported=False
+                ))
+
+    CostCategory.objects.bulk_create(cost_categories, batch_size=BATCH_SIZE)
+
+
+def create_expense_filters(workspace: Workspace) -> None:
+    """
+    Skip the expenses of the first employee or of the first report
+    """
+    ExpenseFilter.objects.bulk_create([
+        ExpenseFilter(workspace=workspace, condition='employee_email', operator='in', values=[get_employee_email(0)], rank=1, join_by='OR'),
+        ExpenseFilter(workspace=workspace, condition='claim_number', operator='in', values=[get_claim_number(0)], rank=2)
+    ])
+
+
+def generate_expenses(workspace: Workspace, size: WorkspaceSize, fund_source: str = 'PERSONAL') -> List[Dict]:
+    """
+    Expenses in the format returned by the Fyle platform connector
+    :param workspace: workspace
+    :param size: WorkspaceSize
+    :param fund_source: PERSONAL or CCC
+    :return: list of expenses
+    """
+    source_account_type = {value: key for key, value in SOURCE_ACCOUNT_MAP.items()}[fund_source]
+    expenses = []
+
+    for index in range(size.expenses):
+        report_index = index % size.reports
+        employee_index = report_index % size.employees
+        job_index = index % size.jobs
+        cost_code_index = index % size.cost_codes_per_job
+        cost_category_index = index % size.cost_categories_per_cost_code
+        spent_at = (SPENT_AT + timedelta(days=index % 28)).isoformat()
+
+        expenses.append({
+            'id': 'txbench{}{}{}'.format(workspace.id, fund_source, index),
+            'employee_email': get_employee_email(employee_index),
+            'employee_name': 'Employee {}'.format(employee_index),
+            'category': 'Category {}'.format(index % size.categories),
+            'sub_category': None,
+            'project': get_project_name(job_index),
+            'project_id': job_index,
+            'expense_number': 'E/2024/01/T/{}'.format(index),
+            'org_id': workspace.org_id,
+            'claim_number': get_claim_number(report_index),
+            'report_title': 'Report {}'.format(report_index),
+            'payment_number': 'P/2024/01/R/{}'.format(report_index),
+            'amount': 10 + index % 500,
+            'tax_amount': 0,
+            'tax_group_id': None,
+            'settled_at': spent_at,
+            'currency': 'USD',
+            'foreign_amount': None,
+            'foreign_currency': None,
+            'reimbursable': fund_source == 'PERSONAL',
+            'billable': False,
+            'state': 'PAYMENT_PROCESSING',
+            'vendor': 'Merchant {}'.format(index % 50),
+            'cost_center': None,
+            'corporate_card_id': None,
+            'purpose': 'Benchmark expense {}'.format(index),
+            'report_id': 'rpbench{}{}{}'.format(workspace.id, fund_source, report_index),
+            'file_ids': [],
+            'spent_at': spent_at,
+            'approved_at': spent_at,
+            'posted_at': spent_at,
+            'is_posted_at_null': False,
+            'expense_created_at': spent_at,
+            'expense_updated_at': spent_at,
+            'source_account_type': source_account_type,
+            'verified_at': None,
+            'custom_properties': {
+                'Cost Code': '{}: {}'.format(cost_code_index, get_cost_code(job_index, cost_code_index)['name']),
+                'Cost Category': '{}: {}'.format(cost_category_index, get_cost_category(job_index, cost_code_index, cost_category_index)['name'])
+            }
+        })
+
+    return expenses
+
+
+def create_expenses(workspace: Workspace, size: WorkspaceSize, fund_source: str = 'PERSONAL') -> List[Expense]:
+    """
+    Bulk insert generated expenses, a fast alternative to Expense.create_expense_objects for setup
+    """
+    model_fields = {field.name for field in Expense._meta.get_fields()}
+    expenses = []
+
+    for expense in generate_expenses(workspace, size, fund_source):
+        values = {key: value for key, value in expense.items() if key in model_fields and key not in ('id', 'workspace')}
+        values['fund_source'] = SOURCE_ACCOUNT_MAP[expense['source_account_type']]
+        expenses.append(Expense(workspace=workspace, expense_id=expense['id'], **values))
+
+    return Expense.objects.bulk_create(expenses, batch_size=BATCH_SIZE)
+
+
+def create_accounting_exports(workspace_id: int, expense_count: int, report_count: int = 1, fund_source: str = 'PERSONAL') -> List[AccountingExport]:
+    """
+    Workspace with expense_count fully mapped expenses grouped into report_count accounting exports
+    """
+    size = WorkspaceSize(
+        expenses=expense_count, reports=report_count, employees=1, categories=expense_count,
+        jobs=1, cost_codes_per_job=1, cost_categories_per_cost_code=1
+    )
+    workspace = create_workspace(workspace_id, size)
+    expenses = create_expenses(workspace, size, fund_source)
+    AccountingExport.create_accounting_export(expenses, fund_source=fund_source, workspace_id=workspace_id)
+
+    return list(AccountingExport.objects.filter(workspace_id=workspace_id).order_by('id'))
+
+
+def generate_hh2_categories(size: WorkspaceSize, changed_every: int = 10) -> List[List[Dict]]:
+    """
+    Pages of job categories as returned by hh2 for sync_cost_categories,
+    every changed_every-th existing category is renamed and one new category is added per cost code
+    """
+    categories = []
+    version = size.cost_categories
+    existing_count = 0
+
+    for job_index in range(size.jobs):
+        for cost_code_index in range(size.cost_codes_per_job):
+            for cost_category_index in range(size.cost_categories_per_cost_code + 1):
+                cost_category = get_cost_category(job_index, cost_code_index, cost_category_index)
+                is_new = cost_category_index == size.cost_categories_per_cost_code
+                if not is_new:
+                    existing_count += 1
+                    if (existing_count - 1) % changed_every:
+                        continue
+
+                version += 1
+                categories.append({
+                    'Id': cost_category['id'],
+                    'Code': cost_category['code'],
+                    'Name': cost_category['name'] if is_new else '{} Renamed'.format(cost_category['name']),
+                    'JobId': get_job(job_index)['id'],
+                    'CostCodeId': get_cost_code(job_index, cost_code_index)['id'],
+                    'IsActive': True,
+                    'Version': version
+                })
+
+    page_size = 500
+    return [categories[index:index + page_size] for index in range(0, len(categories), page_size)]
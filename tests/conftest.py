@@ -5,6 +5,7 @@ from datetime import datetime, timezone
 from unittest import mock
 
 import pytest
+from django.core.cache import cache
 from django.db.models.signals import post_save, pre_save
 from fyle.platform.platform import Platform
 from fyle_accounting_mappings.models import (
@@ -20,7 +21,7 @@ from fyle_rest_auth.models import AuthToken, User
 from rest_framework.test import APIClient
 
 from apps.accounting_exports.models import AccountingExport, AccountingExportSummary, Error
-from apps.fyle.helpers import get_access_token
+from apps.fyle.helpers import clear_fyle_connection_caches, get_access_token
 from apps.fyle.models import DependentFieldSetting, Expense, ExpenseFilter
 from apps.sage300.exports.direct_cost.models import DirectCost
 from apps.sage300.exports.purchase_invoice.models import PurchaseInvoice, PurchaseInvoiceLineitems
@@ -36,6 +37,7 @@ from apps.workspaces.models import (
 )
 from apps.workspaces.signals import run_post_save_export_settings_triggers, run_pre_save_export_settings_triggers
 from sage_desktop_api.tests import settings
+from tests.benchmarks.generator import create_accounting_exports
 from tests.test_fyle.fixtures import fixtures as fyle_fixtures
 
 
@@ -999,6 +1001,16 @@ def add_fyle_sync_timestamp():
         FyleSyncTimestamp.objects.create(workspace_id=workspace_id)
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """
+    Clear the cache so publish dedupe keys, cached flags and fyle tokens don't leak between tests
+    """
+    cache.clear()
+    clear_fyle_connection_caches()
+    yield
+
+
 @pytest.fixture(autouse=True)
 def mock_rabbitmq():
     """
@@ -1012,6 +1024,15 @@ def mock_rabbitmq():
         yield mock_rabbitmq
 
 
+@pytest.fixture(autouse=True)
+def mock_close_old_connections():
+    """
+    Workers drop old connections around every message, that would close the connection holding the test transaction
+    """
+    with mock.patch('workers.concurrency.close_old_connections') as mock_close_old_connections:
+        yield mock_close_old_connections
+
+
 @pytest.fixture()
 def add_category_expense_attribute(create_temp_workspace):
     """
@@ -1149,3 +1170,25 @@ def add_expense_report_data(db, create_temp_workspace):
         'expenses': [expense1, expense2],
         'accounting_export': accounting_export
     }
+
+
+@pytest.fixture
+def create_sized_accounting_exports(db):
+    """
+    Creates fully mapped accounting exports in workspace 300 + size for query budget tests,
+    queued exports are waiting on a Sage 300 operation status poll
+    """
+    def create(size, expense_count=None, report_count=1, queued=False):
+        workspace_id = 300 + size
+        accounting_exports = create_accounting_exports(
+            workspace_id=workspace_id, expense_count=expense_count or size, report_count=report_count
+        )
+
+        if queued:
+            AccountingExport.objects.filter(workspace_id=workspace_id).update(
+                status='EXPORT_QUEUED', export_id='document_id', detail={'export_id': 'export_id'}
+            )
+
+        return accounting_exports
+
+    return create
@@ -0,0 +1,138 @@
+"""
+Query budgets for hot paths
+
+A budget allows `fixed + per_item * size` queries, where size is the number of items
+the code path works on (expenses of an export, queued exports, ...). The path is run
+at two sizes so the per item cost is measured on its own, a new query inside a loop
+fails the budget even when the fixed part has room to spare.
+
+Transaction control statements (savepoints) are not counted.
+"""
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Tuple
+
+import pytest
+from django.db import connection
+
+
+@dataclass(frozen=True)
+class QueryBudget:
+    fixed: int
+    per_item: int
+
+    def allowed(self, size: int) -> int:
+        return self.fixed + self.per_item * size
+
+
+QUERY_BUDGETS: Dict[str, QueryBudget] = {
+    # Category attribute and mapping per expense, employee attribute and mapping per export
+    'validate_accounting_export': QueryBudget(fixed=4, per_item=2),
+    # Expenses, category / employee attributes and mappings of the whole batch
+    'validate_accounting_exports_in_bulk': QueryBudget(fixed=5, per_item=0),
+    # Validation, purchase invoice, settings and post once per export, then per expense the category check,
+    # category / job mappings with their destinations, standard mapping settings, credentials, cost code,
+    # cost category, commitment item and the line item update_or_create
+    'ExportPurchaseInvoice.create_sage300_object': QueryBudget(fixed=25, per_item=13),
+    # update_or_create, imported_from and accounting export check per expense
+    'Expense.create_expense_objects': QueryBudget(fixed=1, per_item=4),
+    # Locking, prefetched errors, batch validation, one status update and one queued export registry write for the whole run
+    'check_accounting_export_and_start_import': QueryBudget(fixed=15, per_item=0),
+    # Save, summary counter update and error resolution per completed export
+    'trigger_poll_operation_status': QueryBudget(fixed=3, per_item=3),
+    # Due queued exports and credentials of every workspace, one next poll update per poll interval,
+    # then save, summary counter update and error resolution per completed export
+    'poll_queued_accounting_exports': QueryBudget(fixed=3, per_item=3),
+}
+
+TRANSACTION_STATEMENT = re.compile(r'^\s*(SAVEPOINT|RELEASE SAVEPOINT|ROLLBACK TO SAVEPOINT)\b', re.IGNORECASE)
+PLACEHOLDER_LIST = re.compile(r'%s(\s*,\s*%s)+')
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r'\b\d+\b')
+
+
+def get_fingerprint(sql: str) -> str:
+    """
+    SQL with parameters, literals and IN lists collapsed so repeated queries compare equal
+    """
+    fingerprint = PLACEHOLDER_LIST.sub('%s, ...', sql)
+    fingerprint = STRING_LITERAL.sub('?', fingerprint)
+    fingerprint = NUMBER_LITERAL.sub('?', fingerprint)
+    return ' '.join(fingerprint.split())
+
+
+class QueryRecorder:
+    """
+    Fingerprints of the queries run inside the context
+    """
+    def __init__(self):
+        self.fingerprints: Counter = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        if not TRANSACTION_STATEMENT.match(sql):
+            self.fingerprints[get_fingerprint(sql)] += 1
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._wrapper = connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *args):
+        return self._wrapper.__exit__(*args)
+
+    @property
+    def count(self) -> int:
+        return sum(self.fingerprints.values())
+
+
+def format_fingerprint_diff(small: QueryRecorder, large: QueryRecorder, size_difference: int) -> List[str]:
+    """
+    Fingerprints ordered by how much they grow with the size, then by count
+    """
+    lines = []
+    fingerprints = set(small.fingerprints) | set(large.fingerprints)
+    rows = sorted(
+        ((large.fingerprints[fingerprint] - small.fingerprints[fingerprint], large.fingerprints[fingerprint], fingerprint) for fingerprint in fingerprints),
+        reverse=True
+    )
+
+    for growth, count, fingerprint in rows:
+        per_item = '+{:g}/item'.format(growth / size_difference) if growth else 'fixed'
+        lines.append('  {:>4} x {:<10} {}'.format(count, per_item, fingerprint))
+
+    return lines
+
+
+def assert_query_budget(name: str, prepare: Callable[[int], Callable], sizes: Tuple[int, int] = (2, 4)) -> None:
+    """
+    Fail when a code path makes more queries than its budget
+    :param name: key in QUERY_BUDGETS
+    :param prepare: creates the data for a size and returns the call to measure, queries made while preparing are not counted
+    :param sizes: the two sizes the call is measured at
+    """
+    budget = QUERY_BUDGETS[name]
+    small_size, large_size = sizes
+
+    recorders = []
+    for size in sizes:
+        call = prepare(size)
+        with QueryRecorder() as recorder:
+            call()
+        recorders.append(recorder)
+
+    small, large = recorders
+    per_item = (large.count - small.count) / (large_size - small_size)
+    fixed = small.count - per_item * small_size
+
+    if per_item > budget.per_item or fixed > budget.fixed or large.count > budget.allowed(large_size):
+        message = [
+            '{} exceeded its query budget'.format(name),
+            '  budget: {} + {}/item, measured: {:g} + {:g}/item ({} queries for {} items)'.format(
+                budget.fixed, budget.per_item, fixed, per_item, large.count, large_size
+            ),
+            '  queries for {} items:'.format(large_size),
+        ]
+        message.extend(format_fingerprint_diff(small, large, large_size - small_size))
+        pytest.fail('\n'.join(message), pytrace=False)
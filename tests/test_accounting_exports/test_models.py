@@ -0,0 +1,86 @@
+from apps.accounting_exports.models import AccountingExport, AccountingExportSummary
+from apps.internal.tasks import reconcile_accounting_export_summaries
+
+
+def get_counts(workspace_id: int) -> tuple:
+    summary = AccountingExportSummary.objects.get(workspace_id=workspace_id)
+    return summary.failed_accounting_export_count, summary.successful_accounting_export_count, summary.total_accounting_export_count
+
+
+def test_summary_counters_on_status_transitions(
+    db,
+    create_temp_workspace,
+    add_accounting_export_summary,
+    add_accounting_export_expenses
+):
+    workspace_id = 1
+    AccountingExportSummary.objects.filter(workspace_id=workspace_id).update(
+        failed_accounting_export_count=0, successful_accounting_export_count=0, total_accounting_export_count=0
+    )
+    accounting_export = AccountingExport.objects.get(workspace_id=workspace_id, type='PURCHASE_INVOICE')
+
+    accounting_export.status = 'FAILED'
+    accounting_export.save()
+    assert get_counts(workspace_id) == (1, 0, 1)
+
+    accounting_export.status = 'FATAL'
+    accounting_export.save()
+    assert get_counts(workspace_id) == (1, 0, 1)
+
+    accounting_export.status = 'ENQUEUED'
+    accounting_export.save()
+    accounting_export.status = 'COMPLETE'
+    accounting_export.save(update_fields=['status', 'updated_at'])
+    assert get_counts(workspace_id) == (0, 1, 1)
+
+    # Saves without a status change do not touch the summary
+    accounting_export.detail = {'export_id': '123'}
+    accounting_export.save()
+    assert get_counts(workspace_id) == (0, 1, 1)
+
+    fetching_export = AccountingExport.objects.get(workspace_id=workspace_id, type='FETCHING_REIMBURSABLE_EXPENSES')
+    fetching_export.status = 'FAILED'
+    fetching_export.save()
+    assert get_counts(workspace_id) == (0, 1, 1)
+
+    failed_export = AccountingExport.objects.get(workspace_id=workspace_id, type='DIRECT_COST')
+    failed_export.status = 'FAILED'
+    failed_export.save()
+    assert get_counts(workspace_id) == (1, 1, 2)
+
+    AccountingExport.objects.get(id=failed_export.id).delete()
+    assert get_counts(workspace_id) == (0, 1, 1)
+
+
+def test_summary_update_counters(
+    db,
+    create_temp_workspace,
+    add_accounting_export_summary
+):
+    AccountingExportSummary.update_counters([
+        (1, 'PURCHASE_INVOICE', 'EXPORT_READY', 'FAILED'),
+        (1, 'DIRECT_COST', 'FAILED', 'ENQUEUED'),
+        (1, 'DIRECT_COST', 'EXPORT_QUEUED', 'COMPLETE'),
+        (2, 'PURCHASE_INVOICE', None, 'FATAL'),
+        (3, 'FETCHING_CREDIT_CARD_EXPENSES', 'IN_PROGRESS', 'FAILED'),
+    ])
+
+    assert get_counts(1) == (5, 6, 11)
+    assert get_counts(2) == (6, 5, 11)
+    assert get_counts(3) == (5, 5, 10)
+
+
+def test_reconcile_accounting_export_summaries(
+    db,
+    create_temp_workspace,
+    add_accounting_export_summary,
+    add_accounting_export_expenses
+):
+    workspace_id = 1
+    AccountingExportSummary.objects.filter(workspace_id=workspace_id).update(last_exported_at=None)
+    AccountingExport.objects.filter(workspace_id=workspace_id, type='PURCHASE_INVOICE').update(status='FAILED')
+    AccountingExport.objects.filter(workspace_id=workspace_id, type='DIRECT_COST').update(status='COMPLETE')
+
+    reconcile_accounting_export_summaries()
+
+    assert get_counts(workspace_id) == (1, 1, 2)
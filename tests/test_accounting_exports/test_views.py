@@ -1,5 +1,9 @@
 import json
+from datetime import datetime, timezone
+
 from django.urls import reverse
+
+from apps.accounting_exports.models import ArchivedAccountingExport
 from tests.helper import dict_compare_keys
 from tests.test_fyle.fixtures import fixtures as data
 
@@ -27,6 +31,31 @@ def test_get_accounting_exports(api_client, test_connection, create_temp_workspa
     assert response['count'] == 2, 'accounting export count api return diffs in keys'
 
 
+def test_get_archived_accounting_exports(api_client, test_connection, create_temp_workspace, add_fyle_credentials):
+    """
+    Test get archived accounting exports
+    """
+    ArchivedAccountingExport.objects.create(
+        id=100, workspace_id=1, type='PURCHASE_INVOICE', fund_source='PERSONAL', status='COMPLETE',
+        expense_ids=['tx4ziVSAyIsv'], expense_search_text='E/2021/12/T/3 Jhon Snow jhonsnow@fyle.in C/2021/12/R/2',
+        data={'id': 100, 'status': 'COMPLETE', 'expenses': [{'expense_id': 'tx4ziVSAyIsv'}]},
+        created_at=datetime.now(tz=timezone.utc), updated_at=datetime.now(tz=timezone.utc)
+    )
+    api_client.credentials(HTTP_AUTHORIZATION='Bearer {}'.format(test_connection.access_token))
+
+    url = reverse('accounting-exports', kwargs={'workspace_id': 1})
+    response = api_client.get(url, {'archived': 'true', 'status__in': 'COMPLETE', 'expenses__employee_name': 'jhon'})
+    assert response.status_code == 200
+    assert json.loads(response.content)['results'] == [{'id': 100, 'status': 'COMPLETE', 'expenses': [{'expense_id': 'tx4ziVSAyIsv'}]}]
+
+    response = api_client.get(url, {'archived': 'true', 'expenses__expense_number': 'E/2022'})
+    assert json.loads(response.content)['results'] == []
+
+    url = reverse('accounting-exports-count', kwargs={'workspace_id': 1})
+    response = api_client.get(url, {'archived': 'true', 'status__in': 'COMPLETE'})
+    assert json.loads(response.content)['count'] == 1
+
+
 def test_get_accounting_export_summary(api_client, test_connection, create_temp_workspace, add_fyle_credentials, add_accounting_export_summary):
     url = reverse('accounting-exports-summary', kwargs={'workspace_id': 1})
 
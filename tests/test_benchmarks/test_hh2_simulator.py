@@ -0,0 +1,62 @@
+import urllib.error
+import urllib.request
+
+import pytest
+
+from benchmarks.hh2_simulator import DEFAULT_SIZES, Latency, SimulatorConfig, start_simulator
+from sage_desktop_sdk.exceptions import InvalidUserCredentials, SageDesktopSDKError
+from sage_desktop_sdk.sage_desktop_sdk import SageDesktopSDK
+
+
+@pytest.fixture
+def simulator():
+    sizes = dict(DEFAULT_SIZES, jobs=25, vendors=1200, categories=40)
+    server, simulator, identifier = start_simulator(SimulatorConfig(sizes=sizes, page_size=10))
+    yield simulator, identifier
+    server.shutdown()
+    server.server_close()
+
+
+def get_sdk(identifier: str, password: str = 'password') -> SageDesktopSDK:
+    return SageDesktopSDK(api_key='key', api_secret='secret', user_name='user', password=password, identifier=identifier)
+
+
+def test_simulator_pagination_and_versions(simulator):
+    simulator, identifier = simulator
+    sage_desktop_sdk = get_sdk(identifier)
+
+    pages = list(next(sage_desktop_sdk.jobs.get_all_jobs()))
+    assert [len(page) for page in pages] == [10, 10, 5]
+    assert pages[0][0]['Id'] == 'jobs-0'
+    assert simulator.request_counts['jobs'] == 4
+
+    latest_version = max(job['Version'] for page in pages for job in page)
+    assert list(next(sage_desktop_sdk.jobs.get_all_jobs(version=latest_version))) == []
+
+    simulator.touch('jobs', 3)
+    changed_jobs = [job for page in next(sage_desktop_sdk.jobs.get_all_jobs(version=latest_version)) for job in page]
+    assert len(changed_jobs) == 3
+    assert all(job['Version'] > latest_version for job in changed_jobs)
+
+    vendor_batches = list(next(sage_desktop_sdk.vendors.get_all()))
+    assert [len(batch) for batch in vendor_batches] == [1000, 200]
+
+    categories = [category for page in next(sage_desktop_sdk.categories.get_all_categories()) for category in page]
+    assert categories[30]['JobId'] == 'jobs-5'
+
+
+def test_simulator_sessions_and_errors(simulator):
+    simulator, identifier = simulator
+
+    with pytest.raises(SageDesktopSDKError) as error:
+        get_sdk(identifier, password='wrong')
+    assert isinstance(error.value.__context__, InvalidUserCredentials)
+
+    with pytest.raises(urllib.error.HTTPError) as error:
+        urllib.request.urlopen('{}/JobCosting/Api/V1/JobCost.svc/jobs?page=0'.format(identifier))
+    assert error.value.code == 401
+
+    simulator.config.error_rates['accounts'] = 1
+    simulator.config.latencies['accounts'] = Latency(median=0.001, p99=0.01)
+    with pytest.raises(SageDesktopSDKError):
+        list(next(get_sdk(identifier).accounts.get_all()))
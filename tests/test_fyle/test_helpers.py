@@ -1,15 +1,22 @@
+import threading
+import time
 from datetime import datetime, timedelta, timezone
 
 import pytest
+from django.core.cache import cache
 from requests import Response
 from rest_framework.exceptions import ValidationError
 
 from apps.fyle.helpers import (
+    ExpiringLRUCache,
     Q,
     assert_valid_request,
     check_interval_and_sync_dimension,
     construct_expense_filter,
     construct_expense_filter_query,
+    get_access_token,
+    get_access_token_cache_key,
+    get_platform_connector,
     get_request,
     patch_request,
     post_request,
@@ -222,6 +229,117 @@ def test_patch_request(mocker):
         assert str(e) == '{"error": "Internal Server Error"}'
 
 
+def test_get_access_token_is_cached(mocker):
+    mock_post_request = mocker.patch(
+        'apps.fyle.helpers.post_request',
+        return_value={'access_token': 'access_token_1', 'expires_in': 3600}
+    )
+
+    assert get_access_token('refresh_token_1') == 'access_token_1'
+    assert get_access_token('refresh_token_1') == 'access_token_1'
+    assert mock_post_request.call_count == 1
+
+    mock_post_request.return_value = {'access_token': 'access_token_2', 'expires_in': 3600}
+    assert get_access_token('refresh_token_2') == 'access_token_2'
+    assert mock_post_request.call_count == 2
+
+    # Tokens about to expire are refreshed
+    mock_post_request.return_value = {'access_token': 'access_token_3', 'expires_in': 10}
+    assert get_access_token('refresh_token_3') == 'access_token_3'
+    assert get_access_token('refresh_token_3') == 'access_token_3'
+    assert mock_post_request.call_count == 3
+
+    mocker.patch('apps.fyle.helpers.time.time', return_value=9999999999)
+    mock_post_request.return_value = {'access_token': 'access_token_4', 'expires_in': 3600}
+    assert get_access_token('refresh_token_3') == 'access_token_4'
+    assert mock_post_request.call_count == 4
+
+
+def test_get_access_token_is_not_shared(mocker):
+    mocker.patch('apps.fyle.helpers.post_request', return_value={'access_token': 'access_token_1', 'expires_in': 3600})
+
+    get_access_token('refresh_token_1')
+
+    # Bearer tokens stay in process memory
+    assert cache.get(get_access_token_cache_key('refresh_token_1')) is None
+
+
+def test_expiring_lru_cache():
+    lru_cache = ExpiringLRUCache(max_size=2)
+    now = time.time()
+
+    lru_cache.set('expired', 1, now - 1)
+    lru_cache.set('a', 2, now + 60)
+    assert lru_cache.get('expired') is None
+
+    lru_cache.set('expired', 1, now - 1)
+    lru_cache.get('a')
+    lru_cache.set('b', 3, now + 60)
+    lru_cache.set('c', 4, now + 60)
+
+    # Expired entries go first, then the least recently used
+    assert lru_cache.get('expired') is None
+    assert lru_cache.get('a') is None
+    assert (lru_cache.get('b'), lru_cache.get('c')) == (3, 4)
+
+
+def test_get_request_retries_on_unauthorized(mocker):
+    unauthorized_response = Response()
+    unauthorized_response.status_code = 401
+    unauthorized_response._content = b'{"error": "Unauthorized"}'
+
+    success_response = Response()
+    success_response.status_code = 200
+    success_response._content = b'{"data": "1234"}'
+
+    mock_get = mocker.patch(
+        'apps.fyle.helpers.requests.get',
+        side_effect=[unauthorized_response, success_response]
+    )
+    mock_post_request = mocker.patch(
+        'apps.fyle.helpers.post_request',
+        side_effect=[{'access_token': 'expired_token'}, {'access_token': 'new_token'}]
+    )
+
+    response = get_request(url='https://api.fyle.tech/api/v7/cluster/', params={}, refresh_token='refresh_token')
+
+    assert response.get('data') == '1234'
+    assert mock_post_request.call_count == 2
+    assert mock_get.call_args_list[0].kwargs['headers']['Authorization'] == 'Bearer expired_token'
+    assert mock_get.call_args_list[1].kwargs['headers']['Authorization'] == 'Bearer new_token'
+    assert get_access_token('refresh_token') == 'new_token'
+
+
+def test_get_platform_connector(mocker):
+    mock_platform_connector = mocker.patch('apps.fyle.helpers.PlatformConnector')
+
+    fyle_credentials = mocker.MagicMock()
+    fyle_credentials.workspace_id = 1
+    fyle_credentials.cluster_domain = 'https://fyle.tech'
+    fyle_credentials.refresh_token = 'refresh_token'
+
+    platform = get_platform_connector(fyle_credentials)
+
+    assert get_platform_connector(fyle_credentials) == platform
+    assert mock_platform_connector.call_count == 1
+
+    fyle_credentials.refresh_token = 'new_refresh_token'
+    get_platform_connector(fyle_credentials)
+    assert mock_platform_connector.call_count == 2
+
+    # Threads of a worker pool get their own connector
+    thread = threading.Thread(target=get_platform_connector, args=(fyle_credentials,))
+    thread.start()
+    thread.join()
+    assert mock_platform_connector.call_count == 3
+
+    # Greenlets of a gevent web worker share the connector of their native thread
+    mocker.patch('apps.fyle.helpers.threading.get_ident', side_effect=[101, 102])
+    get_platform_connector(fyle_credentials)
+    get_platform_connector(fyle_credentials)
+    assert mock_platform_connector.call_count == 3
+
+
 def test_construct_expense_filter_query(
     db,
     mocker
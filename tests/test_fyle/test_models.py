@@ -0,0 +1,17 @@
+from fyle_accounting_library.fyle_platform.enums import ExpenseImportSourceEnum
+
+from apps.fyle.models import Expense
+from tests.benchmarks.generator import WorkspaceSize, create_workspace, generate_expenses
+from tests.query_budget import assert_query_budget
+
+
+def test_create_expense_objects_query_budget(db):
+    def prepare(size):
+        workspace_size = WorkspaceSize(
+            expenses=size, reports=1, employees=1, categories=1, jobs=1, cost_codes_per_job=1, cost_categories_per_cost_code=1
+        )
+        workspace = create_workspace(300 + size, workspace_size)
+        expenses = generate_expenses(workspace, workspace_size)
+        return lambda: Expense.create_expense_objects(expenses, workspace.id, imported_from=ExpenseImportSourceEnum.DASHBOARD_SYNC)
+
+    assert_query_budget('Expense.create_expense_objects', prepare)
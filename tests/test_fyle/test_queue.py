@@ -2,6 +2,7 @@ from unittest import mock
 import pytest
 
 from apps.fyle.queue import async_handle_webhook_callback, queue_import_reimbursable_expenses, queue_import_credit_card_expenses
+from apps.fyle.models import PendingExpenseUpdate
 from apps.workspaces.models import Workspace
 from tests.test_fyle.fixtures import fixtures as fyle_fixtures
 from workers.helpers import RoutingKeyEnum, WorkerActionEnum
@@ -76,7 +77,9 @@ def test_async_handle_webhook_callback_updated_after_approval(db, create_temp_wo
     call_args = mock_publish_to_rabbitmq.call_args
     payload = call_args[1]['payload']
     assert payload['action'] == WorkerActionEnum.EXPENSE_UPDATED_AFTER_APPROVAL.value
+    assert payload['data'] == {'workspace_id': 1}
     assert call_args[1]['routing_key'] == RoutingKeyEnum.UTILITY.value
+    assert PendingExpenseUpdate.objects.filter(workspace_id=1, expense_id='txtest123').exists()
 
 
 def test_async_handle_webhook_callback_attribute_webhooks(db, create_temp_workspace, add_feature_config):
@@ -8,12 +8,14 @@ from rest_framework import status
 from rest_framework.exceptions import ValidationError
 
 from apps.accounting_exports.models import AccountingExport, AccountingExportSummary, Error
-from apps.fyle.models import Expense, ExpenseFilter
+from apps.fyle.models import Expense, ExpenseFilter, PendingExpenseUpdate
 from apps.fyle.tasks import (
     _delete_accounting_exports_for_report,
     _handle_expense_ejected_from_report,
+    apply_pending_expense_updates,
     cleanup_scheduled_task,
     delete_accounting_export_and_related_data,
+    handle_category_changes_for_accounting_exports,
     handle_category_changes_for_expense,
     handle_expense_fund_source_change,
     handle_expense_report_change,
@@ -252,7 +254,7 @@ def test_handle_expense_fund_source_change_no_changes(
     report_id = 'rpFundTest123'
 
     # Mock platform connector
-    mock_platform_connector = mocker.patch('apps.fyle.tasks.PlatformConnector')
+    mock_platform_connector = mocker.patch('apps.fyle.tasks.get_platform_connector')
     mock_platform_instance = mock_platform_connector.return_value
 
     fund_source_expenses = fyle_fixtures['fund_source_change_expenses']
@@ -284,7 +286,7 @@ def test_handle_expense_fund_source_change_with_changes(
     report_id = 'rpFundTest123'
 
     # Mock platform connector
-    mock_platform_connector = mocker.patch('apps.fyle.tasks.PlatformConnector')
+    mock_platform_connector = mocker.patch('apps.fyle.tasks.get_platform_connector')
     mock_platform_instance = mock_platform_connector.return_value
 
     # Create original expenses in DB
@@ -784,11 +786,11 @@ def test_update_non_exported_expenses_fund_source_change(
         'sub_category': updated_expense_data.get('sub_category')
     }]
 
-    # Mock Expense.create_expense_objects to simulate expense update
-    mock_create_expense = mocker.patch('apps.fyle.tasks.Expense.create_expense_objects')
+    # Mock Expense.update_expense_objects to simulate expense update
+    mock_create_expense = mocker.patch('apps.fyle.tasks.Expense.update_expense_objects')
 
     # Mock the expense update to actually update the fund_source in the database
-    def mock_update_expense(expense_objects, workspace_id, skip_update=False):
+    def mock_update_expense(expense_objects, workspace_id):
         # Update the expense in the database to simulate the fund source change
         expense_created.fund_source = updated_expense_data['fund_source']
         expense_created.save()
@@ -824,7 +826,7 @@ def test_import_expenses_fund_source_change_exception(
     report_id = 'rpTest123'
 
     # Mock platform connector
-    mock_platform_connector = mocker.patch('apps.fyle.tasks.PlatformConnector')
+    mock_platform_connector = mocker.patch('apps.fyle.tasks.get_platform_connector')
     mock_platform_instance = mock_platform_connector.return_value
     # Return some expenses so the fund source change logic gets executed
     mock_platform_instance.expenses.get.return_value = [{'id': 'tx123', 'report_id': report_id}]
@@ -882,7 +884,7 @@ def test_import_expenses_no_expenses_for_fund_source_check(
     report_id = 'rpTest123'
 
     # Mock platform connector
-    mock_platform_connector = mocker.patch('apps.fyle.tasks.PlatformConnector')
+    mock_platform_connector = mocker.patch('apps.fyle.tasks.get_platform_connector')
     mock_platform_instance = mock_platform_connector.return_value
     mock_platform_instance.expenses.get.return_value = []
 
@@ -1742,7 +1744,7 @@ def test_update_non_exported_expenses_with_category_change(
     )
     accounting_export.expenses.add(expense_created)
 
-    mock_handle_category_changes = mocker.patch('apps.fyle.tasks.handle_category_changes_for_expense')
+    mock_handle_category_changes = mocker.patch('apps.fyle.tasks.handle_category_changes_for_accounting_exports')
 
     updated_expense_data = data['updated_category_expense']
     mock_fyle_expenses = mocker.patch('apps.fyle.tasks.FyleExpenses.construct_expense_object')
@@ -1752,13 +1754,13 @@ def test_update_non_exported_expenses_with_category_change(
         'sub_category': updated_expense_data['sub_category']
     }]
 
-    mocker.patch('apps.fyle.tasks.Expense.create_expense_objects')
+    mocker.patch('apps.fyle.tasks.Expense.update_expense_objects')
 
     update_non_exported_expenses(updated_expense_data)
 
     mock_handle_category_changes.assert_called_once()
     call_kwargs = mock_handle_category_changes.call_args[1]
-    assert call_kwargs['new_category'] == 'New Category'
+    assert call_kwargs['category_changes'] == [(accounting_export.id, original_expense_data['category'], 'New Category')]
 
 
 def test_update_non_exported_expenses_no_category_change(
@@ -1803,7 +1805,7 @@ def test_update_non_exported_expenses_no_category_change(
     )
     accounting_export.expenses.add(expense_created)
 
-    mock_handle_category_changes = mocker.patch('apps.fyle.tasks.handle_category_changes_for_expense')
+    mock_handle_category_changes = mocker.patch('apps.fyle.tasks.handle_category_changes_for_accounting_exports')
 
     mock_fyle_expenses = mocker.patch('apps.fyle.tasks.FyleExpenses.construct_expense_object')
     mock_fyle_expenses.return_value = [{
@@ -1812,7 +1814,7 @@ def test_update_non_exported_expenses_no_category_change(
         'sub_category': original_expense_data['sub_category']
     }]
 
-    mocker.patch('apps.fyle.tasks.Expense.create_expense_objects')
+    mocker.patch('apps.fyle.tasks.Expense.update_expense_objects')
 
     update_non_exported_expenses(original_expense_data)
 
@@ -2053,3 +2055,62 @@ def test_import_credit_card_expenses(
         accounting_export=accounting_export.id,
         imported_from=ExpenseImportSourceEnum.DIRECT_EXPORT
     )
+
+
+def test_apply_pending_expense_updates(db, create_temp_workspace, mocker):
+    """
+    Test apply_pending_expense_updates applies the last update of every expense once
+    """
+    workspace_id = 1
+    original_expense_data = data['category_change_expense']
+    updated_expense_data = data['updated_category_expense']
+
+    PendingExpenseUpdate.add(workspace_id, original_expense_data)
+    PendingExpenseUpdate.add(workspace_id, updated_expense_data)
+    PendingExpenseUpdate.add(workspace_id, {'id': 'txAnother1', 'category': 'Travel'})
+
+    assert PendingExpenseUpdate.objects.filter(workspace_id=workspace_id).count() == 2
+
+    mocker.patch('apps.fyle.tasks.time.sleep')
+    mock_apply_expense_updates = mocker.patch('apps.fyle.tasks.apply_expense_updates')
+
+    apply_pending_expense_updates(workspace_id=workspace_id)
+
+    mock_apply_expense_updates.assert_called_once_with(workspace_id, [updated_expense_data, {'id': 'txAnother1', 'category': 'Travel'}])
+    assert not PendingExpenseUpdate.objects.filter(workspace_id=workspace_id).exists()
+
+    apply_pending_expense_updates(workspace_id=workspace_id)
+    assert mock_apply_expense_updates.call_count == 1
+
+
+def test_handle_category_changes_for_accounting_exports(
+    db,
+    create_temp_workspace,
+    add_export_settings,
+    add_category_expense_attribute
+):
+    """
+    Test handle_category_changes_for_accounting_exports creates one error for all accounting exports of an unmapped category
+    """
+    workspace_id = 1
+
+    accounting_exports = [
+        AccountingExport.objects.create(
+            workspace_id=workspace_id,
+            type='PURCHASE_INVOICE',
+            fund_source='PERSONAL',
+            status='EXPORT_READY',
+            description={'test': 'data'}
+        ) for _ in range(2)
+    ]
+
+    new_category_attribute = ExpenseAttribute.objects.filter(workspace_id=workspace_id, attribute_type='CATEGORY').first()
+
+    handle_category_changes_for_accounting_exports(
+        workspace_id=workspace_id,
+        category_changes=[(accounting_export.id, 'Old Category', new_category_attribute.value) for accounting_export in accounting_exports]
+    )
+
+    errors = Error.objects.filter(workspace_id=workspace_id, type='CATEGORY_MAPPING', expense_attribute=new_category_attribute)
+    assert errors.count() == 1
+    assert errors.first().mapping_error_accounting_export_ids == [accounting_export.id for accounting_export in accounting_exports]
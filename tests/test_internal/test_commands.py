@@ -0,0 +1,62 @@
+from io import StringIO
+
+from django.core.cache import cache
+from fyle_accounting_library.rabbitmq.models import FailedEvent
+
+from apps.internal.management.commands.capture_payload_logs import Command as CapturePayloadLogsCommand
+from apps.internal.management.commands.replay_failed_events import Command
+from sage_desktop_api.log_handlers import FULL_PAYLOAD_WORKSPACES_CACHE_KEY
+
+
+def _run_command(**options):
+    defaults = {
+        'routing_key': None,
+        'action': None,
+        'workspace_ids': None,
+        'since_hours': 24,
+        'limit': 1000,
+        'rate': 0,
+        'dry_run': False,
+    }
+    defaults.update(options)
+
+    command = Command(stdout=StringIO())
+    command.handle(**defaults)
+
+
+def test_replay_failed_events(db, mocker):
+    mock_publish = mocker.patch('apps.internal.management.commands.replay_failed_events.publish_to_rabbitmq')
+    payload = {'workspace_id': 1, 'action': 'EXPORT.P1.RUN_SYNC_SCHEDULE', 'data': {'workspace_id': 1}}
+
+    # Both attempts of the same message leave a row
+    FailedEvent.objects.create(routing_key='EXPORT.P1.*', payload={**payload, 'retry_count': 1}, error_traceback='error', workspace_id=1)
+    FailedEvent.objects.create(routing_key='EXPORT.P1.*', payload={**payload, 'retry_count': 2}, error_traceback='error', workspace_id=1)
+    FailedEvent.objects.create(
+        routing_key='IMPORT.*',
+        payload={'workspace_id': 2, 'action': 'IMPORT.IMPORT_DIMENSIONS_TO_FYLE', 'data': {'workspace_id': 2}, 'retry_count': 1},
+        error_traceback='error',
+        workspace_id=2
+    )
+
+    _run_command(workspace_ids=[1])
+
+    mock_publish.assert_called_once_with(payload=payload, routing_key='EXPORT.P1.*')
+
+    mock_publish.reset_mock()
+    _run_command(action='IMPORT.IMPORT_DIMENSIONS_TO_FYLE')
+    assert mock_publish.call_args[1]['routing_key'] == 'IMPORT.*'
+
+    mock_publish.reset_mock()
+    _run_command(dry_run=True)
+    mock_publish.assert_not_called()
+
+
+def test_capture_payload_logs():
+    CapturePayloadLogsCommand(stdout=StringIO()).handle(workspace_ids=[1, 2], minutes=15, stop=False)
+    assert set(cache.get(FULL_PAYLOAD_WORKSPACES_CACHE_KEY)) == {'1', '2'}
+
+    CapturePayloadLogsCommand(stdout=StringIO()).handle(workspace_ids=[1], minutes=15, stop=True)
+    assert set(cache.get(FULL_PAYLOAD_WORKSPACES_CACHE_KEY)) == {'2'}
+
+    CapturePayloadLogsCommand(stdout=StringIO()).handle(workspace_ids=[2], minutes=15, stop=True)
+    assert cache.get(FULL_PAYLOAD_WORKSPACES_CACHE_KEY) is None
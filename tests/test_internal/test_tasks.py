@@ -0,0 +1,79 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+from apps.accounting_exports.models import AccountingExport, ArchivedAccountingExport, Error, QueuedAccountingExport
+from apps.fyle.models import Expense
+from apps.internal.tasks import archive_accounting_exports, re_export_stuck_exports
+from apps.workspaces.models import Workspace
+from tests.test_fyle.fixtures import fixtures as fyle_fixtures
+
+
+def test_re_export_stuck_exports(db, create_temp_workspace, add_accounting_export_summary, mocker):
+    workspace_id = 1
+    Workspace.objects.filter(id=workspace_id).update(name='Acme Corp')
+
+    stuck_export, queued_export, lost_export = [
+        AccountingExport.objects.create(workspace_id=workspace_id, type='PURCHASE_INVOICE', fund_source='PERSONAL', status='ENQUEUED')
+        for _ in range(3)
+    ]
+    AccountingExport.objects.filter(workspace_id=workspace_id).update(updated_at=timezone.now() - timedelta(hours=2))
+
+    QueuedAccountingExport.register(workspace_id, [queued_export.id, lost_export.id])
+    QueuedAccountingExport.objects.filter(accounting_export_id=lost_export.id).update(updated_at=timezone.now() - timedelta(days=2))
+
+    mock_publish = mocker.patch('apps.internal.tasks.publish_to_rabbitmq')
+
+    re_export_stuck_exports()
+
+    for accounting_export in (stuck_export, queued_export, lost_export):
+        accounting_export.refresh_from_db()
+
+    assert stuck_export.status == 'FAILED'
+    assert stuck_export.re_attempt_export
+    assert lost_export.status == 'FAILED'
+    assert queued_export.status == 'ENQUEUED'
+    assert list(QueuedAccountingExport.objects.values_list('accounting_export_id', flat=True)) == [queued_export.id]
+    mock_publish.assert_called_once()
+    assert mock_publish.call_args[1]['payload']['workspace_id'] == workspace_id
+
+    QueuedAccountingExport.clear(queued_export.id)
+    assert not QueuedAccountingExport.objects.filter(accounting_export_id=queued_export.id).exists()
+
+
+def test_archive_accounting_exports(db, create_temp_workspace, add_accounting_export_summary):
+    workspace_id = 1
+    old_expense, recent_expense = Expense.create_expense_objects(fyle_fixtures['expenses'][:2], workspace_id)
+
+    old_export, recent_export, failed_export = [
+        AccountingExport.objects.create(workspace_id=workspace_id, type='PURCHASE_INVOICE', fund_source='PERSONAL', status=status)
+        for status in ('COMPLETE', 'COMPLETE', 'COMPLETE')
+    ]
+    old_export.expenses.add(old_expense)
+    recent_export.expenses.add(recent_expense)
+    Error.objects.create(
+        workspace_id=workspace_id, type='SAGE300_ERROR', accounting_export=old_export, is_resolved=True, error_title='Sage Error', error_detail='Sage Error'
+    )
+    Error.objects.create(
+        workspace_id=workspace_id, type='SAGE300_ERROR', accounting_export=failed_export, is_resolved=False, error_title='Sage Error', error_detail='Sage Error'
+    )
+    AccountingExport.objects.filter(id__in=[old_export.id, failed_export.id]).update(updated_at=timezone.now() - timedelta(days=200))
+    old_export.refresh_from_db()
+
+    archive_accounting_exports(days=180, batch_size=1)
+
+    # Exports with unresolved errors and recent exports stay
+    assert set(AccountingExport.objects.filter(workspace_id=workspace_id).values_list('id', flat=True)) == {recent_export.id, failed_export.id}
+    assert not Expense.objects.filter(id=old_expense.id).exists()
+    assert Expense.objects.filter(id=recent_expense.id).exists()
+    assert not Error.objects.filter(workspace_id=workspace_id, is_resolved=True).exists()
+
+    archived_export = ArchivedAccountingExport.objects.get(id=old_export.id)
+    assert archived_export.updated_at == old_export.updated_at
+    assert archived_export.expense_ids == [old_expense.expense_id]
+    assert archived_export.data['expenses'][0]['expense_number'] == old_expense.expense_number
+    assert archived_export.errors[0]['error_title'] == 'Sage Error'
+
+    assert ArchivedAccountingExport.get_archived_expense_ids(
+        workspace_id, [old_expense.expense_id, recent_expense.expense_id]
+    ) == {old_expense.expense_id}
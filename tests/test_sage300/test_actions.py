@@ -1,4 +1,6 @@
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 from apps.accounting_exports.models import AccountingExport, AccountingExportSummary
 from apps.sage300.actions import update_accounting_export_summary
@@ -66,3 +68,20 @@ def test_update_accounting_export_summary_not_found(
     """Test update_accounting_export_summary raises when summary doesn't exist"""
     with pytest.raises(AccountingExportSummary.DoesNotExist):
         update_accounting_export_summary(workspace_id=1)
+
+
+@pytest.mark.django_db
+def test_update_accounting_export_summary_locks_summary(
+    db,
+    create_temp_workspace,
+    add_accounting_export_expenses,
+    add_accounting_export_summary
+):
+    """Test the summary is locked while recounting and only the counts are written"""
+    with CaptureQueriesContext(connection) as queries:
+        update_accounting_export_summary(workspace_id=1)
+
+    statements = [query['sql'] for query in queries.captured_queries]
+    assert any('accounting_export_summary' in sql and 'FOR UPDATE' in sql for sql in statements)
+    summary_update = next(sql for sql in statements if sql.startswith('UPDATE'))
+    assert 'last_exported_at' not in summary_update
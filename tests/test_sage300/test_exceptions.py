@@ -2,7 +2,7 @@ from apps.accounting_exports.models import AccountingExport, Error
 from apps.sage300.exceptions import handle_sage300_error, handle_sage300_exceptions
 from apps.workspaces.models import FyleCredential, Sage300Credential
 from sage_desktop_api.exceptions import BulkError
-from sage_desktop_sdk.exceptions.hh2_exceptions import WrongParamsError
+from sage_desktop_sdk.exceptions.hh2_exceptions import CircuitOpenError, WrongParamsError
 
 
 def test_handle_sage300_error(
@@ -94,3 +94,25 @@ def test_handle_sage300_exceptions(
 
     accounting_export.refresh_from_db()
     assert accounting_export.status == 'FATAL'
+
+
+def test_handle_sage300_exceptions_circuit_open(
+    db,
+    create_temp_workspace,
+    add_export_settings,
+    add_accounting_export_expenses,
+    add_accounting_export_summary,
+    add_sage300_creds
+):
+    accounting_export = AccountingExport.objects.filter(workspace_id=1).first()
+
+    @handle_sage300_exceptions()
+    def test_func(accounting_export_id, is_last_export):
+        raise CircuitOpenError('Circuit open for identifier')
+
+    test_func(accounting_export.id, False)
+
+    accounting_export.refresh_from_db()
+    assert accounting_export.status == 'EXPORT_READY'
+    assert accounting_export.re_attempt_export is True
+    assert not Error.objects.filter(accounting_export=accounting_export).exists()
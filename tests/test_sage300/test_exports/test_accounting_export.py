@@ -1,6 +1,8 @@
 import pytest
 from apps.sage300.exports.accounting_export import AccountingDataExporter
 from apps.accounting_exports.models import AccountingExport
+from apps.sage300.exports.purchase_invoice.tasks import ExportPurchaseInvoice
+from tests.query_budget import assert_query_budget
 
 
 def test_accounting_data_exporter_1():
@@ -122,3 +124,15 @@ def test_accounting_data_exporter_4(
     assert mock_body_model.create_or_update_object.call_count == 0
     assert mock_lineitem_model.create_or_update_object.call_count == 0
     assert mock_post.call_count == 0
+
+
+def test_create_sage300_object_query_budget(db, mocker, create_sized_accounting_exports):
+    sage_desktop_sdk = mocker.patch('apps.sage300.utils.SageDesktopSDK')
+    sage_desktop_sdk.return_value.documents.post_document.return_value = 'document_id'
+    sage_desktop_sdk.return_value.documents.export_document.return_value = 'export_id'
+
+    def prepare(size):
+        accounting_export = create_sized_accounting_exports(size)[0]
+        return lambda: ExportPurchaseInvoice().create_sage300_object(accounting_export)
+
+    assert_query_budget('ExportPurchaseInvoice.create_sage300_object', prepare)
@@ -8,9 +8,13 @@ from apps.sage300.exports.helpers import (
     __validate_employee_mapping,
     get_filtered_mapping,
     resolve_errors_for_exported_accounting_export,
+    skip_accounting_exports_with_mapping_errors,
+    sync_inactive_employees,
     validate_accounting_export,
+    validate_accounting_exports_in_bulk,
 )
 from sage_desktop_api.exceptions import BulkError
+from tests.query_budget import assert_query_budget
 
 
 def test_get_employee_expense_attribute(
@@ -430,3 +434,89 @@ def test_sync_inactive_employee(
     # Generic exception path
     mocker.patch('fyle_accounting_library.fyle_platform.actions.FyleCredential.objects.get', side_effect=ValueError('bad value'))
     assert sync_inactive_employee('inactive_user@fyle.in', workspace_id) is None
+
+
+def test_validate_accounting_export_query_budget(db, create_sized_accounting_exports):
+    def prepare(size):
+        accounting_export = create_sized_accounting_exports(size)[0]
+        return lambda: validate_accounting_export(accounting_export)
+
+    assert_query_budget('validate_accounting_export', prepare)
+
+
+def test_skip_accounting_exports_with_mapping_errors(db, create_sized_accounting_exports):
+    accounting_exports = create_sized_accounting_exports(10, expense_count=4, report_count=2)
+    workspace_id = accounting_exports[0].workspace_id
+    failing_export = [
+        accounting_export for accounting_export in accounting_exports
+        if accounting_export.expenses.filter(category='Category 1').exists()
+    ][0]
+
+    category_mapping = CategoryMapping.objects.get(workspace_id=workspace_id, source_category__value='Category 1')
+    category_attribute = category_mapping.source_category
+    category_mapping.delete()
+
+    exportable_exports = skip_accounting_exports_with_mapping_errors(workspace_id, accounting_exports)
+
+    assert [accounting_export.id for accounting_export in exportable_exports] == [
+        accounting_export.id for accounting_export in accounting_exports if accounting_export.id != failing_export.id
+    ]
+
+    failing_export.refresh_from_db()
+    assert failing_export.status == 'FAILED'
+    assert failing_export.detail[0]['value'] == 'Category 1'
+    assert failing_export.detail[0]['type'] == 'Category Mapping'
+
+    error = Error.objects.get(workspace_id=workspace_id, expense_attribute=category_attribute)
+    assert error.type == 'CATEGORY_MAPPING'
+    assert error.mapping_error_accounting_export_ids == [failing_export.id]
+    assert error.repetition_count == 0
+
+    error.is_resolved = True
+    error.save()
+
+    skip_accounting_exports_with_mapping_errors(workspace_id, accounting_exports)
+
+    error.refresh_from_db()
+    assert error.is_resolved is False
+    assert error.repetition_count == 1
+
+
+def test_sync_inactive_employees(
+    db,
+    mocker,
+    create_temp_workspace,
+    add_fyle_credentials
+):
+    workspace_id = 1
+    platform = mocker.patch('apps.sage300.exports.helpers.PlatformConnector')
+    platform.return_value.employees.connection.list_all.return_value = [{'data': [{
+        'id': 'ouHnjo38H12',
+        'user_id': 'usabcdef1234',
+        'user': {'email': 'inactive_user@fyle.in', 'full_name': 'Inactive User'},
+        'code': 'EMP001',
+        'is_enabled': False,
+        'has_accepted_invite': True,
+        'location': 'San Francisco',
+        'department': {'name': 'Engineering', 'code': 'ENG'},
+        'department_id': 'deptHnjo38H12'
+    }]}]
+
+    sync_inactive_employees(['inactive_user@fyle.in', 'missing_user@fyle.in'], workspace_id)
+
+    query_params = platform.return_value.employees.connection.list_all.call_args[0][0]
+    assert query_params['user->email'] == 'in.(inactive_user@fyle.in,missing_user@fyle.in)'
+
+    employee_attribute = ExpenseAttribute.objects.get(workspace_id=workspace_id, attribute_type='EMPLOYEE', value='inactive_user@fyle.in')
+    assert employee_attribute.active is False
+
+    platform.return_value.employees.connection.list_all.side_effect = InvalidTokenError('Invalid token')
+    sync_inactive_employees(['inactive_user@fyle.in'], workspace_id)
+
+
+def test_validate_accounting_exports_in_bulk_query_budget(db, create_sized_accounting_exports):
+    def prepare(size):
+        accounting_exports = create_sized_accounting_exports(size, expense_count=size * 2, report_count=size)
+        return lambda: validate_accounting_exports_in_bulk(300 + size, accounting_exports)
+
+    assert_query_budget('validate_accounting_exports_in_bulk', prepare)
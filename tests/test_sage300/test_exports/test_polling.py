@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta, timezone
+
+from apps.accounting_exports.models import AccountingExport
+from apps.sage300.exports.polling import (
+    get_next_poll_at,
+    get_poll_interval,
+    poll_queued_accounting_exports,
+    publish_poll_queued_accounting_exports,
+)
+from tests.query_budget import assert_query_budget
+from workers.helpers import RoutingKeyEnum, WorkerActionEnum
+
+
+def test_poll_intervals():
+    assert get_poll_interval(timedelta(minutes=3)) == timedelta(minutes=1)
+    assert get_poll_interval(timedelta(minutes=30)) == timedelta(minutes=5)
+    assert get_poll_interval(timedelta(hours=5)) == timedelta(minutes=15)
+    assert get_poll_interval(timedelta(days=3)) == timedelta(hours=1)
+
+    now = datetime.now(timezone.utc)
+    assert get_next_poll_at(AccountingExport(updated_at=now - timedelta(minutes=3)), now) == now + timedelta(minutes=1)
+    assert get_next_poll_at(AccountingExport(updated_at=now - timedelta(days=3)), now) == now + timedelta(hours=1)
+
+
+def test_publish_poll_queued_accounting_exports(mocker):
+    mock_publish = mocker.patch('apps.sage300.exports.polling.publish_to_rabbitmq')
+
+    publish_poll_queued_accounting_exports()
+
+    call_kwargs = mock_publish.call_args[1]
+    assert call_kwargs['payload']['action'] == WorkerActionEnum.POLL_QUEUED_ACCOUNTING_EXPORTS.value
+    assert call_kwargs['routing_key'] == RoutingKeyEnum.UTILITY.value
+
+
+def test_poll_queued_accounting_exports(
+    db,
+    mocker,
+    create_temp_workspace,
+    add_sage300_creds,
+    add_fyle_credentials,
+    add_accounting_export_expenses
+):
+    mock_sage_connector = mocker.patch('apps.sage300.exports.polling.SageDesktopConnector')
+    mock_sage_connector.return_value.connection.operation_status.get.return_value = {'CompletedOn': '2023-11-29T18:36:01.6307696'}
+    mock_sage_connector.return_value.connection.documents.get.return_value = {'CurrentState': '9'}
+
+    # Workspace 3 is not due yet
+    next_poll_at = datetime.now(timezone.utc) + timedelta(minutes=3)
+    AccountingExport.objects.filter(workspace_id=3).update(next_poll_at=next_poll_at)
+
+    poll_queued_accounting_exports()
+
+    assert set(AccountingExport.objects.filter(status='COMPLETE').values_list('workspace_id', 'type')) == {
+        (1, 'PURCHASE_INVOICE'), (1, 'DIRECT_COST'), (2, 'PURCHASE_INVOICE'), (2, 'DIRECT_COST')
+    }
+    assert AccountingExport.objects.filter(workspace_id=3, status='EXPORT_QUEUED', next_poll_at=next_poll_at).count() == 2
+    # One connection per workspace for both export types
+    assert mock_sage_connector.call_count == 2
+
+    # A poll missed by late ticks runs on the next tick, exports still running are polled again after their interval
+    mock_sage_connector.return_value.connection.operation_status.get.return_value = {'CompletedOn': None}
+    AccountingExport.objects.filter(workspace_id=3).update(next_poll_at=datetime.now(timezone.utc) - timedelta(minutes=20))
+
+    poll_queued_accounting_exports()
+
+    for accounting_export in AccountingExport.objects.filter(workspace_id=3):
+        assert accounting_export.status == 'EXPORT_QUEUED'
+        assert accounting_export.next_poll_at > datetime.now(timezone.utc)
+
+
+def test_poll_queued_accounting_exports_query_budget(db, mocker, create_sized_accounting_exports):
+    sage_desktop_sdk = mocker.patch('apps.sage300.utils.SageDesktopSDK')
+    sage_desktop_sdk.return_value.operation_status.get.return_value = {'CompletedOn': '2024-01-01T00:00:00Z'}
+    sage_desktop_sdk.return_value.documents.get.return_value = {'CurrentState': 9}
+
+    def prepare(size):
+        create_sized_accounting_exports(size, report_count=size, queued=True)
+        return poll_queued_accounting_exports
+
+    assert_query_budget('poll_queued_accounting_exports', prepare)
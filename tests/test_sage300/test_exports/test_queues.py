@@ -1,39 +1,18 @@
 from datetime import datetime
 
-from django_q.models import Schedule
 from fyle_accounting_library.fyle_platform.enums import ExpenseImportSourceEnum
 
 from apps.accounting_exports.models import AccountingExport, Error
+from apps.workspaces.models import FeatureConfig
 from apps.sage300.exports.direct_cost.queues import (
     check_accounting_export_and_start_import as check_accounting_export_and_start_import_direct_cost,
 )
-from apps.sage300.exports.direct_cost.queues import create_schedule_for_polling as create_schedule_for_polling_direct_cost
-from apps.sage300.exports.direct_cost.queues import poll_operation_status as poll_operation_status_direct_cost
 from apps.sage300.exports.direct_cost.queues import trigger_poll_operation_status as trigger_poll_operation_status_direct_cost
 from apps.sage300.exports.purchase_invoice.queues import (
     check_accounting_export_and_start_import,
-    create_schedule_for_polling,
-    poll_operation_status,
     trigger_poll_operation_status,
 )
-from workers.helpers import WorkerActionEnum, RoutingKeyEnum
-
-
-def test_poll_operation_status_purchase_invoice_publishes_to_rabbitmq(
-    db,
-    mocker,
-    create_temp_workspace
-):
-    """Test that poll_operation_status publishes the correct payload to RabbitMQ"""
-    mock_publish = mocker.patch('apps.sage300.exports.purchase_invoice.queues.publish_to_rabbitmq')
-
-    poll_operation_status(workspace_id=1)
-
-    mock_publish.assert_called_once()
-    call_kwargs = mock_publish.call_args[1]
-    assert call_kwargs['payload']['workspace_id'] == 1
-    assert call_kwargs['payload']['action'] == WorkerActionEnum.POLL_PURCHASE_INVOICE_STATUS.value
-    assert call_kwargs['routing_key'] == RoutingKeyEnum.EXPORT_P1.value
+from tests.query_budget import assert_query_budget
 
 
 def test_trigger_poll_operation_status_purchase_invoice(
@@ -147,47 +126,6 @@ def test_check_accounting_export_and_start_import_purchase_invoice(
     assert accounting_export.type == 'PURCHASE_INVOICE'
 
 
-def test_create_schedule_for_polling_purchase_invoice(
-    db,
-):
-    """
-    Test create_schedule_for_polling
-    """
-    create_schedule_for_polling(workspace_id=1)
-    create_schedule_for_polling(workspace_id=1)
-
-    schedule = Schedule.objects.filter(
-        func='apps.sage300.exports.purchase_invoice.queues.poll_operation_status',
-        args='1'
-    ).first()
-
-    assert schedule is not None
-
-    schedule = Schedule.objects.filter(
-        func='apps.sage300.exports.purchase_invoice.queues.poll_operation_status',
-        args='1'
-    ).first()
-
-    assert schedule is not None
-
-
-def test_poll_operation_status_direct_cost_publishes_to_rabbitmq(
-    db,
-    mocker,
-    create_temp_workspace
-):
-    """Test that poll_operation_status publishes the correct payload to RabbitMQ"""
-    mock_publish = mocker.patch('apps.sage300.exports.direct_cost.queues.publish_to_rabbitmq')
-
-    poll_operation_status_direct_cost(workspace_id=1)
-
-    mock_publish.assert_called_once()
-    call_kwargs = mock_publish.call_args[1]
-    assert call_kwargs['payload']['workspace_id'] == 1
-    assert call_kwargs['payload']['action'] == WorkerActionEnum.POLL_DIRECT_COST_STATUS.value
-    assert call_kwargs['routing_key'] == RoutingKeyEnum.EXPORT_P1.value
-
-
 def test_trigger_poll_operation_status_direct_cost(
     db,
     mocker,
@@ -301,30 +239,6 @@ def test_check_accounting_export_and_start_import_direct_cost(
     assert accounting_export.type == 'DIRECT_COST'
 
 
-def test_create_schedule_for_polling_direct_cost(
-    db,
-):
-    """
-    Test create_schedule_for_polling
-    """
-    create_schedule_for_polling_direct_cost(workspace_id=1)
-    create_schedule_for_polling_direct_cost(workspace_id=1)
-
-    schedule = Schedule.objects.filter(
-        func='apps.sage300.exports.direct_cost.queues.poll_operation_status',
-        args='1'
-    ).first()
-
-    assert schedule is not None
-
-    schedule = Schedule.objects.filter(
-        func='apps.sage300.exports.direct_cost.queues.poll_operation_status',
-        args='1'
-    ).first()
-
-    assert schedule is not None
-
-
 def test_skipping_direct_cost(
     db,
     create_temp_workspace,
@@ -616,3 +530,36 @@ def test_skip_export_with_mapping_errors_direct_cost(
     accounting_export.refresh_from_db()
     assert accounting_export.status == 'READY'
     mock_chain_run.assert_not_called()
+
+
+def test_trigger_poll_operation_status_query_budget(db, mocker, create_sized_accounting_exports):
+    sage_desktop_sdk = mocker.patch('apps.sage300.utils.SageDesktopSDK')
+    sage_desktop_sdk.return_value.operation_status.get.return_value = {'CompletedOn': '2024-01-01T00:00:00Z'}
+    sage_desktop_sdk.return_value.documents.get.return_value = {'CurrentState': 9}
+
+    def prepare(size):
+        create_sized_accounting_exports(size, report_count=size, queued=True)
+        return lambda: trigger_poll_operation_status(workspace_id=300 + size)
+
+    assert_query_budget('trigger_poll_operation_status', prepare)
+
+
+def test_check_accounting_export_and_start_import_query_budget(db, mocker, create_sized_accounting_exports):
+    mock_chain_run = mocker.patch('django_q.tasks.Chain.run')
+    accounting_export_ids = {}
+
+    def prepare(size):
+        workspace_id = 300 + size
+        accounting_exports = create_sized_accounting_exports(size, report_count=size)
+        FeatureConfig.objects.create(workspace_id=workspace_id, export_via_rabbitmq=False, fyle_webhook_sync_enabled=True)
+        accounting_export_ids[workspace_id] = [accounting_export.id for accounting_export in accounting_exports]
+
+        return lambda: check_accounting_export_and_start_import(
+            workspace_id, accounting_export_ids[workspace_id], False, 0, ExpenseImportSourceEnum.DIRECT_EXPORT
+        )
+
+    assert_query_budget('check_accounting_export_and_start_import', prepare)
+
+    for workspace_id, ids in accounting_export_ids.items():
+        assert AccountingExport.objects.filter(id__in=ids, status='ENQUEUED', triggered_by=ExpenseImportSourceEnum.DIRECT_EXPORT).count() == len(ids)
+    assert mock_chain_run.call_count == 2
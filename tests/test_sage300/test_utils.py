@@ -736,18 +736,17 @@ def test_sync_data_with_generator(sync_instance, mocker):
     # Mock dependencies
     mock_mapping_setting = mocker.patch('apps.sage300.utils.MappingSetting')
     mock_bulk_create = mocker.patch('apps.sage300.utils.DestinationAttribute.bulk_create_or_update_destination_attributes')
-    mock_get_attribute_class = mocker.patch('apps.sage300.utils.SageDesktopConnector._get_attribute_class')
     mock_update_latest_version = mocker.patch('apps.sage300.utils.SageDesktopConnector._update_latest_version')
-    mock_import_string = mocker.patch('apps.sage300.utils.import_string')
 
     # Setup mock return values
     mock_mapping_setting.objects.filter.return_value.first.return_value = MagicMock(is_custom=False, source_field='PROJECT', destination_field='JOB')
-    mock_get_attribute_class.return_value = 'Job'
     mock_update_latest_version.return_value = None
-    mock_import_string.return_value.from_dict.return_value = MagicMock()
 
     # Mock data generator
-    data_gen = iter([iter([{'key': 'value'}])])
+    data_gen = iter([iter([[
+        {'Id': 'job-1', 'Name': 'Platform  Upgrade', 'Code': '10', 'Version': 3, 'IsActive': True},
+        {'Id': 'job-2', 'Name': 'Closed Job', 'Code': '11', 'Version': 4, 'IsActive': False}
+    ]])])
 
     # Call method
     sync_instance._sync_data(data_gen, 'JOB', 'job', 1, ['code', 'version'], is_generator=True)
@@ -756,6 +755,15 @@ def test_sync_data_with_generator(sync_instance, mocker):
     mock_bulk_create.assert_called_once()
     called_args = mock_bulk_create.call_args[0]
 
+    assert called_args[0] == [{
+        'attribute_type': 'JOB',
+        'display_name': 'job',
+        'value': 'Platform Upgrade',
+        'destination_id': 'job-1',
+        'active': True,
+        'detail': {'code': '10', 'version': 3},
+        'code': '10'
+    }]
     assert called_args[1] == 'JOB'
     assert called_args[2] == 1
     assert mock_bulk_create.call_args[1]['attribute_disable_callback_path'] == 'fyle_integrations_imports.modules.projects.disable_projects'  # ATTRIBUTE_CALLBACK_MAP['PROJECT']
@@ -767,19 +775,15 @@ def test_sync_data_with_generator_case_2(sync_instance, mocker):
     """
     mock_mapping_setting = mocker.patch('apps.sage300.utils.MappingSetting')
     mock_bulk_create = mocker.patch('apps.sage300.utils.DestinationAttribute.bulk_create_or_update_destination_attributes')
-    mock_get_attribute_class = mocker.patch('apps.sage300.utils.SageDesktopConnector._get_attribute_class')
     mock_update_latest_version = mocker.patch('apps.sage300.utils.SageDesktopConnector._update_latest_version')
-    mock_import_string = mocker.patch('apps.sage300.utils.import_string')
     mocker.patch('apps.sage300.utils.UPPER_SYNC_LIMITS', {'JOB': 0})
 
     # Setup mock return values
     mock_mapping_setting.objects.filter.return_value.first.return_value = MagicMock(is_custom=False, source_field='PROJECT', destination_field='JOB')
-    mock_get_attribute_class.return_value = 'Job'
     mock_update_latest_version.return_value = None
-    mock_import_string.return_value.from_dict.return_value = MagicMock()
 
     # Mock data generator
-    data_gen = iter([iter([{'key': 'value'}])])
+    data_gen = iter([iter([[{'Id': 'job-1', 'Name': 'Job', 'Code': '10', 'Version': 3, 'IsActive': True}]])])
 
     # Call method
     sync_instance._sync_data(data_gen, 'JOB', 'job', 1, ['code', 'version'], is_generator=True)
@@ -791,14 +795,10 @@ def test_sync_data_with_generator_case_2(sync_instance, mocker):
 def test_sync_data_without_generator(sync_instance, mocker):
     # Mock dependencies
     mock_bulk_create = mocker.patch('apps.sage300.utils.DestinationAttribute.bulk_create_or_update_destination_attributes')
-    mock_get_attribute_class = mocker.patch('apps.sage300.utils.SageDesktopConnector._get_attribute_class')
     mock_update_latest_version = mocker.patch('apps.sage300.utils.SageDesktopConnector._update_latest_version')
-    mock_import_string = mocker.patch('apps.sage300.utils.import_string')
 
     # Setup mock return values
-    mock_get_attribute_class.return_value = 'CommitmentItem'
     mock_update_latest_version.return_value = None
-    mock_import_string.return_value.from_dict.return_value = MagicMock()
 
     # Mock data
     data = [
@@ -851,14 +851,10 @@ def test_sync_data_without_generator_case_2(sync_instance, mocker):
 
     # Mock dependencies
     mock_bulk_create = mocker.patch('apps.sage300.utils.DestinationAttribute.bulk_create_or_update_destination_attributes')
-    mock_get_attribute_class = mocker.patch('apps.sage300.utils.SageDesktopConnector._get_attribute_class')
     mock_update_latest_version = mocker.patch('apps.sage300.utils.SageDesktopConnector._update_latest_version')
-    mock_import_string = mocker.patch('apps.sage300.utils.import_string')
 
     # Setup mock return values
-    mock_get_attribute_class.return_value = 'CommitmentItem'
     mock_update_latest_version.return_value = None
-    mock_import_string.return_value.from_dict.return_value = MagicMock()
 
     # Mock data
     data = [
@@ -897,3 +893,60 @@ def test_sync_data_without_generator_case_2(sync_instance, mocker):
 
     # Assertions
     mock_bulk_create.assert_not_called()
+
+
+def test_peek_changes(sync_instance):
+    assert sync_instance._peek_changes(iter([iter([])])) is None
+    assert sync_instance._peek_changes([[[]]]) is None
+
+    pages = sync_instance._peek_changes([iter([[{'Id': 1}], [{'Id': 2}]])])
+    assert [item for data in pages for items in data for item in items] == [{'Id': 1}, {'Id': 2}]
+
+
+def test_sync_skipped_when_unchanged(sync_instance, mocker):
+    Version.objects.update_or_create(workspace_id=1, defaults={'account': 10, 'standard_category': 5})
+    mock_sync_data = mocker.patch('apps.sage300.utils.SageDesktopConnector._sync_data')
+    mock_mark_skipped = mocker.patch('apps.sage300.utils.mark_skipped')
+
+    sync_instance.connection.accounts.get_all.return_value = iter([iter([])])
+    sync_instance.connection.jobs.get_standard_categories.return_value = iter([iter([])])
+
+    assert sync_instance.sync_accounts() == []
+    assert sync_instance.sync_standard_categories() == []
+
+    sync_instance.connection.accounts.get_all.assert_called_once_with(version=10)
+    mock_sync_data.assert_not_called()
+    assert mock_mark_skipped.call_count == 2
+
+
+def test_sync_standard_categories_upper_sync_limit(sync_instance):
+    cache.set('STANDARD_CATEGORY_SYNC_LIMIT_REACHED_1', True)
+
+    assert sync_instance.sync_standard_categories() == []
+    sync_instance.connection.jobs.get_standard_categories.assert_not_called()
+
+
+def test_sync_commitment_items_uses_version(sync_instance, mocker):
+    Version.objects.update_or_create(workspace_id=1, defaults={'commitment_item': 42})
+    for destination_id in ['commitment-1', 'commitment-2']:
+        DestinationAttribute.objects.create(
+            attribute_type='COMMITMENT',
+            display_name='commitment',
+            value=destination_id,
+            workspace=Workspace.objects.get(id=1),
+            destination_id=destination_id,
+            active=True
+        )
+
+    mock_sync_data = mocker.patch('apps.sage300.utils.SageDesktopConnector._sync_data')
+    mock_mark_skipped = mocker.patch('apps.sage300.utils.mark_skipped')
+    sync_instance.connection.commitments.get_commitment_items.side_effect = lambda commitment_id, version: iter(
+        [MagicMock(commitment_id=commitment_id)] if commitment_id == 'commitment-2' else []
+    )
+
+    sync_instance.sync_commitment_items()
+
+    sync_instance.connection.commitments.get_commitment_items.assert_any_call('commitment-1', version=42)
+    assert mock_sync_data.call_count == 1
+    assert mock_sync_data.call_args[0][0][0].commitment_id == 'commitment-2'
+    mock_mark_skipped.assert_not_called()
@@ -0,0 +1,63 @@
+import gc
+import sys
+
+from benchmarks.boot_time import get_top_packages, parse_import_times
+from sage_desktop_api.boot import LazyImport, prepare_for_fork, reset_after_fork
+from sage_desktop_api.instrumentation import GEVENTPOOL_BACKEND_MODULE
+
+
+def test_lazy_import(mocker):
+    lazy_counter = LazyImport('collections.Counter')
+    assert not lazy_counter.is_loaded
+    assert 'not loaded' in repr(lazy_counter)
+
+    assert lazy_counter('aab')['a'] == 2
+    assert lazy_counter.is_loaded
+    assert lazy_counter.fromkeys is sys.modules['collections'].Counter.fromkeys
+
+    class Target:
+        def name(self):
+            return 'real'
+
+    mocker.patch('sage_desktop_api.boot.import_string', return_value=Target)
+    lazy_target = LazyImport('module.Target')
+
+    # Patching through the proxy patches the loaded class
+    mocker.patch.object(lazy_target, 'name', return_value='patched')
+    assert lazy_target().name() == 'patched'
+    mocker.stopall()
+    assert Target().name() == 'real'
+
+
+def test_prepare_for_fork_and_reset_after_fork(mocker):
+    pool = mocker.MagicMock()
+    connection_pools = {'default': pool}
+    mocker.patch.dict('sys.modules', {GEVENTPOOL_BACKEND_MODULE: mocker.MagicMock(connection_pools=connection_pools)})
+    close_all = mocker.patch('sage_desktop_api.boot.connections.close_all')
+    close_caches = mocker.patch('sage_desktop_api.boot.caches.close_all')
+
+    prepare_for_fork()
+    gc.unfreeze()
+
+    close_all.assert_called_once()
+    close_caches.assert_called_once()
+    pool.closeall.assert_called_once()
+
+    reset_after_fork()
+    assert connection_pools == {}
+    assert pool.closeall.call_count == 1
+
+
+def test_parse_import_times():
+    stderr = '\n'.join([
+        'import time: self [us] | cumulative | imported package',
+        'import time:       120 |        120 |   requests.compat',
+        'import time:      3000 |       3120 | requests',
+        'import time:       500 |        500 | django.conf',
+        'some other output',
+    ])
+
+    import_times = parse_import_times(stderr)
+    assert [import_time.module for import_time in import_times] == ['requests.compat', 'requests', 'django.conf']
+    assert import_times[1].cumulative_us == 3120
+    assert get_top_packages(import_times) == [('requests', 3120), ('django', 500)]
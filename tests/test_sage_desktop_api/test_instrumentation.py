@@ -0,0 +1,143 @@
+import json
+import logging
+import urllib.request
+from unittest.mock import patch
+
+import pytest
+import requests
+from django.db import connection
+from django.db.backends.signals import connection_created
+
+from apps.workspaces.models import Workspace
+from sage_desktop_api.instrumentation import (
+    GEVENTPOOL_BACKEND_MODULE,
+    TaskMetrics,
+    get_database_connection_metrics,
+    instrument,
+    instrumented,
+    mark_skipped,
+    registry,
+    start_metrics_server,
+)
+from workers.helpers import publisher  # noqa: F401, registers the publisher collector
+
+
+@pytest.fixture(autouse=True)
+def reset_registry():
+    registry.reset()
+    yield
+    registry.reset()
+
+
+@pytest.mark.django_db
+def test_instrument_counts_queries(create_temp_workspace, caplog):
+    with caplog.at_level(logging.INFO, logger='instrumentation'):
+        with instrument('worker_action', workspace_id=1, action='RUN_SYNC_SCHEDULE') as metrics:
+            Workspace.objects.filter(id=1).first()
+            Workspace.objects.count()
+
+    assert metrics.db_query_count == 2
+    assert metrics.status == 'success'
+    assert metrics.wall_time > 0
+    assert metrics.peak_rss_kb > 0
+
+    logged_metrics = json.loads(caplog.records[-1].getMessage().split(' ', 1)[1])
+    assert logged_metrics['workspace_id'] == 1
+    assert logged_metrics['action'] == 'RUN_SYNC_SCHEDULE'
+    assert logged_metrics['db_query_count'] == 2
+
+
+@pytest.mark.django_db
+def test_instrument_nested_and_failed(create_temp_workspace):
+    with pytest.raises(ValueError):
+        with instrument('worker_action', workspace_id=1, action='outer') as outer:
+            with instrument('sage300_sync', workspace_id=1, action='inner') as inner:
+                Workspace.objects.count()
+                mark_skipped()
+            raise ValueError('failed')
+
+    assert outer.db_query_count == 1
+    assert inner.db_query_count == 1
+    assert inner.skipped and not outer.skipped
+    assert outer.status == 'failed'
+
+    rendered = registry.render()
+    assert 'sage_desktop_task_failures_total{task="worker_action",action="outer"} 1' in rendered
+    assert 'sage_desktop_task_skipped_total{task="sage300_sync",action="inner"} 1' in rendered
+    # Workspace ids are in the logs only, they would explode the label cardinality
+    assert 'workspace' not in rendered
+
+
+def test_instrument_http_per_host():
+    with patch('requests.adapters.HTTPAdapter.send') as mock_send:
+        mock_send.return_value = requests.Response()
+        with instrument('sage300_sync', action='sync_jobs') as metrics:
+            requests.get('https://hh2.example.com/api/jobs')
+            requests.get('https://hh2.example.com/api/jobs?page=2')
+            requests.get('https://fyle.example.com/platform/v1')
+
+        requests.get('https://hh2.example.com/api/jobs')
+
+    assert metrics.http_count == {'hh2.example.com': 2, 'fyle.example.com': 1}
+    assert set(metrics.http_time) == {'hh2.example.com', 'fyle.example.com'}
+    assert 'sage_desktop_task_http_requests_total{task="sage300_sync",action="sync_jobs",host="hh2.example.com"} 2' in registry.render()
+
+
+def test_instrumented_decorator():
+    class Connector:
+        workspace_id = 7
+
+        @instrumented('sage300_sync')
+        def sync_accounts(self):
+            return 'synced'
+
+    with patch.object(registry, 'record') as mock_record:
+        assert Connector().sync_accounts() == 'synced'
+
+    metrics = mock_record.call_args[0][0]
+    assert isinstance(metrics, TaskMetrics)
+    assert metrics.workspace_id == 7
+    assert metrics.action == 'sync_accounts'
+
+
+def test_metrics_server():
+    assert start_metrics_server(None) is None
+
+    with instrument('worker_action', action='DASHBOARD_SYNC'):
+        pass
+
+    server = start_metrics_server(0)
+    try:
+        url = 'http://127.0.0.1:{}/metrics'.format(server.server_address[1])
+        body = urllib.request.urlopen(url).read().decode('utf-8')
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert 'sage_desktop_task_total{task="worker_action",action="DASHBOARD_SYNC"} 1' in body
+    assert 'sage_desktop_rabbitmq_publish_published_count' in body
+
+
+def test_instrument_outside_db_access():
+    assert not connection.execute_wrappers
+    with instrument('worker_action') as metrics:
+        assert connection.execute_wrappers
+    assert metrics.db_query_count == 0
+
+
+def test_database_connection_metrics(mocker):
+    opened_connections = get_database_connection_metrics().get('db_connections_opened_default', 0)
+    connection_created.send(sender=connection.__class__, connection=connection)
+
+    metrics = get_database_connection_metrics()
+    assert metrics['db_connections_opened_default'] == opened_connections + 1
+
+    pool = mocker.MagicMock(size=3, maxsize=20)
+    pool.pool.qsize.return_value = 2
+    mocker.patch.dict('sys.modules', {GEVENTPOOL_BACKEND_MODULE: mocker.MagicMock(connection_pools={'default': pool})})
+
+    metrics = get_database_connection_metrics()
+    assert metrics['db_pool_default_connections'] == 3
+    assert metrics['db_pool_default_idle_connections'] == 2
+    assert metrics['db_pool_default_max_connections'] == 20
+    assert 'sage_desktop_db_pool_default_connections 3' in registry.render()
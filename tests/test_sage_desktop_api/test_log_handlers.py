@@ -0,0 +1,110 @@
+import io
+import logging
+
+from apps.internal.management.commands.capture_payload_logs import Command
+from sage_desktop_api.instrumentation import instrument
+from sage_desktop_api.log_handlers import AsyncStreamHandler, PayloadLogFilter
+
+
+def make_record(name: str, msg: str, *args, level: int = logging.INFO) -> logging.LogRecord:
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+
+def test_payload_log_filter_truncation():
+    payload_filter = PayloadLogFilter(
+        max_lengths={'sage_desktop_sdk': 10}, default_max_length=20, sample_every=1, sample_min_length=5
+    )
+
+    record = make_record('sage_desktop_sdk.core.client', 'Response: %s', 'x' * 1000)
+    assert payload_filter.filter(record)
+    assert record.getMessage() == 'Response: ... [truncated 10 characters]'
+
+    record = make_record('apps.sage300.exports', 'payload %s', 'y' * 30)
+    assert payload_filter.filter(record)
+    assert record.getMessage().startswith('payload ' + 'y' * 12 + '... [truncated')
+
+    record = make_record('apps.sage300.exports', 'short')
+    assert payload_filter.filter(record)
+    assert record.getMessage() == 'short'
+
+
+def test_payload_log_filter_sampling():
+    payload_filter = PayloadLogFilter(
+        default_max_length=100, sampled_loggers=['apps.fyle.queue', 'sage_desktop_sdk'], sample_every=3, sample_min_length=10
+    )
+
+    def kept(workspace_id: int, level: int = logging.INFO) -> bool:
+        return payload_filter.filter(make_record('apps.fyle.queue', 'workspace_id: %s payload %s', workspace_id, 'z' * 50, level=level))
+
+    assert [kept(1) for _ in range(6)] == [True, False, False, True, False, False]
+    # Sampled per workspace, errors are always kept
+    assert kept(2)
+    assert kept(1, level=logging.ERROR)
+
+    with instrument('export', workspace_id=3):
+        assert payload_filter.filter(make_record('sage_desktop_sdk.core.client', 'Response: %s', 'z' * 50))
+        assert not payload_filter.filter(make_record('sage_desktop_sdk.core.client', 'Response: %s', 'z' * 50))
+
+    # Operational messages of the other loggers are never sampled out
+    for _ in range(6):
+        assert payload_filter.filter(make_record('workers.worker', 'workspace_id: %s payload %s', 1, 'z' * 50))
+
+
+def test_payload_log_filter_full_payload_capture():
+    Command(stdout=io.StringIO()).handle(workspace_ids=[1], minutes=10, stop=False)
+
+    payload_filter = PayloadLogFilter(
+        default_max_length=10, sampled_loggers=['apps.sage300.exports'], sample_every=100, sample_min_length=5, refresh_seconds=0
+    )
+    payload_filter.refresh_full_payload_workspaces()
+    for _ in range(3):
+        record = make_record('apps.sage300.exports', 'workspace_id: 1 payload %s', 'x' * 50)
+        assert payload_filter.filter(record)
+        assert record.getMessage() == 'workspace_id: 1 payload ' + 'x' * 50
+
+    # Other workspaces are still sampled and truncated
+    record = make_record('apps.sage300.exports', 'workspace_id: 2 payload %s', 'x' * 50)
+    assert payload_filter.filter(record)
+    assert 'truncated' in record.getMessage()
+    assert not payload_filter.filter(make_record('apps.sage300.exports', 'workspace_id: 2 payload %s', 'x' * 50))
+
+    Command(stdout=io.StringIO()).handle(workspace_ids=[1], minutes=10, stop=True)
+    payload_filter.refresh_full_payload_workspaces()
+    record = make_record('apps.sage300.exports', 'workspace_id: 1 payload %s', 'x' * 50)
+    assert payload_filter.filter(record)
+    assert 'truncated' in record.getMessage()
+
+
+def test_payload_log_filter_bounds_sampling_counters():
+    payload_filter = PayloadLogFilter(
+        default_max_length=100, sampled_loggers=['apps.fyle.queue'], sample_every=3, sample_min_length=10,
+        refresh_seconds=0, max_sampled_workspaces=2
+    )
+
+    for workspace_id in range(5):
+        payload_filter.filter(make_record('apps.fyle.queue', 'workspace_id: %s payload %s', workspace_id, 'z' * 50))
+
+    assert len(payload_filter._seen_payloads) <= 2
+
+
+def test_async_stream_handler():
+    stream = io.StringIO()
+    handler = AsyncStreamHandler(stream=stream, max_queue_size=1000)
+    handler.setFormatter(logging.Formatter('%(levelname)s %(message)s'))
+
+    for index in range(5):
+        handler.handle(make_record('apps.fyle.tasks', 'line %s', index))
+    handler.flush()
+
+    assert stream.getvalue().splitlines() == ['INFO line {}'.format(index) for index in range(5)]
+
+
+def test_async_stream_handler_counts_dropped_records():
+    stream = io.StringIO()
+    handler = AsyncStreamHandler(stream=stream, max_queue_size=0)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+
+    for index in range(3):
+        handler.handle(make_record('apps.fyle.tasks', 'line %s', index))
+
+    assert handler._dropped == 3
@@ -0,0 +1,37 @@
+from django.db import connections
+
+from apps.workspaces.models import Workspace
+from sage_desktop_api.streaming import iterate_queryset_by_pk, stream_queryset, stream_queryset_batches
+
+
+def test_stream_queryset(db, create_temp_workspace, mocker):
+    chunked_cursor = mocker.spy(connections['default'], 'chunked_cursor')
+
+    workspaces = Workspace.objects.order_by('id')
+    assert [workspace.id for workspace in stream_queryset(workspaces, chunk_size=2)] == [1, 2, 3]
+    assert list(stream_queryset(workspaces.values_list('name', flat=True))) == [
+        'Fyle For Testing 1', 'Fyle For Testing 2', 'Fyle For Testing 3'
+    ]
+    assert chunked_cursor.call_count == 2
+
+
+def test_stream_queryset_stopped_early(db, create_temp_workspace):
+    for workspace_id in stream_queryset(Workspace.objects.order_by('id').values_list('id', flat=True), chunk_size=1):
+        Workspace.objects.filter(id=workspace_id).update(name='renamed')
+        break
+
+    # Writes made while streaming are kept and the connection is still usable
+    assert list(Workspace.objects.order_by('id').values_list('name', flat=True)) == [
+        'renamed', 'Fyle For Testing 2', 'Fyle For Testing 3'
+    ]
+
+
+def test_stream_queryset_batches(db, create_temp_workspace):
+    workspace_ids = Workspace.objects.order_by('id').values_list('id', flat=True)
+
+    assert list(stream_queryset_batches(workspace_ids, batch_size=2)) == [[1, 2], [3]]
+
+
+def test_iterate_queryset_by_pk(db, create_temp_workspace, django_assert_num_queries):
+    with django_assert_num_queries(2):
+        assert [workspace.id for workspace in iterate_queryset_by_pk(Workspace.objects.all(), batch_size=2)] == [1, 2, 3]
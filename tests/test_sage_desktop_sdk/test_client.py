@@ -0,0 +1,68 @@
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+from sage_desktop_sdk.apis import Vendors
+from sage_desktop_sdk.core.helpers import iter_json_array
+from sage_desktop_sdk.exceptions import InternalServerError
+
+
+def get_chunks(body: bytes, chunk_size: int) -> list:
+    return [body[index:index + chunk_size] for index in range(0, len(body), chunk_size)]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 1024])
+def test_iter_json_array(chunk_size):
+    items = [{'Id': index, 'Name': 'Vendör, [{}] {}'.format(index, '"x"'), 'Amounts': [1, 2.5, None, True]} for index in range(250)] + [10, 'last']
+    body = json.dumps(items, indent=2).encode('utf-8')
+
+    batches = list(iter_json_array(get_chunks(body, chunk_size), batch_size=100))
+
+    assert [len(batch) for batch in batches] == [100, 100, 52]
+    assert [item for batch in batches for item in batch] == items
+
+
+def test_iter_json_array_edge_cases():
+    assert list(iter_json_array([b'[]'])) == []
+    assert list(iter_json_array([b''])) == []
+    assert list(iter_json_array([b'{"Message": ', b'"error"}'])) == [{'Message': 'error'}]
+    assert list(iter_json_array([b'\xef\xbb\xbf[12', b'34, 5]'])) == [[1234, 5]]
+
+    for body in [b'[1, 2', b'[1 2]', b'[{"Id": 1]']:
+        with pytest.raises(json.JSONDecodeError):
+            list(iter_json_array([body]))
+
+
+def get_vendors_client(mocker, status_code: int, body: bytes):
+    response = MagicMock(status_code=status_code, text=body.decode('utf-8'))
+    response.iter_content.return_value = get_chunks(body, 5)
+    response.__enter__.return_value = response
+
+    mock_get = mocker.patch('sage_desktop_sdk.core.client.requests.get', return_value=response)
+
+    vendors = Vendors()
+    vendors.set_api_url('hh2.example.com')
+    vendors.set_cookie('cookie')
+    vendors.set_stream_batch_size(2)
+    return vendors, mock_get
+
+
+def test_vendors_get_all_streams_batches(mocker):
+    body = json.dumps([{'Id': str(index), 'Name': 'Vendor {}'.format(index)} for index in range(5)]).encode('utf-8')
+    vendors, mock_get = get_vendors_client(mocker, 200, body)
+
+    batches = [batch for data in vendors.get_all(version=3) for batch in data]
+
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert batches[2][0]['Name'] == 'Vendor 4'
+    assert mock_get.call_args.kwargs['stream'] is True
+    assert mock_get.call_args.kwargs['url'] == 'https://hh2.example.com/AccountsPayable/Api/V1/Vendor.svc/vendors?version=3'
+
+
+def test_vendors_get_all_stream_error(mocker):
+    vendors, _ = get_vendors_client(mocker, 500, b'Server Error')
+
+    with pytest.raises(InternalServerError):
+        for data in vendors.get_all():
+            list(data)
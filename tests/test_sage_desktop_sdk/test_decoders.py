@@ -0,0 +1,64 @@
+from dataclasses import fields
+
+import pytest
+
+from apps.sage300.utils import SageDesktopConnector
+from sage_desktop_sdk.core.schema.decoders import (
+    ATTRIBUTE_SCHEMA_MAP,
+    build_destination_attribute_extractor,
+    get_field_getters,
+    get_raw_key,
+)
+from sage_desktop_sdk.core.schema.read_only import Category, Job, VendorType
+
+
+def get_raw_item(schema_class):
+    """
+    Raw hh2 item with a distinct value for every field
+    """
+    raw_item = {get_raw_key(field.name): '{} value'.format(field.name) for field in fields(schema_class)}
+    raw_item['IsActive'] = True
+    raw_item['TypeId'] = 'vendor-type-1'
+    return raw_item
+
+
+def test_get_raw_key():
+    assert get_raw_key('id') == 'Id'
+    assert get_raw_key('created_on_utc') == 'CreatedOnUtc'
+    assert get_raw_key('ship_to_address1') == 'ShipToAddress1'
+    assert get_raw_key('default_standard_costcode') == 'DefaultStandardCostCode'
+
+
+@pytest.mark.parametrize('schema_class', list(ATTRIBUTE_SCHEMA_MAP.values()) + [Category])
+def test_field_getters_match_from_dict(schema_class):
+    raw_item = get_raw_item(schema_class)
+    item = schema_class.from_dict(raw_item)
+    getters = get_field_getters(schema_class)
+
+    for field in fields(schema_class):
+        assert getters[field.name](raw_item) == getattr(item, field.name)
+
+    assert get_field_getters(schema_class) is getters
+
+
+@pytest.mark.parametrize('attribute_type', list(ATTRIBUTE_SCHEMA_MAP.keys()))
+def test_extractor_matches_add_to_destination_attributes(attribute_type):
+    schema_class = ATTRIBUTE_SCHEMA_MAP[attribute_type]
+    raw_item = get_raw_item(schema_class)
+    field_names = ['version'] + (['code'] if 'code' in get_field_getters(schema_class) else [])
+    vendor_type_mapping = {'vendor-type-1': 'Credit Card'} if attribute_type == 'VENDOR' else None
+
+    connector = SageDesktopConnector.__new__(SageDesktopConnector)
+    expected = connector._add_to_destination_attributes(
+        schema_class.from_dict(raw_item), attribute_type, 'display', field_names, vendor_type_mapping
+    )
+
+    extract = build_destination_attribute_extractor(attribute_type, 'display', field_names, vendor_type_mapping)
+
+    assert extract(raw_item) == expected
+    assert extract({**raw_item, 'Name': None}) is None
+
+
+def test_schema_classes_are_slotted():
+    assert not hasattr(Job.from_dict({}), '__dict__')
+    assert VendorType.from_dict({}).is_active is True
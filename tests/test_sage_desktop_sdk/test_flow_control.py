@@ -0,0 +1,104 @@
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+import requests
+
+from sage_desktop_sdk.core.flow_control import CircuitBreaker, FlowController, get_flow_controller
+from sage_desktop_sdk.exceptions import CircuitOpenError
+
+
+def respond(status_code: int = 200, delay: float = 0):
+    def method(*args, **kwargs):
+        time.sleep(delay)
+        return MagicMock(status_code=status_code)
+    return method
+
+
+def test_limit_grows_on_fast_successes_and_halves_on_failures():
+    controller = FlowController('hh2.example.com', initial_concurrency=2, max_concurrency=4)
+
+    for _ in range(20):
+        controller.call(respond(200))
+    assert controller.limit == 4
+
+    controller.call(respond(503))
+    assert controller.limit == 2
+
+    with pytest.raises(requests.exceptions.Timeout):
+        controller.call(MagicMock(side_effect=requests.exceptions.Timeout()))
+    assert controller.limit == 1
+    assert controller.in_flight == 0
+
+
+def test_slow_responses_reduce_the_limit():
+    controller = FlowController('hh2.example.com', initial_concurrency=4, latency_target=0.01)
+
+    controller.call(respond(200, delay=0.02))
+
+    assert controller.limit == 2
+    assert controller.circuit_breaker.state == CircuitBreaker.CLOSED
+
+
+def test_client_errors_are_not_failures():
+    controller = FlowController('hh2.example.com', circuit_breaker=CircuitBreaker(failure_threshold=1))
+
+    controller.call(respond(400))
+    with pytest.raises(ValueError):
+        controller.call(MagicMock(side_effect=ValueError()))
+
+    assert controller.circuit_breaker.state == CircuitBreaker.CLOSED
+
+
+def test_in_flight_requests_are_bounded():
+    controller = FlowController('hh2.example.com', initial_concurrency=2, max_concurrency=2)
+    peak_in_flight = []
+
+    def method():
+        peak_in_flight.append(controller.in_flight)
+        time.sleep(0.02)
+        return MagicMock(status_code=200)
+
+    threads = [threading.Thread(target=controller.call, args=(method,)) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert max(peak_in_flight) == 2
+    assert controller.in_flight == 0
+
+
+def test_circuit_opens_and_recovers():
+    controller = FlowController('hh2.example.com', circuit_breaker=CircuitBreaker(failure_threshold=2, reset_timeout=0.05))
+    mock_method = MagicMock(return_value=MagicMock(status_code=500))
+
+    controller.call(mock_method)
+    controller.call(mock_method)
+
+    with pytest.raises(CircuitOpenError):
+        controller.call(mock_method)
+    assert mock_method.call_count == 2
+
+    time.sleep(0.06)
+    mock_method.return_value = MagicMock(status_code=200)
+    controller.call(mock_method)
+
+    assert controller.circuit_breaker.state == CircuitBreaker.CLOSED
+
+
+def test_failed_trial_reopens_circuit():
+    circuit_breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    circuit_breaker.record_failure()
+
+    assert circuit_breaker.allow_request()
+    assert not circuit_breaker.allow_request()
+
+    circuit_breaker.record_failure()
+    assert circuit_breaker.state == CircuitBreaker.OPEN
+
+
+def test_get_flow_controller_is_shared_per_identifier():
+    assert get_flow_controller('a.hh2.com') is get_flow_controller('a.hh2.com')
+    assert get_flow_controller('a.hh2.com') is not get_flow_controller('b.hh2.com')
@@ -14,7 +14,9 @@ from apps.workspaces.tasks import (
     async_create_admin_subscriptions,
     async_update_fyle_credentials,
     export_to_sage300,
+    import_expenses_for_export,
     run_import_export,
+    start_accounting_summary_export_window,
     trigger_run_import_export,
     schedule_sync,
     sync_org_settings,
@@ -696,3 +698,134 @@ def test_sync_org_settings(db, mocker, create_temp_workspace, add_fyle_credentia
             }
         }
     }
+
+
+def test_start_accounting_summary_export_window_keeps_completed_exports(
+    db,
+    create_temp_workspace,
+    add_accounting_export_summary
+):
+    workspace_id = 1
+    run_started_at = datetime.now() - timedelta(hours=1)
+
+    # Completed by the poller while the run was exporting, and one before the run started
+    AccountingExport.objects.create(workspace_id=workspace_id, type='PURCHASE_INVOICE', status='COMPLETE', fund_source='PERSONAL')
+    completed_before_run = AccountingExport.objects.create(workspace_id=workspace_id, type='PURCHASE_INVOICE', status='COMPLETE', fund_source='PERSONAL')
+    AccountingExport.objects.filter(id=completed_before_run.id).update(updated_at=run_started_at - timedelta(hours=1))
+
+    accounting_summary = AccountingExportSummary.objects.get(workspace_id=workspace_id)
+    accounting_summary.last_exported_at = run_started_at
+    start_accounting_summary_export_window(accounting_summary)
+
+    assert accounting_summary.successful_accounting_export_count == 1
+    assert accounting_summary.failed_accounting_export_count == 5
+    assert accounting_summary.total_accounting_export_count == 6
+
+
+def test_trigger_run_import_export_delayed_when_slot_busy(
+    db,
+    mocker,
+    create_temp_workspace,
+    add_export_settings,
+    add_advanced_settings
+):
+    """
+    Test trigger_run_import_export is published again later when the workspace already occupies its P1 slots
+    """
+    workspace_id = 1
+    mocker.patch('apps.workspaces.tasks.acquire_workspace_run_slot', return_value=None)
+    mock_run = mocker.patch('apps.workspaces.tasks._trigger_run_import_export')
+    mock_schedule_retry = mocker.patch('apps.workspaces.tasks.schedule_retry')
+
+    trigger_run_import_export(workspace_id=workspace_id, export_mode='AUTO')
+
+    mock_run.assert_not_called()
+    routing_key, payload = mock_schedule_retry.call_args[0]
+    assert routing_key.startswith('EXPORT.P1.')
+    assert payload['action'] == 'EXPORT.P1.RUN_SYNC_SCHEDULE'
+    assert payload['data'] == {'workspace_id': workspace_id, 'export_mode': 'AUTO', 'retry_count': 1}
+    assert payload['retry_count'] == 1
+
+    # The backoff grows with every delay and the run is dropped once the retries are used up
+    trigger_run_import_export(workspace_id=workspace_id, export_mode='AUTO', retry_count=2)
+    assert mock_schedule_retry.call_args[0][1]['retry_count'] == 3
+
+    mock_schedule_retry.reset_mock()
+    trigger_run_import_export(workspace_id=workspace_id, export_mode='AUTO', retry_count=4)
+    mock_schedule_retry.assert_not_called()
+    mock_run.assert_not_called()
+
+
+def test_trigger_run_import_export_releases_slot(
+    db,
+    mocker,
+    create_temp_workspace,
+    add_export_settings,
+    add_advanced_settings
+):
+    """
+    Test the run slot is released even if the run fails
+    """
+    workspace_id = 1
+    mocker.patch('apps.workspaces.tasks._trigger_run_import_export', side_effect=Exception('boom'))
+    mock_release = mocker.patch('apps.workspaces.tasks.release_workspace_run_slot')
+
+    try:
+        trigger_run_import_export(workspace_id=workspace_id)
+    except Exception:
+        pass
+
+    mock_release.assert_called_once_with('RUN_IMPORT_EXPORT_SLOT_1_0')
+
+
+def test_import_expenses_for_export_overlaps_imports(
+    db,
+    mocker,
+    settings,
+    create_temp_workspace,
+    add_export_settings
+):
+    """
+    Test reimbursable and ccc imports are both triggered when imports are overlapped
+    """
+    workspace_id = 1
+    settings.OVERLAP_EXPENSE_IMPORTS = True
+
+    export_settings = ExportSetting.objects.get(workspace_id=workspace_id)
+    export_settings.reimbursable_expenses_export_type = 'PURCHASE_INVOICE'
+    export_settings.credit_card_expense_export_type = 'DIRECT_COST'
+    export_settings.save()
+
+    mock_reimbursable = mocker.patch('apps.workspaces.tasks.queue_import_reimbursable_expenses')
+    mock_ccc = mocker.patch('apps.workspaces.tasks.queue_import_credit_card_expenses')
+    mocker.patch('apps.workspaces.tasks.connection')
+
+    import_expenses_for_export(workspace_id=workspace_id, export_settings=export_settings)
+
+    mock_reimbursable.assert_called_once_with(workspace_id=workspace_id, synchronous=True, imported_from=ExpenseImportSourceEnum.BACKGROUND_SCHEDULE)
+    mock_ccc.assert_called_once_with(workspace_id=workspace_id, synchronous=True, imported_from=ExpenseImportSourceEnum.BACKGROUND_SCHEDULE)
+
+
+def test_create_schedule_is_spread(
+    db,
+    mocker,
+    settings,
+    create_temp_workspace,
+    add_advanced_settings
+):
+    """
+    Test run_import_export schedules are offset by the workspace spread
+    """
+    workspace_id = 1
+    settings.SCHEDULE_SPREAD_WINDOW_MINUTES = 30
+    mocker.patch('apps.workspaces.tasks.get_schedule_offset_minutes', return_value=17)
+
+    advance_settings = AdvancedSetting.objects.get(workspace_id=workspace_id)
+    advance_settings.is_real_time_export_enabled = False
+    advance_settings.save()
+
+    before = datetime.now()
+    schedule_sync(workspace_id=workspace_id, schedule_enabled=True, hours=1, email_added=[], emails_selected=[])
+
+    schedule = Schedule.objects.get(args=f'{workspace_id}', func='apps.workspaces.tasks.run_import_export')
+    assert schedule.next_run.replace(tzinfo=None) >= before + timedelta(hours=1, minutes=17)
@@ -0,0 +1,153 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock
+
+from common.event import BaseEvent
+
+from workers.concurrency import ThreadSafeQConnector, find_attribute_of_type
+from workers.worker import Worker
+
+
+def _get_event(workspace_id):
+    event = BaseEvent()
+    event.from_dict({'new': {'workspace_id': workspace_id, 'action': 'EXPORT.P1.RUN_SYNC_SCHEDULE', 'data': {}}})
+    return event
+
+
+def _get_worker(max_workers=1):
+    worker = Worker(
+        rabbitmq_url='mock_url',
+        rabbitmq_exchange='mock_exchange',
+        queue_name='mock_queue',
+        binding_keys=['mock.binding.key'],
+        qconnector_cls=Mock(return_value=Mock()),
+        event_cls=BaseEvent,
+        prefetch_count=10,
+        max_workers=max_workers
+    )
+    return worker
+
+
+def test_dispatch_message_without_pool_runs_inline(mock_close_old_connections):
+    worker = _get_worker()
+    handler = Mock()
+    event = _get_event(1)
+
+    worker.dispatch_message(handler, 'EXPORT.P1.*', event, 1)
+
+    handler.assert_called_once_with('EXPORT.P1.*', event, 1)
+    # Broken or expired connections are dropped around serial messages too
+    assert mock_close_old_connections.call_count == 2
+
+
+def test_dispatch_message_serializes_workspace(mocker):
+    mocker.patch('workers.concurrency.close_old_connections')
+    worker = _get_worker(max_workers=4)
+    worker._executor = ThreadPoolExecutor(max_workers=4)
+    worker._channel = Mock()
+    worker._pika_connection = Mock()
+    worker.qconnector = ThreadSafeQConnector(worker.qconnector, worker._pika_connection)
+
+    lock = threading.Lock()
+    running = {}
+    overlaps = []
+    processed = []
+
+    def handler(routing_key, event, delivery_tag):
+        workspace_id = event.new['workspace_id']
+        with lock:
+            if running.get(workspace_id):
+                overlaps.append(workspace_id)
+            running[workspace_id] = True
+        time.sleep(0.01)
+        with lock:
+            running[workspace_id] = False
+            processed.append((workspace_id, delivery_tag))
+
+    delivery_tag = 0
+    for _ in range(3):
+        for workspace_id in (1, 2, 3):
+            delivery_tag += 1
+            worker.dispatch_message(handler, 'EXPORT.P1.*', _get_event(workspace_id), delivery_tag)
+
+    # Wait for queued messages to be picked up, shutting down drops the ones not started yet
+    for _ in range(200):
+        if len(processed) == 9:
+            break
+        time.sleep(0.01)
+    worker.shutdown_executor()
+
+    assert len(processed) == 9
+    assert overlaps == []
+    for workspace_id in (1, 2, 3):
+        tags = [tag for processed_workspace_id, tag in processed if processed_workspace_id == workspace_id]
+        assert tags == sorted(tags)
+
+
+def test_shutdown_sends_acks_before_closing(mocker):
+    mocker.patch('workers.concurrency.close_old_connections')
+    mocker.patch('workers.worker.handle_tasks', side_effect=lambda payload: time.sleep(0.05))
+    calls = []
+    mocker.patch('workers.worker.EventConsumer.shutdown', side_effect=lambda *_: calls.append('close'))
+
+    # Callbacks scheduled by pool threads only run while the consumer thread runs the connection
+    callbacks = queue.SimpleQueue()
+    pika_connection = Mock()
+    pika_connection.add_callback_threadsafe.side_effect = callbacks.put
+
+    def process_data_events(time_limit):
+        time.sleep(0.01)
+        while not callbacks.empty():
+            callbacks.get()()
+
+    pika_connection.process_data_events.side_effect = process_data_events
+
+    worker = _get_worker(max_workers=2)
+    worker.qconnector.acknowledge_message.side_effect = lambda delivery_tag: calls.append(('ack', delivery_tag))
+    worker._executor = ThreadPoolExecutor(max_workers=2)
+    worker._channel = Mock()
+    worker._pika_connection = pika_connection
+    worker.qconnector = ThreadSafeQConnector(worker.qconnector, pika_connection)
+
+    for delivery_tag, workspace_id in ((1, 1), (2, 2), (3, 1)):
+        worker.process_message('EXPORT.P1.*', _get_event(workspace_id), delivery_tag)
+
+    worker.shutdown(15, None)
+
+    worker._channel.stop_consuming.assert_called_once()
+    # 3 was queued behind 1 and is left unacknowledged for redelivery
+    assert sorted(calls[:-1]) == [('ack', 1), ('ack', 2)]
+    assert calls[-1] == 'close'
+
+
+def test_thread_safe_qconnector():
+    qconnector = Mock()
+    pika_connection = Mock()
+    proxy = ThreadSafeQConnector(qconnector, pika_connection)
+
+    # Calls on the consumer thread go straight to the connector
+    proxy.acknowledge_message(1)
+    qconnector.acknowledge_message.assert_called_once_with(1)
+
+    thread = threading.Thread(target=proxy.reject_message, args=(2,), kwargs={'requeue': False})
+    thread.start()
+    thread.join()
+
+    qconnector.reject_message.assert_not_called()
+    assert proxy.pending_callbacks == 1
+    callback = pika_connection.add_callback_threadsafe.call_args[0][0]
+    callback()
+    qconnector.reject_message.assert_called_once_with(2, requeue=False)
+    assert proxy.pending_callbacks == 0
+
+
+def test_find_attribute_of_type():
+    class Connector:
+        def __init__(self):
+            self._channel = threading.Lock()
+            self._name = 'connector'
+
+    assert find_attribute_of_type(Connector(), 'builtins.str') == 'connector'
+    assert find_attribute_of_type(Connector(), 'missing.module.Class') is None
@@ -0,0 +1,45 @@
+import pytest
+import requests
+from django_q.models import Schedule
+
+from sage_desktop_sdk.exceptions.hh2_exceptions import InternalServerError, InvalidUserCredentials
+from workers.retry import get_retry_delay, is_retryable_error, schedule_retry, should_retry
+
+
+def test_is_retryable_error():
+    assert is_retryable_error(InternalServerError('Sage down'))
+    assert is_retryable_error(requests.exceptions.ConnectionError())
+    assert is_retryable_error(Exception('unknown'))
+
+    assert not is_retryable_error(InvalidUserCredentials('Invalid credentials'))
+    assert not is_retryable_error(KeyError('workspace_id'))
+
+
+def test_get_retry_delay(settings):
+    settings.WORKER_RETRY_BASE_DELAY_SECONDS = 60
+    settings.WORKER_RETRY_MAX_DELAY_SECONDS = 600
+
+    assert 60 <= get_retry_delay(1) <= 66
+    assert 120 <= get_retry_delay(2) <= 132
+    assert 240 <= get_retry_delay(3) <= 264
+    assert 600 <= get_retry_delay(10) <= 660
+
+
+def test_should_retry(settings):
+    settings.WORKER_MAX_RETRIES = 3
+
+    assert should_retry({'retry_count': 3}, InternalServerError('Sage down'))
+    assert not should_retry({'retry_count': 4}, InternalServerError('Sage down'))
+    assert not should_retry({'retry_count': 1}, InvalidUserCredentials('Invalid credentials'))
+
+
+@pytest.mark.django_db
+def test_schedule_retry():
+    payload = {'workspace_id': 1, 'action': 'EXPORT.P1.RUN_SYNC_SCHEDULE', 'data': {'workspace_id': 1}, 'retry_count': 1}
+
+    schedule_retry('EXPORT.P1.*', payload)
+
+    schedule = Schedule.objects.get(func='workers.helpers.publish_to_rabbitmq')
+    assert schedule.schedule_type == Schedule.ONCE
+    assert "'retry_count': 1" in schedule.args
+    assert 'EXPORT.P1.*' in schedule.args
@@ -0,0 +1,105 @@
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+from django_q.models import Schedule
+
+from workers.helpers import publisher, RoutingKeyEnum, WorkerActionEnum
+from workers.retry import schedule_retry
+from workers.scheduler import (
+    dispatch_due_schedules,
+    get_next_run,
+    get_sleep_seconds,
+    parse_schedule_arguments,
+    run_scheduled_task,
+)
+
+
+def test_parse_schedule_arguments():
+    assert parse_schedule_arguments(Schedule(args='1')) == ((1,), {})
+    assert parse_schedule_arguments(Schedule(args="(1, [2, 3], 'report_1')", kwargs="{'timeout': 300, 'task_name': 'x'}")) == (
+        (1, [2, 3], 'report_1'), {}
+    )
+    assert parse_schedule_arguments(Schedule(kwargs="hours=24, workspace_id=1")) == ((), {'hours': 24, 'workspace_id': 1})
+
+
+def test_get_next_run():
+    now = timezone.now()
+
+    assert get_next_run(Schedule(schedule_type=Schedule.ONCE, next_run=now), now) is None
+    assert get_next_run(Schedule(schedule_type=Schedule.MINUTES, minutes=5, next_run=now), now) == now + timedelta(minutes=5)
+    assert get_next_run(Schedule(schedule_type=Schedule.DAILY, next_run=now), now) == now + timedelta(days=1)
+    # Missed runs are skipped
+    next_run = get_next_run(Schedule(schedule_type=Schedule.MINUTES, minutes=60, next_run=now - timedelta(hours=5, minutes=10)), now)
+    assert next_run == now + timedelta(minutes=50)
+
+
+@pytest.mark.django_db
+def test_dispatch_due_schedules(mocker):
+    mock_publish = mocker.patch.object(publisher, 'publish')
+    now = timezone.now()
+
+    schedule_retry(RoutingKeyEnum.EXPORT_P0.value, {
+        'workspace_id': 1, 'action': WorkerActionEnum.DASHBOARD_SYNC.value, 'data': {'workspace_id': 1}, 'retry_count': 1
+    })
+    Schedule.objects.filter(func='workers.helpers.publish_to_rabbitmq').update(next_run=now - timedelta(seconds=1))
+    run_import_export = Schedule.objects.create(
+        func='apps.workspaces.tasks.run_import_export', args='1', schedule_type=Schedule.MINUTES, minutes=60, next_run=now - timedelta(minutes=1)
+    )
+    reconcile = Schedule.objects.create(
+        func='apps.internal.tasks.reconcile_accounting_export_summaries', schedule_type=Schedule.DAILY, next_run=now - timedelta(minutes=1)
+    )
+    not_due = Schedule.objects.create(
+        func='apps.internal.tasks.archive_accounting_exports', schedule_type=Schedule.DAILY, next_run=now + timedelta(minutes=10)
+    )
+
+    assert dispatch_due_schedules(now) == 3
+
+    published = {call.kwargs['payload']['action']: call.kwargs for call in mock_publish.call_args_list}
+    # Publishing schedules run in the timer, the others go to the utility worker
+    assert published[WorkerActionEnum.DASHBOARD_SYNC.value]['routing_key'] == RoutingKeyEnum.EXPORT_P0.value
+    assert published[WorkerActionEnum.RUN_SYNC_SCHEDULE.value]['payload']['workspace_id'] == 1
+    assert published[WorkerActionEnum.RUN_SCHEDULED_TASK.value]['routing_key'] == RoutingKeyEnum.UTILITY.value
+    assert published[WorkerActionEnum.RUN_SCHEDULED_TASK.value]['payload']['data'] == {
+        'func': 'apps.internal.tasks.reconcile_accounting_export_summaries', 'args': [], 'kwargs': {}
+    }
+
+    assert not Schedule.objects.filter(func='workers.helpers.publish_to_rabbitmq').exists()
+    run_import_export.refresh_from_db()
+    assert run_import_export.next_run == now + timedelta(minutes=59)
+    reconcile.refresh_from_db()
+    assert reconcile.next_run > now
+
+    # Nothing due until the archive schedule
+    assert dispatch_due_schedules(now) == 0
+    assert get_sleep_seconds(now) == 60
+    assert get_sleep_seconds(not_due.next_run - timedelta(seconds=5)) == 5
+
+
+@pytest.mark.django_db
+def test_dispatch_due_schedules_disables_broken_schedule(mocker):
+    mock_publish = mocker.patch.object(publisher, 'publish')
+    now = timezone.now()
+
+    broken = Schedule.objects.create(
+        func='apps.internal.tasks.archive_accounting_exports', schedule_type=Schedule.CRON, cron='not a cron', next_run=now - timedelta(minutes=2)
+    )
+    reconcile = Schedule.objects.create(
+        func='apps.internal.tasks.reconcile_accounting_export_summaries', schedule_type=Schedule.DAILY, next_run=now - timedelta(minutes=1)
+    )
+
+    assert dispatch_due_schedules(now) == 2
+
+    broken.refresh_from_db()
+    assert broken.repeats == 0
+    reconcile.refresh_from_db()
+    assert reconcile.next_run > now
+    assert mock_publish.call_count == 1
+
+
+def test_run_scheduled_task(mocker):
+    reconcile = mocker.patch('apps.internal.tasks.reconcile_accounting_export_summaries')
+
+    run_scheduled_task('apps.internal.tasks.reconcile_accounting_export_summaries', kwargs={'hours': 2})
+
+    reconcile.assert_called_once_with(hours=2)
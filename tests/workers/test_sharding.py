@@ -0,0 +1,59 @@
+import pytest
+
+from workers.helpers import get_routing_key, get_shard_routing_key, RoutingKeyEnum
+from workers.sharding import ConsistentHashRing, get_export_routing_key, get_schedule_offset_minutes
+
+
+def test_consistent_hash_ring_is_stable():
+    ring = ConsistentHashRing(shard_count=4)
+
+    assert [ring.get_shard(workspace_id) for workspace_id in range(100)] == [ring.get_shard(workspace_id) for workspace_id in range(100)]
+    assert set(ring.get_shard(workspace_id) for workspace_id in range(1000)) == {0, 1, 2, 3}
+
+
+def test_consistent_hash_ring_moves_few_workspaces():
+    old_ring = ConsistentHashRing(shard_count=4)
+    new_ring = ConsistentHashRing(shard_count=5)
+
+    moved = [workspace_id for workspace_id in range(1000) if old_ring.get_shard(workspace_id) != new_ring.get_shard(workspace_id)]
+
+    # Only the workspaces picked up by the new shard should move
+    assert all(new_ring.get_shard(workspace_id) == 4 for workspace_id in moved)
+    assert len(moved) < 400
+
+
+def test_consistent_hash_ring_invalid_shard_count():
+    with pytest.raises(ValueError):
+        ConsistentHashRing(shard_count=0)
+
+
+def test_get_export_routing_key(settings):
+    settings.EXPORT_P1_SHARD_COUNT = 1
+    assert get_export_routing_key(1) == RoutingKeyEnum.EXPORT_P1.value
+
+    settings.EXPORT_P1_SHARD_COUNT = 3
+    routing_key = get_export_routing_key(1)
+    assert routing_key.startswith('EXPORT.P1.SHARD.')
+    assert len(routing_key.split('.')) == 4
+
+
+def test_get_shard_routing_key(settings):
+    settings.EXPORT_P1_SHARD_COUNT = 3
+
+    assert get_shard_routing_key('sage_desktop_export.p1.shard_2') == 'EXPORT.P1.SHARD.2'
+    assert get_routing_key('sage_desktop_export.p1.shard_0') == 'EXPORT.P1.SHARD.0'
+    assert get_shard_routing_key('sage_desktop_import') is None
+
+    with pytest.raises(ValueError):
+        get_shard_routing_key('sage_desktop_export.p1.shard_3')
+
+
+def test_get_schedule_offset_minutes(settings):
+    settings.SCHEDULE_SPREAD_WINDOW_MINUTES = 0
+    assert get_schedule_offset_minutes(1) == 0
+
+    settings.SCHEDULE_SPREAD_WINDOW_MINUTES = 30
+    offsets = [get_schedule_offset_minutes(workspace_id) for workspace_id in range(200)]
+    assert all(0 <= offset < 30 for offset in offsets)
+    assert len(set(offsets)) > 10
+    assert get_schedule_offset_minutes(7) == get_schedule_offset_minutes(7)
@@ -1,14 +1,23 @@
+import threading
+import time
 from unittest.mock import Mock, patch
 
 import pytest
 from common.event import BaseEvent
 from fyle_accounting_library.rabbitmq.models import FailedEvent
+from sage_desktop_sdk.exceptions.hh2_exceptions import WrongParamsError
 
-from workers.actions import handle_tasks
-from workers.helpers import get_routing_key, publish_to_rabbitmq, RoutingKeyEnum, WorkerActionEnum
+from workers.actions import RESOLVED_ACTION_METHODS, handle_tasks
+from workers.helpers import clear_publish_dedupe, get_routing_key, publish_to_rabbitmq, publisher, RoutingKeyEnum, WorkerActionEnum
 from workers.worker import Worker, main
 
 
+@pytest.fixture(autouse=True)
+def clear_resolved_action_methods():
+    RESOLVED_ACTION_METHODS.clear()
+    yield
+
+
 @pytest.fixture
 def mock_qconnector():
     return Mock()
@@ -171,15 +180,15 @@ def test_handle_exception_with_retry(export_worker):
         'retry_count': 0
     }
 
-    with patch.object(export_worker.qconnector, 'publish') as mock_publish:
+    with patch('workers.worker.schedule_retry') as mock_schedule_retry:
         with patch.object(export_worker.qconnector, 'reject_message') as mock_reject:
             try:
                 raise Exception('Test error')
             except Exception as error:
                 export_worker.handle_exception(routing_key, payload_dict, error, 1)
 
-            # Should publish retry message
-            assert mock_publish.called
+            # Should schedule a delayed retry instead of republishing immediately
+            mock_schedule_retry.assert_called_once_with(routing_key, payload_dict)
             mock_reject.assert_called_once_with(1, requeue=False)
 
             # Check retry count incremented
@@ -194,24 +203,36 @@ def test_handle_exception_max_retries(export_worker):
     payload_dict = {
         'data': {'some': 'data'},
         'workspace_id': 456,
-        'retry_count': 1
+        'retry_count': 4
     }
 
-    with patch.object(export_worker.qconnector, 'publish') as mock_publish:
+    with patch('workers.worker.schedule_retry') as mock_schedule_retry:
         with patch.object(export_worker.qconnector, 'reject_message') as mock_reject:
             try:
                 raise Exception('Max retry error')
             except Exception as error:
                 export_worker.handle_exception(routing_key, payload_dict, error, 2)
 
-            # Should NOT publish retry message (max retries reached)
-            mock_publish.assert_not_called()
+            # Should NOT retry (max retries reached)
+            mock_schedule_retry.assert_not_called()
             # Should reject the message without requeue
             mock_reject.assert_called_once_with(2, requeue=False)
 
-            # Verify retry_count was incremented to 2
+            # Verify retry_count was incremented to 5
             failed_event = FailedEvent.objects.get(routing_key=routing_key, workspace_id=456)
-            assert failed_event.payload['retry_count'] == 2
+            assert failed_event.payload['retry_count'] == 5
+
+
+@pytest.mark.django_db
+def test_handle_exception_terminal_error(export_worker):
+    """Test terminal errors are not retried"""
+    payload_dict = {'data': {}, 'workspace_id': 789, 'retry_count': 0}
+
+    with patch('workers.worker.schedule_retry') as mock_schedule_retry:
+        export_worker.handle_exception('test.routing.key', payload_dict, WrongParamsError('Bad request'), 3)
+
+    mock_schedule_retry.assert_not_called()
+    export_worker.qconnector.reject_message.assert_called_once_with(3, requeue=False)
 
 
 def test_shutdown(export_worker):
@@ -286,3 +307,131 @@ def test_publish_to_rabbitmq(mocker):
 
     mock_get_instance.assert_called_once()
     mock_rabbitmq.publish.assert_called_once()
+
+
+@pytest.mark.django_db
+def test_publish_to_rabbitmq_dedupes_idempotent_actions(mocker):
+    """Test identical idempotent payloads are published once until picked up"""
+    mock_rabbitmq = Mock()
+    mocker.patch('workers.helpers.RabbitMQConnection.get_instance', return_value=mock_rabbitmq)
+
+    payload = {
+        'workspace_id': 1,
+        'action': WorkerActionEnum.POLL_PURCHASE_INVOICE_STATUS.value,
+        'data': {'workspace_id': 1}
+    }
+
+    publish_to_rabbitmq(payload, RoutingKeyEnum.EXPORT_P1.value)
+    publish_to_rabbitmq(dict(payload), RoutingKeyEnum.EXPORT_P1.value)
+    assert mock_rabbitmq.publish.call_count == 1
+
+    clear_publish_dedupe(payload)
+    publish_to_rabbitmq(payload, RoutingKeyEnum.EXPORT_P1.value)
+    assert mock_rabbitmq.publish.call_count == 2
+
+    other_workspace_payload = {**payload, 'workspace_id': 2, 'data': {'workspace_id': 2}}
+    publish_to_rabbitmq(other_workspace_payload, RoutingKeyEnum.EXPORT_P1.value)
+    assert mock_rabbitmq.publish.call_count == 3
+
+
+@pytest.mark.django_db
+def test_publish_to_rabbitmq_failure_clears_dedupe(mocker):
+    """Test a payload that failed to publish is not dropped as a duplicate when published again"""
+    mock_rabbitmq = Mock()
+    mock_rabbitmq.publish.side_effect = Exception('broker down')
+    mocker.patch('workers.helpers.RabbitMQConnection.get_instance', return_value=mock_rabbitmq)
+
+    payload = {
+        'workspace_id': 1,
+        'action': WorkerActionEnum.RUN_SYNC_SCHEDULE.value,
+        'data': {'workspace_id': 1}
+    }
+
+    with pytest.raises(Exception):
+        with publisher.batch():
+            publish_to_rabbitmq(payload, RoutingKeyEnum.EXPORT_P1.value)
+
+    mock_rabbitmq.publish.side_effect = None
+    mock_rabbitmq.publish.reset_mock()
+    publish_to_rabbitmq(payload, RoutingKeyEnum.EXPORT_P1.value)
+    assert mock_rabbitmq.publish.call_count == 1
+
+
+@pytest.mark.django_db
+def test_publisher_batch(mocker):
+    """Test messages published inside a batch are flushed together on exit"""
+    mock_rabbitmq = Mock()
+    mocker.patch('workers.helpers.RabbitMQConnection.get_instance', return_value=mock_rabbitmq)
+
+    with publisher.batch():
+        for workspace_id in range(3):
+            publish_to_rabbitmq({'workspace_id': workspace_id, 'action': WorkerActionEnum.DASHBOARD_SYNC.value, 'data': {}}, RoutingKeyEnum.EXPORT_P0.value)
+        assert mock_rabbitmq.publish.call_count == 0
+        assert publisher.get_metrics()['buffer_depth'] == 3
+
+    assert mock_rabbitmq.publish.call_count == 3
+    assert publisher.get_metrics()['buffer_depth'] == 0
+
+
+@pytest.mark.django_db
+def test_publisher_reconnects_on_failure(mocker):
+    """Test the publisher reconnects once before giving up"""
+    mock_rabbitmq = Mock()
+    mock_rabbitmq.publish.side_effect = [Exception('connection reset'), None]
+    mocker.patch('workers.helpers.RabbitMQConnection.get_instance', return_value=mock_rabbitmq)
+
+    publish_to_rabbitmq({'workspace_id': 1, 'action': WorkerActionEnum.DASHBOARD_SYNC.value, 'data': {}}, RoutingKeyEnum.EXPORT_P0.value)
+
+    mock_rabbitmq.connect.assert_called_once()
+    assert mock_rabbitmq.publish.call_count == 2
+
+    mock_rabbitmq.publish.side_effect = Exception('broker down')
+    with pytest.raises(Exception):
+        publish_to_rabbitmq({'workspace_id': 1, 'action': WorkerActionEnum.DASHBOARD_SYNC.value, 'data': {}}, RoutingKeyEnum.EXPORT_P0.value)
+    assert publisher.get_metrics()['buffer_depth'] == 0
+
+
+def test_publisher_serializes_threads(mocker):
+    """Test threads never use the shared connection at the same time"""
+    lock = threading.Lock()
+    publishing = []
+    overlaps = []
+
+    def publish(routing_key, data):
+        with lock:
+            if publishing:
+                overlaps.append(routing_key)
+            publishing.append(routing_key)
+        time.sleep(0.005)
+        with lock:
+            publishing.remove(routing_key)
+
+    mock_rabbitmq = Mock()
+    mock_rabbitmq.publish.side_effect = publish
+    mocker.patch('workers.helpers.RabbitMQConnection.get_instance', return_value=mock_rabbitmq)
+
+    threads = [
+        threading.Thread(
+            target=publish_to_rabbitmq,
+            args=({'workspace_id': workspace_id, 'action': WorkerActionEnum.DASHBOARD_SYNC.value, 'data': {}}, RoutingKeyEnum.EXPORT_P0.value)
+        ) for workspace_id in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert mock_rabbitmq.publish.call_count == 5
+    assert overlaps == []
+
+
+@pytest.mark.django_db
+def test_handle_tasks_caches_resolved_method():
+    """Test task callables are resolved once per process"""
+    with patch('workers.actions.import_string') as mock_import_string:
+        payload = {'action': 'EXPORT.P0.DASHBOARD_SYNC', 'data': {'workspace_id': 1}}
+        handle_tasks(payload)
+        handle_tasks(payload)
+
+        mock_import_string.assert_called_once_with('apps.workspaces.tasks.export_to_sage300')
+        assert mock_import_string.return_value.call_count == 2
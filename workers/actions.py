@@ -1,11 +1,12 @@
 import logging
 import os
-from typing import Dict
+from typing import Callable, Dict, Optional
 
 import django
 from django.utils.module_loading import import_string
 
-from workers.helpers import ACTION_METHOD_MAP, WorkerActionEnum
+from sage_desktop_api.instrumentation import instrument
+from workers.helpers import ACTION_METHOD_MAP, WorkerActionEnum, clear_publish_dedupe
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "sage_desktop_api.settings")
 django.setup()
@@ -13,6 +14,25 @@ django.setup()
 logger = logging.getLogger(__name__)
 logger.level = logging.INFO
 
+# Task callables resolved from ACTION_METHOD_MAP, resolved once per process
+RESOLVED_ACTION_METHODS: Dict[WorkerActionEnum, Callable] = {}
+
+
+def get_action_method(action: WorkerActionEnum) -> Optional[Callable]:
+    """
+    Get the task callable of an action
+    :param action: WorkerActionEnum
+    :return: callable or None
+    """
+    method = RESOLVED_ACTION_METHODS.get(action)
+    if method is None:
+        method_path = ACTION_METHOD_MAP.get(action)
+        if method_path is None:
+            return None
+        method = RESOLVED_ACTION_METHODS[action] = import_string(method_path)
+
+    return method
+
 
 def handle_tasks(payload: Dict) -> None:
     """
@@ -33,10 +53,14 @@ def handle_tasks(payload: Dict) -> None:
         logger.error('Unknown action - %s for workspace_id - %s', action, payload.get('workspace_id'))
         return
 
-    method = ACTION_METHOD_MAP.get(action_enum)
+    # The message left the queue, an identical payload may be published again
+    clear_publish_dedupe(payload)
+
+    method = get_action_method(action_enum)
 
     if method is None:
         logger.error('Method is None for action - %s and workspace_id - %s', action, payload.get('workspace_id'))
         return
 
-    import_string(method)(**data)
+    with instrument('worker_action', workspace_id=payload.get('workspace_id'), action=action_enum.name):
+        method(**data)
@@ -0,0 +1,200 @@
+import functools
+import importlib
+import logging
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Set, Tuple
+
+from django.db import close_old_connections
+
+from common.event import BaseEvent
+
+logger = logging.getLogger('workers')
+
+# Connector methods that touch the channel and have to run on the consumer thread
+CHANNEL_METHODS = {'acknowledge_message', 'reject_message', 'publish'}
+
+
+def find_attribute_of_type(obj: Any, class_path: str) -> Any:
+    """
+    Find the attribute of obj whose class matches class_path, used to reach the pika
+    connection and channel of the connector without depending on its private names
+    :param obj: object to search
+    :param class_path: eg: pika.adapters.blocking_connection.BlockingConnection
+    :return: attribute or None
+    """
+    module_path, class_name = class_path.rsplit('.', 1)
+    try:
+        module = importlib.import_module(module_path)
+    except ImportError:
+        return None
+
+    cls = getattr(module, class_name)
+    for value in vars(obj).values():
+        if isinstance(value, cls):
+            return value
+
+    return None
+
+
+class ThreadSafeQConnector:
+    """
+    Proxy around the connector, channel calls made from pool threads are
+    scheduled on the consumer thread since pika channels are not thread safe
+    """
+    def __init__(self, qconnector: Any, pika_connection: Any):
+        """
+        Initialize
+        """
+        self._qconnector = qconnector
+        self._pika_connection = pika_connection
+        self._consumer_thread_id = threading.get_ident()
+        self._lock = threading.Lock()
+        self._pending_callbacks = 0
+
+    def __getattr__(self, name: str) -> Any:
+        attribute = getattr(self._qconnector, name)
+        if name not in CHANNEL_METHODS:
+            return attribute
+
+        @functools.wraps(attribute)
+        def call_on_consumer_thread(*args, **kwargs):
+            if threading.get_ident() == self._consumer_thread_id:
+                return attribute(*args, **kwargs)
+            with self._lock:
+                self._pending_callbacks += 1
+            self._pika_connection.add_callback_threadsafe(functools.partial(self._run_callback, attribute, *args, **kwargs))
+
+        return call_on_consumer_thread
+
+    def _run_callback(self, method: Callable, *args, **kwargs) -> Any:
+        try:
+            return method(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._pending_callbacks -= 1
+
+    @property
+    def pending_callbacks(self) -> int:
+        """
+        Channel calls scheduled by pool threads and not run by the consumer thread yet
+        """
+        with self._lock:
+            return self._pending_callbacks
+
+
+class ConcurrentConsumerMixin:
+    """
+    Consumer mode running messages of different workspaces concurrently on a bounded thread pool.
+    Messages of the same workspace are run one after another in delivery order.
+    The prefetch count bounds the number of unacknowledged messages held by the worker.
+    """
+    def __init__(self, *, prefetch_count: int = 1, max_workers: int = 1, **kwargs):
+        """
+        Initialize
+        :param prefetch_count: number of unacknowledged deliveries the broker sends
+        :param max_workers: pool size
+        """
+        super().__init__(**kwargs)
+        self.prefetch_count = max(prefetch_count, max_workers)
+        self.max_workers = max_workers
+        self._executor = None
+        self._pika_connection = None
+        self._channel = None
+        self._lock = threading.Lock()
+        self._running_workspaces: Set[Any] = set()
+        self._pending_messages: Dict[Any, Deque[Tuple[Callable, str, BaseEvent, int]]] = defaultdict(deque)
+
+    def connect(self) -> None:
+        """
+        Connect and switch to concurrent mode when the connector exposes a pika connection
+        """
+        super().connect()
+
+        pika_connection = find_attribute_of_type(self.qconnector, 'pika.adapters.blocking_connection.BlockingConnection')
+        channel = find_attribute_of_type(self.qconnector, 'pika.adapters.blocking_connection.BlockingChannel')
+
+        if self.max_workers <= 1 or pika_connection is None or channel is None:
+            logger.info('Consuming one message at a time')
+            return
+
+        channel.basic_qos(prefetch_count=self.prefetch_count)
+        self._pika_connection = pika_connection
+        self._channel = channel
+        self.qconnector = ThreadSafeQConnector(self.qconnector, pika_connection)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='worker')
+        logger.info('Consuming with prefetch count %s and %s threads', self.prefetch_count, self.max_workers)
+
+    def dispatch_message(self, handler: Callable, routing_key: str, event: BaseEvent, delivery_tag: int) -> None:
+        """
+        Run handler for the message on the pool, or queue it behind the running message of its workspace
+        :param handler: message handler, acks or rejects the delivery itself
+        """
+        if self._executor is None:
+            return self._run_message(handler, routing_key, event, delivery_tag)
+
+        # Messages without a workspace don't need ordering, give each its own key
+        serialization_key = event.new.get('workspace_id') or object()
+
+        with self._lock:
+            if serialization_key in self._running_workspaces:
+                self._pending_messages[serialization_key].append((handler, routing_key, event, delivery_tag))
+                return
+            self._running_workspaces.add(serialization_key)
+
+        self._executor.submit(self._run_workspace_messages, serialization_key, handler, routing_key, event, delivery_tag)
+
+    def _run_message(self, handler: Callable, routing_key: str, event: BaseEvent, delivery_tag: int) -> None:
+        """
+        Run handler, dropping connections that are broken or past CONN_MAX_AGE before and after the message
+        """
+        close_old_connections()
+        try:
+            handler(routing_key, event, delivery_tag)
+        finally:
+            close_old_connections()
+
+    def _run_workspace_messages(self, serialization_key: Any, handler: Callable, routing_key: str, event: BaseEvent, delivery_tag: int) -> None:
+        """
+        Run a message and then every message queued behind it for the same workspace
+        """
+        while True:
+            try:
+                self._run_message(handler, routing_key, event, delivery_tag)
+            except Exception:
+                logger.exception('Unhandled error while processing message with delivery tag %s', delivery_tag)
+
+            with self._lock:
+                pending_messages = self._pending_messages.get(serialization_key)
+                if not pending_messages:
+                    self._pending_messages.pop(serialization_key, None)
+                    self._running_workspaces.discard(serialization_key)
+                    return
+                handler, routing_key, event, delivery_tag = pending_messages.popleft()
+
+    def _is_busy(self) -> bool:
+        with self._lock:
+            if self._running_workspaces:
+                return True
+        # Pool threads schedule their acks before leaving the running set
+        return self.qconnector.pending_callbacks > 0
+
+    def shutdown_executor(self, poll_seconds: float = 0.5) -> None:
+        """
+        Stop consuming and run the connection until the running messages finish and their acks are sent,
+        the connection can be closed after this without redelivering finished messages.
+        Messages queued behind a running one are dropped unacknowledged and redelivered by the broker.
+        :param poll_seconds: time limit of each connection event loop run
+        """
+        if self._executor is None:
+            return
+
+        self._channel.stop_consuming()
+        with self._lock:
+            self._pending_messages.clear()
+
+        while self._is_busy():
+            self._pika_connection.process_data_events(time_limit=poll_seconds)
+
+        self._executor.shutdown(wait=True)
@@ -14,6 +14,7 @@ from fyle_accounting_library.fyle_platform.enums import ExpenseImportSourceEnum
 
 from apps.fyle.tasks import import_expenses
 from apps.accounting_exports.models import AccountingExport
+from sage_desktop_api.instrumentation import instrument
 
 
 logger = logging.getLogger(__name__)
@@ -31,4 +32,5 @@ def handle_exports(data: Dict) -> None:
     )
     data['accounting_export_id'] = accounting_export.id
 
-    import_expenses(**data)
+    with instrument('worker_action', workspace_id=data['workspace_id'], action='IMPORT_EXPENSES'):
+        import_expenses(**data)
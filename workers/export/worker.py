@@ -11,14 +11,17 @@ from common.event import BaseEvent
 from common.qconnector import RabbitMQConnector
 from consumer.event_consumer import EventConsumer
 from fyle_accounting_library.fyle_platform.enums import RoutingKeyEnum
-from fyle_accounting_library.rabbitmq.data_class import RabbitMQData
 from fyle_accounting_library.rabbitmq.helpers import create_cache_table
 from fyle_accounting_library.rabbitmq.models import FailedEvent
 
+from workers.concurrency import ConcurrentConsumerMixin
+from workers.helpers import start_worker_metrics_server
+from workers.retry import schedule_retry, should_retry
+
 logger = logging.getLogger('workers')
 
 
-class ExportWorker(EventConsumer):
+class ExportWorker(ConcurrentConsumerMixin, EventConsumer):
     """
     Export Worker
     """
@@ -30,7 +33,13 @@ class ExportWorker(EventConsumer):
 
     def process_message(self, routing_key: str, event: BaseEvent, delivery_tag: int) -> None:
         """
-        Process message
+        Process message, on the pool when the worker runs in concurrent mode
+        """
+        self.dispatch_message(self._process_message, routing_key, event, delivery_tag)
+
+    def _process_message(self, routing_key: str, event: BaseEvent, delivery_tag: int) -> None:
+        """
+        Run the task and ack the message
         """
         payload_dict = event.new
         try:
@@ -61,23 +70,19 @@ class ExportWorker(EventConsumer):
             workspace_id=payload_dict['workspace_id'] if payload_dict.get('workspace_id') else None
         )
 
-        if payload_dict['retry_count'] < 2:
-            logger.info('Publishing new message with incremented retry count')
-            data = RabbitMQData(
-                new=payload_dict
-            )
-            self.qconnector.publish(RoutingKeyEnum.EXPORT, data.to_json())
-
-            self.qconnector.reject_message(delivery_tag, requeue=False)
+        if should_retry(payload_dict, error):
+            schedule_retry(routing_key, payload_dict)
         else:
-            logger.info('Max retries reached, dropping message')
-            self.qconnector.reject_message(delivery_tag, requeue=False)
+            logger.info('Not retrying message after %s attempts, error - %s', payload_dict['retry_count'], error.__class__.__name__)
+
+        self.qconnector.reject_message(delivery_tag, requeue=False)
 
     def shutdown(self, _: int, __: int) -> None:
         """
         Shutdown
         """
         logger.info('Received signal %s, shutting down...', _)
+        self.shutdown_executor()
         super().shutdown()
 
 
@@ -95,12 +100,15 @@ def consume() -> None:
         queue_name='sage_desktop_queue',
         binding_keys=RoutingKeyEnum.EXPORT,
         qconnector_cls=RabbitMQConnector,
-        event_cls=BaseEvent
+        event_cls=BaseEvent,
+        prefetch_count=int(os.environ.get('WORKER_PREFETCH_COUNT', 1)),
+        max_workers=int(os.environ.get('WORKER_CONCURRENCY', 1))
     )
 
     signal.signal(signal.SIGTERM, export_worker.shutdown)
     signal.signal(signal.SIGINT, export_worker.shutdown)
 
+    start_worker_metrics_server()
     export_worker.connect()
     export_worker.start_consuming()
 
@@ -1,9 +1,24 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
 from enum import Enum
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
 
 from fyle_accounting_library.rabbitmq.connector import RabbitMQConnection
 from fyle_accounting_library.rabbitmq.data_class import RabbitMQData
 from fyle_accounting_library.rabbitmq.enums import RabbitMQExchangeEnum
 
+from sage_desktop_api.instrumentation import registry, start_metrics_server
+
+logger = logging.getLogger(__name__)
+
 
 class RoutingKeyEnum(str, Enum):
     """
@@ -29,6 +44,8 @@ class WorkerActionEnum(str, Enum):
     RUN_SYNC_SCHEDULE = 'EXPORT.P1.RUN_SYNC_SCHEDULE'
     POLL_PURCHASE_INVOICE_STATUS = 'EXPORT.P1.POLL_PURCHASE_INVOICE_STATUS'
     POLL_DIRECT_COST_STATUS = 'EXPORT.P1.POLL_DIRECT_COST_STATUS'
+    POLL_QUEUED_ACCOUNTING_EXPORTS = 'UTILITY.POLL_QUEUED_ACCOUNTING_EXPORTS'
+    RUN_SCHEDULED_TASK = 'UTILITY.RUN_SCHEDULED_TASK'
 
     EXPENSE_UPDATED_AFTER_APPROVAL = 'UTILITY.EXPENSE_UPDATED_AFTER_APPROVAL'
     EXPENSE_ADDED_EJECTED_FROM_REPORT = 'UTILITY.EXPENSE_ADDED_EJECTED_FROM_REPORT'
@@ -55,8 +72,10 @@ ACTION_METHOD_MAP = {
     WorkerActionEnum.RUN_SYNC_SCHEDULE: 'apps.workspaces.tasks.trigger_run_import_export',
     WorkerActionEnum.POLL_PURCHASE_INVOICE_STATUS: 'apps.sage300.exports.purchase_invoice.queues.trigger_poll_operation_status',
     WorkerActionEnum.POLL_DIRECT_COST_STATUS: 'apps.sage300.exports.direct_cost.queues.trigger_poll_operation_status',
+    WorkerActionEnum.POLL_QUEUED_ACCOUNTING_EXPORTS: 'apps.sage300.exports.polling.poll_queued_accounting_exports',
+    WorkerActionEnum.RUN_SCHEDULED_TASK: 'workers.scheduler.run_scheduled_task',
     WorkerActionEnum.IMPORT_DIMENSIONS_TO_FYLE: 'apps.mappings.queue.initiate_import_to_fyle',
-    WorkerActionEnum.EXPENSE_UPDATED_AFTER_APPROVAL: 'apps.fyle.tasks.update_non_exported_expenses',
+    WorkerActionEnum.EXPENSE_UPDATED_AFTER_APPROVAL: 'apps.fyle.tasks.apply_pending_expense_updates',
     WorkerActionEnum.EXPENSE_ADDED_EJECTED_FROM_REPORT: 'apps.fyle.tasks.handle_expense_report_change',
     WorkerActionEnum.CHECK_INTERVAL_AND_SYNC_FYLE_DIMENSION: 'apps.fyle.helpers.check_interval_and_sync_dimension',
     WorkerActionEnum.HANDLE_ORG_SETTING_UPDATED: 'apps.fyle.tasks.handle_org_setting_updated',
@@ -65,6 +84,34 @@ ACTION_METHOD_MAP = {
 }
 
 
+EXPORT_P1_SHARD_QUEUE_PREFIX = 'sage_desktop_export.p1.shard_'
+EXPORT_P1_SHARD_ROUTING_KEY = 'EXPORT.P1.SHARD.{shard}'
+
+
+def get_export_shard_count() -> int:
+    """
+    Number of P1 export shards, 1 means sharding is disabled, see workers.sharding
+    :return: int
+    """
+    return max(int(getattr(settings, 'EXPORT_P1_SHARD_COUNT', 1)), 1)
+
+
+def get_shard_routing_key(queue_name: str) -> str:
+    """
+    Get the binding key for a shard queue, None for non shard queues
+    :param queue_name: queue name, eg: sage_desktop_export.p1.shard_3
+    :return: routing key
+    """
+    if not queue_name.startswith(EXPORT_P1_SHARD_QUEUE_PREFIX):
+        return None
+
+    shard = queue_name[len(EXPORT_P1_SHARD_QUEUE_PREFIX):]
+    if not shard.isdigit() or int(shard) >= get_export_shard_count():
+        raise ValueError(f'Unknown shard queue: {queue_name}. Shard count is {get_export_shard_count()}')
+
+    return EXPORT_P1_SHARD_ROUTING_KEY.format(shard=int(shard))
+
+
 def get_routing_key(queue_name: str) -> str:
     """
     Get the routing key for a given queue name
@@ -73,11 +120,180 @@ def get_routing_key(queue_name: str) -> str:
     :raises ValueError: if queue_name is not found in QUEUE_BINDKEY_MAP
     """
     routing_key = QUEUE_BINDKEY_MAP.get(queue_name)
+    if routing_key is None:
+        # Sharded P1 export queues are derived from EXPORT_P1_SHARD_COUNT
+        routing_key = get_shard_routing_key(queue_name)
     if routing_key is None:
         raise ValueError(f'Unknown queue name: {queue_name}. Valid queue names are: {list(QUEUE_BINDKEY_MAP.keys())}')
     return routing_key
 
 
+# Idempotent actions, a second copy published while the first one is still queued is dropped
+DEDUPLICATED_ACTIONS = {
+    WorkerActionEnum.RUN_SYNC_SCHEDULE,
+    WorkerActionEnum.POLL_PURCHASE_INVOICE_STATUS,
+    WorkerActionEnum.POLL_DIRECT_COST_STATUS,
+    WorkerActionEnum.POLL_QUEUED_ACCOUNTING_EXPORTS,
+    WorkerActionEnum.IMPORT_DIMENSIONS_TO_FYLE,
+    WorkerActionEnum.CHECK_INTERVAL_AND_SYNC_FYLE_DIMENSION,
+    WorkerActionEnum.BACKGROUND_SCHEDULE_EXPORT,
+    WorkerActionEnum.EXPENSE_UPDATED_AFTER_APPROVAL,
+}
+
+
+def get_publish_dedupe_key(payload: dict) -> Optional[str]:
+    """
+    Get the dedupe key of a payload, None if the action is not deduplicated
+    :param payload: dict
+    :return: cache key
+    """
+    if payload.get('action') not in {action.value for action in DEDUPLICATED_ACTIONS}:
+        return None
+
+    fingerprint = json.dumps(
+        [payload.get('action'), payload.get('workspace_id'), payload.get('data')],
+        sort_keys=True,
+        default=str
+    )
+    return 'RABBITMQ_PUBLISHED_{}'.format(hashlib.sha1(fingerprint.encode('utf-8')).hexdigest())
+
+
+def clear_publish_dedupe(payload: dict) -> None:
+    """
+    Allow the payload to be published again, called once the message is picked up by a worker
+    :param payload: dict
+    :return: None
+    """
+    dedupe_key = get_publish_dedupe_key(payload)
+    if dedupe_key:
+        cache.delete(dedupe_key)
+
+
+class RabbitMQPublisher:
+    """
+    Per process publisher on top of the persistent RabbitMQConnection instance.
+    Reconnects once on publish failures, buffers messages inside batch() blocks,
+    drops duplicate idempotent payloads and keeps publish metrics.
+    Flushes hold a lock since the pika connection is shared by every thread of the process.
+    """
+    def __init__(self):
+        """
+        Initialize
+        """
+        self._lock = threading.Lock()
+        self._connection_lock = threading.Lock()
+        self._local = threading.local()
+        self.metrics = {
+            'published_count': 0,
+            'deduplicated_count': 0,
+            'failed_count': 0,
+            'batch_count': 0,
+            'publish_latency_seconds_total': 0.0,
+            'publish_latency_seconds_max': 0.0,
+        }
+
+    def _get_local(self) -> threading.local:
+        """
+        Buffers are per thread so concurrent requests never flush each other's batches
+        """
+        if not hasattr(self._local, 'buffer'):
+            self._local.buffer = []
+            self._local.batch_depth = 0
+        return self._local
+
+    def get_metrics(self) -> Dict:
+        """
+        Publish metrics of this process, buffer_depth is the number of messages waiting for a flush
+        :return: dict
+        """
+        with self._lock:
+            metrics = dict(self.metrics)
+        metrics['buffer_depth'] = len(self._get_local().buffer)
+        return metrics
+
+    def _increment(self, metric: str, value: float = 1) -> None:
+        with self._lock:
+            self.metrics[metric] += value
+
+    def publish(self, payload: dict, routing_key: str) -> None:
+        """
+        Publish a message, inside a batch() block the message is buffered until the block exits
+        :param payload: dict
+        :param routing_key: routing key
+        :return: None
+        """
+        dedupe_key = get_publish_dedupe_key(payload)
+        # cache.add only succeeds for the first publish within the window, the key is kept with the
+        # buffered message and deleted if the message is never sent
+        if dedupe_key and not cache.add(dedupe_key, True, timeout=getattr(settings, 'RABBITMQ_PUBLISH_DEDUPE_SECONDS', 300)):
+            self._increment('deduplicated_count')
+            logger.info('Skipping duplicate %s for workspace %s', payload.get('action'), payload.get('workspace_id'))
+            return
+
+        local = self._get_local()
+        local.buffer.append((routing_key, payload, dedupe_key))
+
+        if not local.batch_depth or len(local.buffer) >= getattr(settings, 'RABBITMQ_PUBLISH_BATCH_SIZE', 100):
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Publish buffered messages, the connection is re-established once before giving up
+        :return: None
+        """
+        buffer = self._get_local().buffer
+        if not buffer:
+            return
+
+        start_time = time.monotonic()
+        # Worker pool threads publish too, the connection and its reconnect are used by one thread at a time
+        with self._connection_lock:
+            for attempt in range(2):
+                rabbitmq = RabbitMQConnection.get_instance(RabbitMQExchangeEnum.SAGE_DESKTOP_EXCHANGE)
+                try:
+                    while buffer:
+                        routing_key, payload, _ = buffer[0]
+                        rabbitmq.publish(routing_key, RabbitMQData(new=payload))
+                        buffer.pop(0)
+                        self._increment('published_count')
+                    break
+                except Exception:
+                    self._increment('failed_count')
+                    if attempt:
+                        # The unsent messages were never queued, a later publish must not be dropped as their duplicate
+                        dedupe_keys = [dedupe_key for _, _, dedupe_key in buffer if dedupe_key]
+                        buffer.clear()
+                        if dedupe_keys:
+                            cache.delete_many(dedupe_keys)
+                        raise
+                    logger.warning('Publishing to RabbitMQ failed, reconnecting')
+                    rabbitmq.connect()
+
+        latency = time.monotonic() - start_time
+        with self._lock:
+            self.metrics['batch_count'] += 1
+            self.metrics['publish_latency_seconds_total'] += latency
+            self.metrics['publish_latency_seconds_max'] = max(self.metrics['publish_latency_seconds_max'], latency)
+
+    @contextmanager
+    def batch(self):
+        """
+        Buffer every publish made inside the block and publish them together on exit
+        """
+        local = self._get_local()
+        local.batch_depth += 1
+        try:
+            yield self
+        finally:
+            local.batch_depth -= 1
+            if not local.batch_depth:
+                self.flush()
+
+
+publisher = RabbitMQPublisher()
+registry.register_collector(lambda: {'rabbitmq_publish_{}'.format(metric): value for metric, value in publisher.get_metrics().items()})
+
+
 def publish_to_rabbitmq(payload: dict, routing_key: RoutingKeyEnum) -> None:
     """
     Publish messages to RabbitMQ
@@ -85,6 +301,12 @@ def publish_to_rabbitmq(payload: dict, routing_key: RoutingKeyEnum) -> None:
     :param: routing_key: RoutingKeyEnum
     :return: None
     """
-    rabbitmq = RabbitMQConnection.get_instance(RabbitMQExchangeEnum.SAGE_DESKTOP_EXCHANGE)
-    data = RabbitMQData(new=payload)
-    rabbitmq.publish(routing_key, data)
+    publisher.publish(payload=payload, routing_key=routing_key)
+
+
+def start_worker_metrics_server() -> None:
+    """
+    Serve the Prometheus metrics of this worker process when WORKER_METRICS_PORT is set
+    :return: None
+    """
+    start_metrics_server(os.environ.get('WORKER_METRICS_PORT'))
@@ -0,0 +1,113 @@
+import logging
+import random
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import InterfaceError, OperationalError
+from django.utils import timezone
+from django_q.models import Schedule
+from django_q.tasks import schedule
+from fyle.platform.exceptions import InvalidTokenError as FyleInvalidTokenError
+from fyle.platform.exceptions import NoPrivilegeError, RetryException
+
+from sage_desktop_sdk.exceptions.hh2_exceptions import (
+    CircuitOpenError,
+    InternalServerError,
+    InvalidUserCredentials,
+    InvalidWebApiClientCredentials,
+    NotAcceptableClientError,
+    NotFoundItemError,
+    UserAccountLocked,
+    WebApiClientLocked,
+    WrongParamsError,
+)
+
+logger = logging.getLogger('workers')
+
+# Errors that can go away on their own, eg: hh2 / Fyle outages and dropped DB connections
+RETRYABLE_ERRORS = (
+    CircuitOpenError,
+    InternalServerError,
+    RetryException,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    OperationalError,
+    InterfaceError,
+)
+
+# Errors that fail the same way on every attempt until someone fixes credentials, data or code
+TERMINAL_ERRORS = (
+    WrongParamsError,
+    NotFoundItemError,
+    NotAcceptableClientError,
+    InvalidUserCredentials,
+    InvalidWebApiClientCredentials,
+    UserAccountLocked,
+    WebApiClientLocked,
+    NoPrivilegeError,
+    FyleInvalidTokenError,
+    ObjectDoesNotExist,
+    KeyError,
+    TypeError,
+    ValueError,
+)
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """
+    Check if a failed message should be retried
+    :param error: exception raised by the task
+    :return: bool
+    """
+    if isinstance(error, RETRYABLE_ERRORS):
+        return True
+
+    if isinstance(error, TERMINAL_ERRORS):
+        return False
+
+    # Unknown errors keep being retried like before
+    return True
+
+
+def get_retry_delay(retry_count: int) -> int:
+    """
+    Exponential backoff with jitter for the nth retry
+    :param retry_count: retry number, starting at 1
+    :return: delay in seconds
+    """
+    base_delay = getattr(settings, 'WORKER_RETRY_BASE_DELAY_SECONDS', 60)
+    max_delay = getattr(settings, 'WORKER_RETRY_MAX_DELAY_SECONDS', 60 * 60)
+
+    delay = min(base_delay * 2 ** (max(retry_count, 1) - 1), max_delay)
+    return int(delay + random.uniform(0, delay * 0.1))
+
+
+def should_retry(payload: dict, error: Exception) -> bool:
+    """
+    Check if the payload has retries left and the error is retryable
+    :param payload: payload with the already incremented retry_count
+    :param error: exception raised by the task
+    :return: bool
+    """
+    return payload.get('retry_count', 0) <= getattr(settings, 'WORKER_MAX_RETRIES', 4) and is_retryable_error(error)
+
+
+def schedule_retry(routing_key: str, payload: dict) -> None:
+    """
+    Re-publish the payload after the backoff delay of its retry_count
+    :param routing_key: routing key the message was consumed from
+    :param payload: payload with the already incremented retry_count
+    :return: None
+    """
+    delay = get_retry_delay(payload.get('retry_count', 1))
+    logger.info('Retrying %s for workspace %s in %s seconds', payload.get('action'), payload.get('workspace_id'), delay)
+
+    schedule(
+        'workers.helpers.publish_to_rabbitmq',
+        payload,
+        routing_key,
+        schedule_type=Schedule.ONCE,
+        next_run=timezone.now() + timedelta(seconds=delay)
+    )
@@ -0,0 +1,227 @@
+"""
+Timer process dispatching due django_q_schedule rows through RabbitMQ
+
+Schedules are still written as Django-Q Schedule rows, existing ones included, but instead of every
+qcluster polling the schedule and ormq tables, one timer process (manage.py run_scheduler) locks the
+due rows, dispatches them and sleeps until the next one is due, at most SCHEDULER_MAX_SLEEP_SECONDS.
+Tasks that only publish to RabbitMQ run in the timer itself, the others are published as
+RUN_SCHEDULED_TASK and run by the utility worker.
+"""
+import ast
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Min
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from django_q.models import Schedule
+
+from workers.helpers import publish_to_rabbitmq, publisher, RoutingKeyEnum, WorkerActionEnum
+
+logger = logging.getLogger('workers')
+
+# Scheduled functions that only publish to RabbitMQ, cheap enough to run in the timer
+INLINE_SCHEDULE_FUNCS = {
+    'workers.helpers.publish_to_rabbitmq',
+    'apps.workspaces.tasks.run_import_export',
+    'apps.sage300.exports.polling.publish_poll_queued_accounting_exports',
+}
+
+# Django-Q task options stored with the schedule kwargs, they are not arguments of the function
+Q_OPTION_KEYS = {'q_options', 'timeout', 'hook', 'group', 'save', 'sync', 'cached', 'ack_failure', 'broker', 'task_name'}
+
+SCHEDULE_INTERVALS = {
+    Schedule.HOURLY: relativedelta(hours=1),
+    Schedule.DAILY: relativedelta(days=1),
+    Schedule.WEEKLY: relativedelta(weeks=1),
+    Schedule.MONTHLY: relativedelta(months=1),
+    Schedule.QUARTERLY: relativedelta(months=3),
+    Schedule.YEARLY: relativedelta(years=1),
+}
+
+
+def parse_schedule_arguments(schedule: Schedule) -> Tuple[tuple, Dict]:
+    """
+    Arguments of a schedule, stored by Django-Q as the repr of the args tuple and kwargs dict
+    :param schedule: Schedule
+    :return: (args, kwargs)
+    """
+    args = ()
+    if schedule.args:
+        args = ast.literal_eval(schedule.args)
+        if not isinstance(args, tuple):
+            args = (args,)
+
+    kwargs = {}
+    if schedule.kwargs:
+        try:
+            kwargs = ast.literal_eval(schedule.kwargs)
+        except (SyntaxError, ValueError):
+            # Written by hand as "key=value, ..."
+            call = ast.parse('dict({})'.format(schedule.kwargs), mode='eval').body
+            kwargs = {keyword.arg: ast.literal_eval(keyword.value) for keyword in call.keywords}
+
+    return args, {key: value for key, value in kwargs.items() if key not in Q_OPTION_KEYS}
+
+
+def get_next_run(schedule: Schedule, now: datetime) -> Optional[datetime]:
+    """
+    Next run of a repeating schedule after now, missed runs are skipped like catch_up=False
+    :param schedule: Schedule
+    :param now: current time
+    :return: next run, None for ONCE schedules
+    """
+    if schedule.schedule_type == Schedule.ONCE:
+        return None
+
+    if schedule.schedule_type == Schedule.CRON:
+        croniter = import_string('croniter.croniter')
+        return croniter(schedule.cron, max(schedule.next_run, now)).get_next(datetime)
+
+    interval = SCHEDULE_INTERVALS.get(schedule.schedule_type, relativedelta(minutes=schedule.minutes or 1))
+    next_run = schedule.next_run + interval
+    if next_run <= now:
+        # Jump over the missed runs of a long stopped scheduler in one go for fixed length intervals
+        if schedule.schedule_type == Schedule.MINUTES:
+            step = timedelta(minutes=schedule.minutes or 1)
+            next_run += step * ((now - next_run) // step)
+        while next_run <= now:
+            next_run += interval
+
+    return next_run
+
+
+def dispatch_schedule(schedule: Schedule) -> None:
+    """
+    Run an inline schedule or publish it to the utility worker
+    :param schedule: Schedule
+    :return: None
+    """
+    args, kwargs = parse_schedule_arguments(schedule)
+
+    if schedule.func in INLINE_SCHEDULE_FUNCS:
+        import_string(schedule.func)(*args, **kwargs)
+        return
+
+    payload = {
+        'workspace_id': args[0] if args and isinstance(args[0], int) else None,
+        'action': WorkerActionEnum.RUN_SCHEDULED_TASK.value,
+        'data': {
+            'func': schedule.func,
+            'args': list(args),
+            'kwargs': kwargs
+        }
+    }
+    publish_to_rabbitmq(payload=payload, routing_key=RoutingKeyEnum.UTILITY.value)
+
+
+def run_scheduled_task(func: str, args: list = None, kwargs: dict = None) -> None:
+    """
+    Run a scheduled function in the worker
+    :param func: dotted path of the function
+    :param args: positional arguments
+    :param kwargs: keyword arguments
+    :return: None
+    """
+    import_string(func)(*(args or []), **(kwargs or {}))
+
+
+def dispatch_due_schedules(now: datetime = None) -> int:
+    """
+    Dispatch the schedules due at now and move them to their next run, ONCE schedules are deleted
+    unless they have positive repeats. Locked rows are skipped so a second timer never doubles a run
+    :param now: current time
+    :return: number of dispatched schedules
+    """
+    now = now or timezone.now()
+    batch_size = getattr(settings, 'SCHEDULER_BATCH_SIZE', 100)
+    dispatched_count = 0
+
+    while True:
+        with transaction.atomic(), publisher.batch():
+            schedules = list(
+                Schedule.objects.select_for_update(skip_locked=True).exclude(repeats=0).filter(
+                    next_run__lte=now
+                ).order_by('next_run')[:batch_size]
+            )
+
+            for schedule in schedules:
+                try:
+                    next_run = get_next_run(schedule, now)
+                except Exception as exception:
+                    # Fails the same way on every tick, eg: an invalid cron, disabled so it can't block the others
+                    logger.exception('Disabling schedule %s of %s, next run failed | ERROR: %s', schedule.id, schedule.func, exception)
+                    schedule.repeats = 0
+                    schedule.save(update_fields=['repeats'])
+                    continue
+
+                try:
+                    # A savepoint per schedule, a failed query of one dispatch does not abort the batch
+                    with transaction.atomic():
+                        dispatch_schedule(schedule)
+                except Exception as exception:
+                    # A broken schedule must not hold back the others, it is moved on like a run
+                    logger.exception('Dispatching schedule %s of %s failed | ERROR: %s', schedule.id, schedule.func, exception)
+
+                if next_run is None:
+                    if schedule.repeats < 0:
+                        schedule.delete()
+                        continue
+                    schedule.repeats = 0
+                else:
+                    schedule.next_run = next_run
+                    schedule.repeats -= 1
+                schedule.save(update_fields=['next_run', 'repeats'])
+
+        dispatched_count += len(schedules)
+        if len(schedules) < batch_size:
+            return dispatched_count
+
+
+def get_sleep_seconds(now: datetime = None) -> float:
+    """
+    Time until the next schedule is due, capped at SCHEDULER_MAX_SLEEP_SECONDS so schedules
+    added while sleeping wait at most that long
+    :param now: current time
+    :return: seconds
+    """
+    now = now or timezone.now()
+    max_sleep_seconds = getattr(settings, 'SCHEDULER_MAX_SLEEP_SECONDS', 60)
+
+    next_run = Schedule.objects.exclude(repeats=0).aggregate(next_run=Min('next_run'))['next_run']
+    if next_run is None:
+        return max_sleep_seconds
+
+    return min(max((next_run - now).total_seconds(), 0), max_sleep_seconds)
+
+
+class Scheduler:
+    """
+    Timer loop, dispatch what is due then sleep until the next schedule, stop() ends the loop
+    """
+    def __init__(self):
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        logger.info('Scheduler started')
+        while not self._stopped.is_set():
+            close_old_connections()
+            try:
+                dispatched_count = dispatch_due_schedules()
+                if dispatched_count:
+                    logger.info('Dispatched %s schedules', dispatched_count)
+                sleep_seconds = get_sleep_seconds()
+            except Exception as exception:
+                logger.exception('Scheduler tick failed | ERROR: %s', exception)
+                sleep_seconds = getattr(settings, 'SCHEDULER_MAX_SLEEP_SECONDS', 60)
+
+            self._stopped.wait(sleep_seconds)
+        logger.info('Scheduler stopped')
+
+    def stop(self, *_) -> None:
+        self._stopped.set()
@@ -0,0 +1,91 @@
+import bisect
+import hashlib
+from functools import lru_cache
+from typing import List
+
+from django.conf import settings
+
+from workers.helpers import EXPORT_P1_SHARD_ROUTING_KEY, get_export_shard_count, RoutingKeyEnum
+
+
+def _hash(value: str) -> int:
+    """
+    Stable 64 bit hash, python's hash() is salted per process
+    :param value: str
+    :return: int
+    """
+    return int(hashlib.md5(value.encode('utf-8')).hexdigest()[:16], 16)
+
+
+class ConsistentHashRing:
+    """
+    Consistent hash ring mapping workspaces to export shards.
+    Adding or removing a shard only moves the workspaces owned by that shard.
+    """
+    def __init__(self, shard_count: int, virtual_nodes: int = 64):
+        """
+        Initialize
+        :param shard_count: number of shards
+        :param virtual_nodes: virtual nodes per shard
+        """
+        if shard_count < 1:
+            raise ValueError('shard_count must be at least 1')
+
+        self.shard_count = shard_count
+        ring = sorted(
+            (_hash('shard-{}-{}'.format(shard, node)), shard)
+            for shard in range(shard_count)
+            for node in range(virtual_nodes)
+        )
+        self._keys: List[int] = [key for key, _ in ring]
+        self._shards: List[int] = [shard for _, shard in ring]
+
+    def get_shard(self, workspace_id: int) -> int:
+        """
+        Get the shard owning a workspace
+        :param workspace_id: workspace id
+        :return: shard number
+        """
+        index = bisect.bisect(self._keys, _hash('workspace-{}'.format(workspace_id)))
+        return self._shards[index % len(self._keys)]
+
+
+@lru_cache(maxsize=8)
+def _get_ring(shard_count: int) -> ConsistentHashRing:
+    return ConsistentHashRing(shard_count)
+
+
+def get_export_shard(workspace_id: int) -> int:
+    """
+    Get the P1 export shard for a workspace
+    :param workspace_id: workspace id
+    :return: shard number
+    """
+    return _get_ring(get_export_shard_count()).get_shard(workspace_id)
+
+
+def get_export_routing_key(workspace_id: int) -> str:
+    """
+    Get the P1 export routing key for a workspace.
+    Shard routing keys have four words so they never match the EXPORT.P1.* binding.
+    :param workspace_id: workspace id
+    :return: routing key
+    """
+    if get_export_shard_count() == 1:
+        return RoutingKeyEnum.EXPORT_P1.value
+
+    return EXPORT_P1_SHARD_ROUTING_KEY.format(shard=get_export_shard(workspace_id))
+
+
+def get_schedule_offset_minutes(workspace_id: int) -> int:
+    """
+    Deterministic offset used to spread workspace schedules over a window
+    instead of firing every workspace at the same minute
+    :param workspace_id: workspace id
+    :return: offset in minutes
+    """
+    window = int(getattr(settings, 'SCHEDULE_SPREAD_WINDOW_MINUTES', 0))
+    if window <= 0:
+        return 0
+
+    return _hash('schedule-{}'.format(workspace_id)) % window
@@ -11,17 +11,18 @@ from workers.actions import handle_tasks
 from common.event import BaseEvent
 from common.qconnector import RabbitMQConnector
 from consumer.event_consumer import EventConsumer
-from fyle_accounting_library.rabbitmq.data_class import RabbitMQData
 from fyle_accounting_library.rabbitmq.enums import RabbitMQExchangeEnum
 from fyle_accounting_library.rabbitmq.helpers import create_cache_table
 from fyle_accounting_library.rabbitmq.models import FailedEvent
 
-from workers.helpers import get_routing_key
+from workers.concurrency import ConcurrentConsumerMixin
+from workers.retry import schedule_retry, should_retry
+from workers.helpers import get_routing_key, start_worker_metrics_server
 
 logger = logging.getLogger('workers')
 
 
-class Worker(EventConsumer):
+class Worker(ConcurrentConsumerMixin, EventConsumer):
     """
     Generic Worker
     """
@@ -33,7 +34,13 @@ class Worker(EventConsumer):
 
     def process_message(self, routing_key: str, event: BaseEvent, delivery_tag: int) -> None:
         """
-        Process message
+        Process message, on the pool when the worker runs in concurrent mode
+        """
+        self.dispatch_message(self._process_message, routing_key, event, delivery_tag)
+
+    def _process_message(self, routing_key: str, event: BaseEvent, delivery_tag: int) -> None:
+        """
+        Run the task and ack the message
         """
         payload_dict = event.new
         try:
@@ -64,23 +71,19 @@ class Worker(EventConsumer):
             workspace_id=payload_dict['workspace_id'] if payload_dict.get('workspace_id') else None
         )
 
-        if payload_dict['retry_count'] < 2:
-            logger.info('Publishing new message with incremented retry count')
-            data = RabbitMQData(
-                new=payload_dict
-            )
-            self.qconnector.publish(routing_key, data.to_json())
-
-            self.qconnector.reject_message(delivery_tag, requeue=False)
+        if should_retry(payload_dict, error):
+            schedule_retry(routing_key, payload_dict)
         else:
-            logger.info('Max retries reached, dropping message')
-            self.qconnector.reject_message(delivery_tag, requeue=False)
+            logger.info('Not retrying message after %s attempts, error - %s', payload_dict['retry_count'], error.__class__.__name__)
+
+        self.qconnector.reject_message(delivery_tag, requeue=False)
 
     def shutdown(self, _: int, __: int) -> None:
         """
         Shutdown
         """
         logger.info('Received signal %s, shutting down...', _)
+        self.shutdown_executor()
         super().shutdown()
 
 
@@ -98,12 +101,15 @@ def consume(queue_name: str) -> None:
         queue_name=queue_name,
         binding_keys=get_routing_key(queue_name),
         qconnector_cls=RabbitMQConnector,
-        event_cls=BaseEvent
+        event_cls=BaseEvent,
+        prefetch_count=int(os.environ.get('WORKER_PREFETCH_COUNT', 1)),
+        max_workers=int(os.environ.get('WORKER_CONCURRENCY', 1))
     )
 
     signal.signal(signal.SIGTERM, worker.shutdown)
     signal.signal(signal.SIGINT, worker.shutdown)
 
+    start_worker_metrics_server()
     worker.connect()
     worker.start_consuming()
 